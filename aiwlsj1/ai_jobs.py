@@ -0,0 +1,213 @@
+"""
+AI分析后台任务模块
+POST 接口只负责入队，固定数量的后台协程调用大模型并把结果写回数据库，
+前端按任务ID轮询状态；相同输入的进行中任务只保留一个。
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+from db.models import AIAnalysisJob
+from db.session import AsyncSessionLocal, get_db
+from utils.llm_client import LLMClient, LLMError, get_llm_client
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/ai_jobs", tags=["AI分析任务"])
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+ACTIVE_STATUSES = (JOB_PENDING, JOB_RUNNING)
+
+# 后台任务使用的会话工厂，测试时替换为测试库
+session_factory = AsyncSessionLocal
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+
+
+def job_to_dict(job: AIAnalysisJob) -> Dict[str, Any]:
+    """任务状态的JSON表示"""
+    def fmt(value):
+        return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "scope": job.scope,
+        "status": job.status,
+        "input_hash": job.input_hash,
+        "result": job.result,
+        "error": job.error,
+        "prompt_stats": job.prompt_stats,
+        "created_at": fmt(job.created_at),
+        "started_at": fmt(job.started_at),
+        "finished_at": fmt(job.finished_at),
+    }
+
+
+async def _run_job(job_id: int):
+    async with session_factory() as session:
+        job = await session.get(AIAnalysisJob, job_id)
+        if job is None or job.status != JOB_PENDING:
+            return
+        job.status = JOB_RUNNING
+        job.started_at = datetime.utcnow()
+        await session.commit()
+
+        try:
+            job.result = await get_llm_client().analyze(job.prompt, raise_on_error=True, **(job.options or {}))
+            job.status = JOB_DONE
+        except LLMError as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+        except Exception as e:
+            logger.error(f"AI分析任务{job_id}执行失败: {e}", exc_info=True)
+            job.status = JOB_FAILED
+            job.error = f"AI分析过程中出现错误：{str(e)[:100]}"
+        job.finished_at = datetime.utcnow()
+        await session.commit()
+
+
+async def _worker():
+    while True:
+        job_id = await _queue.get()
+        try:
+            await _run_job(job_id)
+        except Exception as e:
+            logger.error(f"AI分析任务{job_id}状态更新失败: {e}", exc_info=True)
+        finally:
+            _queue.task_done()
+
+
+async def _requeue_unfinished_jobs():
+    """服务重启后，把未完成的任务重新放回队列"""
+    try:
+        async with session_factory() as session:
+            result = await session.execute(
+                select(AIAnalysisJob).where(AIAnalysisJob.status.in_(ACTIVE_STATUSES)).order_by(AIAnalysisJob.id)
+            )
+            jobs = result.scalars().all()
+            for job in jobs:
+                job.status = JOB_PENDING
+            await session.commit()
+    except Exception as e:
+        logger.error(f"恢复未完成的AI分析任务失败: {e}")
+        return
+    for job in jobs:
+        _queue.put_nowait(job.id)
+    if jobs:
+        logger.info(f"恢复{len(jobs)}个未完成的AI分析任务")
+
+
+def start_ai_job_workers(resume: bool = True):
+    """在当前事件循环中启动后台任务协程（应用启动时调用）"""
+    global _queue
+    if _workers:
+        return
+    # 队列容量覆盖恢复的任务，新任务由 submit_ai_job 限制在 AI_JOB_QUEUE_SIZE 以内
+    _queue = asyncio.Queue()
+    for _ in range(max(settings.AI_JOB_WORKERS, 1)):
+        _workers.append(asyncio.create_task(_worker()))
+    if resume:
+        _workers.append(asyncio.create_task(_requeue_unfinished_jobs()))
+
+
+async def stop_ai_job_workers():
+    """停止后台任务协程，未完成的任务保留为待处理状态，下次启动时恢复"""
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
+
+
+async def wait_ai_jobs_idle():
+    """等待队列中的任务全部处理完成"""
+    if _queue is not None:
+        await _queue.join()
+
+
+async def submit_ai_job(
+    db: AsyncSession,
+    kind: str,
+    prompt: str,
+    scope: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None,
+    prompt_stats: Optional[Dict[str, Any]] = None,
+) -> AIAnalysisJob:
+    """提交AI分析任务
+
+    相同类型和输入的任务若仍在排队/执行，直接返回该任务；
+    若在缓存有效期内已完成，直接返回已完成的结果。并发的相同请求由部分唯一索引保证只入库一个任务。
+    """
+    options = options or {}
+    input_hash = LLMClient.cache_key(prompt, kind=kind, **options)
+
+    result = await db.execute(
+        select(AIAnalysisJob)
+        .where(AIAnalysisJob.kind == kind, AIAnalysisJob.input_hash == input_hash)
+        .where(AIAnalysisJob.status.in_(ACTIVE_STATUSES + (JOB_DONE,)))
+        .order_by(AIAnalysisJob.id.desc())
+        .limit(1)
+    )
+    existing = result.scalars().first()
+    if existing is not None:
+        fresh_after = datetime.utcnow() - timedelta(seconds=settings.AI_CACHE_TTL)
+        if existing.status != JOB_DONE or (existing.finished_at and existing.finished_at >= fresh_after):
+            return existing
+
+    if _queue is None:
+        start_ai_job_workers(resume=False)
+    if _queue.qsize() >= settings.AI_JOB_QUEUE_SIZE:
+        raise HTTPException(status_code=503, detail="AI分析任务排队已满，请稍后重试")
+
+    job = AIAnalysisJob(
+        kind=kind,
+        scope=scope,
+        input_hash=input_hash,
+        prompt=prompt,
+        options=options,
+        prompt_stats=prompt_stats,
+        status=JOB_PENDING,
+    )
+    db.add(job)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 查重之后另一个请求已提交了相同任务（唯一索引 ux_ai_analysis_job_active_hash），复用该任务
+        await db.rollback()
+        result = await db.execute(
+            select(AIAnalysisJob)
+            .where(AIAnalysisJob.kind == kind, AIAnalysisJob.input_hash == input_hash)
+            .where(AIAnalysisJob.status.in_(ACTIVE_STATUSES))
+        )
+        existing = result.scalars().first()
+        if existing is None:
+            raise
+        return existing
+    await db.refresh(job)
+    _queue.put_nowait(job.id)
+    return job
+
+
+@router.get("/{job_id}")
+async def get_ai_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """查询AI分析任务状态，完成后返回分析结果"""
+    job = await db.get(AIAnalysisJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="分析任务不存在")
+    # 后台会话已更新该行，重新读取最新状态
+    await db.refresh(job)
+    return {"success": True, "data": job_to_dict(job)}
@@ -19,9 +19,16 @@ if config.config_file_name is not None:
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import settings
 from db.models import Base
+from db.session import is_sqlite, sync_database_url
 target_metadata = Base.metadata
 
+# 连接串取自应用配置（.env 中的 DATABASE_URL），迁移与应用使用同一个数据库；
+# SQLite 不支持大部分 ALTER TABLE，使用批量模式重建表
+config.set_main_option("sqlalchemy.url", sync_database_url(settings.DATABASE_URL).replace("%", "%%"))
+render_as_batch = is_sqlite(settings.DATABASE_URL)
+
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
@@ -47,6 +54,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        render_as_batch=render_as_batch,
     )
 
     with context.begin_transaction():
@@ -68,7 +76,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            render_as_batch=render_as_batch,
         )
 
         with context.begin_transaction():
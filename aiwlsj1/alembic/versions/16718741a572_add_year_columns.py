@@ -9,7 +9,6 @@ from typing import Sequence, Union
 
 from alembic import op
 import sqlalchemy as sa
-from sqlalchemy.dialects import sqlite
 
 # revision identifiers, used by Alembic.
 revision: str = '16718741a572'
@@ -46,7 +45,7 @@ def downgrade() -> None:
     sa.Column('id', sa.INTEGER(), nullable=False),
     sa.Column('version', sa.VARCHAR(length=255), nullable=False),
     sa.Column('app', sa.VARCHAR(length=100), nullable=False),
-    sa.Column('content', sqlite.JSON(), nullable=False),
+    sa.Column('content', sa.JSON(), nullable=False),
     sa.PrimaryKeyConstraint('id')
     )
     # ### end Alembic commands ###
@@ -0,0 +1,42 @@
+"""add imported_file table
+
+Revision ID: a8b9c0d1e2f3
+Revises: f7a8b9c0d1e2
+Create Date: 2025-10-05 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8b9c0d1e2f3'
+down_revision: Union[str, None] = 'f7a8b9c0d1e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create table recording files loaded by the bulk import CLI, keyed by checksum."""
+    op.create_table(
+        'imported_file',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('kind', sa.String(length=32), nullable=False,
+                  comment='导入类型: fault, pue, contract, kpi, drill_down'),
+        sa.Column('path', sa.String(length=512), nullable=True, comment='导入时的文件路径'),
+        sa.Column('checksum', sa.String(length=64), nullable=False, comment='文件内容（及导入范围）的SHA-256'),
+        sa.Column('rows_read', sa.Integer(), nullable=True, comment='读取的数据行数'),
+        sa.Column('inserted', sa.Integer(), nullable=True, comment='写入行数'),
+        sa.Column('rejected', sa.Integer(), nullable=True, comment='出错跳过的行数'),
+        sa.Column('duplicates', sa.Integer(), nullable=True, comment='重复跳过的行数'),
+        sa.Column('imported_at', sa.DateTime(), nullable=True, comment='导入时间'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_imported_file_kind_checksum', 'imported_file', ['kind', 'checksum'], unique=True)
+
+
+def downgrade() -> None:
+    """Drop table added in upgrade."""
+    op.drop_index('ix_imported_file_kind_checksum', table_name='imported_file')
+    op.drop_table('imported_file')
@@ -0,0 +1,32 @@
+"""add composite index on pue_drill_down_data lookup columns
+
+Revision ID: b3c4d5e6f7a8
+Revises: e417db4c3d99
+Create Date: 2025-09-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3c4d5e6f7a8'
+down_revision: Union[str, None] = 'e417db4c3d99'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add (location, year, month) index for exact/prefix drill-down lookups."""
+    op.create_index(
+        'ix_pue_drill_down_location_year_month',
+        'pue_drill_down_data',
+        ['location', 'year', 'month'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Remove index added in upgrade."""
+    op.drop_index('ix_pue_drill_down_location_year_month', table_name='pue_drill_down_data')
@@ -0,0 +1,40 @@
+"""add trigram indexes for fault text search on PostgreSQL
+
+Revision ID: b9c0d1e2f3a4
+Revises: a8b9c0d1e2f3
+Create Date: 2025-10-12 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9c0d1e2f3a4'
+down_revision: Union[str, None] = 'a8b9c0d1e2f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# fault search matches these columns with ILIKE '%keyword%'
+SEARCH_COLUMNS = ('fault_name', 'fault_cause', 'fault_handling', 'remarks')
+
+
+def upgrade() -> None:
+    """Add pg_trgm GIN indexes so substring search does not scan fault_record; no-op on other backends."""
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in SEARCH_COLUMNS:
+        op.create_index(
+            f'ix_fault_record_{column}_trgm', 'fault_record', [sa.text(f'{column} gin_trgm_ops')],
+            unique=False, postgresql_using='gin',
+        )
+
+
+def downgrade() -> None:
+    """Remove the trigram indexes; the extension is left installed."""
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    for column in reversed(SEARCH_COLUMNS):
+        op.drop_index(f'ix_fault_record_{column}_trgm', table_name='fault_record')
@@ -0,0 +1,43 @@
+"""add unique index on the fault_record natural key
+
+Revision ID: c0d1e2f3a4b5
+Revises: b9c0d1e2f3a4
+Create Date: 2025-10-20 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c0d1e2f3a4b5'
+down_revision: Union[str, None] = 'b9c0d1e2f3a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# must match db.models.FAULT_NATURAL_KEY
+NATURAL_KEY = ('sequence_no', 'start_time', 'fault_name')
+BACKUP_TABLE = 'fault_record_duplicates'
+
+
+def upgrade() -> None:
+    """Move duplicate rows left by imports before deduplication (all but the oldest) to fault_record_duplicates,
+    then add the unique index. The backup table is always created so the moved rows can be reviewed or restored."""
+    key = ', '.join(NATURAL_KEY)
+    not_null = ' AND '.join(f'{column} IS NOT NULL' for column in NATURAL_KEY)
+    # the derived table lets MySQL select from the table it copies
+    op.execute(
+        f'CREATE TABLE {BACKUP_TABLE} AS SELECT * FROM fault_record WHERE {not_null} AND id NOT IN '
+        f'(SELECT id FROM (SELECT MIN(id) AS id FROM fault_record WHERE {not_null} GROUP BY {key}) AS keep)'
+    )
+    op.execute(f'DELETE FROM fault_record WHERE id IN (SELECT id FROM {BACKUP_TABLE})')
+    op.create_index('ux_fault_record_natural_key', 'fault_record', list(NATURAL_KEY), unique=True,
+                    mysql_length={'fault_name': 255})
+
+
+def downgrade() -> None:
+    """Remove the unique index and put the moved duplicates back."""
+    op.drop_index('ux_fault_record_natural_key', table_name='fault_record')
+    op.execute(f'INSERT INTO fault_record SELECT * FROM {BACKUP_TABLE}')
+    op.drop_table(BACKUP_TABLE)
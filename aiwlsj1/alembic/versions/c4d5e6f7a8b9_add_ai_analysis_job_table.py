@@ -0,0 +1,44 @@
+"""add ai_analysis_job table
+
+Revision ID: c4d5e6f7a8b9
+Revises: b3c4d5e6f7a8
+Create Date: 2025-09-20 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d5e6f7a8b9'
+down_revision: Union[str, None] = 'b3c4d5e6f7a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create table for queued AI analysis jobs and their results."""
+    op.create_table(
+        'ai_analysis_job',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('kind', sa.String(length=32), nullable=False, comment='分析类型: pue, huiju, fault'),
+        sa.Column('scope', sa.String(length=255), nullable=True, comment='分析范围（地点、城市或筛选条件）'),
+        sa.Column('input_hash', sa.String(length=64), nullable=False, comment='输入数据及调用参数的哈希'),
+        sa.Column('prompt', sa.Text(), nullable=True, comment='提示词（服务重启后据此恢复任务）'),
+        sa.Column('options', sa.JSON(), nullable=True, comment='模型调用参数(JSON格式)'),
+        sa.Column('status', sa.String(length=20), nullable=True, comment='状态: pending, running, done, failed'),
+        sa.Column('result', sa.Text(), nullable=True, comment='分析结果'),
+        sa.Column('error', sa.Text(), nullable=True, comment='失败原因'),
+        sa.Column('created_at', sa.DateTime(), nullable=True, comment='创建时间'),
+        sa.Column('started_at', sa.DateTime(), nullable=True, comment='开始执行时间'),
+        sa.Column('finished_at', sa.DateTime(), nullable=True, comment='完成时间'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_ai_analysis_job_kind_hash', 'ai_analysis_job', ['kind', 'input_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop table added in upgrade."""
+    op.drop_index('ix_ai_analysis_job_kind_hash', table_name='ai_analysis_job')
+    op.drop_table('ai_analysis_job')
@@ -0,0 +1,41 @@
+"""add partial unique index on active ai_analysis_job rows
+
+Revision ID: d1e2f3a4b5c6
+Revises: c0d1e2f3a4b5
+Create Date: 2025-10-22 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1e2f3a4b5c6'
+down_revision: Union[str, None] = 'c0d1e2f3a4b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE = "status IN ('pending', 'running')"
+
+
+def upgrade() -> None:
+    """Fail duplicate active jobs (keeping the oldest), then allow one active job per kind and input hash.
+
+    Partial indexes are only available on SQLite and PostgreSQL; MySQL keeps relying on the lookup in submit_ai_job.
+    """
+    if op.get_bind().dialect.name not in ('sqlite', 'postgresql'):
+        return
+    op.execute(
+        f"UPDATE ai_analysis_job SET status = 'failed', error = '重复的分析任务' WHERE {ACTIVE} AND id NOT IN "
+        f"(SELECT MIN(id) FROM ai_analysis_job WHERE {ACTIVE} GROUP BY kind, input_hash)"
+    )
+    op.create_index('ux_ai_analysis_job_active_hash', 'ai_analysis_job', ['kind', 'input_hash'], unique=True,
+                    sqlite_where=sa.text(ACTIVE), postgresql_where=sa.text(ACTIVE))
+
+
+def downgrade() -> None:
+    """Drop index added in upgrade."""
+    if op.get_bind().dialect.name not in ('sqlite', 'postgresql'):
+        return
+    op.drop_index('ux_ai_analysis_job_active_hash', table_name='ai_analysis_job')
@@ -0,0 +1,31 @@
+"""add prompt_stats column to ai_analysis_job
+
+Revision ID: d5e6f7a8b9c0
+Revises: c4d5e6f7a8b9
+Create Date: 2025-09-22 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e6f7a8b9c0'
+down_revision: Union[str, None] = 'c4d5e6f7a8b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Record prompt digest sizes and compression ratio per job."""
+    op.add_column(
+        'ai_analysis_job',
+        sa.Column('prompt_stats', sa.JSON(), nullable=True, comment='提示词摘要统计：原始/摘要字符数和压缩比(JSON格式)'),
+    )
+
+
+def downgrade() -> None:
+    """Remove column added in upgrade."""
+    with op.batch_alter_table('ai_analysis_job') as batch_op:
+        batch_op.drop_column('prompt_stats')
@@ -0,0 +1,77 @@
+"""normalize huijugugan months and add a unique (city, month) index
+
+Revision ID: e2f3a4b5c6d7
+Revises: d1e2f3a4b5c6
+Create Date: 2025-10-23 00:00:00.000000
+
+"""
+import logging
+import re
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2f3a4b5c6d7'
+down_revision: Union[str, None] = 'd1e2f3a4b5c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# same rule as huijugugan.normalize_huiju_month: "2025年1月" / "2025-1" -> "2025-01"
+_YEAR_MONTH_RE = re.compile(r"(\d{4})\D*(\d{1,2})")
+BACKUP_TABLE = 'huijugugan_duplicates'
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def _normalize_month(value):
+    if value is None:
+        return None
+    text = str(value).strip()
+    match = _YEAR_MONTH_RE.search(text)
+    if match and 1 <= int(match.group(2)) <= 12:
+        return f"{match.group(1)}-{int(match.group(2)):02d}"
+    return text
+
+
+def upgrade() -> None:
+    """Rewrite city/month to the normalized form, move rows that collide after normalization
+    (all but the oldest) to huijugugan_duplicates, then add the unique index."""
+    if context.is_offline_mode():
+        raise RuntimeError('e2f3a4b5c6d7 rewrites existing rows and cannot be generated as offline SQL')
+    bind = op.get_bind()
+    rows = bind.execute(sa.text('SELECT id, city, month FROM huijugugan ORDER BY id')).all()
+    kept = set()
+    duplicates = []
+    changed = []
+    for row_id, city, month in rows:
+        new_city = city.strip() if city is not None else None
+        new_month = _normalize_month(month)
+        if new_city is not None and new_month is not None:
+            if (new_city, new_month) in kept:
+                duplicates.append(row_id)
+                continue
+            kept.add((new_city, new_month))
+        if (new_city, new_month) != (city, month):
+            changed.append({'id': row_id, 'city': new_city, 'month': new_month})
+
+    if duplicates:
+        op.execute(f'CREATE TABLE {BACKUP_TABLE} AS SELECT * FROM huijugugan WHERE 1 = 0')
+        for start in range(0, len(duplicates), 500):
+            ids = ', '.join(str(i) for i in duplicates[start:start + 500])
+            op.execute(f'INSERT INTO {BACKUP_TABLE} SELECT * FROM huijugugan WHERE id IN ({ids})')
+            op.execute(f'DELETE FROM huijugugan WHERE id IN ({ids})')
+        logger.warning(f'moved {len(duplicates)} duplicate huijugugan rows to {BACKUP_TABLE}')
+    if changed:
+        bind.execute(sa.text('UPDATE huijugugan SET city = :city, month = :month WHERE id = :id'), changed)
+    op.create_index('ux_huijugugan_city_month', 'huijugugan', ['city', 'month'], unique=True)
+
+
+def downgrade() -> None:
+    """Drop the unique index and restore rows moved to the backup table; normalized months are kept."""
+    op.drop_index('ux_huijugugan_city_month', table_name='huijugugan')
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table(BACKUP_TABLE):
+        op.execute(f'INSERT INTO huijugugan SELECT * FROM {BACKUP_TABLE}')
+        op.drop_table(BACKUP_TABLE)
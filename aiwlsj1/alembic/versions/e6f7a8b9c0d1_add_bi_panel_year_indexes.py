@@ -0,0 +1,34 @@
+"""add year indexes on big-screen panel tables
+
+Revision ID: e6f7a8b9c0d1
+Revises: d5e6f7a8b9c0
+Create Date: 2025-09-26 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f7a8b9c0d1'
+down_revision: Union[str, None] = 'd5e6f7a8b9c0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PANEL_TABLES = (
+    'center_top_top', 'center_top_bottom', 'left_top', 'left_middle', 'right_top', 'right_middle', 'bottom',
+    'left_middle_kpi', 'center_middle_kpi', 'right_middle_kpi', 'left_bottom_kpi', 'right_bottom_kpi', 'top_kpi',
+)
+
+
+def upgrade() -> None:
+    """Index year so the big screen only reads the displayed year."""
+    for table in PANEL_TABLES:
+        op.create_index(f'ix_{table}_year', table, ['year'], unique=False)
+
+
+def downgrade() -> None:
+    """Remove indexes added in upgrade."""
+    for table in reversed(PANEL_TABLES):
+        op.drop_index(f'ix_{table}_year', table_name=table)
@@ -0,0 +1,50 @@
+"""add import_job table
+
+Revision ID: f7a8b9c0d1e2
+Revises: e6f7a8b9c0d1
+Create Date: 2025-10-02 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a8b9c0d1e2'
+down_revision: Union[str, None] = 'e6f7a8b9c0d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create table for background spreadsheet import jobs and their progress."""
+    op.create_table(
+        'import_job',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('kind', sa.String(length=32), nullable=False, comment='导入类型: fault, contract, kpi, pue'),
+        sa.Column('filename', sa.String(length=255), nullable=True, comment='上传的原始文件名'),
+        sa.Column('spool_path', sa.String(length=512), nullable=True, comment='暂存文件路径（导入结束后删除）'),
+        sa.Column('file_size', sa.Integer(), nullable=True, comment='文件字节数'),
+        sa.Column('options', sa.JSON(), nullable=True, comment='导入参数(JSON格式)'),
+        sa.Column('status', sa.String(length=20), nullable=True,
+                  comment='状态: pending, running, done, failed, cancelled'),
+        sa.Column('rows_read', sa.Integer(), nullable=True, comment='读取的数据行数'),
+        sa.Column('inserted', sa.Integer(), nullable=True, comment='写入行数'),
+        sa.Column('rejected', sa.Integer(), nullable=True, comment='出错跳过的行数'),
+        sa.Column('duplicates', sa.Integer(), nullable=True, comment='重复跳过的行数'),
+        sa.Column('errors', sa.JSON(), nullable=True, comment='出错行明细(JSON格式)'),
+        sa.Column('error', sa.Text(), nullable=True, comment='失败原因'),
+        sa.Column('elapsed_seconds', sa.Float(), nullable=True, comment='导入耗时（秒）'),
+        sa.Column('created_at', sa.DateTime(), nullable=True, comment='创建时间'),
+        sa.Column('started_at', sa.DateTime(), nullable=True, comment='开始执行时间'),
+        sa.Column('finished_at', sa.DateTime(), nullable=True, comment='完成时间'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_import_job_status'), 'import_job', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop table added in upgrade."""
+    op.drop_index(op.f('ix_import_job_status'), table_name='import_job')
+    op.drop_table('import_job')
@@ -1,57 +1,59 @@
 import os
 import sys
-from fastapi import APIRouter, Request, Response, Depends
+from typing import Optional
+from fastapi import APIRouter, Request, Response, Depends, Query
 from fastapi.responses import HTMLResponse
 from starlette.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from db.session import get_db
-from db.models import CenterTopTop, CenterTopBottom, LeftTop, LeftMiddle, RightTop, RightMiddle, Bottom
+from db.session import get_read_db
+from bi_snapshot import get_bi_snapshot
+from bi_api import check_month_range
 from common import bi_templates, bi_templates_env
+from config import settings
+from utils.static_files import ImageFiles
 
 router = APIRouter()
 
 root_path = os.getcwd()
 sys.path.append(root_path)
-current_file = os.path.abspath(sys.argv[0])
-current_dir = os.path.dirname(current_file)
 
-async def read_img(item, img):
-    img_path = current_dir + '/img/{}/{}'.format(item, img)
-    with open(img_path, 'rb') as frb:
-        res_body = frb.read()
-    return Response(res_body)
+# 大屏图片目录，相对路径基于项目目录而不是启动脚本所在目录
+img_root = settings.IMG_ROOT
+if not os.path.isabs(img_root):
+    img_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), img_root)
+image_files = ImageFiles(img_root, settings.IMG_CACHE_MAX_BYTES, settings.IMG_CACHE_MAX_ITEM_BYTES, settings.IMG_MAX_AGE)
 
 @router.get("/bi", response_class=HTMLResponse)
-async def bi(request: Request, db: AsyncSession = Depends(get_db)):
-    # 查询所有大屏需要的数据
-    center_top_top = (await db.execute(select(CenterTopTop))).scalars().all()
-    center_top_bottom = (await db.execute(select(CenterTopBottom))).scalars().all()
-    left_top = (await db.execute(select(LeftTop))).scalars().all()
-    left_middle = (await db.execute(select(LeftMiddle))).scalars().all()
-    right_top = (await db.execute(select(RightTop))).scalars().all()
-    right_middle = (await db.execute(select(RightMiddle))).scalars().all()
-    bottom = (await db.execute(select(Bottom))).scalars().all()
+async def bi(
+    request: Request,
+    year: Optional[int] = Query(None, ge=1900, le=2100),
+    month_from: Optional[int] = Query(None, ge=1, le=12),
+    month_to: Optional[int] = Query(None, ge=1, le=12),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # 大屏数据取自内存快照，与 /api/bi_data 一致；页面上的 year/month_from/month_to 参数由 index.js 原样带给接口
+    check_month_range(month_from, month_to)
+    data = (await get_bi_snapshot(db, year, month_from, month_to))["data"]
 
     # 组装模板上下文
     return bi_templates_env.TemplateResponse(
         bi_templates['index1'],
         {
             "request": request,
-            "center_top_top": center_top_top,
-            "center_top_bottom": center_top_bottom,
-            "left_top": left_top,
-            "left_middle": left_middle,
-            "right_top": right_top,
-            "right_middle": right_middle,
-            "bottom": bottom,
+            "center_top_top": data["centerTopTopData"],
+            "center_top_bottom": data["centerTopBottomData"],
+            "left_top": data["leftTopData"],
+            "left_middle": data["leftMiddleData"],
+            "right_top": data["rightTopData"],
+            "right_middle": data["rightMiddleData"],
+            "bottom": data["bottomData"],
+            "year": data["year"],
         }
     )
 
 @router.get("/img/{item}/{img}")
-async def send_img(item, img):
-    ret = await read_img(item=item, img=img)
-    return ret
+async def send_img(request: Request, item: str, img: str):
+    return await image_files.response(request, item, img)
 
 @router.get("/bi2", response_class=HTMLResponse)
 async def bi2(request: Request):
@@ -1,41 +1,27 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from db.models import CenterTopTop, CenterTopBottom, LeftTop, LeftMiddle, RightTop, RightMiddle, Bottom, LeftMiddleKPI, CenterMiddleKPI, RightMiddleKPI, LeftBottomKPI, RightBottomKPI, TopKPI
-from db.session import get_db
+from db.session import get_read_db
+from bi_snapshot import get_bi_snapshot
 
 router = APIRouter()
 
-@router.get('/api/bi_data')
-async def get_bi_data(session: AsyncSession = Depends(get_db)):
-    def to_list(result, fields):
-        return [[getattr(row, f) for f in fields] for row in result.scalars().all()]
-
-    center_top_top = await session.execute(select(CenterTopTop))
-    center_top_bottom = await session.execute(select(CenterTopBottom))
-    left_top = await session.execute(select(LeftTop))
-    left_middle = await session.execute(select(LeftMiddle))
-    right_top = await session.execute(select(RightTop))
-    right_middle = await session.execute(select(RightMiddle))
-    bottom = await session.execute(select(Bottom))
-    left_middle_kpi = await session.execute(select(LeftMiddleKPI))
-    center_middle_kpi = await session.execute(select(CenterMiddleKPI))
-    right_middle_kpi = await session.execute(select(RightMiddleKPI))
-    left_bottom_kpi = await session.execute(select(LeftBottomKPI))
-    right_bottom_kpi = await session.execute(select(RightBottomKPI))
-    top_kpi = await session.execute(select(TopKPI))
+def check_month_range(month_from: Optional[int], month_to: Optional[int]):
+    if month_from and month_to and month_from > month_to:
+        raise HTTPException(status_code=400, detail="起始月份不能晚于结束月份")
 
-    return {
-        "centerTopTopData": to_list(center_top_top, ["type", "status"]),
-        "centerTopBottomData": to_list(center_top_bottom, ["region", "value", "ratio"]),
-        "leftTopData": to_list(left_top, ["month", "baseline", "challenge", "indicator"]),
-        "leftMiddleData": to_list(left_middle, ["month", "baseline", "challenge", "indicator"]),
-        "centerMiddleData": to_list(center_middle_kpi, ["month", "baseline", "challenge", "broadband_rate", "delivery_rate", "year"]),
-        "rightMiddleData": to_list(right_middle, ["month", "baseline", "challenge", "indicator"]),
-        "rightMiddleKPIData": to_list(right_middle_kpi, ["month", "baseline", "challenge", "r_and_d_completion", "year"]),
-        "rightTopData": to_list(right_top, ["month", "baseline", "challenge", "indicator"]),
-        "leftBottomData": to_list(left_bottom_kpi, ["indicator", "baseline", "challenge", "current", "year"]),
-        "rightBottomData": to_list(right_bottom_kpi, ["month", "baseline", "challenge", "broadband_rate", "year"]),
-        "bottomData": to_list(bottom, ["month", "baseline", "challenge", "battery_voltage_ratio", "mains_load_ratio", "ups_load_ratio", "env_signal_ratio"]),
-        "topData": to_list(top_kpi, ["type", "status", "year"]),
-    }
+@router.get('/api/bi_data')
+async def get_bi_data(
+    request: Request,
+    year: Optional[int] = Query(None, ge=1900, le=2100, description="年份，默认当前年份"),
+    month_from: Optional[int] = Query(None, ge=1, le=12, description="起始月份"),
+    month_to: Optional[int] = Query(None, ge=1, le=12, description="结束月份"),
+    session: AsyncSession = Depends(get_read_db),
+):
+    """大屏数据，直接返回内存中的快照；浏览器带 If-None-Match 且未变化时返回304"""
+    check_month_range(month_from, month_to)
+    snapshot = await get_bi_snapshot(session, year, month_from, month_to)
+    headers = {"ETag": snapshot["etag"], "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == snapshot["etag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot["body"], media_type="application/json", headers=headers)
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Request, Form, HTTPException, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from typing import Optional, List
 import io
+import logging
 import pandas as pd
 from db.models import Zbk, CenterTopTop, CenterTopBottom, LeftTop, LeftMiddle, RightTop, RightMiddle, Bottom, LeftMiddleKPI, CenterMiddleKPI, RightMiddleKPI, LeftBottomKPI, RightBottomKPI, TopKPI, PUEData, FaultRecord
 from common import bi_data_templates, bi_data_templates_env
@@ -10,6 +11,12 @@ from sqlalchemy.future import select
 from sqlalchemy import func
 from fastapi import Depends
 from db.session import get_db
+from bi_snapshot import mark_bi_data_changed
+from bi_panel_batch import BATCH_DETAIL_LIMIT, PANEL_TABLES, panel_template_frame, parse_panel_frame, upsert_panel_frame
+from import_maps import ZBK_MAP
+from utils.ingest import check_upload, ingest, iter_sheet_rows, read_upload_frame
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -55,9 +62,11 @@ class ZbkUpdate(BaseModel):
 
 # CenterTopTop管理页面及增删改查接口
 from fastapi.templating import Jinja2Templates
+from utils.static_files import install_static_url
 from fastapi.responses import RedirectResponse
 
 templates = Jinja2Templates(directory="templates")
+install_static_url(templates)
 
 @router.get("/center_top_top", response_class=HTMLResponse)
 async def center_top_top_page(request: Request, db: AsyncSession = Depends(get_db)):
@@ -75,6 +84,7 @@ async def center_top_top_add(
     obj = CenterTopTop(type=type, status=status, year=year)
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/center_top_top", status_code=303)
 
 @router.post("/center_top_top/update")
@@ -93,6 +103,7 @@ async def center_top_top_update(
     obj.status = status
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/center_top_top", status_code=303)
 
 @router.post("/center_top_top/delete")
@@ -106,6 +117,7 @@ async def center_top_top_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/center_top_top", status_code=303)
 
 # CenterTopBottom管理页面及增删改查接口
@@ -126,6 +138,7 @@ async def center_top_bottom_add(
     obj = CenterTopBottom(region=region, value=value, ratio=ratio, year=year)
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/center_top_bottom", status_code=303)
 
 @router.post("/center_top_bottom/update")
@@ -146,6 +159,7 @@ async def center_top_bottom_update(
     obj.ratio = ratio
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/center_top_bottom", status_code=303)
 
 @router.post("/center_top_bottom/delete")
@@ -159,6 +173,7 @@ async def center_top_bottom_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/center_top_bottom", status_code=303)
 
 # LeftTop管理页面及增删改查接口
@@ -180,6 +195,7 @@ async def left_top_add(
     obj = LeftTop(month=month, baseline=baseline, challenge=challenge, indicator=indicator, year=year)
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/left_top", status_code=303)
 
 @router.post("/left_top/update")
@@ -202,6 +218,7 @@ async def left_top_update(
     obj.indicator = indicator
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/left_top", status_code=303)
 
 @router.post("/left_top/delete")
@@ -215,6 +232,7 @@ async def left_top_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/left_top", status_code=303)
 
 # LeftMiddle管理页面及增删改查接口
@@ -236,6 +254,7 @@ async def left_middle_add(
     obj = LeftMiddle(month=month, baseline=baseline, challenge=challenge, indicator=indicator, year=year)
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/left_middle", status_code=303)
 
 @router.post("/left_middle/update")
@@ -258,6 +277,7 @@ async def left_middle_update(
     obj.indicator = indicator
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/left_middle", status_code=303)
 
 @router.post("/left_middle/delete")
@@ -271,6 +291,7 @@ async def left_middle_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/left_middle", status_code=303)
 
 # RightTop管理页面及增删改查接口
@@ -292,6 +313,7 @@ async def right_top_add(
     obj = RightTop(month=month, baseline=baseline, challenge=challenge, indicator=indicator, year=year)
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/right_top", status_code=303)
 
 @router.post("/right_top/update")
@@ -314,6 +336,7 @@ async def right_top_update(
     obj.indicator = indicator
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/right_top", status_code=303)
 
 @router.post("/right_top/delete")
@@ -327,6 +350,7 @@ async def right_top_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/right_top", status_code=303)
 
 # RightMiddle管理页面及增删改查接口
@@ -348,6 +372,7 @@ async def right_middle_add(
     obj = RightMiddle(month=month, baseline=baseline, challenge=challenge, indicator=indicator, year=year)
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/right_middle", status_code=303)
 
 @router.post("/right_middle/update")
@@ -370,6 +395,7 @@ async def right_middle_update(
     obj.indicator = indicator
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/right_middle", status_code=303)
 
 @router.post("/right_middle/delete")
@@ -383,6 +409,7 @@ async def right_middle_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/right_middle", status_code=303)
 
 # Bottom管理页面及增删改查接口
@@ -416,6 +443,7 @@ async def bottom_add(
     )
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/bottom", status_code=303)
 
 @router.post("/bottom/update")
@@ -444,6 +472,7 @@ async def bottom_update(
     obj.env_signal_ratio = env_signal_ratio
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/bottom", status_code=303)
 
 @router.post("/bottom/delete")
@@ -457,6 +486,7 @@ async def bottom_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/bottom", status_code=303)
 
 # left_middle_kpi 管理
@@ -478,6 +508,7 @@ async def left_middle_kpi_add(
     obj = LeftMiddleKPI(month=month, baseline=baseline, challenge=challenge, offline_duration=offline_duration, year=year)
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/left_middle_kpi", status_code=303)
 
 @router.post("/left_middle_kpi/update")
@@ -500,6 +531,7 @@ async def left_middle_kpi_update(
     obj.offline_duration = offline_duration
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/left_middle_kpi", status_code=303)
 
 @router.post("/left_middle_kpi/delete")
@@ -513,6 +545,7 @@ async def left_middle_kpi_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/left_middle_kpi", status_code=303)
 
 # center_middle_kpi 管理
@@ -535,6 +568,7 @@ async def center_middle_kpi_add(
     obj = CenterMiddleKPI(month=month, baseline=baseline, challenge=challenge, broadband_rate=broadband_rate, delivery_rate=delivery_rate, year=year)
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/center_middle_kpi", status_code=303)
 
 @router.post("/center_middle_kpi/update")
@@ -559,6 +593,7 @@ async def center_middle_kpi_update(
     obj.delivery_rate = delivery_rate
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/center_middle_kpi", status_code=303)
 
 @router.post("/center_middle_kpi/delete")
@@ -572,6 +607,7 @@ async def center_middle_kpi_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/center_middle_kpi", status_code=303)
 
 # right_middle_kpi 管理
@@ -593,6 +629,7 @@ async def right_middle_kpi_add(
     obj = RightMiddleKPI(month=month, baseline=baseline, challenge=challenge, r_and_d_completion=r_and_d_completion, year=year)
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/right_middle_kpi", status_code=303)
 
 @router.post("/right_middle_kpi/update")
@@ -615,6 +652,7 @@ async def right_middle_kpi_update(
     obj.r_and_d_completion = r_and_d_completion
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/right_middle_kpi", status_code=303)
 
 @router.post("/right_middle_kpi/delete")
@@ -628,6 +666,7 @@ async def right_middle_kpi_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/right_middle_kpi", status_code=303)
 
 # left_bottom_kpi 管理
@@ -649,6 +688,7 @@ async def left_bottom_kpi_add(
     obj = LeftBottomKPI(indicator=indicator, baseline=baseline, challenge=challenge, current=current, year=year)
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/left_bottom_kpi", status_code=303)
 
 @router.post("/left_bottom_kpi/update")
@@ -671,6 +711,7 @@ async def left_bottom_kpi_update(
     obj.current = current
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/left_bottom_kpi", status_code=303)
 
 @router.post("/left_bottom_kpi/delete")
@@ -684,6 +725,7 @@ async def left_bottom_kpi_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/left_bottom_kpi", status_code=303)
 
 # right_bottom_kpi 管理
@@ -705,6 +747,7 @@ async def right_bottom_kpi_add(
     obj = RightBottomKPI(month=month, baseline=baseline, challenge=challenge, broadband_rate=broadband_rate, year=year)
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/right_bottom_kpi", status_code=303)
 
 @router.post("/right_bottom_kpi/update")
@@ -727,6 +770,7 @@ async def right_bottom_kpi_update(
     obj.broadband_rate = broadband_rate
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/right_bottom_kpi", status_code=303)
 
 @router.post("/right_bottom_kpi/delete")
@@ -740,6 +784,7 @@ async def right_bottom_kpi_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/right_bottom_kpi", status_code=303)
 
 # top_kpi 管理
@@ -759,6 +804,7 @@ async def top_kpi_add(
     obj = TopKPI(type=type, status=status, year=year)
     db.add(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/top_kpi", status_code=303)
 
 @router.post("/top_kpi/update")
@@ -777,6 +823,7 @@ async def top_kpi_update(
     obj.status = status
     obj.year = year
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/top_kpi", status_code=303)
 
 @router.post("/top_kpi/delete")
@@ -790,8 +837,78 @@ async def top_kpi_delete(
         raise HTTPException(status_code=404, detail="数据不存在")
     await db.delete(obj)
     await db.commit()
+    mark_bi_data_changed()
     return RedirectResponse(url="/top_kpi", status_code=303)
 
+# 面板数据批量写入：任一面板表按 年份+月份（或类型/区域/指标）一次新增或更新多行
+def _check_panel_table(table: str):
+    if table not in PANEL_TABLES:
+        raise HTTPException(status_code=404, detail=f"未知的面板数据表: {table}")
+
+@router.post("/api/panels/{table}/batch")
+async def panel_batch_upsert(table: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """批量写入面板数据，大屏快照只失效一次
+
+    JSON: {"year": 2026, "dry_run": false, "rows": [{"month": "1月", "baseline": 95, ...}]}
+    表格: multipart 上传 file（列名可用字段名或中文注释），可附带 year、dry_run 表单字段
+    """
+    _check_panel_table(table)
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="请上传Excel或CSV文件")
+        raw = read_upload_frame(upload.filename or "", await upload.read())
+        year, dry_run, first_line = form.get("year"), form.get("dry_run"), 2
+    else:
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="请求体不是有效的JSON")
+        rows = payload.get("rows") if isinstance(payload, dict) else None
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise HTTPException(status_code=400, detail="rows 必须为对象数组")
+        raw = pd.DataFrame(rows, dtype=object)
+        year, dry_run, first_line = payload.get("year"), payload.get("dry_run"), 1
+
+    try:
+        default_year = int(year) if year not in (None, "") else None
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="year 必须为整数")
+    dry_run = str(dry_run).strip().lower() in ("1", "true", "yes", "on")
+
+    df, errors = parse_panel_frame(table, raw, default_year=default_year, first_line=first_line)
+    if errors:
+        return JSONResponse(status_code=400, content={
+            "success": False,
+            "message": f"数据校验未通过，共{len(errors)}处错误",
+            "errors": errors[:BATCH_DETAIL_LIMIT],
+        })
+    if df.empty:
+        return JSONResponse(status_code=400, content={"success": False, "message": "没有数据行", "errors": []})
+    try:
+        summary = await upsert_panel_frame(db, table, df, dry_run=dry_run)
+    except Exception as e:
+        logger.error(f"面板数据批量写入失败({table}): {e}", exc_info=True)
+        return JSONResponse(status_code=500, content={"success": False, "message": f"写入失败：{str(e)[:100]}"})
+    action = "预览" if dry_run else "写入完成"
+    summary["message"] = f"{action}：新增{summary['inserted']}条，更新{summary['updated']}条，未变化{summary['unchanged']}条"
+    return {"success": True, **summary}
+
+@router.get("/api/panels/{table}/template")
+async def panel_batch_template(table: str):
+    """下载面板数据批量导入模板"""
+    _check_panel_table(table)
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        panel_template_frame(table).to_excel(writer, index=False, sheet_name=table)
+    output.seek(0)
+    return StreamingResponse(
+        output,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f"attachment; filename={table}_template.xlsx"}
+    )
+
 # 路由定义
 @router.get("/", response_class=HTMLResponse)
 async def index(request: Request, db: AsyncSession = Depends(get_db)):
@@ -939,97 +1056,22 @@ async def add_kpi_zbk(
     await db.commit()
     return RedirectResponse(url="/kpi_indicators", status_code=303)
 
+async def _import_zbk_excel(file: UploadFile, indicator_type: str, db: AsyncSession):
+    """流式导入指标库表格，任一行出错时整体回滚"""
+    contents = await file.read()
+    check_upload(file.filename or "", len(contents))
+    rows = iter_sheet_rows(contents, file.filename)
+    await ingest(db, rows, ZBK_MAP.with_constants(type=indicator_type), strict=True)
+
 @router.post("/upload-excel")
 async def upload_contract_excel(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
-    if not file.filename.endswith((".xls", ".xlsx")):
-        raise HTTPException(status_code=400, detail="仅支持Excel文件格式（.xls, .xlsx）")
-    try:
-        contents = await file.read()
-        df = pd.read_excel(io.BytesIO(contents))
-        required_columns = ['指标项', '分值', '全省排名', '全年累计得分占比', '年度达成评估',
-                            '1月指标', '2月指标', '3月指标', '4月指标', '5月指标', '6月指标', '基准值', '挑战值']
-        col_mapping = {}
-        for req_col in required_columns:
-            if req_col in df.columns:
-                col_mapping[req_col] = req_col
-                continue
-            for col in df.columns:
-                if req_col in col:
-                    col_mapping[req_col] = col
-                    break
-            if req_col not in col_mapping:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Excel文件缺少必要的列: {req_col}"
-                )
-        for _, row in df.iterrows():
-            new_zbk = Zbk(
-                zbx=str(row[col_mapping['指标项']]),
-                fz=str(row[col_mapping['分值']]),
-                qspm=str(row[col_mapping['全省排名']]),
-                qnljdfzb=str(row[col_mapping['全年累计得分占比']]),
-                nddcpg=str(row[col_mapping['年度达成评估']]),
-                y1zb=str(row[col_mapping['1月指标']]),
-                y2zb=str(row[col_mapping['2月指标']]),
-                y3zb=str(row[col_mapping['3月指标']]),
-                y4zb=str(row[col_mapping['4月指标']]),
-                y5zb=str(row[col_mapping['5月指标']]),
-                y6zb=str(row[col_mapping['6月指标']]),
-                jzz=str(row[col_mapping['基准值']]),
-                tzz=str(row[col_mapping['挑战值']]),
-                type="contract"
-            )
-            db.add(new_zbk)
-        await db.commit()
-        return RedirectResponse(url="/contract_indicators", status_code=303)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"导入失败: {str(e)}")
+    await _import_zbk_excel(file, "contract", db)
+    return RedirectResponse(url="/contract_indicators", status_code=303)
 
 @router.post("/upload-kpi-excel")
 async def upload_kpi_excel(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
-    if not file.filename.endswith((".xls", ".xlsx")):
-        raise HTTPException(status_code=400, detail="仅支持Excel文件格式（.xls, .xlsx）")
-    try:
-        contents = await file.read()
-        df = pd.read_excel(io.BytesIO(contents))
-        required_columns = ['指标项', '分值', '全省排名', '全年累计得分占比', '年度达成评估',
-                            '1月指标', '2月指标', '3月指标', '4月指标', '5月指标', '6月指标', '基准值', '挑战值']
-        col_mapping = {}
-        for req_col in required_columns:
-            if req_col in df.columns:
-                col_mapping[req_col] = req_col
-                continue
-            for col in df.columns:
-                if req_col in col:
-                    col_mapping[req_col] = col
-                    break
-            if req_col not in col_mapping:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Excel文件缺少必要的列: {req_col}"
-                )
-        for _, row in df.iterrows():
-            new_zbk = Zbk(
-                zbx=str(row[col_mapping['指标项']]),
-                fz=str(row[col_mapping['分值']]),
-                qspm=str(row[col_mapping['全省排名']]),
-                qnljdfzb=str(row[col_mapping['全年累计得分占比']]),
-                nddcpg=str(row[col_mapping['年度达成评估']]),
-                y1zb=str(row[col_mapping['1月指标']]),
-                y2zb=str(row[col_mapping['2月指标']]),
-                y3zb=str(row[col_mapping['3月指标']]),
-                y4zb=str(row[col_mapping['4月指标']]),
-                y5zb=str(row[col_mapping['5月指标']]),
-                y6zb=str(row[col_mapping['6月指标']]),
-                jzz=str(row[col_mapping['基准值']]),
-                tzz=str(row[col_mapping['挑战值']]),
-                type="kpi"
-            )
-            db.add(new_zbk)
-        await db.commit()
-        return RedirectResponse(url="/kpi_indicators", status_code=303)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"导入失败: {str(e)}")
+    await _import_zbk_excel(file, "kpi", db)
+    return RedirectResponse(url="/kpi_indicators", status_code=303)
 
 @router.get("/edit/{xh}", response_class=HTMLResponse)
 async def edit_contract_form(request: Request, xh: int, db: AsyncSession = Depends(get_db)):
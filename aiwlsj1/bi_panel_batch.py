@@ -0,0 +1,189 @@
+"""
+大屏面板数据批量写入模块
+按模型定义校验 JSON 行或表格行，按 年份+月份（或 类型/区域/指标）批量新增或更新，
+一个事务提交，大屏快照只失效一次；年初整年数据一次请求即可导入。
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import Float, Integer, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from bi_snapshot import mark_bi_data_changed, parse_panel_month
+from config import settings
+from db.models import (
+    CenterTopTop, CenterTopBottom, LeftTop, LeftMiddle, RightTop, RightMiddle, Bottom,
+    LeftMiddleKPI, CenterMiddleKPI, RightMiddleKPI, LeftBottomKPI, RightBottomKPI, TopKPI,
+)
+
+logger = logging.getLogger(__name__)
+
+# 管理页路径名 -> (模型, 年份之外的业务键)
+PANEL_TABLES: Dict[str, Tuple[Any, str]] = {
+    "center_top_top": (CenterTopTop, "type"),
+    "center_top_bottom": (CenterTopBottom, "region"),
+    "left_top": (LeftTop, "month"),
+    "left_middle": (LeftMiddle, "month"),
+    "right_top": (RightTop, "month"),
+    "right_middle": (RightMiddle, "month"),
+    "bottom": (Bottom, "month"),
+    "left_middle_kpi": (LeftMiddleKPI, "month"),
+    "center_middle_kpi": (CenterMiddleKPI, "month"),
+    "right_middle_kpi": (RightMiddleKPI, "month"),
+    "left_bottom_kpi": (LeftBottomKPI, "indicator"),
+    "right_bottom_kpi": (RightBottomKPI, "month"),
+    "top_kpi": (TopKPI, "type"),
+}
+
+# 返回的错误和差异明细条数上限
+BATCH_DETAIL_LIMIT = 50
+
+
+def panel_columns(model) -> List[Any]:
+    """可写入的列（不含主键）"""
+    return [c for c in model.__table__.columns if not c.primary_key]
+
+
+def _match_key(key_field: str, value) -> Any:
+    """业务键比较值：月份按 1-12 比较（"1月"与"2025-01"视为同一月），其余去掉首尾空白"""
+    if key_field == "month":
+        return parse_panel_month(value)
+    return str(value).strip()
+
+
+def parse_panel_frame(
+    table: str, raw: pd.DataFrame, default_year: Optional[int] = None, first_line: int = 2
+) -> Tuple[Optional[pd.DataFrame], List[str]]:
+    """按模型校验并转换数据，返回 (数据, 错误列表)
+
+    列名可用字段名或模型注释（如 "月份"、"基准值"）；未提供的数值列在更新时保持原值。
+    年份列缺失或为空时使用 default_year。first_line 为第一条数据的行号（表格为2，JSON为1）。
+    """
+    model, key_field = PANEL_TABLES[table]
+    columns = {c.name: c for c in panel_columns(model)}
+    aliases = {c.comment: c.name for c in columns.values() if c.comment}
+    raw = raw.rename(columns=lambda c: aliases.get(str(c).strip(), str(c).strip()))
+    raw = raw[[c for c in raw.columns if c in columns]]
+
+    required = [key_field] + ([] if default_year else ["year"])
+    missing = [f"{name}({columns[name].comment})" for name in required if name not in raw.columns]
+    if missing:
+        return None, [f"缺少必要的列: {'、'.join(missing)}"]
+
+    raw = raw.dropna(how="all")
+    line = pd.Series(range(first_line, first_line + len(raw)), index=raw.index)
+    errors: List[str] = []
+
+    def report(mask: pd.Series, message: str):
+        for n in line[mask].tolist():
+            errors.append(f"第{n}行：{message}")
+
+    df = pd.DataFrame(index=raw.index)
+    for name in raw.columns:
+        column = columns[name]
+        label = column.comment or name
+        text = raw[name].astype("string").str.strip()
+        blank = text.isna() | (text == "")
+        if isinstance(column.type, (Integer, Float)):
+            number = pd.to_numeric(text, errors="coerce")
+            report(~blank & number.isna(), f"{label}不是有效数字")
+            if isinstance(column.type, Integer):
+                report(number.notna() & (number % 1 != 0), f"{label}必须为整数")
+            df[name] = number
+        else:
+            length = getattr(column.type, "length", None)
+            if length:
+                report(text.str.len() > length, f"{label}超过{length}个字符")
+            df[name] = text.astype(object).where(~blank, None)
+
+    if "year" not in df.columns:
+        df["year"] = default_year
+    elif default_year:
+        df["year"] = df["year"].fillna(default_year)
+    report(df["year"].isna(), "年份不能为空")
+    report(df[key_field].isna(), f"{columns[key_field].comment}不能为空")
+
+    df["_key"] = df[key_field].map(lambda v: _match_key(key_field, v) if v is not None else None)
+    if key_field == "month":
+        report(df[key_field].notna() & df["_key"].isna(), "月份无法识别")
+
+    valid = df["year"].notna() & df["_key"].notna()
+    duplicated = df[valid].duplicated(subset=["year", "_key"], keep=False)
+    report(duplicated.reindex(df.index, fill_value=False), f"同一年份的{columns[key_field].comment}重复")
+
+    if errors:
+        return None, errors
+    df["year"] = df["year"].astype(int)
+    return df, []
+
+
+async def upsert_panel_frame(db: AsyncSession, table: str, df: pd.DataFrame, dry_run: bool = False) -> Dict[str, Any]:
+    """按 年份+业务键 批量写入：不存在则新增，有变化则更新，同一事务提交
+
+    只比较和更新数据中提供的列；库中同一键存在多条时更新id最小的一条。
+    写入成功后使大屏快照失效一次；dry_run 时只返回差异不写库。
+    """
+    model, key_field = PANEL_TABLES[table]
+    chunk_size = max(settings.IMPORT_CHUNK_SIZE, 1)
+    value_fields = [c for c in df.columns if c not in ("year", key_field, "_key")]
+
+    existing: Dict[tuple, Any] = {}
+    result = await db.execute(
+        select(model).where(model.year.in_(sorted(df["year"].unique().tolist()))).order_by(model.id)
+    )
+    for item in result.scalars():
+        key = _match_key(key_field, getattr(item, key_field))
+        if key is not None:
+            existing.setdefault((item.year, key), item)
+
+    inserts: List[Dict[str, Any]] = []
+    updates: List[Dict[str, Any]] = []
+    changes: List[Dict[str, Any]] = []
+    unchanged = 0
+    records = df.astype(object).where(df.notna(), None).to_dict(orient="records")
+    for row in records:
+        key = row.pop("_key")
+        item = existing.get((row["year"], key))
+        if item is None:
+            inserts.append(row)
+            continue
+        before = {f: getattr(item, f) for f in value_fields}
+        after = {f: row[f] for f in value_fields}
+        if before == after:
+            unchanged += 1
+            continue
+        updates.append({"id": item.id, **after})
+        if len(changes) < BATCH_DETAIL_LIMIT:
+            changes.append({"year": row["year"], key_field: row[key_field], "before": before, "after": after})
+
+    if not dry_run and (inserts or updates):
+        try:
+            for start in range(0, len(inserts), chunk_size):
+                await db.execute(insert(model), inserts[start:start + chunk_size])
+            for start in range(0, len(updates), chunk_size):
+                await db.execute(update(model), updates[start:start + chunk_size])
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        mark_bi_data_changed()
+        logger.info(f"面板{table}批量写入：新增{len(inserts)}条，更新{len(updates)}条")
+
+    return {
+        "table": table,
+        "total": len(df),
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "unchanged": unchanged,
+        "changes": changes,
+        "dry_run": dry_run,
+    }
+
+
+def panel_template_frame(table: str) -> pd.DataFrame:
+    """导入模板：表头为各列注释"""
+    model, _ = PANEL_TABLES[table]
+    return pd.DataFrame(columns=[c.comment or c.name for c in panel_columns(model)])
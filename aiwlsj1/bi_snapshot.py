@@ -0,0 +1,146 @@
+"""
+大屏数据快照模块
+把大屏各面板某一年（可限定月份范围）的数据一次性读出并序列化为JSON缓存在内存中，
+/bi 和 /api/bi_data 都从快照读取；bi_data_manage 增删改后调用 mark_bi_data_changed 使其失效。
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+
+from db.models import (
+    CenterTopTop, CenterTopBottom, LeftTop, LeftMiddle, RightTop, RightMiddle, Bottom,
+    LeftMiddleKPI, CenterMiddleKPI, RightMiddleKPI, LeftBottomKPI, RightBottomKPI, TopKPI,
+)
+from utils.event_bus import TOPIC_BI, publish_event
+
+logger = logging.getLogger(__name__)
+
+# 接口字段名 -> (模型, 输出列)，顺序即 /api/bi_data 返回的顺序
+BI_PANELS: List[Tuple[str, Any, List[str]]] = [
+    ("centerTopTopData", CenterTopTop, ["type", "status"]),
+    ("centerTopBottomData", CenterTopBottom, ["region", "value", "ratio"]),
+    ("leftTopData", LeftTop, ["month", "baseline", "challenge", "indicator"]),
+    ("leftMiddleData", LeftMiddle, ["month", "baseline", "challenge", "indicator"]),
+    ("centerMiddleData", CenterMiddleKPI, ["month", "baseline", "challenge", "broadband_rate", "delivery_rate", "year"]),
+    ("rightMiddleData", RightMiddle, ["month", "baseline", "challenge", "indicator"]),
+    ("rightMiddleKPIData", RightMiddleKPI, ["month", "baseline", "challenge", "r_and_d_completion", "year"]),
+    ("rightTopData", RightTop, ["month", "baseline", "challenge", "indicator"]),
+    ("leftBottomData", LeftBottomKPI, ["indicator", "baseline", "challenge", "current", "year"]),
+    ("rightBottomData", RightBottomKPI, ["month", "baseline", "challenge", "broadband_rate", "year"]),
+    ("bottomData", Bottom, ["month", "baseline", "challenge", "battery_voltage_ratio", "mains_load_ratio", "ups_load_ratio", "env_signal_ratio"]),
+    ("topData", TopKPI, ["type", "status", "year"]),
+]
+
+# 同时保留的快照数（不同 年份/月份范围 各一份）
+BI_SNAPSHOT_CACHE_SIZE = 16
+
+_MONTH_RE = re.compile(r"(\d{1,2})\D*$")
+
+_state: Dict[str, int] = {"version": 0}
+_snapshots: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_build_lock = asyncio.Lock()
+
+
+def mark_bi_data_changed() -> None:
+    """大屏面板数据增删改后调用：使全部快照过期，下次请求时重建，并通知已打开的大屏"""
+    _state["version"] += 1
+    _snapshots.clear()
+    publish_event(TOPIC_BI, {"version": _state["version"]})
+
+
+def parse_panel_month(value) -> Optional[int]:
+    """面板月份（"1月"、"2025-01"、"1"）转为1-12，无法解析时返回None"""
+    match = _MONTH_RE.search(str(value or "").strip())
+    if not match:
+        return None
+    month = int(match.group(1))
+    return month if 1 <= month <= 12 else None
+
+
+async def default_bi_year(db: AsyncSession) -> int:
+    """默认展示年份：配置的年份或当前年份；该年还没有数据时取此前最近有数据的年份"""
+    year = settings.BI_DEFAULT_YEAR or datetime.now().year
+    latest = None
+    for _, model, _ in BI_PANELS:
+        value = (await db.execute(select(func.max(model.year)).where(model.year <= year))).scalar()
+        if value is not None and (latest is None or value > latest):
+            latest = value
+    return latest if latest is not None else year
+
+
+async def load_bi_panels(
+    db: AsyncSession, year: int, month_from: Optional[int] = None, month_to: Optional[int] = None
+) -> Dict[str, List[list]]:
+    """在同一个会话中依次读取各面板指定年份的数据（只查输出列，按主键排序）
+
+    未填年份的历史数据在每个年份都展示；月份范围只作用于有月份列的面板。
+    """
+    filter_months = month_from is not None or month_to is not None
+    low, high = month_from or 1, month_to or 12
+    data: Dict[str, List[list]] = {}
+    for key, model, fields in BI_PANELS:
+        columns = [getattr(model, f) for f in fields]
+        by_month = filter_months and hasattr(model, "month")
+        if by_month:
+            columns.append(model.month)
+        query = select(*columns).where(or_(model.year == year, model.year.is_(None))).order_by(model.id)
+        rows = (await db.execute(query)).all()
+        if by_month:
+            rows = [row[:-1] for row in rows if low <= (parse_panel_month(row[-1]) or 0) <= high]
+        data[key] = [list(row) for row in rows]
+    return data
+
+
+async def get_bi_snapshot(
+    db: AsyncSession, year: Optional[int] = None, month_from: Optional[int] = None, month_to: Optional[int] = None
+) -> Dict[str, Any]:
+    """返回指定范围的快照 {data, body, etag}；过期时只有一个请求重建，其余请求等待后复用
+
+    year 为空时为默认年份视图，返回数据中的 year 字段为实际展示的年份。
+    重建前记下数据版本，读取期间有写入使版本变化时本次结果只返回、不缓存，避免把写入前的数据缓存在新版本下。
+    """
+    key = (year, month_from, month_to)
+    snapshot = _snapshots.get(key)
+    if snapshot is not None and snapshot["version"] == _state["version"]:
+        _snapshots.move_to_end(key)
+        return snapshot
+    async with _build_lock:
+        version = _state["version"]
+        snapshot = _snapshots.get(key)
+        if snapshot is not None and snapshot["version"] == version:
+            return snapshot
+        resolved_year = year or await default_bi_year(db)
+        data = await load_bi_panels(db, resolved_year, month_from, month_to)
+        data["year"] = resolved_year
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        snapshot = {
+            "version": version,
+            "data": data,
+            "body": body,
+            "etag": '"' + hashlib.md5(body).hexdigest() + '"',
+        }
+        if _state["version"] != version:
+            logger.info("大屏数据在重建期间有更新，本次快照不缓存")
+            return snapshot
+        _snapshots[key] = snapshot
+        while len(_snapshots) > BI_SNAPSHOT_CACHE_SIZE:
+            _snapshots.popitem(last=False)
+        logger.info(f"大屏数据快照已重建({resolved_year}年): {sum(len(v) for v in data.values() if isinstance(v, list))} 行, {len(body)} 字节")
+        return snapshot
+
+
+def clear_bi_snapshot() -> None:
+    """清空快照（测试或切换数据库时使用）"""
+    _snapshots.clear()
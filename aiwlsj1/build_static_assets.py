@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+静态资源构建脚本（部署前执行）
+为 js/css/字体/图片 生成带内容哈希的文件名（echarts.min.0123456789ab.js），
+CSS 中 url() 引用改写为指纹文件名，文本类文件另生成 .gz（安装 brotli 时还有 .br）预压缩文件，
+清单写入 static/manifest.json，模板中的 static_url() 据此输出指纹URL。
+
+用法: python build_static_assets.py [--static-dir static] [--clean]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import posixpath
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+from utils.static_files import ASSET_MANIFEST, FINGERPRINT_RE, PRECOMPRESSED_ENCODINGS, STATIC_DIR
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时只生成 .gz
+    brotli = None
+
+# 生成指纹文件名的资源类型
+ASSET_SUFFIXES = (".js", ".css", ".woff", ".woff2", ".ttf", ".otf", ".eot", ".svg",
+                  ".png", ".jpg", ".jpeg", ".gif", ".ico")
+# 生成预压缩文件的类型（woff2/图片本身已压缩）
+COMPRESS_SUFFIXES = (".js", ".css", ".svg", ".ttf", ".otf", ".eot", ".json")
+# 小于该大小的文件不预压缩
+COMPRESS_MIN_SIZE = 1024
+
+_CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+?)\1\s*\)""")
+_COMPRESSED_SUFFIXES = tuple(suffix for _, suffix in PRECOMPRESSED_ENCODINGS)
+
+
+def fingerprint_name(rel_path: str, content: bytes) -> str:
+    """js/echarts.min.js -> js/echarts.min.<md5前12位>.js"""
+    root, ext = posixpath.splitext(rel_path)
+    return f"{root}.{hashlib.md5(content).hexdigest()[:12]}{ext}"
+
+
+def _is_generated(rel_path: str) -> bool:
+    return (
+        rel_path == ASSET_MANIFEST
+        or rel_path.endswith(_COMPRESSED_SUFFIXES)
+        or FINGERPRINT_RE.search(rel_path) is not None
+    )
+
+
+def rewrite_css_urls(css: str, css_path: str, files: Dict[str, str]) -> str:
+    """把CSS中指向已构建资源的相对/绝对 url() 改写为指纹文件名（保持相对路径写法）"""
+    base = posixpath.dirname(css_path)
+
+    def replace(match):
+        quote_char, url = match.group(1), match.group(2).strip()
+        if url.startswith(("data:", "http:", "https:", "//", "#")):
+            return match.group(0)
+        # 保留 ?查询参数 和 #片段（字体的 #iefix 等）
+        split = re.search(r"[?#]", url)
+        path, suffix = (url[:split.start()], url[split.start():]) if split else (url, "")
+        if path.startswith("/static/"):
+            target = path[len("/static/"):]
+        elif path.startswith("/"):
+            return match.group(0)
+        else:
+            target = posixpath.normpath(posixpath.join(base, path))
+        built = files.get(target)
+        if built is None:
+            return match.group(0)
+        new_path = "/static/" + built if path.startswith("/") else posixpath.relpath(built, base or ".")
+        return f"url({quote_char}{new_path}{suffix}{quote_char})"
+
+    return _CSS_URL_RE.sub(replace, css)
+
+
+def _compress(path: Path) -> List[Path]:
+    """生成 .gz/.br；压缩后不足原大小95%的不保留"""
+    content = path.read_bytes()
+    if len(content) < COMPRESS_MIN_SIZE:
+        return []
+    outputs = []
+    variants = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(content, quality=11)
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        data = variants.get(encoding)
+        if data is None or len(data) > len(content) * 0.95:
+            continue
+        target = path.with_name(path.name + suffix)
+        target.write_bytes(data)
+        outputs.append(target)
+    return outputs
+
+
+def clean_static_assets(directory: str = STATIC_DIR) -> int:
+    """删除上次构建生成的文件，返回删除的文件数"""
+    root = Path(directory)
+    manifest_path = root / ASSET_MANIFEST
+    try:
+        generated = json.loads(manifest_path.read_text(encoding="utf-8")).get("generated", [])
+    except (OSError, ValueError):
+        return 0
+    removed = 0
+    for rel_path in generated + [ASSET_MANIFEST]:
+        try:
+            (root / rel_path).unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def build_static_assets(directory: str = STATIC_DIR) -> Dict[str, Any]:
+    """构建指纹文件和预压缩文件，写入并返回清单 {files, generated}"""
+    root = Path(directory)
+    clean_static_assets(directory)
+
+    sources = sorted(
+        path.relative_to(root).as_posix()
+        for path in root.rglob("*")
+        if path.is_file() and path.suffix.lower() in ASSET_SUFFIXES
+    )
+    sources = [rel_path for rel_path in sources if not _is_generated(rel_path)]
+    # CSS 最后处理，这样它引用的字体、图片已有指纹文件名
+    sources.sort(key=lambda rel_path: rel_path.lower().endswith(".css"))
+
+    files: Dict[str, str] = {}
+    generated: List[str] = []
+    for rel_path in sources:
+        content = (root / rel_path).read_bytes()
+        if rel_path.lower().endswith(".css"):
+            css = content.decode("utf-8", errors="surrogateescape")
+            content = rewrite_css_urls(css, rel_path, files).encode("utf-8", errors="surrogateescape")
+        built = fingerprint_name(rel_path, content)
+        (root / built).write_bytes(content)
+        files[rel_path] = built
+        generated.append(built)
+
+    # 指纹文件和原文件都预压缩：未经 static_url 的引用（如JS中拼接的路径）同样受益
+    for rel_path in sources + list(files.values()):
+        if rel_path.lower().endswith(COMPRESS_SUFFIXES):
+            generated.extend(path.relative_to(root).as_posix() for path in _compress(root / rel_path))
+
+    manifest = {"files": files, "generated": generated}
+    (root / ASSET_MANIFEST).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return manifest
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="构建带指纹和预压缩的静态资源")
+    parser.add_argument("--static-dir", default=STATIC_DIR, help="静态文件目录")
+    parser.add_argument("--clean", action="store_true", help="只删除上次构建生成的文件")
+    args = parser.parse_args(argv)
+
+    if args.clean:
+        print(f"已删除 {clean_static_assets(args.static_dir)} 个构建文件")
+        return 0
+    manifest = build_static_assets(args.static_dir)
+    compressed = sum(1 for name in manifest["generated"] if name.endswith(_COMPRESSED_SUFFIXES))
+    print(f"已生成 {len(manifest['files'])} 个指纹文件、{compressed} 个预压缩文件")
+    if brotli is None:
+        print("未安装 brotli，跳过 .br 文件")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量导入命令行工具
+一次导入一个目录或通配符匹配的多个表格文件（每个地点/月份一个文件）：
+多个进程并行解析，主进程作为唯一的写入端按批插入，每个文件一个事务。
+同时解析或等待写入的文件不超过进程数，内存只与进程数和单个文件大小有关，与文件总数无关。
+已导入文件的 SHA-256（含导入范围）记录在 imported_file 表中，中断后重新运行会跳过已完成的文件。
+
+用法：
+    python bulk_import.py drill_down "data/drill_down/*.xlsx"
+    python bulk_import.py fault data/faults/ --workers 4
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import create_engine, delete, insert
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from config import settings
+from db.dialect import upsert
+from db.models import FAULT_NATURAL_KEY, Base, ImportedFile
+from db.session import install_sqlite_pragmas, is_sqlite, sync_database_url
+from import_maps import FAULT_RECORD_MAP, PUE_DATA_MAP, PUE_DRILL_DOWN_MAP, ZBK_MAP
+from utils.exceptions import FileUploadException
+from utils.ingest import (
+    IngestReport, TableMap, existing_keys_query, iter_record_chunks, iter_sheet_rows, record_keys,
+    split_new_records,
+)
+
+SUPPORTED_SUFFIXES = (".xlsx", ".xlsm", ".xls", ".csv", ".parquet")
+
+# 下钻文件名：_<地点>[_<年>-<月>]，如 "_深圳宝安区宝城.xlsx"、"深圳宝安区宝城_2025-01.xlsx"
+SITE_PERIOD_RE = re.compile(r"^_?(?P<location>.+?)(?:[_-](?P<year>\d{4})[-_年]?(?P<month>\d{1,2})月?)?$")
+
+
+class BulkKind:
+    """一种批量导入：列映射、按文件整体校验、替换范围和去重键
+
+    scope 中的字段由文件名或命令行参数确定，导入前先删除库中同一范围的数据（重新导入即替换）；
+    dedup_key 非空时库中已有相同业务键的行跳过。
+    """
+
+    def __init__(self, table_map: TableMap, strict: bool = False,
+                 scope: Sequence[str] = (), dedup_key: Sequence[str] = ()):
+        self.table_map = table_map
+        self.strict = strict
+        self.scope = tuple(scope)
+        self.dedup_key = tuple(dedup_key)
+
+
+BULK_KINDS: Dict[str, BulkKind] = {
+    "fault": BulkKind(FAULT_RECORD_MAP, dedup_key=FAULT_NATURAL_KEY),
+    "pue": BulkKind(PUE_DATA_MAP, strict=True),
+    "contract": BulkKind(ZBK_MAP.with_constants(type="contract"), strict=True),
+    "kpi": BulkKind(ZBK_MAP.with_constants(type="kpi"), strict=True),
+    "drill_down": BulkKind(PUE_DRILL_DOWN_MAP, scope=("location", "year", "month")),
+}
+
+
+def file_checksum(path: str, scope: Optional[Dict[str, str]] = None) -> str:
+    """文件内容的SHA-256；有替换范围时一并计入（同一文件导入到不同地点/月份视为不同的导入）"""
+    digest = hashlib.sha256()
+    if scope:
+        digest.update(json.dumps(scope, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1048576), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def expand_paths(patterns: Iterable[str]) -> List[str]:
+    """目录展开为其中的表格文件，其余按通配符匹配；结果去重排序"""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [str(p) for p in Path(pattern).rglob("*")]
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+        for path in candidates:
+            name = os.path.basename(path)
+            # 跳过 Excel 打开时产生的 ~$ 锁文件
+            if os.path.isfile(path) and path.lower().endswith(SUPPORTED_SUFFIXES) and not name.startswith("~$"):
+                paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+
+def file_scope(kind: BulkKind, path: str, overrides: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """确定文件的替换范围：命令行参数优先，其次从文件名解析"""
+    if not kind.scope:
+        return {}
+    match = SITE_PERIOD_RE.match(Path(path).stem)
+    parsed = match.groupdict() if match else {}
+    scope = {field: overrides.get(field) or parsed.get(field) for field in kind.scope}
+    # 月份与库中写法一致，不带前导0
+    if scope.get("month") and scope["month"].isdigit():
+        scope["month"] = str(int(scope["month"]))
+    missing = [field for field, value in scope.items() if not value]
+    if missing:
+        raise FileUploadException(f"无法从文件名确定 {'、'.join(missing)}，请用 --{' --'.join(missing)} 指定")
+    return scope
+
+
+def parse_file(kind_name: str, path: str, scope: Dict[str, str], skip_rows: int, chunk_size: int) -> Dict[str, Any]:
+    """解析一个文件（在子进程中执行），返回分好批的记录和统计"""
+    kind = BULK_KINDS[kind_name]
+    report = IngestReport()
+    try:
+        rows = iter_sheet_rows(path)
+        chunks = list(iter_record_chunks(rows, kind.table_map.with_constants(**scope), chunk_size, report, skip_rows))
+    except FileUploadException as e:
+        return {"path": path, "error": e.message}
+    return {"path": path, "chunks": chunks, "report": report.to_dict()}
+
+
+class BulkWriter:
+    """唯一的写入端：每个文件一个事务，写入数据和 imported_file 记录一起提交"""
+
+    def __init__(self, engine, kind_name: str):
+        self.engine = engine
+        self.kind_name = kind_name
+        self.kind = BULK_KINDS[kind_name]
+        self.model = self.kind.table_map.model
+        Base.metadata.create_all(engine, tables=[self.model.__table__, ImportedFile.__table__])
+
+    def imported_checksums(self) -> set:
+        with Session(self.engine) as session:
+            result = session.execute(select(ImportedFile.checksum).where(ImportedFile.kind == self.kind_name))
+            return set(result.scalars())
+
+    def _insert(self, session, records: List[Dict[str, Any]]) -> int:
+        """写入一批记录，返回实际写入条数；有去重键时只查询本批键范围内的已有记录，冲突的行忽略"""
+        if not self.kind.dedup_key:
+            session.execute(insert(self.model), records)
+            return len(records)
+        keys = record_keys(records, self.kind.dedup_key)
+        existing = session.execute(existing_keys_query(self.model, self.kind.dedup_key, keys)).all() if keys else []
+        fresh = split_new_records(records, self.kind.dedup_key, existing)
+        if not fresh:
+            return 0
+        stmt = upsert(self.engine.dialect.name, self.model, fresh, self.kind.dedup_key, update=())
+        return session.execute(stmt).rowcount
+
+    def write(self, path: str, checksum: str, scope: Dict[str, str], chunks: List[List[Dict[str, Any]]],
+              report: Dict[str, Any]) -> Dict[str, Any]:
+        inserted = 0
+        with Session(self.engine) as session:
+            if scope:
+                session.execute(delete(self.model).where(
+                    *[getattr(self.model, field) == value for field, value in scope.items()]
+                ))
+            try:
+                for chunk in chunks:
+                    inserted += self._insert(session, chunk)
+                duplicates = report["total"] - report["error_count"] - inserted
+                # --force 重新导入时覆盖原记录
+                session.execute(upsert(self.engine.dialect.name, ImportedFile, [{
+                    "kind": self.kind_name, "path": path, "checksum": checksum, "rows_read": report["total"],
+                    "inserted": inserted, "rejected": report["error_count"], "duplicates": duplicates,
+                    "imported_at": datetime.utcnow(),
+                }], keys=["kind", "checksum"]))
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+        return {**report, "inserted": inserted, "duplicate_count": duplicates}
+
+
+def run_bulk_import(kind_name: str, patterns: Sequence[str], database_url: Optional[str] = None,
+                    workers: Optional[int] = None, skip_rows: int = 0, force: bool = False,
+                    overrides: Optional[Dict[str, Optional[str]]] = None, log=print) -> Dict[str, Any]:
+    """并行解析、顺序写入；返回 {imported, skipped, failed, inserted, files}"""
+    kind = BULK_KINDS[kind_name]
+    url = sync_database_url(database_url or settings.DATABASE_URL)
+    engine = create_engine(url)
+    if is_sqlite(url):
+        install_sqlite_pragmas(engine)
+    writer = BulkWriter(engine, kind_name)
+    chunk_size = max(settings.IMPORT_CHUNK_SIZE, 1)
+    summary = {"imported": 0, "skipped": 0, "failed": 0, "inserted": 0, "files": []}
+
+    imported = set() if force else writer.imported_checksums()
+    queued: Dict[str, str] = {}
+    tasks = []
+    for path in expand_paths(patterns):
+        try:
+            scope = file_scope(kind, path, overrides or {})
+        except FileUploadException as e:
+            summary["failed"] += 1
+            summary["files"].append({"path": path, "error": e.message})
+            log(f"[失败] {path}：{e.message}")
+            continue
+        checksum = file_checksum(path, scope)
+        if checksum in imported or checksum in queued:
+            summary["skipped"] += 1
+            log(f"[跳过] {path}：" + ("已导入" if checksum in imported else f"与 {queued[checksum]} 内容相同"))
+            continue
+        queued[checksum] = path
+        tasks.append((path, checksum, scope))
+
+    def handle(result: Dict[str, Any], checksum: str, scope: Dict[str, str]):
+        path = result["path"]
+        error = result.get("error")
+        report = result.get("report")
+        if error is None and kind.strict and report["error_count"]:
+            error = f"数据校验未通过，共{report['error_count']}行有错误：{'；'.join(report['errors'][:5])}"
+        if error is None:
+            try:
+                report = writer.write(path, checksum, scope, result["chunks"], report)
+            except Exception as e:
+                error = f"写入失败：{str(e)[:200]}"
+        if error is not None:
+            summary["failed"] += 1
+            summary["files"].append({"path": path, "error": error})
+            log(f"[失败] {path}：{error}")
+            return
+        summary["imported"] += 1
+        summary["inserted"] += report["inserted"]
+        summary["files"].append({"path": path, **{k: v for k, v in report.items() if k != "errors"}})
+        log(f"[完成] {path}：读取{report['total']}行，写入{report['inserted']}行，"
+            f"重复{report['duplicate_count']}行，出错{report['error_count']}行")
+        for message in report["errors"][:5]:
+            log(f"    {message}")
+
+    workers = max(workers or os.cpu_count() or 1, 1)
+    if workers == 1 or len(tasks) <= 1:
+        for path, checksum, scope in tasks:
+            handle(parse_file(kind_name, path, scope, skip_rows, chunk_size), checksum, scope)
+    else:
+        workers = min(workers, len(tasks))
+        queue = iter(tasks)
+        pending: Dict[Any, tuple] = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            def submit_next():
+                task = next(queue, None)
+                if task is not None:
+                    path, _, scope = task
+                    pending[pool.submit(parse_file, kind_name, path, scope, skip_rows, chunk_size)] = task
+
+            # 解析结果整文件返回，只保持 workers 个文件在途，避免已解析未写入的文件堆积在内存中
+            for _ in range(workers):
+                submit_next()
+            # 先解析完的文件先写入，写入端始终只有主进程一个
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, checksum, scope = pending.pop(future)
+                    submit_next()
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"path": path, "error": f"解析失败：{str(e)[:200]}"}
+                    handle(result, checksum, scope)
+    engine.dispose()
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="并行批量导入多个表格文件（xlsx/csv/parquet）")
+    parser.add_argument("kind", choices=sorted(BULK_KINDS), help="导入类型")
+    parser.add_argument("paths", nargs="+", help="文件、目录或通配符（如 \"data/*.xlsx\"）")
+    parser.add_argument("--workers", type=int, default=None, help="解析进程数，默认为CPU核数")
+    parser.add_argument("--database-url", default=None, help="数据库连接串，默认使用配置中的 DATABASE_URL")
+    parser.add_argument("--skip-rows", type=int, default=0, help="表头之后跳过的行数（如说明行）")
+    parser.add_argument("--force", action="store_true", help="忽略校验和记录，重新导入所有文件")
+    parser.add_argument("--location", help="下钻数据的地点，默认从文件名解析")
+    parser.add_argument("--year", help="下钻数据的年份，默认从文件名解析")
+    parser.add_argument("--month", help="下钻数据的月份，默认从文件名解析")
+    args = parser.parse_args(argv)
+
+    summary = run_bulk_import(
+        args.kind, args.paths, database_url=args.database_url, workers=args.workers,
+        skip_rows=args.skip_rows, force=args.force,
+        overrides={"location": args.location, "year": args.year, "month": args.month},
+    )
+    print(f"导入完成：{summary['imported']}个文件，共写入{summary['inserted']}行；"
+          f"跳过{summary['skipped']}个已导入文件，失败{summary['failed']}个")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,14 @@
 from fastapi.templating import Jinja2Templates
 
+from utils.static_files import install_static_url
+
 # 大屏相关模板
 bi_templates = {
     'index1': 'index1.html',
     'index2': 'index2.html',
 }
 bi_templates_env = Jinja2Templates(directory="templates")
+install_static_url(bi_templates_env)
 
 # 指标管理相关模板
 bi_data_templates = {
@@ -17,3 +20,4 @@ bi_data_templates = {
     'edit': 'edit.html',
 }
 bi_data_templates_env = Jinja2Templates(directory="templates")
+install_static_url(bi_data_templates_env)
@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import Dict, List
 try:
     from pydantic_settings import BaseSettings
 except ImportError:
@@ -10,10 +10,39 @@ class Settings(BaseSettings):
     
     # 数据库配置
     DATABASE_URL: str = "sqlite+aiosqlite:///db.sqlite3"
+    DB_ECHO: bool = False  # 是否在日志中输出每条SQL，仅排查问题时打开
+    DB_POOL_SIZE: int = 5  # 连接池常驻连接数（内存SQLite不适用）
+    DB_MAX_OVERFLOW: int = 10  # 连接池满时允许额外创建的连接数
+    DB_POOL_TIMEOUT: float = 30.0  # 等待空闲连接的超时（秒）
+    DB_POOL_RECYCLE: int = 1800  # 连接使用超过该秒数后重建，-1 表示不重建
+    DB_POOL_PRE_PING: bool = True  # 取出连接前先检测是否可用
+    DATABASE_READ_URL: str = ""  # 读库（只读副本）连接串，为空时与写库相同但使用独立连接池
+    DB_READ_POOL_SIZE: int = 10  # 读库连接池常驻连接数，分析类查询使用
+    DB_READ_MAX_OVERFLOW: int = 10  # 读库连接池满时允许额外创建的连接数
+
+    # SQLite 连接参数（每个新连接执行 PRAGMA，置空则不设置该项）
+    SQLITE_JOURNAL_MODE: str = "WAL"  # WAL 模式下读不阻塞写、写不阻塞读
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # WAL 模式下 NORMAL 即可保证一致性
+    SQLITE_MMAP_SIZE: int = 268435456  # 内存映射读取的上限（256MB）
+    SQLITE_CACHE_SIZE: int = -65536  # 页缓存大小，负数单位为KB（64MB）
+    SQLITE_TEMP_STORE: str = "MEMORY"  # 临时表和排序使用内存
+    SQLITE_BUSY_TIMEOUT: int = 5000  # 等待写锁的毫秒数，超时才报 database is locked
     
     # API配置
     DEEPSEEK_API_URL: str = "https://DeepSeek-R1-wzrba.eastus2.models.ai.azure.com/chat/completions"
     DEEPSEEK_API_KEY: str = ""
+    DEEPSEEK_MODEL: str = "deepseek-chat"
+    
+    # AI分析调用配置
+    AI_BACKEND: str = "deepseek"  # deepseek | stub（本地桩，不访问网络）
+    AI_MAX_CONCURRENCY: int = 4  # 同时进行的模型调用数上限
+    AI_MAX_CONNECTIONS: int = 10  # httpx连接池大小
+    AI_REQUEST_TIMEOUT: float = 60.0  # 单次调用超时（秒）
+    AI_TOTAL_TIMEOUT: float = 150.0  # 含续写轮次的总超时预算（秒）
+    AI_CACHE_TTL: int = 3600  # 相同输入的分析结果缓存时间（秒）
+    AI_CACHE_SIZE: int = 128
+    AI_JOB_WORKERS: int = 2  # 后台AI分析任务的并行数
+    AI_JOB_QUEUE_SIZE: int = 100  # 排队任务上限，超出时拒绝新任务
     
     # 应用配置
     APP_HOST: str = "127.0.0.1"
@@ -43,7 +72,7 @@ class Settings(BaseSettings):
     
     # 文件上传配置
     MAX_UPLOAD_SIZE: int = 10485760
-    ALLOWED_FILE_TYPES: List[str] = [".xlsx",".xls",".csv"]
+    ALLOWED_FILE_TYPES: List[str] = [".xlsx",".xls",".csv",".parquet"]
     
     # 缓存配置
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -51,12 +80,39 @@ class Settings(BaseSettings):
     
     # 文件上传配置
     MAX_FILE_SIZE: int = 10485760  # 10MB
-    ALLOWED_FILE_EXTENSIONS: List[str] = [".xlsx", ".xls", ".csv"]
+    ALLOWED_FILE_EXTENSIONS: List[str] = [".xlsx", ".xls", ".csv", ".parquet"]  # .parquet 需要安装 pyarrow
+    IMPORT_CHUNK_SIZE: int = 500  # 批量导入时每批读取/写入的行数
+    IMPORT_SPOOL_DIR: str = "data/import_spool"  # 后台导入任务的上传文件暂存目录，相对路径基于项目目录
+    IMPORT_JOB_MAX_FILE_SIZE: int = 209715200  # 后台导入任务允许的文件大小（200MB）
+    IMPORT_JOB_WORKERS: int = 1  # 后台导入任务的并行数
+    IMPORT_JOB_QUEUE_SIZE: int = 20  # 排队的导入任务上限，超出时拒绝新任务
     
     # 缓存配置
     CACHE_ENABLED: bool = True
     CACHE_TTL: int = 300  # 5分钟
     
+    # 响应压缩配置
+    GZIP_MINIMUM_SIZE: int = 1024  # 超过该字节数的响应才进行gzip压缩
+    
+    # 汇聚骨干红绿灯预警配置
+    HUIJU_ALERT_COMPARE: List[str] = ["深圳", "广州"]  # 前者任一数量指标大于后者则该月红灯，置空关闭
+    HUIJU_ALERT_THRESHOLDS: Dict[str, List[float]] = {}  # 例：{"over_4h_ratio": [0.05, 0.1]} 为黄灯/红灯阈值
+    
+    # 大屏配置
+    BI_DEFAULT_YEAR: int = 0  # 大屏默认展示的年份，0 表示当前年份
+    
+    # 事件推送配置
+    EVENT_HEARTBEAT_SECONDS: float = 15.0  # SSE空闲时发送心跳的间隔（秒）
+    EVENT_METRICS_INTERVAL: float = 5.0  # 有订阅者时系统指标的采样间隔（秒）
+    EVENT_MAX_SUBSCRIBERS: int = 500  # 同时在线的推送连接上限
+    
+    # 静态文件缓存配置
+    STATIC_LONG_CACHE_SECONDS: int = 31536000  # 第三方库（*.min.js等）浏览器缓存时间
+    IMG_ROOT: str = "img"  # /img/{item}/{img} 的图片根目录，相对路径基于项目目录
+    IMG_CACHE_MAX_BYTES: int = 33554432  # 图片内存缓存总大小上限（32MB）
+    IMG_CACHE_MAX_ITEM_BYTES: int = 2097152  # 超过该大小的图片不缓存，直接分块发送
+    IMG_MAX_AGE: int = 3600  # 图片浏览器缓存时间（秒）
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -10,7 +10,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Any
 import logging
 
-from db.session import get_db
+from db.session import get_db, get_read_db
+from pue_forecast import get_pue_outlook
 from db.models import (
     PUEData, FaultRecord, Huijugugan, 
     CenterTopTop, LeftTop, RightTop, Bottom,
@@ -23,7 +24,7 @@ router = APIRouter(prefix="/api/dashboard", tags=["仪表板"])
 
 
 @router.get("/summary")
-async def get_dashboard_summary(db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
+async def get_dashboard_summary(db: AsyncSession = Depends(get_read_db)) -> Dict[str, Any]:
     """获取仪表板汇总数据"""
     try:
         # 获取当前时间
@@ -59,20 +60,20 @@ async def get_dashboard_summary(db: AsyncSession = Depends(get_db)) -> Dict[str,
 
 
 async def get_pue_stats(db: AsyncSession, current_month: datetime, last_month: datetime) -> Dict[str, Any]:
-    """获取PUE统计数据"""
+    """获取PUE统计数据；pue_data 的年、月为文本列，按字符串比较（PostgreSQL 不会把整数参数隐式转换为文本）"""
     try:
         # 当月PUE平均值
         current_pue_query = select(func.avg(PUEData.pue_value)).where(
-            PUEData.year == current_month.year,
-            PUEData.month == current_month.month
+            PUEData.year == str(current_month.year),
+            PUEData.month == str(current_month.month)
         )
         current_pue_result = await db.execute(current_pue_query)
         current_pue = current_pue_result.scalar() or 0
         
         # 上月PUE平均值
         last_pue_query = select(func.avg(PUEData.pue_value)).where(
-            PUEData.year == last_month.year,
-            PUEData.month == last_month.month
+            PUEData.year == str(last_month.year),
+            PUEData.month == str(last_month.month)
         )
         last_pue_result = await db.execute(last_pue_query)
         last_pue = last_pue_result.scalar() or 0
@@ -248,7 +249,7 @@ def calculate_health_score(pue_stats: Dict, fault_stats: Dict, network_stats: Di
 
 
 @router.get("/trend/pue")
-async def get_pue_trend(months: int = 6, db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
+async def get_pue_trend(months: int = 6, db: AsyncSession = Depends(get_read_db)) -> Dict[str, Any]:
     """获取PUE趋势数据"""
     try:
         # 计算起始月份
@@ -283,7 +284,7 @@ async def get_pue_trend(months: int = 6, db: AsyncSession = Depends(get_db)) ->
 
 
 @router.get("/alerts")
-async def get_recent_alerts(limit: int = 5, db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
+async def get_recent_alerts(limit: int = 5, db: AsyncSession = Depends(get_read_db)) -> Dict[str, Any]:
     """获取最近告警信息"""
     try:
         # 获取最近的故障记录作为告警
@@ -307,6 +308,26 @@ async def get_recent_alerts(limit: int = 5, db: AsyncSession = Depends(get_db))
         raise HTTPException(status_code=500, detail=f"获取告警失败: {str(e)}")
 
 
+@router.get("/pue_outlook")
+async def get_pue_outlook_summary(horizon: int = 3, top: int = 5, db: AsyncSession = Depends(get_read_db)) -> Dict[str, Any]:
+    """获取PUE预测风险排名（读取本地预测引擎缓存）"""
+    try:
+        outlook = await get_pue_outlook(db, horizon=horizon)
+        return {
+            "success": True,
+            "data": {
+                "generated_at": outlook["generated_at"],
+                "last_period": outlook["last_period"],
+                "forecast_months": outlook["forecast_months"],
+                "anomaly_count": outlook["anomaly_count"],
+                "top_risks": outlook["locations"][:top]
+            }
+        }
+    except Exception as e:
+        logger.error(f"获取PUE预测失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取PUE预测失败: {str(e)}")
+
+
 # ===== 绩效目标管理API =====
 
 @router.post('/performance-targets/save', response_model=Dict[str, Any])
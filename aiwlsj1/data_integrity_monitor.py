@@ -156,6 +156,15 @@ class DataIntegrityMonitor:
         """检查数据库健康状态"""
         try:
             async with AsyncSessionLocal() as db:
+                if db.bind.dialect.name == "postgresql":
+                    # PostgreSQL 没有 PRAGMA，只统计库大小
+                    result = await db.execute(text("SELECT pg_database_size(current_database())"))
+                    db_size_bytes = result.scalar()
+                    return {
+                        'database_size_mb': round(db_size_bytes / (1024 * 1024), 2),
+                        'status': 'healthy'
+                    }
+
                 # 检查数据库完整性
                 result = await db.execute(text("PRAGMA integrity_check"))
                 integrity_result = result.scalar()
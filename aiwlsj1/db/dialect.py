@@ -0,0 +1,144 @@
+"""
+跨数据库的查询辅助
+时间分桶、按唯一键写入（upsert）和文本检索在 SQLite / PostgreSQL / MySQL 上生成各自的 SQL，
+业务代码只用这里的写法，不直接调用 strftime、date_format、to_char 等某一种数据库独有的函数。
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import String, func, literal_column, or_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
+class _DateBucket(FunctionElement):
+    """时间截断到某一粒度，返回文本标签；各数据库的标签格式一致"""
+    type = String()
+    inherit_cache = True
+    unit = ""
+
+
+class _HourBucket(_DateBucket):
+    inherit_cache = True
+    unit = "hour"
+
+
+class _DayBucket(_DateBucket):
+    inherit_cache = True
+    unit = "day"
+
+
+class _WeekBucket(_DateBucket):
+    inherit_cache = True
+    unit = "week"
+
+
+class _MonthBucket(_DateBucket):
+    inherit_cache = True
+    unit = "month"
+
+
+class _YearBucket(_DateBucket):
+    inherit_cache = True
+    unit = "year"
+
+
+_BUCKETS = {cls.unit: cls for cls in (_HourBucket, _DayBucket, _WeekBucket, _MonthBucket, _YearBucket)}
+
+# 各粒度的标签格式：(strftime / DATE_FORMAT, to_char)；周以周一的日期为标签
+_BUCKET_FORMATS = {
+    "hour": ("%Y-%m-%d %H:00:00", "YYYY-MM-DD HH24:00:00"),
+    "day": ("%Y-%m-%d", "YYYY-MM-DD"),
+    "week": ("%Y-%m-%d", "YYYY-MM-DD"),
+    "month": ("%Y-%m", "YYYY-MM"),
+    "year": ("%Y", "YYYY"),
+}
+
+
+def date_bucket(column, unit: str) -> FunctionElement:
+    """按 hour / day / week / month / year 截断时间列，返回文本标签（周为该周周一的日期）"""
+    try:
+        return _BUCKETS[unit](column)
+    except KeyError:
+        raise ValueError(f"不支持的时间粒度: {unit}")
+
+
+def _fmt(text: str):
+    return literal_column(f"'{text}'")
+
+
+def _compile_sqlite(element, compiler, **kw):
+    column = list(element.clauses)[0]
+    fmt = _BUCKET_FORMATS[element.unit][0]
+    if element.unit == "week":
+        # 'weekday 0' 前进到本周日（周日不变），再回退6天即为周一
+        expr = func.strftime(_fmt(fmt), column, _fmt("weekday 0"), _fmt("-6 days"))
+    else:
+        expr = func.strftime(_fmt(fmt), column)
+    return compiler.process(expr, **kw)
+
+
+def _compile_postgresql(element, compiler, **kw):
+    column = list(element.clauses)[0]
+    if element.unit == "week":
+        column = func.date_trunc(_fmt("week"), column)
+    return compiler.process(func.to_char(column, _fmt(_BUCKET_FORMATS[element.unit][1])), **kw)
+
+
+def _compile_default(element, compiler, **kw):
+    # MySQL / MariaDB
+    column = compiler.process(list(element.clauses)[0], **kw)
+    if element.unit == "week":
+        column = f"DATE_SUB({column}, INTERVAL WEEKDAY({column}) DAY)"
+    fmt = compiler.process(_fmt(_BUCKET_FORMATS[element.unit][0]), **kw)
+    return f"DATE_FORMAT({column}, {fmt})"
+
+
+for _bucket in _BUCKETS.values():
+    compiles(_bucket, "sqlite")(_compile_sqlite)
+    compiles(_bucket, "postgresql")(_compile_postgresql)
+    compiles(_bucket)(_compile_default)
+
+
+def escape_like(keyword: str, escape: str = "\\") -> str:
+    """转义 LIKE 模式中的通配符"""
+    return keyword.replace(escape, escape * 2).replace("%", escape + "%").replace("_", escape + "_")
+
+
+def text_search(columns: Sequence[Any], keyword: str):
+    """任一列包含关键字（不区分大小写）
+
+    中文没有空格分词，PostgreSQL 内置全文检索无法按词匹配，因此统一用 ILIKE 子串匹配；
+    PostgreSQL 上由 pg_trgm 三元组 GIN 索引加速，SQLite 编译为 lower() LIKE。
+    """
+    pattern = f"%{escape_like(keyword.strip())}%"
+    return or_(*[column.ilike(pattern, escape="\\") for column in columns])
+
+
+_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert, "mysql": mysql.insert,
+            "mariadb": mysql.insert}
+
+
+def upsert(dialect_name: str, model, rows: List[Dict[str, Any]], keys: Sequence[str],
+           update: Optional[Iterable[str]] = None):
+    """按唯一键写入：键已存在时更新 update 中的列（为空则忽略该行）
+
+    keys 必须对应表上的唯一约束或唯一索引；MySQL 按表上任一唯一键判断冲突，keys 仅用于确定默认更新列。
+    """
+    try:
+        stmt = _INSERTS[dialect_name](model).values(rows)
+    except KeyError:
+        raise NotImplementedError(f"{dialect_name} 不支持 upsert")
+    if update is None:
+        update = [name for name in rows[0] if name not in keys]
+    update = list(update)
+    if dialect_name in ("mysql", "mariadb"):
+        if not update:
+            # 冲突时把第一个键更新为自身，相当于忽略
+            return stmt.on_duplicate_key_update({keys[0]: stmt.inserted[keys[0]]})
+        return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in update})
+    if not update:
+        return stmt.on_conflict_do_nothing(index_elements=list(keys))
+    return stmt.on_conflict_do_update(index_elements=list(keys),
+                                      set_={name: stmt.excluded[name] for name in update})
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, JSON, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -64,6 +64,10 @@ class PUERectifyRecord(Base):
 class PUEDrillDownData(Base):
     """PUE下钻数据模型 - 存储机房运维详细工作信息"""
     __tablename__ = "pue_drill_down_data"
+    __table_args__ = (
+        # 下钻弹窗按 地点(精确/前缀)+年+月 查询
+        Index("ix_pue_drill_down_location_year_month", "location", "year", "month"),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     
     # 关联字段
@@ -100,6 +104,10 @@ class PUEDrillDownData(Base):
 class Huijugugan(Base):
     """汇聚故障感知多维表数据模型"""
     __tablename__ = "huijugugan"
+    __table_args__ = (
+        # 城市+月份 唯一，月份统一为 YYYY-MM（见 huijugugan.normalize_huiju_month）
+        Index("ux_huijugugan_city_month", "city", "month", unique=True),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     month = Column(String(16), comment="月份")
     city = Column(String(16), comment="城市")
@@ -115,7 +123,7 @@ class CenterTopTop(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     type = Column(String(128), comment="类型")
     status = Column(String(128), comment="是否达标")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
 
 class CenterTopBottom(Base):
     __tablename__ = "center_top_bottom"
@@ -123,7 +131,7 @@ class CenterTopBottom(Base):
     region = Column(String(128), comment="区域")
     value = Column(Float, comment="数据")
     ratio = Column(Float, comment="比例")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
 
 class LeftTop(Base):
     __tablename__ = "left_top"
@@ -132,7 +140,7 @@ class LeftTop(Base):
     baseline = Column(Float, comment="基准值")
     challenge = Column(Float, comment="挑战值")
     indicator = Column(Float, comment="指标")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
 
 class LeftMiddle(Base):
     __tablename__ = "left_middle"
@@ -141,7 +149,7 @@ class LeftMiddle(Base):
     baseline = Column(Float, comment="基准值")
     challenge = Column(Float, comment="挑战值")
     indicator = Column(Float, comment="指标")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
 
 class RightTop(Base):
     __tablename__ = "right_top"
@@ -150,7 +158,7 @@ class RightTop(Base):
     baseline = Column(Float, comment="基准值")
     challenge = Column(Float, comment="挑战值")
     indicator = Column(Float, comment="指标")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
 
 class RightMiddle(Base):
     __tablename__ = "right_middle"
@@ -159,7 +167,7 @@ class RightMiddle(Base):
     baseline = Column(Float, comment="基准值")
     challenge = Column(Float, comment="挑战值")
     indicator = Column(Float, comment="指标")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
 
 class Bottom(Base):
     __tablename__ = "bottom"
@@ -171,7 +179,7 @@ class Bottom(Base):
     mains_load_ratio = Column(Float, comment="开关电源负载电流采集率")
     ups_load_ratio = Column(Float, comment="UPS负载电流采集率")
     env_signal_ratio = Column(Float, comment="动环关键信号采集完整率")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
 
 class LeftMiddleKPI(Base):
     __tablename__ = "left_middle_kpi"
@@ -180,7 +188,7 @@ class LeftMiddleKPI(Base):
     baseline = Column(Float, comment="基准值")
     challenge = Column(Float, comment="挑战值")
     offline_duration = Column(Float, comment="无线退服时长")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
 
 class CenterMiddleKPI(Base):
     __tablename__ = "center_middle_kpi"
@@ -190,7 +198,7 @@ class CenterMiddleKPI(Base):
     challenge = Column(Float, comment="挑战值")
     broadband_rate = Column(Float, comment="家企宽回单率")
     delivery_rate = Column(Float, comment="到企网络侧交付率")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
 
 class RightMiddleKPI(Base):
     __tablename__ = "right_middle_kpi"
@@ -199,7 +207,7 @@ class RightMiddleKPI(Base):
     baseline = Column(Float, comment="基准值")
     challenge = Column(Float, comment="挑战值")
     r_and_d_completion = Column(Float, comment="研发投入完成度")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
 
 class LeftBottomKPI(Base):
     __tablename__ = "left_bottom_kpi"
@@ -208,7 +216,7 @@ class LeftBottomKPI(Base):
     baseline = Column(Float, comment="基准值")
     challenge = Column(Float, comment="挑战值")
     current = Column(Float, comment="当前值")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
 
 class RightBottomKPI(Base):
     __tablename__ = "right_bottom_kpi"
@@ -217,18 +225,27 @@ class RightBottomKPI(Base):
     baseline = Column(Float, comment="基准值")
     challenge = Column(Float, comment="挑战值")
     broadband_rate = Column(Float, comment="家企宽回单率")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
 
 class TopKPI(Base):
     __tablename__ = "top_kpi"
     id = Column(Integer, primary_key=True, autoincrement=True)
     type = Column(String(64), comment="类型")
     status = Column(String(16), comment="是否达标")
-    year = Column(Integer, comment="年份")
+    year = Column(Integer, index=True, comment="年份")
+
+# 故障记录的业务键：导入去重和 ON CONFLICT 都按它匹配，必须与唯一索引 ux_fault_record_natural_key 的列一致，不做成配置项
+FAULT_NATURAL_KEY = ("sequence_no", "start_time", "fault_name")
+
 
 class FaultRecord(Base):
     """故障记录数据模型"""
     __tablename__ = "fault_record"
+    __table_args__ = (
+        # 业务键唯一，并发导入时重复的行由数据库拒绝
+        Index("ux_fault_record_natural_key", *FAULT_NATURAL_KEY, unique=True,
+              mysql_length={"fault_name": 255}),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     sequence_no = Column(Integer, comment="序号")
@@ -371,3 +388,75 @@ class PerformanceRecord(Base):
     created_at = Column(DateTime, default=datetime.utcnow, comment="创建时间")
     updated_by = Column(String(100), comment="最后更新者")
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment="更新时间")
+
+
+class AIAnalysisJob(Base):
+    """AI分析后台任务模型 - 持久化排队中的分析请求及其结果"""
+    __tablename__ = "ai_analysis_job"
+    __table_args__ = (
+        # 按 类型+输入哈希 去重和复用已完成的结果
+        Index("ix_ai_analysis_job_kind_hash", "kind", "input_hash"),
+        # 相同输入的进行中任务只能有一个，并发提交由唯一约束兜底（部分索引，MySQL 不支持）
+        Index(
+            "ux_ai_analysis_job_active_hash", "kind", "input_hash", unique=True,
+            sqlite_where=text("status IN ('pending', 'running')"),
+            postgresql_where=text("status IN ('pending', 'running')"),
+        ).ddl_if(dialect=("sqlite", "postgresql")),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(32), nullable=False, comment="分析类型: pue, huiju, fault")
+    scope = Column(String(255), comment="分析范围（地点、城市或筛选条件）")
+    input_hash = Column(String(64), nullable=False, comment="输入数据及调用参数的哈希")
+    prompt = Column(Text, comment="提示词（服务重启后据此恢复任务）")
+    options = Column(JSON, comment="模型调用参数(JSON格式)")
+    prompt_stats = Column(JSON, comment="提示词摘要统计：原始/摘要字符数和压缩比(JSON格式)")
+    status = Column(String(20), default="pending", comment="状态: pending, running, done, failed")
+    result = Column(Text, comment="分析结果")
+    error = Column(Text, comment="失败原因")
+
+    created_at = Column(DateTime, default=datetime.utcnow, comment="创建时间")
+    started_at = Column(DateTime, comment="开始执行时间")
+    finished_at = Column(DateTime, comment="完成时间")
+
+
+class ImportJob(Base):
+    """后台导入任务模型 - 上传文件暂存后由后台协程导入，记录进度和结果"""
+    __tablename__ = "import_job"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(32), nullable=False, comment="导入类型: fault, contract, kpi, pue")
+    filename = Column(String(255), comment="上传的原始文件名")
+    spool_path = Column(String(512), comment="暂存文件路径（导入结束后删除）")
+    file_size = Column(Integer, comment="文件字节数")
+    options = Column(JSON, comment="导入参数(JSON格式)")
+    status = Column(String(20), default="pending", index=True, comment="状态: pending, running, done, failed, cancelled")
+    rows_read = Column(Integer, default=0, comment="读取的数据行数")
+    inserted = Column(Integer, default=0, comment="写入行数")
+    rejected = Column(Integer, default=0, comment="出错跳过的行数")
+    duplicates = Column(Integer, default=0, comment="重复跳过的行数")
+    errors = Column(JSON, comment="出错行明细(JSON格式)")
+    error = Column(Text, comment="失败原因")
+    elapsed_seconds = Column(Float, comment="导入耗时（秒）")
+
+    created_at = Column(DateTime, default=datetime.utcnow, comment="创建时间")
+    started_at = Column(DateTime, comment="开始执行时间")
+    finished_at = Column(DateTime, comment="完成时间")
+
+
+class ImportedFile(Base):
+    """批量导入的文件记录 - 按内容校验和跳过已导入的文件，中断后重新运行即可续传"""
+    __tablename__ = "imported_file"
+    __table_args__ = (
+        Index("ix_imported_file_kind_checksum", "kind", "checksum", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(32), nullable=False, comment="导入类型: fault, pue, contract, kpi, drill_down")
+    path = Column(String(512), comment="导入时的文件路径")
+    checksum = Column(String(64), nullable=False, comment="文件内容（及导入范围）的SHA-256")
+    rows_read = Column(Integer, default=0, comment="读取的数据行数")
+    inserted = Column(Integer, default=0, comment="写入行数")
+    rejected = Column(Integer, default=0, comment="出错跳过的行数")
+    duplicates = Column(Integer, default=0, comment="重复跳过的行数")
+    imported_at = Column(DateTime, default=datetime.utcnow, comment="导入时间")
@@ -1,11 +1,147 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+"""
+数据库引擎与会话
+引擎参数（SQL日志、连接池大小、超时、预检）取自配置；SQLite 连接建立时设置 WAL 等 PRAGMA，
+读写可以并发，写入等待锁时不会立即报 database is locked。
+读写分离：写入用 get_write_db（get_db），分析类只读查询用 get_read_db；读库可以指向只读副本，
+未配置时连接同一个库但使用独立连接池，长时间的分析查询不占用写入的连接。
+按写入版本失效的缓存（大屏快照、汇聚图表、PUE预测）从读库重建，重建前后版本不一致时结果不缓存。
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+
 from db.models import Base
-from config import DATABASE_URL
+from config import DATABASE_URL, settings
+
+logger = logging.getLogger(__name__)
+
+# 启动报告中读取的 SQLite PRAGMA
+SQLITE_REPORT_PRAGMAS = ("journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store", "busy_timeout")
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def sync_database_url(url: str) -> str:
+    """把异步驱动的连接串换成同步驱动（命令行和 Alembic 使用同步引擎）"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    return parsed.set(drivername=backend).render_as_string(hide_password=False)
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return is_sqlite(url) and make_url(url).database in (None, "", ":memory:")
+
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    """按配置生成连接时执行的 PRAGMA，值为空的项不设置"""
+    pragmas = {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "temp_store": settings.SQLITE_TEMP_STORE,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT,
+    }
+    return {name: value for name, value in pragmas.items() if value is not None and value != ""}
+
+
+def install_sqlite_pragmas(sync_engine: Engine, memory: bool = False, read_only: bool = False):
+    """在每个新建的 SQLite 连接上执行 PRAGMA；内存库不支持 WAL，跳过 journal_mode
+
+    read_only 时不修改日志模式（由写库设置并持久化在库文件中），并开启 query_only 拒绝写入。
+    """
+    pragmas = sqlite_pragmas()
+    if memory or read_only:
+        pragmas.pop("journal_mode", None)
+    if read_only:
+        pragmas["query_only"] = "ON"
 
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def engine_options(url: str, read_only: bool = False) -> Dict[str, Any]:
+    """按配置生成引擎参数；内存 SQLite 使用单连接池，不设置池大小"""
+    options: Dict[str, Any] = {
+        "echo": settings.DB_ECHO,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if not _is_memory_sqlite(url):
+        options.update(
+            pool_size=settings.DB_READ_POOL_SIZE if read_only else settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_READ_MAX_OVERFLOW if read_only else settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    return options
+
+
+def create_engine_from_settings(url: Optional[str] = None, read_only: bool = False) -> AsyncEngine:
+    """按配置创建异步引擎，SQLite 同时安装 PRAGMA 钩子；read_only 为读库引擎"""
+    url = url or DATABASE_URL
+    async_engine = create_async_engine(url, **engine_options(url, read_only))
+    if is_sqlite(url):
+        install_sqlite_pragmas(async_engine.sync_engine, memory=_is_memory_sqlite(url), read_only=read_only)
+    return async_engine
+
+
+def create_read_engine(write_engine: AsyncEngine) -> AsyncEngine:
+    """创建读库引擎：指向 DATABASE_READ_URL，未配置时连接写库；内存 SQLite 无法跨连接共享，直接复用写库引擎"""
+    url = settings.DATABASE_READ_URL or DATABASE_URL
+    if not settings.DATABASE_READ_URL and _is_memory_sqlite(url):
+        return write_engine
+    return create_engine_from_settings(url, read_only=True)
+
+
+async def database_report(async_engine: Optional[AsyncEngine] = None) -> Dict[str, Any]:
+    """返回引擎实际生效的配置，启动时写入日志"""
+    async_engine = async_engine or engine
+    pool = async_engine.pool
+    report: Dict[str, Any] = {
+        "dialect": async_engine.dialect.name,
+        "echo": async_engine.echo,
+        "pool": type(pool).__name__,
+        "pool_pre_ping": pool._pre_ping,
+    }
+    if hasattr(pool, "size"):
+        report.update(pool_size=pool.size(), max_overflow=pool._max_overflow, pool_timeout=pool.timeout(),
+                      pool_recycle=pool._recycle)
+    if async_engine.dialect.name == "sqlite":
+        async with async_engine.connect() as conn:
+            for name in SQLITE_REPORT_PRAGMAS:
+                report[name] = (await conn.execute(text(f"PRAGMA {name}"))).scalar()
+    return report
+
+
+engine = create_engine_from_settings()
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+read_engine = create_read_engine(engine)
+ReadSessionLocal = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+
+# 写库会话；与 get_db 是同一个依赖，覆盖 get_db 即同时覆盖 get_write_db
+get_write_db = get_db
+
+
+async def get_read_db():
+    """只读会话：分析、统计、导出等 GET 查询使用，不与写入争用连接"""
+    async with ReadSessionLocal() as session:
+        yield session
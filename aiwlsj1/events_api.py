@@ -0,0 +1,33 @@
+"""
+服务端事件推送接口
+浏览器通过 EventSource 订阅 /api/events，面板在收到事件时刷新，不再定时轮询。
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from config import settings
+from utils.event_bus import TOPIC_BI, TOPIC_FAULT, TOPIC_IMPORT, TOPIC_METRICS, TOPIC_SYSTEM_FAULT, event_bus
+
+router = APIRouter(prefix="/api/events", tags=["事件推送"])
+
+DEFAULT_EVENT_TOPICS = (TOPIC_BI, TOPIC_FAULT, TOPIC_SYSTEM_FAULT, TOPIC_METRICS)
+# 导入进度事件较频繁，需显式订阅
+EVENT_TOPICS = DEFAULT_EVENT_TOPICS + (TOPIC_IMPORT,)
+
+
+@router.get("")
+async def subscribe_events(topics: str = Query(",".join(DEFAULT_EVENT_TOPICS), description="逗号分隔的主题")):
+    """订阅事件流（text/event-stream）"""
+    wanted = {t.strip() for t in topics.split(",") if t.strip()}
+    unknown = wanted - set(EVENT_TOPICS)
+    if not wanted or unknown:
+        raise HTTPException(status_code=400, detail=f"未知的主题: {'、'.join(sorted(unknown)) or '空'}")
+    if event_bus.subscriber_count >= settings.EVENT_MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="推送连接数已满，请稍后重试")
+    subscription = event_bus.subscribe(wanted)
+    return StreamingResponse(
+        event_bus.stream(subscription, settings.EVENT_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
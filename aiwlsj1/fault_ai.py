@@ -0,0 +1,200 @@
+"""
+故障数据AI智能分析
+按故障分析页面的筛选条件组织数据，同步分析或提交后台任务；挂在故障分析路由上，对齐PUE指标分析体验。
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+import pandas as pd
+from fastapi import Depends, Form, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ai_jobs import job_to_dict, submit_ai_job
+from db.models import FaultRecord
+from db.session import get_db, get_read_db
+from utils.llm_client import get_llm_client
+
+logger = logging.getLogger(__name__)
+
+# 故障分析的模型调用参数（深度思考模型，单轮输出）
+FAULT_AI_OPTIONS = {"model": "deepseek-reasoner", "max_rounds": 1, "max_tokens": 2000}
+
+
+def build_fault_ai_prompt(df, location=None):
+    # 如果数据量过大，限制行数以避免超时
+    if len(df) > 50:
+        df_sample = df.head(50)
+        data_summary = f"数据样本（前50条，共{len(df)}条）"
+    else:
+        df_sample = df
+        data_summary = f"完整数据（共{len(df)}条）"
+
+    # 简化提示词，减少API负载
+    return f"请简要分析以下{('筛选条件：'+location) if location else '全部'}的故障数据（{data_summary}），总结主要规律和趋势：\n{df_sample.to_string(index=False)}"
+
+
+async def analyze_and_predict_with_deepseek(df, location=None, max_rounds=1):
+    """使用DeepSeek API进行故障数据智能分析和预测"""
+    # 如果没有数据，返回默认分析
+    if len(df) == 0:
+        return "暂无故障数据进行分析。建议检查筛选条件或数据源。"
+    return await get_llm_client().analyze(build_fault_ai_prompt(df, location), **{**FAULT_AI_OPTIONS, "max_rounds": max_rounds})
+
+
+async def load_fault_ai_frame(
+    db: AsyncSession,
+    fault_type: str = None,
+    cause_category: str = None,
+    notification_level: str = None,
+    start_date: str = None,
+    end_date: str = None,
+    time_range: str = None,
+):
+    """按页面筛选条件读取AI分析用的故障数据，返回 (DataFrame, 筛选条件描述)"""
+    # 构建查询条件
+    query = select(FaultRecord)
+
+    # 若提供明确的起止日期，优先生效；否则支持 time_range 快捷筛选
+    if start_date:
+        start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
+        query = query.where(FaultRecord.fault_date >= start_datetime)
+    if end_date:
+        end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
+        query = query.where(FaultRecord.fault_date <= end_datetime)
+    if not start_date and not end_date and time_range:
+        try:
+            days = int(time_range)
+            start_dt = datetime.now() - timedelta(days=days)
+            query = query.where(FaultRecord.fault_date >= start_dt)
+        except ValueError:
+            # 忽略非法的 time_range 值
+            pass
+
+    if fault_type:
+        query = query.where(FaultRecord.province_fault_type == fault_type)
+    if cause_category:
+        query = query.where(FaultRecord.cause_category == cause_category)
+    if notification_level:
+        query = query.where(FaultRecord.notification_level == notification_level)
+
+    # 获取数据
+    result = await db.execute(query.order_by(FaultRecord.fault_date.desc()))
+    fault_records = result.scalars().all()
+
+    df_data = []
+    for record in fault_records:
+        df_data.append({
+            "故障日期": record.fault_date.strftime('%Y-%m-%d') if record.fault_date else '',
+            "故障名称": record.fault_name or '',
+            "故障类型": record.province_fault_type or '',
+            "原因分类": record.cause_category or '',
+            "通报级别": record.notification_level or '',
+            "处理时长(小时)": record.fault_duration_hours or 0,
+            "主动发现": record.is_proactive_discovery or '',
+            "投诉情况": record.complaint_situation or ''
+        })
+    df = pd.DataFrame(df_data)
+    filter_desc = f"故障类型:{fault_type}" if fault_type else ""
+    if cause_category:
+        filter_desc += f", 原因分类:{cause_category}"
+    if notification_level:
+        filter_desc += f", 通报级别:{notification_level}"
+    if start_date or end_date:
+        filter_desc += f", 时间范围:{start_date or '开始'}-{end_date or '结束'}"
+    elif time_range:
+        filter_desc += f", 近{time_range}天"
+    return df, filter_desc or None
+
+
+async def post_fault_ai_analysis(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    fault_type: str = Form(None),
+    cause_category: str = Form(None),
+    notification_level: str = Form(None),
+    start_date: str = Form(None),
+    end_date: str = Form(None)
+):
+    """获取AI分析报告（表单提交方式）"""
+    try:
+        df, filter_desc = await load_fault_ai_frame(
+            db, fault_type, cause_category, notification_level, start_date, end_date
+        )
+        analysis = await analyze_and_predict_with_deepseek(df, filter_desc)
+
+        return {
+            "success": True,
+            "analysis": analysis,
+            "record_count": len(df)
+        }
+
+    except Exception as e:
+        logger.error(f"AI分析错误: {str(e)}")
+        return {
+            "success": False,
+            "error": f"生成分析报告时出现错误: {str(e)}",
+            "analysis": "分析功能暂时不可用，请稍后重试。"
+        }
+
+
+async def get_fault_ai_analysis(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    fault_type: str = Query(None, description="故障类型筛选"),
+    cause_category: str = Query(None, description="原因分类筛选"),
+    notification_level: str = Query(None, description="通报级别筛选"),
+    start_date: str = Query(None, description="开始日期(YYYY-MM-DD)"),
+    end_date: str = Query(None, description="结束日期(YYYY-MM-DD)"),
+    time_range: str = Query(None, description="时间范围(天): 7/30/90/365")
+):
+    """获取AI分析报告 (GET 方式，支持与页面相同的查询参数)
+    该端点返回 `ai_analysis` 字段，保持与前端预期一致。
+    """
+    try:
+        df, filter_desc = await load_fault_ai_frame(
+            db, fault_type, cause_category, notification_level, start_date, end_date, time_range
+        )
+        analysis = await analyze_and_predict_with_deepseek(df, filter_desc)
+
+        return {
+            "success": True,
+            "ai_analysis": analysis,  # 前端期望的字段名
+            "analysis": analysis,      # 兼容旧字段名
+            "record_count": len(df)
+        }
+    except Exception as e:
+        logger.error(f"AI分析(GET)错误: {str(e)}")
+        return {
+            "success": False,
+            "error": f"生成分析报告时出现错误: {str(e)}",
+            "ai_analysis": "分析功能暂时不可用，请稍后重试。",
+            "analysis": "分析功能暂时不可用，请稍后重试。"
+        }
+
+
+async def submit_fault_ai_job(
+    db: AsyncSession = Depends(get_db),
+    fault_type: str = Query(None, description="故障类型筛选"),
+    cause_category: str = Query(None, description="原因分类筛选"),
+    notification_level: str = Query(None, description="通报级别筛选"),
+    start_date: str = Query(None, description="开始日期(YYYY-MM-DD)"),
+    end_date: str = Query(None, description="结束日期(YYYY-MM-DD)"),
+    time_range: str = Query(None, description="时间范围(天): 7/30/90/365")
+):
+    """提交故障AI分析任务（查询参数同 GET /ai_analysis），结果通过 /api/ai_jobs/{job_id} 轮询获取
+
+    前端 `fault_analyze.html` 的 refreshAIAnalysis() 使用该端点。
+    """
+    try:
+        df, filter_desc = await load_fault_ai_frame(
+            db, fault_type, cause_category, notification_level, start_date, end_date, time_range
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="日期格式错误，应为YYYY-MM-DD")
+    if len(df) == 0:
+        return JSONResponse(content={"success": False, "ai_analysis": "暂无故障数据进行分析。建议检查筛选条件或数据源。"})
+    job = await submit_ai_job(db, "fault", build_fault_ai_prompt(df, filter_desc), scope=filter_desc, options=FAULT_AI_OPTIONS)
+    return JSONResponse(status_code=202, content={"success": True, "data": job_to_dict(job), "record_count": len(df)})
@@ -7,6 +7,7 @@
 
 from fastapi import APIRouter, Request, Depends, Query
 from fastapi.templating import Jinja2Templates
+from utils.static_files import install_static_url
 from fastapi.responses import JSONResponse
 from sqlalchemy import func, extract, and_, or_
 from sqlalchemy.orm import Session
@@ -22,6 +23,7 @@ router = APIRouter(prefix="/fault", tags=["故障分析"])
 
 # 配置模板
 templates = Jinja2Templates(directory="templates")
+install_static_url(templates)
 
 @router.get('/dashboard_legacy')
 async def fault_dashboard(request: Request):
@@ -7,12 +7,19 @@
 
 from fastapi import APIRouter, Request, Depends, Query, Form, HTTPException
 from fastapi.templating import Jinja2Templates
+from utils.static_files import install_static_url
 from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse, Response
 from sqlalchemy import func, extract, and_, or_, distinct, case
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from db.session import get_db
+from db.session import get_db, get_read_db
 from db.models import FaultRecord, PerformanceTarget, PerformanceRecord
+from db.dialect import date_bucket, text_search
+from fault_ai import get_fault_ai_analysis, post_fault_ai_analysis, submit_fault_ai_job
+from fault_export import export_fault_data
+from fault_import import upload_fault_data
+from utils.event_bus import TOPIC_FAULT, publish_event
 from datetime import datetime, timedelta
 import json
 import logging
@@ -40,6 +47,7 @@ router = APIRouter(prefix="/fault", tags=["故障分析"])
 
 # 配置模板
 templates = Jinja2Templates(directory="templates")
+install_static_url(templates)
 
 def convert_numpy_types(obj):
     """递归转换numpy类型为Python原生类型"""
@@ -89,7 +97,7 @@ async def indicators_management_page(request: Request):
     )
 
 @router.get('/api/overview')
-async def fault_overview(db: AsyncSession = Depends(get_db)):
+async def fault_overview(db: AsyncSession = Depends(get_read_db)):
     """获取故障概览数据"""
     try:
         # 总故障数
@@ -135,7 +143,7 @@ async def fault_overview(db: AsyncSession = Depends(get_db)):
         return JSONResponse({'success': False, 'error': str(e)})
 
 @router.get('/api/trend')
-async def fault_trend(db: AsyncSession = Depends(get_db)):
+async def fault_trend(db: AsyncSession = Depends(get_read_db)):
     """获取故障趋势数据"""
     try:
         # 按月统计故障数量
@@ -171,7 +179,7 @@ async def fault_trend(db: AsyncSession = Depends(get_db)):
         return JSONResponse({'success': False, 'error': str(e)})
 
 @router.get('/api/category_analysis')
-async def fault_category_analysis(db: AsyncSession = Depends(get_db)):
+async def fault_category_analysis(db: AsyncSession = Depends(get_read_db)):
     """故障分类分析"""
     try:
         # 按原因分类统计
@@ -220,7 +228,7 @@ async def fault_category_analysis(db: AsyncSession = Depends(get_db)):
         return JSONResponse({'success': False, 'error': str(e)})
 
 @router.get('/api/duration_analysis')
-async def fault_duration_analysis(db: AsyncSession = Depends(get_db)):
+async def fault_duration_analysis(db: AsyncSession = Depends(get_read_db)):
     """故障处理时长分析"""
     try:
         # 按时长区间统计
@@ -290,7 +298,7 @@ async def fault_duration_analysis(db: AsyncSession = Depends(get_db)):
         return JSONResponse({'success': False, 'error': str(e)})
 
 @router.get('/api/proactive_analysis')
-async def fault_proactive_analysis(db: AsyncSession = Depends(get_db)):
+async def fault_proactive_analysis(db: AsyncSession = Depends(get_read_db)):
     """主动发现分析"""
     try:
         # 主动发现vs被动发现统计
@@ -351,7 +359,7 @@ async def fault_detail_list(
     per_page: int = Query(20, ge=1, le=100),
     fault_type: Optional[str] = Query(None),
     cause_category: Optional[str] = Query(None),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """获取故障详细列表"""
     try:
@@ -410,18 +418,18 @@ async def fault_detail_list(
 @router.get('/api/search')
 async def fault_search(
     keyword: str = Query(..., min_length=1),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """故障搜索"""
     try:
         # 在多个字段中搜索
         stmt = select(FaultRecord).where(
-            or_(
-                FaultRecord.fault_name.like(f'%{keyword}%'),
-                FaultRecord.fault_cause.like(f'%{keyword}%'),
-                FaultRecord.fault_handling.like(f'%{keyword}%'),
-                FaultRecord.remarks.like(f'%{keyword}%')
-            )
+            text_search([
+                FaultRecord.fault_name,
+                FaultRecord.fault_cause,
+                FaultRecord.fault_handling,
+                FaultRecord.remarks,
+            ], keyword)
         ).order_by(FaultRecord.fault_date.desc()).limit(50)
         result = await db.execute(stmt)
         faults = result.scalars().all()
@@ -455,7 +463,7 @@ async def fault_drill_group(
     group_by: str = Query(..., regex='^(notification_level|cause_category)$'),
     notification_level: Optional[str] = Query(None),
     cause_category: Optional[str] = Query(None),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Grouped aggregation for drill-down (V1)
     • group_by 可选 'notification_level' 或 'cause_category'
@@ -506,7 +514,7 @@ async def fault_drill_group(
 @router.get('/api/drilldown')
 async def fault_drilldown(
     month: str = Query(..., description="格式: YYYY-MM"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """按月下钻，多维度返回：
     - pareto: 原因分类计数与累计占比
@@ -738,11 +746,27 @@ async def fault_data_page(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+router.add_api_route('/export_fault_data', export_fault_data, methods=['GET'])
+
+router.add_api_route('/ai_analysis', post_fault_ai_analysis, methods=['POST'])
+router.add_api_route('/ai_analysis', get_fault_ai_analysis, methods=['GET'])
+router.add_api_route('/ai_analysis/jobs', submit_fault_ai_job, methods=['POST'])
+
+@router.get('/import_fault_data', response_class=HTMLResponse)
+async def import_fault_data_page(request: Request):
+    """批量导入页面"""
+    return templates.TemplateResponse('import_fault_data.html', {'request': request})
+
+router.add_api_route('/upload_fault_data', upload_fault_data, methods=['POST'])
+
 @router.get('/add_fault_data', response_class=HTMLResponse)
 async def add_fault_data_form(request: Request):
     """添加故障数据表单页面"""
     return templates.TemplateResponse('add_fault_data.html', {'request': request})
 
+# 序号+发生时间+故障名称 与已有记录相同时违反唯一索引 ux_fault_record_natural_key
+DUPLICATE_FAULT_DETAIL = "相同序号、发生时间和故障名称的故障记录已存在"
+
 @router.post('/add_fault_data')
 async def add_fault_data(
     sequence_no: Optional[int] = Form(None),
@@ -811,9 +835,13 @@ async def add_fault_data(
         
         db.add(fault_record)
         await db.commit()
+        publish_event(TOPIC_FAULT, {"action": "add", "id": fault_record.id})
         
         return RedirectResponse(url='/fault/data', status_code=303)
         
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=DUPLICATE_FAULT_DETAIL)
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -898,9 +926,15 @@ async def edit_fault_data(
         fault_record.updated_at = datetime.utcnow()
         
         await db.commit()
+        publish_event(TOPIC_FAULT, {"action": "update", "id": fault_id})
         
         return RedirectResponse(url='/fault/data', status_code=303)
         
+    except HTTPException:
+        raise
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=DUPLICATE_FAULT_DETAIL)
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -916,6 +950,7 @@ async def delete_fault_data(fault_id: int, db: AsyncSession = Depends(get_db)):
         
         await db.delete(fault_record)
         await db.commit()
+        publish_event(TOPIC_FAULT, {"action": "delete", "id": fault_id})
         
         return RedirectResponse(url='/fault/data', status_code=303)
         
@@ -961,6 +996,7 @@ async def batch_delete_fault_data(request: Request, db: AsyncSession = Depends(g
         
         # 提交事务
         await db.commit()
+        publish_event(TOPIC_FAULT, {"action": "delete", "count": deleted_count})
         
         logging.info(f"批量删除故障记录成功，删除数量: {deleted_count}")
         
@@ -1062,7 +1098,7 @@ class AnomalyDetectionResponse(BaseModel):
 @router.get('/api/prediction/fault_forecast', response_model=Dict[str, Any])
 async def fault_forecast_prediction(
     forecast_days: int = Query(30, ge=7, le=90),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     故障预测API - 基于历史数据预测未来故障发生情况
@@ -1182,7 +1218,7 @@ async def fault_forecast_prediction(
 async def mttr_prediction(
     fault_type: Optional[str] = Query(None),
     cause_category: Optional[str] = Query(None),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     MTTR预测API - 预测特定类型故障的平均修复时间
@@ -1287,7 +1323,7 @@ async def mttr_prediction(
 async def anomaly_detection(
     analysis_days: int = Query(30, ge=7, le=90),
     anomaly_threshold: float = Query(2.0, ge=1.0, le=5.0),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     异常检测API - 检测故障模式中的异常情况
@@ -1299,7 +1335,7 @@ async def anomaly_detection(
         
         # 按天统计故障数量和平均处理时长
         stmt = select(
-            func.date(FaultRecord.fault_date).label('fault_date'),
+            date_bucket(FaultRecord.fault_date, 'day').label('fault_date'),
             func.count(FaultRecord.id).label('daily_count'),
             func.avg(FaultRecord.fault_duration_hours).label('avg_duration'),
             func.count(case((FaultRecord.is_proactive_discovery == '是', 1))).label('proactive_count')
@@ -1309,7 +1345,7 @@ async def anomaly_detection(
                 FaultRecord.fault_date >= start_date,
                 FaultRecord.fault_date <= end_date
             )
-        ).group_by(func.date(FaultRecord.fault_date)).order_by('fault_date')
+        ).group_by(date_bucket(FaultRecord.fault_date, 'day')).order_by('fault_date')
         
         result = await db.execute(stmt)
         daily_data = result.all()
@@ -1618,7 +1654,7 @@ def _generate_anomaly_recommendations(anomalies: List[Dict], pattern_analysis: D
 async def advanced_time_series_analysis(
     analysis_period: int = Query(180, ge=30, le=365),
     granularity: str = Query("daily", regex="^(hourly|daily|weekly|monthly)$"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     高级时序分析API - 支持多种粒度的时序分析
@@ -1628,19 +1664,10 @@ async def advanced_time_series_analysis(
         end_date = datetime.now()
         start_date = end_date - timedelta(days=analysis_period)
         
-        # 根据粒度选择时间分组方式
-        if granularity == "hourly":
-            time_format = func.date_format(FaultRecord.fault_date, '%Y-%m-%d %H:00:00')
-            group_by_clause = func.date_format(FaultRecord.fault_date, '%Y-%m-%d %H')
-        elif granularity == "daily":
-            time_format = func.date(FaultRecord.fault_date)
-            group_by_clause = func.date(FaultRecord.fault_date)
-        elif granularity == "weekly":
-            time_format = func.date_format(FaultRecord.fault_date, '%Y-%u')
-            group_by_clause = func.date_format(FaultRecord.fault_date, '%Y-%u')
-        else:  # monthly
-            time_format = func.date_format(FaultRecord.fault_date, '%Y-%m')
-            group_by_clause = func.date_format(FaultRecord.fault_date, '%Y-%m')
+        # 根据粒度选择时间分组方式（周以该周周一的日期为标签）
+        unit = {"hourly": "hour", "daily": "day", "weekly": "week", "monthly": "month"}[granularity]
+        time_format = date_bucket(FaultRecord.fault_date, unit)
+        group_by_clause = time_format
         
         # 查询时序数据
         stmt = select(
@@ -1720,7 +1747,7 @@ async def advanced_time_series_analysis(
 async def pattern_recognition_analysis(
     pattern_type: str = Query("all", regex="^(all|cyclical|seasonal|anomaly|correlation)$"),
     min_pattern_length: int = Query(3, ge=2, le=10),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     模式识别分析API - 识别故障数据中的各种模式
@@ -1732,19 +1759,20 @@ async def pattern_recognition_analysis(
         
         # 按日统计数据
         stmt = select(
-            func.date(FaultRecord.fault_date).label('date'),
+            date_bucket(FaultRecord.fault_date, 'day').label('date'),
             func.count(FaultRecord.id).label('count'),
             func.avg(FaultRecord.fault_duration_hours).label('avg_duration'),
-            extract('dow', FaultRecord.fault_date).label('day_of_week'),
-            extract('hour', FaultRecord.fault_date).label('hour'),
-            extract('month', FaultRecord.fault_date).label('month')
+            # 非分组列需聚合（PostgreSQL 不允许直接选出）
+            func.min(extract('dow', FaultRecord.fault_date)).label('day_of_week'),
+            func.min(extract('hour', FaultRecord.fault_date)).label('hour'),
+            func.min(extract('month', FaultRecord.fault_date)).label('month')
         ).where(
             and_(
                 FaultRecord.fault_date.isnot(None),
                 FaultRecord.fault_date >= start_date,
                 FaultRecord.fault_date <= end_date
             )
-        ).group_by(func.date(FaultRecord.fault_date)).order_by('date')
+        ).group_by(date_bucket(FaultRecord.fault_date, 'day')).order_by('date')
         
         result = await db.execute(stmt)
         daily_data = result.all()
@@ -1792,7 +1820,7 @@ async def advanced_forecasting_analysis(
     forecast_periods: int = Query(30, ge=7, le=90),
     model_type: str = Query("auto", regex="^(auto|linear|exponential|arima)$"),
     confidence_level: float = Query(0.95, ge=0.8, le=0.99),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     高级预测分析API - 支持多种预测模型
@@ -1803,7 +1831,7 @@ async def advanced_forecasting_analysis(
         start_date = end_date - timedelta(days=365)  # 使用一年的历史数据
         
         stmt = select(
-            func.date(FaultRecord.fault_date).label('date'),
+            date_bucket(FaultRecord.fault_date, 'day').label('date'),
             func.count(FaultRecord.id).label('count'),
             func.avg(FaultRecord.fault_duration_hours).label('avg_duration')
         ).where(
@@ -1812,7 +1840,7 @@ async def advanced_forecasting_analysis(
                 FaultRecord.fault_date >= start_date,
                 FaultRecord.fault_date <= end_date
             )
-        ).group_by(func.date(FaultRecord.fault_date)).order_by('date')
+        ).group_by(date_bucket(FaultRecord.fault_date, 'day')).order_by('date')
         
         result = await db.execute(stmt)
         historical_data = result.all()
@@ -2292,7 +2320,7 @@ def _evaluate_model_performance(data, model_type):
 async def correlation_analysis(
     correlation_type: str = Query("fault_metrics", regex="^(fault_metrics|external_factors|cross_domain)$"),
     time_range: int = Query(180, ge=30, le=365),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     故障指标关联性分析
@@ -2668,7 +2696,7 @@ async def fault_impact_assessment(
     assessment_dimension: str = Query("business", regex="^(business|technical|operational)$"),
     severity_weight: float = Query(1.0, ge=0.1, le=3.0),
     duration_weight: float = Query(1.0, ge=0.1, le=3.0),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     故障影响评估分析
@@ -3051,7 +3079,7 @@ async def fault_details_drill_down(
     drill_value: str = Query(..., description="下钻的具体值"),
     time_range: int = Query(90, ge=7, le=365),
     detail_level: str = Query("detailed", regex="^(summary|detailed|comprehensive)$"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     故障详情二级下钻分析
@@ -3088,11 +3116,11 @@ async def fault_details_drill_down(
                     extract('month', FaultRecord.start_time) == int(month)
                 )
             else:  # 完整日期
-                target_date = datetime.strptime(drill_value, '%Y-%m-%d').date()
+                target_date = datetime.strptime(drill_value, '%Y-%m-%d')
                 next_date = target_date + timedelta(days=1)
                 stmt = base_stmt.where(
-                    func.date(FaultRecord.start_time) >= target_date,
-                    func.date(FaultRecord.start_time) < next_date
+                    FaultRecord.start_time >= target_date,
+                    FaultRecord.start_time < next_date
                 )
         elif drill_type == "by_severity":
             stmt = base_stmt.where(FaultRecord.notification_level == drill_value)
@@ -3814,7 +3842,7 @@ async def intelligent_recommendations(
     priority_level: str = Query("high", regex="^(low|medium|high|critical)$"),
     time_horizon: str = Query("short_term", regex="^(immediate|short_term|medium_term|long_term)$"),
     focus_area: str = Query("all", regex="^(all|reliability|efficiency|cost|quality)$"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     智能推荐引擎
@@ -4370,7 +4398,7 @@ async def generate_action_plan(
     plan_type: str = Query("quick_win", regex="^(quick_win|balanced|comprehensive|custom)$"),
     resource_constraint: str = Query("medium", regex="^(low|medium|high|unlimited)$"),
     target_improvement: str = Query("overall", regex="^(overall|reliability|efficiency|cost_reduction)$"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     生成具体行动计划
@@ -4810,7 +4838,7 @@ async def get_indicators_management(
 async def get_performance_evaluation(
     evaluation_period: str = Query('monthly', description="评估周期"),
     focus_area: Optional[str] = Query(None, description="重点评估领域"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     获取绩效评估报告
@@ -4915,7 +4943,7 @@ async def get_performance_evaluation(
 async def get_indicators_dashboard(
     dashboard_type: str = Query('comprehensive', description="仪表盘类型"),
     refresh_interval: int = Query(300, description="刷新间隔秒数"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     获取指标管理仪表盘数据
@@ -5,12 +5,13 @@
 用于将故障记录Excel文件导入到数据库中
 """
 
-import pandas as pd
-from datetime import datetime
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from db.models import Base, FaultRecord
+from import_maps import FAULT_RECORD_MAP
+from utils.ingest import ingest_sync, iter_sheet_rows
 import os
+import sys
 
 class FaultDataImporter:
     """故障数据导入器"""
@@ -22,80 +23,22 @@ class FaultDataImporter:
         Session = sessionmaker(bind=self.engine)
         self.session = Session()
     
-    def parse_datetime(self, date_str):
-        """解析日期时间字符串"""
-        if pd.isna(date_str) or date_str == '':
-            return None
-        
-        try:
-            # 尝试不同的日期格式
-            if isinstance(date_str, str):
-                # 处理常见的日期格式
-                for fmt in ['%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M:%S', 
-                           '%Y-%m-%d', '%Y/%m/%d', '%m/%d/%Y %H:%M:%S']:
-                    try:
-                        return datetime.strptime(date_str, fmt)
-                    except ValueError:
-                        continue
-            elif isinstance(date_str, datetime):
-                return date_str
-            else:
-                # pandas Timestamp
-                return date_str.to_pydatetime() if hasattr(date_str, 'to_pydatetime') else date_str
-        except Exception as e:
-            print(f"日期解析错误: {date_str}, 错误: {e}")
-            return None
-    
     def import_from_excel(self, excel_path="data/故障记录.xlsx"):
-        """从Excel文件导入故障数据"""
+        """从表格文件（xlsx/csv/parquet）流式导入故障数据（清空现有数据后分批插入）"""
         try:
-            # 读取Excel文件
-            df = pd.read_excel(excel_path)
-            print(f"读取到 {len(df)} 条故障记录")
-            
             # 清空现有数据
             self.session.query(FaultRecord).delete()
-            
-            # 逐行导入数据
-            imported_count = 0
-            for index, row in df.iterrows():
-                try:
-                    # 获取列名列表以便调试
-                    columns = df.columns.tolist()
-                    
-                    fault_record = FaultRecord(
-                        sequence_no=int(row['序号']) if pd.notna(row['序号']) else None,
-                        fault_date=self.parse_datetime(row['日期']),
-                        fault_name=str(row['故障名称']) if pd.notna(row['故障名称']) else None,
-                        province_cause_analysis=str(row[columns[3]]) if pd.notna(row[columns[3]]) else None,  # 省-故障原因分析
-                        province_cause_category=str(row['省-原因分类']) if pd.notna(row['省-原因分类']) else None,
-                        province_fault_type=str(row['省-故障类型']) if pd.notna(row['省-故障类型']) else None,
-                        notification_level=str(row['通报级别']) if pd.notna(row['通报级别']) else None,
-                        cause_category=str(row['原因分类']) if pd.notna(row['原因分类']) else None,
-                        fault_duration_hours=float(row['故障处理时长（小时）']) if pd.notna(row['故障处理时长（小时）']) else None,
-                        complaint_situation=str(row['投诉情况']) if pd.notna(row['投诉情况']) else None,
-                        start_time=self.parse_datetime(row['发生时间']),
-                        end_time=self.parse_datetime(row['结束时间']),
-                        fault_cause=str(row['故障原因']) if pd.notna(row['故障原因']) else None,
-                        fault_handling=str(row['故障处理']) if pd.notna(row['故障处理']) else None,
-                        is_proactive_discovery=str(row['是否主动发现']) if pd.notna(row['是否主动发现']) else None,
-                        remarks=str(row['备注']) if pd.notna(row['备注']) else None
-                    )
-                    
-                    self.session.add(fault_record)
-                    imported_count += 1
-                    
-                except Exception as e:
-                    print(f"导入第 {index + 1} 行数据时出错: {e}")
-                    continue
-            
-            # 提交事务
-            self.session.commit()
-            print(f"成功导入 {imported_count} 条故障记录")
-            
+
+            summary = ingest_sync(
+                self.session, iter_sheet_rows(excel_path), FAULT_RECORD_MAP,
+                progress=lambda n: print(f"已导入 {n} 条记录..."),
+            )
+            print(f"读取到 {summary['total']} 条故障记录，成功导入 {summary['inserted']} 条")
+            for error in summary['errors']:
+                print(f"  {error}")
+
         except Exception as e:
             print(f"导入数据时发生错误: {e}")
-            self.session.rollback()
             raise
     
     def get_fault_statistics(self):
@@ -142,8 +85,8 @@ def main():
     """主函数"""
     print("开始导入故障数据...")
     
-    # 检查Excel文件是否存在
-    excel_path = "data/故障记录.xlsx"
+    # 检查文件是否存在；可在命令行指定 .xlsx/.csv/.parquet 文件
+    excel_path = sys.argv[1] if len(sys.argv) > 1 else "data/故障记录.xlsx"
     if not os.path.exists(excel_path):
         print(f"错误: 找不到文件 {excel_path}")
         return
@@ -0,0 +1,60 @@
+"""
+故障数据上传导入
+上传的表格流式解析、按业务键去重后写入；挂在故障分析路由上，与导入页面使用同一路径。
+"""
+
+import logging
+import traceback
+
+from fastapi import Depends, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import FAULT_NATURAL_KEY, FaultRecord
+from db.session import get_db
+from import_maps import FAULT_RECORD_MAP
+from utils.event_bus import TOPIC_FAULT, publish_event
+from utils.exceptions import FileUploadException
+from utils.ingest import check_upload, dedup_insert_sink, ingest, iter_sheet_rows
+
+logger = logging.getLogger(__name__)
+
+
+async def upload_fault_data(
+    file: UploadFile = File(...),
+    skip_first_row: bool = Form(True),
+    db: AsyncSession = Depends(get_db)
+):
+    """上传并流式导入故障记录表格（xlsx/csv/parquet），出错的行跳过并在结果中列出
+
+    按业务键 FAULT_NATURAL_KEY 去重：库中已有的记录不再写入，重复上传同一文件不会产生重复数据。
+    """
+    try:
+        contents = await file.read()
+        check_upload(file.filename or "", len(contents))
+        summary = await ingest(
+            db, iter_sheet_rows(contents, file.filename), FAULT_RECORD_MAP,
+            skip_rows=1 if skip_first_row else 0,
+            sink=dedup_insert_sink(FaultRecord, FAULT_NATURAL_KEY),
+        )
+    except FileUploadException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    except Exception as e:
+        logger.error(f"故障数据导入失败: {e}", exc_info=True)
+        return JSONResponse({
+            'success': False,
+            'error': f'文件处理失败: {str(e)}',
+            'traceback': traceback.format_exc()
+        }, status_code=500)
+
+    if summary['inserted']:
+        publish_event(TOPIC_FAULT, {"action": "import", "count": summary['inserted']})
+    return JSONResponse({
+        'success': True,
+        'message': '文件处理完成',
+        'total_rows': summary['total'],
+        'success_count': summary['inserted'],
+        'error_count': summary['error_count'],
+        'duplicate_count': summary['duplicate_count'],
+        'errors': summary['errors'][:10]  # 只返回前10个错误
+    })
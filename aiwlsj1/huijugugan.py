@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Request, Form, HTTPException, Depends, File, UploadFile
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, Response
 from fastapi import status
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
@@ -7,172 +7,208 @@ from db.models import Huijugugan
 from common import bi_templates_env
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import distinct, func, and_
-from db.session import get_db
+from sqlalchemy import distinct, func, and_, case, cast, insert, update, Float
+from sqlalchemy.exc import IntegrityError
+from db.session import get_db, get_read_db
 import pandas as pd
 from io import BytesIO
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import hashlib
 from datetime import datetime, timedelta
 import calendar
 
 from fastapi.templating import Jinja2Templates
-import requests
+from utils.static_files import install_static_url
 from config import settings
+from utils.ingest import read_upload_frame
+from utils.llm_client import get_llm_client
+from utils.prompt_digest import build_digest, month_index
+from utils.traffic_light import RED, YELLOW, CompareRule, ThresholdRule, evaluate_rules, split_by_level
+from ai_jobs import job_to_dict, submit_ai_job
 import logging
 
 router = APIRouter(prefix="/huiju", tags=["汇聚骨干指标管理"])
 templates = Jinja2Templates(directory="templates")
+install_static_url(templates)
 logger = logging.getLogger(__name__)
 
-def analyze_and_predict_with_deepseek(df, city=None, max_rounds=3):
+# 汇聚骨干分析的模型调用参数（输出较长，允许续写）
+HUIJU_AI_OPTIONS = {"max_rounds": 3}
+
+HUIJU_DIGEST_LABELS = {
+    "over_4h_ratio": "超4小时占比",
+    "over_12h_ratio": "超12小时占比",
+    "huiju_amount": "汇聚全量",
+}
+
+def build_huiju_ai_prompt(df, city=None):
+    """返回 (提示词, 摘要统计)，明细先压缩为固定大小的统计摘要"""
+    digest, stats = build_digest(
+        df.assign(period=month_index(None, df["month"])),
+        "city", list(HUIJU_DIGEST_LABELS), entity_label="城市", value_labels=HUIJU_DIGEST_LABELS,
+    )
+    prompt = f"请根据如下{('城市：'+city) if city else '全部城市'}的汇聚骨干指标统计摘要进行简要分析、总结规律，并预测未来几个月的趋势：\n{digest}"
+    return prompt, stats
+
+async def analyze_and_predict_with_deepseek(df, city=None, max_rounds=3):
     """使用DeepSeek API分析和预测数据趋势"""
-    if not settings.DEEPSEEK_API_KEY:
-        logger.warning("DeepSeek API密钥未配置")
-        return "AI分析功能未配置，请联系管理员配置API密钥。"
-    
-    api_url = settings.DEEPSEEK_API_URL
-    api_key = settings.DEEPSEEK_API_KEY
-    prompt = f"请对如下{('城市：'+city) if city else '全部城市'}的汇聚骨干指标数据进行简要分析、总结规律，并预测未来几个月的趋势：\n{df.to_string(index=False)}"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    messages = [{"role": "user", "content": prompt}]
-    all_content = ""
-    for i in range(max_rounds):
-        payload = {
-            "model": "deepseek-chat",
-            "messages": messages,
-            "max_tokens": 1024,
-            "temperature": 0.7
-        }
-        try:
-            resp = requests.post(api_url, headers=headers, json=payload, timeout=60)
-            resp.raise_for_status()
-            content = resp.json()["choices"][0]["message"]["content"]
-            all_content += content
-            # 若本轮返回内容已很短或出现结束标志，则停止
-            if len(content) < 900 or "已完成" in content or "END" in content:
-                break
-            messages.append({"role": "assistant", "content": content})
-            messages.append({"role": "user", "content": "请继续输出剩余内容"})
-        except Exception as e:
-            all_content += f"\n[AI分析补全失败：{e}]"
-            break
-    import re
-    # 去除<think>...</think>标签及其内容
-    cleaned_content = re.sub(r'<think>[\s\S]*?</think>', '', all_content)
-    # 去除多余的markdown符号（#、*、-、>等行首符号）
-    cleaned_content = re.sub(r'^[#>*\-\s]+', '', cleaned_content, flags=re.MULTILINE)
-    # 去除所有*字符
-    cleaned_content = cleaned_content.replace('*', '')
-    return cleaned_content.strip()
+    prompt, _ = build_huiju_ai_prompt(df, city)
+    return await get_llm_client().analyze(prompt, max_rounds=max_rounds)
 
 from fastapi.responses import JSONResponse
 
+HUIJU_AMOUNT_FIELDS = ["huiju_amount", "over_4h", "important_amount", "over_12h"]
+HUIJU_FIELDS = ["huiju_amount", "over_4h", "over_4h_ratio", "important_amount", "over_12h", "over_12h_ratio"]
+# 城市排列顺序：深圳、广州、东莞、佛山在前，其他城市按名称排在其后
+CITY_ORDER = ['深圳', '广州', '东莞', '佛山']
+
+def _ratio(numerator, denominator):
+    return case((denominator > 0, cast(numerator, Float) / denominator), else_=0.0)
+
+async def _load_huiju_frame(db: AsyncSession, city: str = None):
+    """按 城市+月份 在SQL中汇总数量并计算超时占比，无数据时返回None"""
+    huiju = func.sum(Huijugugan.huiju_amount)
+    over_4h = func.sum(Huijugugan.over_4h)
+    important = func.sum(Huijugugan.important_amount)
+    over_12h = func.sum(Huijugugan.over_12h)
+    query = select(
+        Huijugugan.month, Huijugugan.city,
+        huiju.label("huiju_amount"), over_4h.label("over_4h"), _ratio(over_4h, huiju).label("over_4h_ratio"),
+        important.label("important_amount"), over_12h.label("over_12h"), _ratio(over_12h, important).label("over_12h_ratio"),
+    ).group_by(Huijugugan.month, Huijugugan.city).order_by(Huijugugan.month, Huijugugan.city)
+    if city:
+        query = query.where(Huijugugan.city == city)
+    rows = (await db.execute(query)).all()
+    if not rows:
+        return None
+    return pd.DataFrame(rows, columns=["month", "city"] + HUIJU_FIELDS)
+
+def build_huiju_wide(df) -> pd.DataFrame:
+    """月份×(指标, 城市) 宽表，多维表、预警和图表共用；CITY_ORDER 只决定顺序，不在其中的城市排在后面"""
+    wide = df.pivot(index="month", columns="city", values=HUIJU_FIELDS).sort_index()
+    present = set(wide.columns.get_level_values(1))
+    cities = [c for c in CITY_ORDER if c in present] + sorted(present - set(CITY_ORDER))
+    return wide.reindex(columns=pd.MultiIndex.from_product([HUIJU_FIELDS, cities]))
+
+def huiju_alert_rules() -> List[Any]:
+    """根据配置生成红绿灯规则集"""
+    rules: List[Any] = []
+    if len(settings.HUIJU_ALERT_COMPARE) == 2:
+        left, right = settings.HUIJU_ALERT_COMPARE
+        rules.append(CompareRule(HUIJU_AMOUNT_FIELDS, left, right, level=RED))
+    for field, (yellow, red) in settings.HUIJU_ALERT_THRESHOLDS.items():
+        rules.append(ThresholdRule(field, yellow=yellow, red=red))
+    return rules
+
 @router.get("/ai_analysis")
-async def get_ai_analysis(city: str = None, db: AsyncSession = Depends(get_db)):
-    # 查询所有城市和数据
-    result = await db.execute(select(Huijugugan))
-    data = result.scalars().all()
-    if not data:
+async def get_ai_analysis(city: str = None, db: AsyncSession = Depends(get_read_db)):
+    df = await _load_huiju_frame(db, city)
+    if df is None:
         return JSONResponse(content={"ai_analysis": "暂无数据"})
-    df_data = []
-    for item in data:
-        df_data.append({
-            "month": item.month,
-            "city": item.city,
-            "huiju_amount": item.huiju_amount,
-            "over_4h": item.over_4h,
-            "over_4h_ratio": item.over_4h / item.huiju_amount if item.huiju_amount > 0 else 0,
-            "important_amount": item.important_amount,
-            "over_12h": item.over_12h,
-            "over_12h_ratio": item.over_12h / item.important_amount if item.important_amount > 0 else 0
-        })
-    import pandas as pd
-    df = pd.DataFrame(df_data)
-    ai_analysis = analyze_and_predict_with_deepseek(df if not city else df[df['city'] == city], city)
+    ai_analysis = await analyze_and_predict_with_deepseek(df, city, **HUIJU_AI_OPTIONS)
     return JSONResponse(content={"ai_analysis": ai_analysis})
 
+@router.post("/ai_analysis")
+async def submit_ai_analysis(city: str = None, db: AsyncSession = Depends(get_db)):
+    """提交汇聚骨干AI分析任务，结果通过 /api/ai_jobs/{job_id} 轮询获取"""
+    df = await _load_huiju_frame(db, city)
+    if df is None:
+        return JSONResponse(content={"success": False, "ai_analysis": "暂无数据"})
+    prompt, prompt_stats = build_huiju_ai_prompt(df, city)
+    job = await submit_ai_job(db, "huiju", prompt, scope=city, options=HUIJU_AI_OPTIONS, prompt_stats=prompt_stats)
+    return JSONResponse(status_code=202, content={"success": True, "data": job_to_dict(job)})
+
 @router.get("/analyze")
-async def huiju_analyze(request: Request, city: str = None, db: AsyncSession = Depends(get_db)):
-    # 查询所有城市和数据
-    result = await db.execute(select(Huijugugan))
-    data = result.scalars().all()
-    all_cities = sorted(set(item.city for item in data))
-    if not data:
+async def huiju_analyze(request: Request, city: str = None, db: AsyncSession = Depends(get_read_db)):
+    # 按城市+月份汇总后的数据
+    df = await _load_huiju_frame(db)
+    if df is None:
         return bi_templates_env.TemplateResponse(
             "huiju_analyze.html",
             {
                 "request": request,
-                "all_cities": all_cities,
+                "all_cities": [],
                 "current_city": city,
                 "no_data": True
             }
         )
-    # 准备DataFrame
-    df_data = []
-    for item in data:
-        df_data.append({
-            "month": item.month,
-            "city": item.city,
-            "huiju_amount": item.huiju_amount,
-            "over_4h": item.over_4h,
-            "over_4h_ratio": item.over_4h / item.huiju_amount if item.huiju_amount > 0 else 0,
-            "important_amount": item.important_amount,
-            "over_12h": item.over_12h,
-            "over_12h_ratio": item.over_12h / item.important_amount if item.important_amount > 0 else 0
-        })
-    import pandas as pd
-    df = pd.DataFrame(df_data)
-    from pyecharts.charts import Bar, Line, Grid
+    all_cities = sorted(df['city'].unique())
+    # 一次透视得到多维表，预警规则直接作用在宽表上
+    wide = build_huiju_wide(df)
+    months = wide.index.tolist()
+    cities = wide.columns.get_level_values(1).unique().tolist()
+    table_cities = [city] if city else cities
+    # AI分析（已移至异步接口，不在主内容渲染时调用）
+    # 图表配置由 /huiju/analyze/charts 以JSON返回，页面只加载一次本地echarts
+
+    # 预警：默认规则为深圳任一指标大于广州则该月红灯，阈值规则见 HUIJU_ALERT_THRESHOLDS
+    rules = huiju_alert_rules()
+    if city:
+        # 阈值规则只看当前城市，对比规则始终比较两个城市
+        rules = [ThresholdRule(r.field, r.yellow, r.red, entities=[city]) if isinstance(r, ThresholdRule) else r for r in rules]
+    by_level = split_by_level(evaluate_rules(wide, rules))
+    red_months = by_level[RED]
+    yellow_months = by_level[YELLOW]
+    # 只显示红色和黄色预警，绿色不显示
+    green_months = []
+
+    # 多维表数据：key 为 '指标|城市'
+    flat = wide.fillna(0)
+    flat.columns = [f"{field}|{city_name}" for field, city_name in flat.columns]
+    pivot_data = flat.to_dict(orient='index')
+    return bi_templates_env.TemplateResponse(
+        "huiju_analyze.html",
+        {
+            "request": request,
+            "all_cities": all_cities,
+            "current_city": city,
+            "red_months": red_months,
+            "yellow_months": yellow_months,
+            "green_months": green_months,
+            "months": months,
+            "cities": table_cities,
+            "has_shenzhen_chart": '深圳' in cities,
+            "pivot_data": pivot_data,
+            "no_data": False,
+        }
+    )
+
+# 图表配置缓存：(城市, 数据版本) -> echarts配置
+_chart_cache: Dict[Any, Dict[str, Any]] = {}
+CHART_CACHE_SIZE = 32
+
+async def _huiju_data_version(db: AsyncSession) -> str:
+    """数据版本：记录数+最大ID+最后更新时间，任何增删改都会改变"""
+    row = (await db.execute(
+        select(func.count(Huijugugan.id), func.max(Huijugugan.id), func.max(Huijugugan.updated_at))
+    )).one()
+    return f"{row[0]}-{row[1] or 0}-{row[2].isoformat() if row[2] else ''}"
+
+def build_huiju_chart_options(df, city=None) -> Dict[str, Any]:
+    """生成分析页图表的echarts配置（柱状图+深圳趋势图）"""
+    from pyecharts.charts import Bar, Line
     from pyecharts import options as opts
     from pyecharts.globals import ThemeType
-    from pyecharts.commons.utils import JsCode
-    from pyecharts.render import make_snapshot
-    # 柱状图
-    # 保证 months 和 cities 在所有分支都可用，并固定城市顺序
-    months = sorted(df['month'].unique())
-    # 固定城市顺序：深圳、广州、东莞、佛山
-    city_order = ['深圳', '广州', '东莞', '佛山']
-    cities = [city for city in city_order if city in df['city'].unique()]  # 只保留数据中存在的城市
-    # 生成pivot_data和table_cities
-    pivot_data = {}
-    if city:
-        table_cities = [city]
-    else:
-        table_cities = cities
-    for m in months:
-        pivot_data[m] = {}
-        if city:
-            for field in ["huiju_amount", "over_4h", "important_amount", "over_12h"]:
-                key = f"{field}|{city}"
-                value = float(df[(df['month'] == m) & (df['city'] == city)][field].values[0]) if not df[(df['month'] == m) & (df['city'] == city)].empty else 0
-                pivot_data[m][key] = value
-        else:
-            for city_name in cities:
-                for field in ["huiju_amount", "over_4h", "important_amount", "over_12h"]:
-                    key = f"{field}|{city_name}"
-                    value = float(df[(df['month'] == m) & (df['city'] == city_name)][field].values[0]) if not df[(df['month'] == m) & (df['city'] == city_name)].empty else 0
-                    pivot_data[m][key] = value
-    # AI分析（已移至异步接口，不在主内容渲染时调用）
-    # ai_analysis = analyze_and_predict_with_deepseek(df if not city else df[df['city'] == city], city)
-    # ↓↓↓ 下面保持原有流程 ↓↓↓
+
+    # 月份×(指标,城市) 宽表，缺失补0
+    wide = build_huiju_wide(df).fillna(0)
+    months = wide.index.tolist()
+    cities = wide.columns.get_level_values(1).unique().tolist()
+    fields = HUIJU_AMOUNT_FIELDS
+
+    def series(field, city_name):
+        if (field, city_name) not in wide.columns:
+            return [0.0] * len(months)
+        return wide[(field, city_name)].astype(float).tolist()
+
+    names = ["汇聚总量", "超4小时", "重要紧急", "超12小时"]
+    colors = ["#3498db", "#2ecc71", "#e74c3c", "#9b59b6"]
+    bar = Bar(init_opts=opts.InitOpts(theme=ThemeType.LIGHT))
+    bar.add_xaxis(months)
     if city:
-        # 单城市分组柱状图 - 增大图表尺寸
-        bar = Bar(init_opts=opts.InitOpts(theme=ThemeType.LIGHT, width="100%", height="546px"))
-        bar.add_xaxis(months)
-        colors = ["#3498db", "#2ecc71", "#e74c3c", "#9b59b6"]
-        for field, name, color in zip(
-            ["huiju_amount", "over_4h", "important_amount", "over_12h"],
-            ["汇聚总量", "超4小时", "重要紧急", "超12小时"],
-            colors
-        ):
-            y = [float(df[(df['month'] == m) & (df['city'] == city)][field].values[0]) if not df[(df['month'] == m) & (df['city'] == city)].empty else 0 for m in months]
-            bar.add_yaxis(name, y, stack=None, itemstyle_opts=opts.ItemStyleOpts(color=color))
+        # 单城市分组柱状图
+        for field, name, color in zip(fields, names, colors):
+            bar.add_yaxis(name, series(field, city), stack=None, itemstyle_opts=opts.ItemStyleOpts(color=color))
         bar.set_series_opts(label_opts=opts.LabelOpts(is_show=False))
         bar.set_global_opts(
             title_opts=opts.TitleOpts(title=f"{city} - 多系列对比柱状图", pos_top="1%"),
@@ -182,37 +218,17 @@ async def huiju_analyze(request: Request, city: str = None, db: AsyncSession = D
         )
         # 设置图表网格布局（如无缩放条可适当减小底部间距）
         bar.options["grid"] = {"top": "15%", "bottom": "12%"}
-        bar_chart = bar.render_embed()
-        # 折线图
-        line = Line(init_opts=opts.InitOpts(theme=ThemeType.LIGHT, width="1000px", height="320px"))
-        line.add_xaxis(months)
-        line.add_yaxis("超4小时比例", [float(df[df['month'] == m]['over_4h_ratio'].values[0]) if not df[df['month'] == m].empty else 0 for m in months], is_smooth=True)
-        line.set_global_opts(title_opts=opts.TitleOpts(title=f"{city} - 超4小时比例"), yaxis_opts=opts.AxisOpts(axislabel_opts=opts.LabelOpts(formatter="{value}%")))
-        line_chart = line.render_embed()
-        line2 = Line(init_opts=opts.InitOpts(theme=ThemeType.LIGHT, width="1000px", height="320px"))
-        line2.add_xaxis(months)
-        line2.add_yaxis("超12小时比例", [float(df[df['month'] == m]['over_12h_ratio'].values[0]) if not df[df['month'] == m].empty else 0 for m in months], is_smooth=True)
-        line2.set_global_opts(title_opts=opts.TitleOpts(title=f"{city} - 重要环超12小时比例"), yaxis_opts=opts.AxisOpts(axislabel_opts=opts.LabelOpts(formatter="{value}%")))
-        important_chart = line2.render_embed()
     else:
-        # 全部城市：同一坐标轴下4个城市并列对比分组柱状图 - 增大图表尺寸
-        bar = Bar(init_opts=opts.InitOpts(theme=ThemeType.LIGHT, width="100%", height="546px"))
-        bar.add_xaxis(months)
-        colors = ["#3498db", "#2ecc71", "#e74c3c", "#9b59b6"]
-        for field, name, color in zip(
-            ["huiju_amount", "over_4h", "important_amount", "over_12h"],
-            ["汇聚总量", "超4小时", "重要紧急", "超12小时"],
-            colors
-        ):
+        # 全部城市：同一坐标轴下4个城市并列对比分组柱状图
+        for field, name, color in zip(fields, names, colors):
             for city_name in cities:
-                y = [float(df[(df['month'] == m) & (df['city'] == city_name)][field].values[0]) if not df[(df['month'] == m) & (df['city'] == city_name)].empty else 0 for m in months]
-                bar.add_yaxis(f"{city_name}-{name}", y, stack=None, itemstyle_opts=opts.ItemStyleOpts(color=color))
+                bar.add_yaxis(f"{city_name}-{name}", series(field, city_name), stack=None, itemstyle_opts=opts.ItemStyleOpts(color=color))
         bar.set_series_opts(label_opts=opts.LabelOpts(is_show=False))
         bar.set_global_opts(
             title_opts=opts.TitleOpts(title="多城市对比", pos_top="1%"),
             xaxis_opts=opts.AxisOpts(
-                type_="category", 
-                name="月份", 
+                type_="category",
+                name="月份",
                 axislabel_opts=opts.LabelOpts(rotate=45, interval=0),
                 axisline_opts=opts.AxisLineOpts(is_show=True),
                 splitline_opts=opts.SplitLineOpts(is_show=True)
@@ -229,7 +245,6 @@ async def huiju_analyze(request: Request, city: str = None, db: AsyncSession = D
                 orient="horizontal",
                 align="left"
             ),
-
         )
         # 设置图表网格布局，增加底部和顶部间距
         bar.options["grid"] = {
@@ -239,110 +254,44 @@ async def huiju_analyze(request: Request, city: str = None, db: AsyncSession = D
             "right": "0%",
             "containLabel": True
         }
-        bar_chart = bar.render_embed()
-        # 多城市折线图
-        line = Line(init_opts=opts.InitOpts(theme=ThemeType.LIGHT, width="1200px", height="400px"))
-        line = Line(init_opts=opts.InitOpts(theme=ThemeType.LIGHT, width="1000px", height="320px"))
-        line.add_xaxis(months)
-        for city_name in cities:
-            city_df = df[df['city'] == city_name]
-            y = [float(city_df[city_df['month'] == m]['over_4h_ratio'].values[0]) if not city_df[city_df['month'] == m].empty else 0 for m in months]
-            line.add_yaxis(city_name, y, is_smooth=True)
-        line.set_global_opts(title_opts=opts.TitleOpts(title="全部城市 - 超4小时比例"), yaxis_opts=opts.AxisOpts(axislabel_opts=opts.LabelOpts(formatter="{value}%")))
-        line_chart = line.render_embed()
-        line2 = Line(init_opts=opts.InitOpts(theme=ThemeType.LIGHT, width="1000px", height="320px"))
-        line2.add_xaxis(months)
-        for city_name in cities:
-            city_df = df[df['city'] == city_name]
-            y = [float(city_df[city_df['month'] == m]['over_12h_ratio'].values[0]) if not city_df[city_df['month'] == m].empty else 0 for m in months]
-            line2.add_yaxis(city_name, y, is_smooth=True)
-        line2.set_global_opts(title_opts=opts.TitleOpts(title="全部城市 - 重要环超12小时比例"), yaxis_opts=opts.AxisOpts(axislabel_opts=opts.LabelOpts(formatter="{value}%")))
-        important_chart = line2.render_embed()
-
-
-    # 新预警逻辑：深圳任一指标大于广州则该月预警（红）
-    red_months = []
-    yellow_months = []
-    green_months = []
-    if '深圳' in cities and '广州' in cities:
-        for m in months:
-            sz_row = df[(df['city'] == '深圳') & (df['month'] == m)]
-            gz_row = df[(df['city'] == '广州') & (df['month'] == m)]
-            if not sz_row.empty and not gz_row.empty:
-                sz = sz_row.iloc[0]
-                gz = gz_row.iloc[0]
-                for col in ['huiju_amount', 'over_4h', 'important_amount', 'over_12h']:
-                    if float(sz[col]) > float(gz[col]):
-                        red_months.append(m)
-                        break
-    # 只显示红色预警，其他不显示
-    yellow_months = []
-    green_months = []
-    # 多维表数据
-    pivot_df = df.pivot_table(
-        index='month',
-        columns='city',
-        values=['huiju_amount', 'over_4h', 'over_4h_ratio', 'important_amount', 'over_12h', 'over_12h_ratio'],
-        aggfunc='first'
-    )
-    months = sorted(df['month'].unique())
-    cities = sorted(df['city'].unique())
-    # 修正：pivot_data的key转为字符串，避免前端序列化报错
-    pivot_data_raw = pivot_df.to_dict(orient='index') if not pivot_df.empty else {}
-    pivot_data = {}
-    for month, row in pivot_data_raw.items():
-        pivot_data[month] = {}
-        for k, v in row.items():
-            if isinstance(k, tuple):
-                key_str = '|'.join(map(str, k))
-            else:
-                key_str = str(k)
-            pivot_data[month][key_str] = v
-    # 深圳折线图（右侧专用）
-    shenzhen_line_chart = ""
+    charts = {"bar_chart": json.loads(bar.dump_options()), "shenzhen_line_chart": None}
+
+    # 深圳折线图（右侧专用）：四条数据线
     if '深圳' in cities:
-        shenzhen_df = df[df['city'] == '深圳']
-        if not shenzhen_df.empty:
-            from pyecharts.charts import Line
-            from pyecharts import options as opts
-            shenzhen_line = Line(init_opts=opts.InitOpts(theme=ThemeType.LIGHT, width="100%", height="330px"))
-            shenzhen_line.add_xaxis(months)
-            # 四条数据线：汇聚总量、超4小时、重要紧急、超12小时
-            fields = [
-                ("huiju_amount", "汇聚总量"),
-                ("over_4h", "超4小时"),
-                ("important_amount", "重要紧急"),
-                ("over_12h", "超12小时")
-            ]
-            for field, name in fields:
-                y = [float(shenzhen_df[shenzhen_df['month'] == m][field].values[0]) if not shenzhen_df[shenzhen_df['month'] == m].empty else 0 for m in months]
-                shenzhen_line.add_yaxis(name, y, is_smooth=True)
-            shenzhen_line.set_global_opts(title_opts=opts.TitleOpts(title="深圳汇聚数据趋势", pos_top="2%", pos_left="center", title_textstyle_opts=opts.TextStyleOpts(font_size=13)),
-                                          xaxis_opts=opts.AxisOpts(type_="category", name="月份", axislabel_opts=opts.LabelOpts(rotate=0)),
-                                          yaxis_opts=opts.AxisOpts(name="数量"),
-                                          legend_opts=opts.LegendOpts(pos_top="10%"))
-            shenzhen_line.options["grid"] = {"top": "20%", "bottom": "18%", "left": "8%", "right": "4%", "containLabel": True}
-            shenzhen_line_chart = shenzhen_line.render_embed()
+        shenzhen_line = Line(init_opts=opts.InitOpts(theme=ThemeType.LIGHT))
+        shenzhen_line.add_xaxis(months)
+        for field, name in zip(fields, names):
+            shenzhen_line.add_yaxis(name, series(field, '深圳'), is_smooth=True)
+        shenzhen_line.set_global_opts(title_opts=opts.TitleOpts(title="深圳汇聚数据趋势", pos_top="2%", pos_left="center", title_textstyle_opts=opts.TextStyleOpts(font_size=13)),
+                                      xaxis_opts=opts.AxisOpts(type_="category", name="月份", axislabel_opts=opts.LabelOpts(rotate=0)),
+                                      yaxis_opts=opts.AxisOpts(name="数量"),
+                                      legend_opts=opts.LegendOpts(pos_top="10%"))
+        shenzhen_line.options["grid"] = {"top": "20%", "bottom": "18%", "left": "8%", "right": "4%", "containLabel": True}
+        charts["shenzhen_line_chart"] = json.loads(shenzhen_line.dump_options())
+    return charts
 
-    return bi_templates_env.TemplateResponse(
-        "huiju_analyze.html",
-        {
-            "request": request,
-            "all_cities": all_cities,
-            "current_city": city,
-            "bar_chart": bar_chart,
-            "line_chart": line_chart,
-            "important_chart": important_chart,
-            "red_months": red_months,
-            "yellow_months": yellow_months,
-            "green_months": green_months,
-            "months": months,
-            "cities": table_cities,
-            "shenzhen_line_chart": shenzhen_line_chart,
-            "pivot_data": pivot_data,
-            "no_data": False,
-        }
-    )
+@router.get("/analyze/charts")
+async def huiju_analyze_charts(request: Request, city: str = None, db: AsyncSession = Depends(get_read_db)):
+    """分析页图表的echarts配置，按 城市+数据版本 缓存，支持ETag协商缓存
+
+    读取数据后再查一次版本，期间有写入使版本变化时本次图表只返回、不缓存，避免把旧数据缓存在新版本下。
+    """
+    version = await _huiju_data_version(db)
+    etag = '"' + hashlib.sha1(f"{city or ''}|{version}".encode("utf-8")).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    key = (city or "", version)
+    charts = _chart_cache.get(key)
+    if charts is None:
+        df = await _load_huiju_frame(db)
+        charts = build_huiju_chart_options(df, city) if df is not None else {"bar_chart": None, "shenzhen_line_chart": None}
+        if await _huiju_data_version(db) == version:
+            if len(_chart_cache) >= CHART_CACHE_SIZE:
+                _chart_cache.clear()
+            _chart_cache[key] = charts
+    return JSONResponse(content={"success": True, "version": version, "charts": charts}, headers=headers)
 
 @router.delete("/data/delete/{id}")
 async def delete_huiju_data(id: int, db: AsyncSession = Depends(get_db)):
@@ -472,17 +421,26 @@ async def add_huijugugan(
     db: AsyncSession = Depends(get_db)
 ):
     new_data = Huijugugan(
-        month=month,
-        city=city,
+        month=normalize_huiju_month(pd.Series([month])).iloc[0],
+        city=city.strip(),
         huiju_amount=huiju_amount,
         over_4h=over_4h,
         important_amount=important_amount,
         over_12h=over_12h
     )
     db.add(new_data)
-    await db.commit()
+    await _commit_huiju(db)
     return RedirectResponse(url="/huijugugan", status_code=303)
 
+
+async def _commit_huiju(db: AsyncSession):
+    """提交表单修改；城市+月份与已有数据重复时返回409"""
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="该城市本月的数据已存在")
+
 @router.get("/data/edit/{id}", response_class=HTMLResponse)
 async def edit_huiju_form(request: Request, id: int, db: AsyncSession = Depends(get_db)):
     """编辑汇聚骨干数据表单"""
@@ -510,156 +468,224 @@ async def update_huiju_data(
         raise HTTPException(status_code=404, detail="数据不存在")
     
     # 更新数据
-    huijugugan.month = month
-    huijugugan.city = city
+    huijugugan.month = normalize_huiju_month(pd.Series([month])).iloc[0]
+    huijugugan.city = city.strip()
     huijugugan.huiju_amount = huiju_amount
     huijugugan.over_4h = over_4h
     huijugugan.important_amount = important_amount
     huijugugan.over_12h = over_12h
     
-    await db.commit()
+    await _commit_huiju(db)
     return RedirectResponse(url="/huiju/data", status_code=303)
-@router.get("/analyze", response_class=HTMLResponse)
-async def huiju_analyze(
-    request: Request, 
-    city: str = None, 
+
+
+# ---------------- 批量导入 ----------------
+
+# 模板列名 -> 字段名
+HUIJU_IMPORT_COLUMNS = {
+    "月份": "month",
+    "城市": "city",
+    "汇聚全量": "huiju_amount",
+    "超4小时": "over_4h",
+    "重要环全量": "important_amount",
+    "超12小时": "over_12h",
+}
+# 可选的占比列：填写时校验与数量计算出的占比一致
+HUIJU_IMPORT_RATIO_COLUMNS = {
+    "超4小时占比": ("over_4h", "huiju_amount"),
+    "超12小时占比": ("over_12h", "important_amount"),
+}
+RATIO_TOLERANCE = 0.005
+# 返回给前端的错误和变更明细条数上限
+IMPORT_DETAIL_LIMIT = 50
+
+
+def _parse_ratio(values: pd.Series) -> pd.Series:
+    text = values.astype(str).str.strip()
+    percent = text.str.endswith("%")
+    number = pd.to_numeric(text.str.rstrip("%"), errors="coerce")
+    return number.where(~percent, number / 100)
+
+
+def normalize_huiju_month(month: pd.Series) -> pd.Series:
+    """月份统一为 YYYY-MM（"2025年1月"、"2025-1" 与 "2025-01" 视为同一月），无法识别或缺少年份的保留去掉首尾空白的原值"""
+    text = month.fillna("").astype(str).str.strip()
+    period = month_index(None, text)
+    valid = period.notna() & (period >= 12)
+    period = period.where(valid, 0).astype(int)
+    formatted = (period // 12).astype(str) + "-" + (period % 12 + 1).astype(str).str.zfill(2)
+    return formatted.where(valid, text)
+
+
+def parse_huiju_frame(raw: pd.DataFrame):
+    """校验并规范化导入数据，返回 (数据, 错误列表)
+
+    数量须为非负整数，超时数量不超过对应全量；月份统一为 YYYY-MM；同一文件内 城市+月份 不可重复。
+    错误行号对应表格中的行（表头为第1行）。
+    """
+    raw = raw.rename(columns=lambda c: str(c).strip())
+    missing = [c for c in HUIJU_IMPORT_COLUMNS if c not in raw.columns]
+    if missing:
+        return None, [f"缺少必要的列: {'、'.join(missing)}"]
+
+    raw = raw.dropna(how="all", subset=list(HUIJU_IMPORT_COLUMNS))
+    line = pd.Series(raw.index + 2, index=raw.index)
+    errors: List[str] = []
+
+    def report(mask: pd.Series, message: str):
+        for n in line[mask].tolist():
+            errors.append(f"第{n}行：{message}")
+
+    df = pd.DataFrame(index=raw.index)
+    df["city"] = raw["城市"].fillna("").astype(str).str.strip()
+    report(df["city"] == "", "城市不能为空")
+
+    period = month_index(None, raw["月份"].fillna(""))
+    report(period.isna() | (period < 12), "月份格式应为 YYYY-MM")
+    df["month"] = normalize_huiju_month(raw["月份"])
+
+    count_fields = [f for f in HUIJU_IMPORT_COLUMNS.values() if f not in ("month", "city")]
+    bad_count = pd.Series(False, index=raw.index)
+    for label, field in HUIJU_IMPORT_COLUMNS.items():
+        if field not in count_fields:
+            continue
+        value = pd.to_numeric(raw[label].astype(str).str.replace(",", "").str.strip(), errors="coerce")
+        bad = value.isna() | (value < 0) | (value % 1 != 0)
+        report(bad, f"{label}须为非负整数")
+        bad_count |= bad
+        df[field] = value.where(~bad, 0).astype("int64")
+
+    # 数量本身有误的行不再做占比相关校验
+    report(~bad_count & (df["over_4h"] > df["huiju_amount"]), "超4小时不能大于汇聚全量")
+    report(~bad_count & (df["over_12h"] > df["important_amount"]), "超12小时不能大于重要环全量")
+
+    for label, (numerator, denominator) in HUIJU_IMPORT_RATIO_COLUMNS.items():
+        if label not in raw.columns:
+            continue
+        given = _parse_ratio(raw[label])
+        expected = (df[numerator] / df[denominator].where(df[denominator] > 0)).fillna(0.0)
+        report(~bad_count & given.notna() & ((given - expected).abs() > RATIO_TOLERANCE), f"{label}与数量计算结果不一致")
+
+    duplicated = df.duplicated(subset=["city", "month"], keep="first") & (df["city"] != "")
+    report(duplicated, "城市+月份在文件中重复")
+
+    errors.sort(key=lambda e: int(e[1:e.index("行")]))
+    return df[["month", "city"] + count_fields].reset_index(drop=True), errors
+
+
+async def upsert_huiju_frame(db: AsyncSession, df: pd.DataFrame, dry_run: bool = False) -> Dict[str, Any]:
+    """按 城市+月份 批量写入：不存在则新增，数量有变化则更新
+
+    分批读取已有数据、分批写入，全部在同一个事务中提交；dry_run 时只返回差异不写库。
+    库中的城市去掉首尾空白、月份按 normalize_huiju_month 规范化后再比较，更新时一并写回规范化的值；
+    同一 城市+月份 存在多条时更新id最小的一条。
+    """
+    chunk_size = max(settings.IMPORT_CHUNK_SIZE, 1)
+    count_fields = [c for c in df.columns if c not in ("month", "city")]
+
+    # 按城市读取已有数据：月份写法可能不同（如 "2025年1月"），不能按月份原值筛选
+    items: List[Huijugugan] = []
+    cities = sorted(df["city"].unique())
+    for start in range(0, len(cities), chunk_size):
+        result = await db.execute(
+            select(Huijugugan)
+            .where(func.trim(Huijugugan.city).in_(cities[start:start + chunk_size]))
+            .order_by(Huijugugan.id)
+        )
+        items.extend(result.scalars())
+    existing: Dict[tuple, Huijugugan] = {}
+    months = normalize_huiju_month(pd.Series([item.month for item in items], dtype=object))
+    for item, month in zip(items, months):
+        existing.setdefault((item.city.strip(), month), item)
+
+    now = datetime.utcnow()
+    inserts: List[Dict[str, Any]] = []
+    updates: List[Dict[str, Any]] = []
+    changes: List[Dict[str, Any]] = []
+    unchanged = 0
+    for row in df.to_dict(orient="records"):
+        item = existing.get((row["city"], row["month"]))
+        if item is None:
+            inserts.append({**row, "created_at": now, "updated_at": now})
+            continue
+        before = {f: getattr(item, f) for f in count_fields}
+        after = {f: int(row[f]) for f in count_fields}
+        if before == after:
+            unchanged += 1
+            continue
+        updates.append({"id": item.id, "city": row["city"], "month": row["month"], **after, "updated_at": now})
+        if len(changes) < IMPORT_DETAIL_LIMIT:
+            changes.append({"city": row["city"], "month": row["month"], "before": before, "after": after})
+
+    if not dry_run and (inserts or updates):
+        try:
+            for start in range(0, len(inserts), chunk_size):
+                await db.execute(insert(Huijugugan), inserts[start:start + chunk_size])
+            for start in range(0, len(updates), chunk_size):
+                await db.execute(update(Huijugugan), updates[start:start + chunk_size])
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+    return {
+        "total": len(df),
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "unchanged": unchanged,
+        "changes": changes,
+        "dry_run": dry_run,
+    }
+
+
+@router.get("/data/download_template")
+async def download_huiju_template():
+    """下载汇聚骨干数据导入模板"""
+    df = pd.DataFrame({
+        "月份": ["2025-01", "2025-01"],
+        "城市": ["深圳", "广州"],
+        "汇聚全量": [120, 98],
+        "超4小时": [6, 4],
+        "重要环全量": [40, 35],
+        "超12小时": [1, 0],
+    })
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='汇聚骨干数据')
+        worksheet = writer.sheets['汇聚骨干数据']
+        for i, col in enumerate(df.columns):
+            max_length = max(len(str(col)), df[col].astype(str).map(len).max())
+            worksheet.column_dimensions[worksheet.cell(1, i + 1).column_letter].width = max_length + 4
+    output.seek(0)
+    return StreamingResponse(
+        output,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": "attachment; filename=huiju_data_template.xlsx"}
+    )
+
+
+@router.post("/data/upload")
+async def upload_huiju_data(
+    file: UploadFile = File(...),
+    dry_run: bool = Form(False),
     db: AsyncSession = Depends(get_db)
 ):
-    """汇聚骨干指标数据分析页面"""
-    # 获取所有城市
-    result = await db.execute(select(distinct(Huijugugan.city)))
-    all_cities = [row[0] for row in result.all() if row[0]]
-    
-    # 构建查询
-    query = select(Huijugugan)
-    if city:
-        query = query.where(Huijugugan.city == city)
-    
-    # 获取数据
-    result = await db.execute(query.order_by(Huijugugan.month, Huijugugan.city))
-    data = result.scalars().all()
-    
-    if not data:
-        return bi_templates_env.TemplateResponse(
-            "huiju_analyze.html",
-            {
-                "request": request,
-                "all_cities": all_cities,
-                "current_city": city,
-                "no_data": True
-            }
-        )
-    
-    # 准备数据
-    df_data = []
-    for item in data:
-        df_data.append({
-            "month": item.month,
-            "city": item.city,
-            "huiju_amount": item.huiju_amount,
-            "over_4h": item.over_4h,
-            "over_4h_ratio": item.over_4h / item.huiju_amount if item.huiju_amount > 0 else 0,
-            "important_amount": item.important_amount,
-            "over_12h": item.over_12h,
-            "over_12h_ratio": item.over_12h / item.important_amount if item.important_amount > 0 else 0
+    """从Excel/CSV批量导入汇聚骨干数据，按 城市+月份 新增或更新，返回差异汇总"""
+    raw = read_upload_frame(file.filename or "", await file.read())
+    df, errors = parse_huiju_frame(raw)
+    if errors:
+        return JSONResponse(status_code=400, content={
+            "success": False,
+            "message": f"数据校验未通过，共{len(errors)}处错误",
+            "errors": errors[:IMPORT_DETAIL_LIMIT],
         })
-    
-    df = pd.DataFrame(df_data)
-    
-    # 创建图表
-    # 1. 多系列对比柱状图
-    # melt数据，得到每个城市、月份、指标的值
-    df_melted = df.melt(id_vars=["month", "city"], value_vars=["huiju_amount", "over_4h", "important_amount", "over_12h"], 
-                        var_name="指标", value_name="数值")
-    fig = px.bar(
-        df_melted,
-        x="month",
-        y="数值",
-        color="指标",
-        barmode="group",
-        facet_col="city",
-        category_orders={"指标": ["huiju_amount", "over_4h", "important_amount", "over_12h"]},
-        labels={"month": "月份", "数值": "数量", "city": "城市", "指标": "指标"},
-        title=f"{city if city else '全部城市'} - 多系列对比柱状图"
-    )
-    bar_chart = fig.to_html(full_html=False)
-    
-    # 2. 超4小时比例折线图
-    fig_line = px.line(
-        df,
-        x="month",
-        y="over_4h_ratio",
-        color="city",
-        title=f"{city if city else '全部城市'} - 超4小时比例",
-        labels={"month": "月份", "over_4h_ratio": "超4小时比例", "city": "城市"}
-    )
-    line_chart = fig_line.to_html(full_html=False)
-    
-    # 3. 重要环超12小时比例折线图
-    fig_important = px.line(
-        df,
-        x="month",
-        y="over_12h_ratio",
-        color="city",
-        title=f"{city if city else '全部城市'} - 重要环超12小时比例",
-        labels={"month": "月份", "over_12h_ratio": "超12小时比例", "city": "城市"}
-    )
-    important_chart = fig_important.to_html(full_html=False)
-    
-    # 4. 红绿灯预警
-    red_months = []
-    yellow_months = []
-    green_months = []
-    
-    # 这里可以根据业务逻辑设置红绿灯规则
-    # 示例：超4小时比例>10%为红灯，>5%为黄灯，其他为绿灯
-    for _, row in df.iterrows():
-        if row['over_4h_ratio'] > 0.1:  # 10%
-            red_months.append(row['month'])
-        elif row['over_4h_ratio'] > 0.05:  # 5%
-            yellow_months.append(row['month'])
-        else:
-            green_months.append(row['month'])
-    
-    # 5. 创建多维数据表
-    # 按城市和月份透视数据
-    pivot_df = df.pivot_table(
-        index='month',
-        columns='city',
-        values=['huiju_amount', 'over_4h', 'over_4h_ratio', 'important_amount', 'over_12h', 'over_12h_ratio'],
-        aggfunc='first'
-    )
-    
-    # 准备多维表数据
-    months = sorted(df['month'].unique())
-    cities = sorted(df['city'].unique())
-    
-    # 确保城市顺序一致
-    city_order = ['深圳', '广州', '东莞', '佛山']
-    # 重新排序all_cities
-    all_cities = [city for city in city_order if city in set(all_cities)]
-    # 重新排序cities
-    cities = [city for city in city_order if city in set(cities)]
-    # 重新排序透视表数据
-    if not pivot_df.empty:
-        pivot_df = pivot_df.reindex(columns=city_order, level=1)
-    
-    # 渲染模板（不传递任何AI分析相关变量，主内容“秒开”）
-    return bi_templates_env.TemplateResponse(
-        "huiju_analyze.html",
-        {
-            "request": request,
-            "all_cities": all_cities,
-            "current_city": city,
-            "bar_chart": bar_chart,
-            "line_chart": line_chart,
-            "important_chart": important_chart,
-            "red_months": red_months,
-            "yellow_months": yellow_months,
-            "green_months": green_months,
-            "months": months,
-            "cities": cities,
-            "pivot_data": pivot_df.to_dict(orient='index') if not pivot_df.empty else {},
-            "no_data": False
-        }
-    )
+    if df.empty:
+        return JSONResponse(status_code=400, content={"success": False, "message": "文件中没有数据行", "errors": []})
+    try:
+        summary = await upsert_huiju_frame(db, df, dry_run=dry_run)
+    except Exception as e:
+        logger.error(f"汇聚骨干数据导入失败: {e}", exc_info=True)
+        return JSONResponse(status_code=500, content={"success": False, "message": f"导入失败：{str(e)[:100]}"})
+    action = "预览" if dry_run else "导入完成"
+    summary["message"] = f"{action}：新增{summary['inserted']}条，更新{summary['updated']}条，未变化{summary['unchanged']}条"
+    return {"success": True, **summary}
@@ -0,0 +1,377 @@
+"""
+后台导入任务模块
+上传接口把文件分块写入暂存目录并入队后立即返回，后台协程流式导入；
+进度（读取/写入/出错/重复行数和耗时）可按任务ID查询，也通过事件总线的 import 主题推送。
+取消的任务整体回滚，不留下部分数据。
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+from db.models import FAULT_NATURAL_KEY, FaultRecord, ImportJob
+from db.session import AsyncSessionLocal, get_db
+from import_maps import FAULT_RECORD_MAP, PUE_DATA_MAP, ZBK_MAP
+from pue_forecast import mark_pue_data_changed
+from utils.event_bus import TOPIC_FAULT, TOPIC_IMPORT, publish_event
+from utils.exceptions import FileUploadException
+from utils.ingest import Sink, TableMap, check_upload, dedup_insert_sink, ingest, iter_sheet_rows
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/import_jobs", tags=["后台导入任务"])
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+ACTIVE_STATUSES = (JOB_PENDING, JOB_RUNNING)
+
+# 上传文件每次读取并写入暂存文件的字节数
+SPOOL_BLOCK_SIZE = 1048576
+
+# 后台任务使用的会话工厂，测试时替换为测试库
+session_factory = AsyncSessionLocal
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+# 执行中任务的实时进度（只在内存中，结束时写入任务表），以及请求取消的任务
+_live: Dict[int, Dict[str, Any]] = {}
+_cancel_requested: Set[int] = set()
+
+
+class ImportCancelled(Exception):
+    """导入被取消"""
+
+
+class ImportKind:
+    """一种导入：列映射、写入端、是否整体校验和导入成功后的处理"""
+
+    def __init__(self, table_map: TableMap, strict: bool = False,
+                 sink: Optional[Callable[[], Sink]] = None,
+                 after: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.table_map = table_map
+        self.strict = strict
+        self.sink = sink
+        self.after = after
+
+
+def _after_fault_import(summary: Dict[str, Any]):
+    if summary["inserted"]:
+        publish_event(TOPIC_FAULT, {"action": "import", "count": summary["inserted"]})
+
+
+IMPORT_KINDS: Dict[str, ImportKind] = {
+    "fault": ImportKind(
+        FAULT_RECORD_MAP,
+        sink=lambda: dedup_insert_sink(FaultRecord, FAULT_NATURAL_KEY),
+        after=_after_fault_import,
+    ),
+    "contract": ImportKind(ZBK_MAP.with_constants(type="contract"), strict=True),
+    "kpi": ImportKind(ZBK_MAP.with_constants(type="kpi"), strict=True),
+    "pue": ImportKind(PUE_DATA_MAP, strict=True, after=lambda summary: mark_pue_data_changed()),
+}
+
+
+def spool_dir() -> Path:
+    path = Path(settings.IMPORT_SPOOL_DIR)
+    return path if path.is_absolute() else Path(__file__).resolve().parent / path
+
+
+def _remove_spool_file(path: Optional[str]):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"删除暂存文件失败 {path}: {e}")
+
+
+async def spool_upload(file: UploadFile) -> Dict[str, Any]:
+    """把上传文件分块写入暂存目录，超过 IMPORT_JOB_MAX_FILE_SIZE 时中止并删除"""
+    filename = file.filename or ""
+    max_size = settings.IMPORT_JOB_MAX_FILE_SIZE
+    check_upload(filename, 0, max_size=max_size)
+    directory = spool_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{uuid.uuid4().hex}{Path(filename).suffix.lower()}"
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                block = await file.read(SPOOL_BLOCK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                check_upload(filename, size, max_size=max_size)
+                out.write(block)
+    except BaseException:
+        _remove_spool_file(str(path))
+        raise
+    return {"filename": filename, "spool_path": str(path), "file_size": size}
+
+
+def job_to_dict(job: ImportJob) -> Dict[str, Any]:
+    """任务状态的JSON表示；执行中的任务使用内存中的实时进度"""
+    def fmt(value):
+        return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+    data = {
+        "job_id": job.id,
+        "kind": job.kind,
+        "filename": job.filename,
+        "file_size": job.file_size,
+        "status": job.status,
+        "rows_read": job.rows_read or 0,
+        "inserted": job.inserted or 0,
+        "rejected": job.rejected or 0,
+        "duplicates": job.duplicates or 0,
+        "elapsed_seconds": job.elapsed_seconds,
+        "errors": job.errors or [],
+        "error": job.error,
+        "cancel_requested": job.id in _cancel_requested,
+        "created_at": fmt(job.created_at),
+        "started_at": fmt(job.started_at),
+        "finished_at": fmt(job.finished_at),
+    }
+    if job.status == JOB_RUNNING and job.id in _live:
+        data.update(_live[job.id])
+    return data
+
+
+def _publish(data: Dict[str, Any]):
+    publish_event(TOPIC_IMPORT, {k: v for k, v in data.items() if k != "errors"})
+
+
+async def _run_job(job_id: int):
+    async with session_factory() as session:
+        job = await session.get(ImportJob, job_id)
+        if job is None or job.status != JOB_PENDING:
+            return
+        job.status = JOB_RUNNING
+        job.started_at = datetime.utcnow()
+        await session.commit()
+        kind, spool_path, options = job.kind, job.spool_path, job.options or {}
+        _publish(job_to_dict(job))
+
+    started = time.monotonic()
+    live = _live[job_id] = {"rows_read": 0, "inserted": 0, "rejected": 0, "duplicates": 0, "elapsed_seconds": 0.0}
+
+    def on_progress(summary: Dict[str, Any]):
+        if job_id in _cancel_requested:
+            raise ImportCancelled()
+        live.update(
+            rows_read=summary["total"],
+            inserted=summary["inserted"],
+            rejected=summary["error_count"],
+            duplicates=summary["duplicate_count"],
+            elapsed_seconds=round(time.monotonic() - started, 3),
+        )
+        _publish({"job_id": job_id, "status": JOB_RUNNING, **live})
+
+    status, error, errors, summary = JOB_DONE, None, None, None
+    try:
+        import_kind = IMPORT_KINDS[kind]
+        async with session_factory() as session:
+            summary = await ingest(
+                session, iter_sheet_rows(spool_path), import_kind.table_map,
+                skip_rows=int(options.get("skip_rows", 0)),
+                sink=import_kind.sink() if import_kind.sink else None,
+                strict=import_kind.strict,
+                progress=on_progress,
+            )
+        if import_kind.after is not None:
+            import_kind.after(summary)
+    except ImportCancelled:
+        status, error = JOB_CANCELLED, "导入已取消，本次写入的数据已全部回滚"
+    except FileUploadException as e:
+        status, error, errors = JOB_FAILED, e.message, e.details.get("errors")
+    except Exception as e:
+        logger.error(f"导入任务{job_id}执行失败: {e}", exc_info=True)
+        status, error = JOB_FAILED, f"导入过程中出现错误：{str(e)[:100]}"
+    except asyncio.CancelledError:
+        # 服务关闭：保留暂存文件，下次启动时重新导入
+        _live.pop(job_id, None)
+        raise
+    _live.pop(job_id, None)
+    _cancel_requested.discard(job_id)
+    _remove_spool_file(spool_path)
+
+    async with session_factory() as session:
+        job = await session.get(ImportJob, job_id)
+        job.status = status
+        job.error = error
+        if summary is not None:
+            job.rows_read = summary["total"]
+            job.inserted = summary["inserted"]
+            job.rejected = summary["error_count"]
+            job.duplicates = summary["duplicate_count"]
+            job.errors = summary["errors"]
+        else:
+            # 未完成的导入已整体回滚，写入行数为0
+            job.rows_read, job.rejected, job.duplicates = live["rows_read"], live["rejected"], live["duplicates"]
+            job.inserted = 0
+            job.errors = errors
+        job.elapsed_seconds = round(time.monotonic() - started, 3)
+        job.finished_at = datetime.utcnow()
+        await session.commit()
+        _publish(job_to_dict(job))
+
+
+async def _worker():
+    while True:
+        job_id = await _queue.get()
+        try:
+            await _run_job(job_id)
+        except Exception as e:
+            logger.error(f"导入任务{job_id}状态更新失败: {e}", exc_info=True)
+        finally:
+            _queue.task_done()
+
+
+async def _requeue_unfinished_jobs():
+    """服务重启后，暂存文件仍在的未完成任务重新放回队列，其余标记为失败"""
+    try:
+        async with session_factory() as session:
+            result = await session.execute(
+                select(ImportJob).where(ImportJob.status.in_(ACTIVE_STATUSES)).order_by(ImportJob.id)
+            )
+            jobs = []
+            for job in result.scalars():
+                if job.spool_path and os.path.exists(job.spool_path):
+                    job.status = JOB_PENDING
+                    jobs.append(job)
+                else:
+                    job.status = JOB_FAILED
+                    job.error = "服务重启时暂存文件已丢失，请重新上传"
+                    job.finished_at = datetime.utcnow()
+            await session.commit()
+    except Exception as e:
+        logger.error(f"恢复未完成的导入任务失败: {e}")
+        return
+    for job in jobs:
+        _queue.put_nowait(job.id)
+    if jobs:
+        logger.info(f"恢复{len(jobs)}个未完成的导入任务")
+
+
+def start_import_job_workers(resume: bool = True):
+    """在当前事件循环中启动后台导入协程（应用启动时调用）"""
+    global _queue
+    if _workers:
+        return
+    _queue = asyncio.Queue()
+    for _ in range(max(settings.IMPORT_JOB_WORKERS, 1)):
+        _workers.append(asyncio.create_task(_worker()))
+    if resume:
+        _workers.append(asyncio.create_task(_requeue_unfinished_jobs()))
+
+
+async def stop_import_job_workers():
+    """停止后台导入协程，执行中的导入随之回滚，任务保留为待处理状态，下次启动时恢复"""
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _live.clear()
+    _queue = None
+
+
+async def wait_import_jobs_idle():
+    """等待队列中的任务全部处理完成"""
+    if _queue is not None:
+        await _queue.join()
+
+
+async def submit_import_job(db: AsyncSession, kind: str, file: UploadFile,
+                            options: Optional[Dict[str, Any]] = None) -> ImportJob:
+    """暂存上传文件并创建导入任务"""
+    if kind not in IMPORT_KINDS:
+        raise HTTPException(status_code=404, detail=f"未知的导入类型: {kind}")
+    if _queue is None:
+        start_import_job_workers(resume=False)
+    if _queue.qsize() >= settings.IMPORT_JOB_QUEUE_SIZE:
+        raise HTTPException(status_code=503, detail="导入任务排队已满，请稍后重试")
+
+    spooled = await spool_upload(file)
+    job = ImportJob(kind=kind, options=options or {}, status=JOB_PENDING, **spooled)
+    try:
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+    except Exception:
+        _remove_spool_file(spooled["spool_path"])
+        raise
+    _queue.put_nowait(job.id)
+    return job
+
+
+@router.post("/{kind}", status_code=202)
+async def create_import_job(
+    kind: str,
+    file: UploadFile = File(...),
+    skip_rows: int = Form(0),
+    db: AsyncSession = Depends(get_db),
+):
+    """上传文件并在后台导入（kind: fault、contract、kpi、pue），立即返回任务ID"""
+    if skip_rows < 0:
+        raise HTTPException(status_code=400, detail="skip_rows 不能为负数")
+    job = await submit_import_job(db, kind, file, {"skip_rows": skip_rows})
+    return JSONResponse({"success": True, "data": job_to_dict(job)}, status_code=202)
+
+
+@router.get("")
+async def list_import_jobs(limit: int = 20, db: AsyncSession = Depends(get_db)):
+    """最近的导入任务"""
+    result = await db.execute(
+        select(ImportJob).order_by(ImportJob.id.desc()).limit(min(max(limit, 1), 100))
+        .execution_options(populate_existing=True)
+    )
+    return {"success": True, "data": [job_to_dict(job) for job in result.scalars()]}
+
+
+async def _get_job(db: AsyncSession, job_id: int) -> ImportJob:
+    job = await db.get(ImportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="导入任务不存在")
+    # 后台会话已更新该行，重新读取最新状态
+    await db.refresh(job)
+    return job
+
+
+@router.get("/{job_id}")
+async def get_import_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """查询导入任务的状态和进度"""
+    return {"success": True, "data": job_to_dict(await _get_job(db, job_id))}
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_import_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """取消导入任务：排队中的直接取消；执行中的在当前批次写入后停止并整体回滚"""
+    job = await _get_job(db, job_id)
+    if job.status == JOB_PENDING:
+        job.status = JOB_CANCELLED
+        job.error = "导入已取消"
+        job.finished_at = datetime.utcnow()
+        await db.commit()
+        _remove_spool_file(job.spool_path)
+        _publish(job_to_dict(job))
+    elif job.status == JOB_RUNNING:
+        _cancel_requested.add(job.id)
+    else:
+        raise HTTPException(status_code=409, detail="导入任务已结束，无法取消")
+    return {"success": True, "data": job_to_dict(job)}
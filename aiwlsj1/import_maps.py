@@ -0,0 +1,63 @@
+"""
+导入列映射
+各导入入口（上传接口和命令行脚本）共用的 表头->字段 映射声明，配合 utils.ingest 流式导入
+"""
+
+from db.models import (
+    CenterTopTop, CenterTopBottom, LeftTop, LeftMiddle, RightTop, RightMiddle, Bottom,
+    FaultRecord, PUEData, PUEDrillDownData, Zbk,
+)
+from utils.ingest import FieldSpec, TableMap, as_datetime, as_float, as_int, model_table_map
+
+# 故障记录表；原始表格中"省-故障原因分析"列名为" 省-故障原因析"
+FAULT_RECORD_MAP = TableMap(FaultRecord, [
+    FieldSpec("sequence_no", "序号", convert=as_int),
+    FieldSpec("fault_date", "日期", convert=as_datetime),
+    FieldSpec("fault_name", "故障名称"),
+    FieldSpec("province_cause_analysis", "省-故障原因分析", "省-故障原因析"),
+    FieldSpec("province_cause_category", "省-原因分类"),
+    FieldSpec("province_fault_type", "省-故障类型"),
+    FieldSpec("notification_level", "通报级别"),
+    FieldSpec("cause_category", "原因分类"),
+    FieldSpec("fault_duration_hours", "故障处理时长（小时）", "故障处理时长(小时)", convert=as_float),
+    FieldSpec("complaint_situation", "投诉情况"),
+    FieldSpec("start_time", "发生时间", convert=as_datetime),
+    FieldSpec("end_time", "结束时间", convert=as_datetime),
+    FieldSpec("fault_cause", "故障原因"),
+    FieldSpec("fault_handling", "故障处理"),
+    FieldSpec("is_proactive_discovery", "是否主动发现"),
+    FieldSpec("remarks", "备注"),
+])
+
+# 契约化/KPI指标库，各列都必须存在（表头包含列名即可），导入时用 with_constants(type=...) 指定指标类型
+ZBK_MAP = TableMap(Zbk, [
+    FieldSpec(field, header, required=True, contains=True)
+    for field, header in (
+        ("zbx", "指标项"), ("fz", "分值"), ("qspm", "全省排名"), ("qnljdfzb", "全年累计得分占比"),
+        ("nddcpg", "年度达成评估"), ("y1zb", "1月指标"), ("y2zb", "2月指标"), ("y3zb", "3月指标"),
+        ("y4zb", "4月指标"), ("y5zb", "5月指标"), ("y6zb", "6月指标"), ("jzz", "基准值"), ("tzz", "挑战值"),
+    )
+])
+
+PUE_DATA_MAP = TableMap(PUEData, [
+    FieldSpec("location", "地点", required=True, nullable=False, contains=True),
+    FieldSpec("month", "月份", required=True, nullable=False, contains=True),
+    FieldSpec("pue_value", "PUE值", convert=as_float, required=True, nullable=False, contains=True),
+    FieldSpec("year", "年份", required=True, nullable=False, contains=True),
+])
+
+# PUE下钻明细：表头即模型注释；地点、年月由导入时指定
+PUE_DRILL_DOWN_MAP = model_table_map(
+    PUEDrillDownData, exclude=("location", "month", "year", "created_at", "updated_at"),
+)
+
+# data/index.xlsx 各工作表 -> 大屏面板表（表头为模型注释）
+INDEX_SHEET_MAPS = {
+    "centerTopTop": model_table_map(CenterTopTop),
+    "centerTopBottom": model_table_map(CenterTopBottom),
+    "leftTop": model_table_map(LeftTop),
+    "leftMiddle": model_table_map(LeftMiddle),
+    "rightTop": model_table_map(RightTop),
+    "rightMiddle": model_table_map(RightMiddle),
+    "bottom": model_table_map(Bottom),
+}
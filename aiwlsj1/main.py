@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from sqlalchemy.orm import Session
 import logging
 import traceback
@@ -12,10 +12,16 @@ from config import settings
 from utils.logging_config import setup_logging
 from utils.response import handle_server_error, handle_error
 from utils.exceptions import BaseAppException
+from utils.static_files import CachedStaticFiles
 
 # 导入数据库相关
-from db.session import engine, get_db
+from db.session import database_report, engine, get_db, read_engine
 from db.models import Base
+from pue_forecast import schedule_pue_outlook_refresh
+from utils.llm_client import close_llm_client
+from ai_jobs import start_ai_job_workers, stop_ai_job_workers
+from import_jobs import start_import_job_workers, stop_import_job_workers
+from utils.event_bus import event_bus
 
 # 导入路由
 from bi import router as bi_router
@@ -25,6 +31,9 @@ from bi_data_manage import router as bi_data_manage_router
 from bi_api import router as bi_api_router
 from fault_analysis_fastapi import router as fault_router
 from dashboard_api import router as dashboard_router
+from ai_jobs import router as ai_jobs_router
+from events_api import router as events_router
+from import_jobs import router as import_jobs_router
 
 # 初始化日志系统
 setup_logging()
@@ -64,6 +73,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 压缩较大的响应（如PUE下钻数据），小响应不压缩
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE)
+
 # 全局异常处理器
 @app.exception_handler(BaseAppException)
 async def app_exception_handler(request: Request, exc: BaseAppException):
@@ -102,7 +114,7 @@ async def general_exception_handler(request: Request, exc: Exception):
         return handle_server_error()
 
 # 挂载静态文件
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 
 # 注册各业务路由
 app.include_router(bi_data_manage_router, prefix="", tags=["数据管理"])
@@ -112,6 +124,9 @@ app.include_router(huiju_router, tags=["汇聚骨干指标"])
 app.include_router(bi_api_router, prefix="", tags=["API接口"])
 app.include_router(fault_router, tags=["故障分析"])
 app.include_router(dashboard_router, prefix="", tags=["仪表板"])
+app.include_router(ai_jobs_router, tags=["AI分析任务"])
+app.include_router(events_router, tags=["事件推送"])
+app.include_router(import_jobs_router, tags=["后台导入任务"])
 
 # 条件性注册绩效目标API
 if TARGETS_API_AVAILABLE:
@@ -132,6 +147,15 @@ async def on_startup():
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
         logger.info("数据库初始化完成")
+        logger.info(f"数据库连接配置: {await database_report()}")
+        if read_engine is not engine:
+            logger.info(f"读库连接配置: {await database_report(read_engine)}")
+        # 后台预热PUE预测缓存
+        schedule_pue_outlook_refresh()
+        # 启动AI分析后台任务，并恢复上次未完成的任务
+        start_ai_job_workers()
+        # 启动后台导入任务，并恢复暂存文件仍在的未完成任务
+        start_import_job_workers()
     except Exception as e:
         logger.error(f"数据库初始化失败: {str(e)}", exc_info=True)
         raise
@@ -142,6 +166,12 @@ async def on_startup():
 async def on_shutdown():
     """应用关闭事件"""
     logger.info("应用关闭中...")
+    await stop_ai_job_workers()
+    await stop_import_job_workers()
+    # 停止指标采样并断开推送连接
+    await event_bus.close()
+    # 释放大模型调用的连接池
+    await close_llm_client()
 
 # 健康检查端点
 @app.get("/health", tags=["系统"])
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Request, Form, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, Request, Form, UploadFile, File, HTTPException, Depends, Query
 from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from typing import Optional, List, Union
 from pydantic import BaseModel
@@ -10,13 +10,17 @@ from common import bi_templates_env  # 使用大屏模板环境
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import distinct, func, and_, or_
-from db.session import get_db
+from db.session import get_db, get_read_db
+from pue_forecast import get_pue_outlook, mark_pue_data_changed, MAX_HORIZON
+from utils.streaming_export import column, iter_query_rows, split_multi, streaming_export_response
+from utils.ingest import check_upload, ingest, iter_sheet_rows
+from import_maps import PUE_DATA_MAP
 
 router = APIRouter()
 
 # ------------- PUE指标12个月趋势接口 -------------
 @router.get("/pue_trend_data")
-async def pue_trend_data(location: str, year: str, month: str, db: AsyncSession = Depends(get_db)):
+async def pue_trend_data(location: str, year: str, month: str, db: AsyncSession = Depends(get_read_db)):
     """返回指定地点截止到 year-month 的近 12 个月 PUE 平均值列表，供弹窗 sparkline 使用"""
     # 计算 12 个日期元组 (year, month) 字符串，最近的在最后
     year_i = int(year)
@@ -422,6 +426,7 @@ async def add_pue_data(
     )
     db.add(new_data)
     await db.commit()
+    mark_pue_data_changed()
     return RedirectResponse(url="/pue_data", status_code=303)
 
 @router.get("/edit_pue_data/{id}", response_class=HTMLResponse)
@@ -453,6 +458,7 @@ async def edit_pue_data(
     pue_data.pue_value = pue_value
     pue_data.year = year
     await db.commit()
+    mark_pue_data_changed()
     return RedirectResponse(url="/pue_data", status_code=303)
 
 @router.get("/delete_pue_data/{id}")
@@ -464,6 +470,7 @@ async def delete_pue_data(id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="PUE数据不存在")
     await db.delete(pue_data)
     await db.commit()
+    mark_pue_data_changed()
     return RedirectResponse(url="/pue_data", status_code=303)
 
 @router.post("/pue_data/batch_delete")
@@ -490,6 +497,7 @@ async def batch_delete_pue_data(request: Request, db: AsyncSession = Depends(get
             deleted_count += 1
         
         await db.commit()
+        mark_pue_data_changed()
         
         return {"success": True, "deleted_count": deleted_count, "message": f"成功删除 {deleted_count} 条记录"}
         
@@ -525,45 +533,13 @@ async def download_pue_template():
     )
 
 @router.post("/upload-pue-excel")
-async def upload_pue_excel(file: UploadFile = File(...)):
-    """从Excel文件批量导入PUE数据"""
-    if not file.filename.endswith(('.xls', '.xlsx')):
-        raise HTTPException(status_code=400, detail="仅支持Excel文件格式（.xls, .xlsx）")
-    try:
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        required_columns = ['地点', '月份', 'PUE值', '年份']
-        col_mapping = {}
-        for req_col in required_columns:
-            if req_col in df.columns:
-                col_mapping[req_col] = req_col
-                continue
-            for col in df.columns:
-                if req_col in col:
-                    col_mapping[req_col] = col
-                    break
-            if req_col not in col_mapping:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Excel文件缺少必要的列: {req_col}"
-                )
-        for _, row in df.iterrows():
-            try:
-                pue_value = float(row[col_mapping['PUE值']])
-            except (ValueError, TypeError):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"PUE值必须是有效的数字"
-                )
-            await PUEData.create(
-                location=str(row[col_mapping['地点']]),
-                month=str(row[col_mapping['月份']]),
-                pue_value=pue_value,
-                year=str(row[col_mapping['年份']])
-            )
-        return RedirectResponse(url="/pue_data", status_code=303)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"导入失败: {str(e)}")
+async def upload_pue_excel(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+    """从表格文件（xlsx/csv/parquet）批量导入PUE数据，任一行出错时整体回滚"""
+    contents = await file.read()
+    check_upload(file.filename or "", len(contents))
+    await ingest(db, iter_sheet_rows(contents, file.filename), PUE_DATA_MAP, strict=True)
+    mark_pue_data_changed()
+    return RedirectResponse(url="/pue_data", status_code=303)
 
 # PUE数据API端点
 @router.get("/api/pue_data", response_model=List[dict])
@@ -595,7 +571,7 @@ async def delete_pue_data_api(id: int):
     return None
 
 @router.get("/pue_analyze", response_class=HTMLResponse)
-async def pue_analyze(request: Request, location: str = None, date_range: str = None, period: str = None, db: AsyncSession = Depends(get_db)):
+async def pue_analyze(request: Request, location: str = None, date_range: str = None, period: str = None, db: AsyncSession = Depends(get_read_db)):
     from datetime import datetime
     
     # 初始化所有必需的变量为默认值，防止模板渲染错误
@@ -626,6 +602,7 @@ async def pue_analyze(request: Request, location: str = None, date_range: str =
     red_months = []
     yellow_months = []
     green_months = []
+    pue_outlook = None
     
     try:
         # 获取所有地点
@@ -1311,52 +1288,38 @@ async def pue_analyze(request: Request, location: str = None, date_range: str =
         import traceback
         traceback.print_exc()
     
+    # 本地预测与风险排名（读取缓存）
+    try:
+        pue_outlook = await get_pue_outlook(db, horizon=3, location=location)
+    except Exception as e:
+        print(f"PUE预测结果获取失败: {e}")
+    
     return bi_templates_env.TemplateResponse(
         "pue_analyze.html",
-        {"request": request, "pue_bar_chart": chart_html, "all_locations": all_locations, "current_location": location, "table_data": table_data, "last_year": last_year, "this_year": this_year, "locations": locations, "years": years, "months": months, "multi_table": multi_table, "red_months": red_months, "yellow_months": yellow_months, "green_months": green_months, "line_chart_html": line_chart_html, "key_metrics": key_metrics, "heatmap_html": heatmap_html, "radar_html": radar_html}
+        {"request": request, "pue_bar_chart": chart_html, "all_locations": all_locations, "current_location": location, "table_data": table_data, "last_year": last_year, "this_year": this_year, "locations": locations, "years": years, "months": months, "multi_table": multi_table, "red_months": red_months, "yellow_months": yellow_months, "green_months": green_months, "line_chart_html": line_chart_html, "key_metrics": key_metrics, "heatmap_html": heatmap_html, "radar_html": radar_html, "pue_outlook": pue_outlook}
     )
 
 # ========== AI智能分析接口，对齐汇聚骨干指标分析体验 ==========
 from fastapi.responses import JSONResponse
-import requests
-import re
-
-# 可复用huijugugan.py的AI分析函数，或本地定义
-
-def analyze_and_predict_with_deepseek(df, location=None, max_rounds=3):
-    api_url = "https://DeepSeek-R1-wzrba.eastus2.models.ai.azure.com/chat/completions"
-    api_key = "HyYc4J6EcwlktQLXMcXQJNAtkRgioiqi"
-    prompt = f"请对如下{('地点：'+location) if location else '全部地点'}的PUE指标数据进行简要分析、总结规律，并预测未来几个月的趋势：\n{df.to_string(index=False)}"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    messages = [{"role": "user", "content": prompt}]
-    all_content = ""
-    for i in range(max_rounds):
-        payload = {
-            "model": "deepseek-chat",
-            "messages": messages,
-            "max_tokens": 1024,
-            "temperature": 0.7
-        }
-        try:
-            resp = requests.post(api_url, headers=headers, json=payload, timeout=60)
-            resp.raise_for_status()
-            content = resp.json()["choices"][0]["message"]["content"]
-            all_content += content
-            if len(content) < 900 or "已完成" in content or "END" in content:
-                break
-            messages.append({"role": "assistant", "content": content})
-            messages.append({"role": "user", "content": "请继续输出剩余内容"})
-        except Exception as e:
-            all_content += f"\n[AI分析补全失败：{e}]"
-            break
-    # 清洗AI输出
-    cleaned_content = re.sub(r'<think>[\s\S]*?</think>', '', all_content)
-    cleaned_content = re.sub(r'^[#>*\-\s]+', '', cleaned_content, flags=re.MULTILINE)
-    cleaned_content = cleaned_content.replace('*', '')
-    return cleaned_content.strip()
+from utils.llm_client import get_llm_client
+from utils.prompt_digest import build_digest, month_index
+from ai_jobs import job_to_dict, submit_ai_job
+
+# PUE分析的模型调用参数（输出较长，允许续写）
+PUE_AI_OPTIONS = {"max_rounds": 3}
+
+def build_pue_ai_prompt(df, location=None):
+    """返回 (提示词, 摘要统计)，明细先压缩为固定大小的统计摘要"""
+    digest, stats = build_digest(
+        df.assign(period=month_index(df["year"], df["month"])),
+        "location", ["pue_value"], entity_label="地点", value_labels={"pue_value": "PUE"},
+    )
+    prompt = f"请根据如下{('地点：'+location) if location else '全部地点'}的PUE指标统计摘要进行简要分析、总结规律，并预测未来几个月的趋势：\n{digest}"
+    return prompt, stats
+
+async def analyze_and_predict_with_deepseek(df, location=None, max_rounds=3):
+    prompt, _ = build_pue_ai_prompt(df, location)
+    return await get_llm_client().analyze(prompt, max_rounds=max_rounds)
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -1364,106 +1327,200 @@ from db.models import PUEData
 from fastapi import Depends
 from fastapi import APIRouter
 
+async def _load_pue_ai_frame(db: AsyncSession, location: str = None):
+    """读取AI分析用的PUE数据，无数据时返回None"""
+    query = select(PUEData.month, PUEData.location, PUEData.pue_value, PUEData.year).order_by(PUEData.id)
+    if location:
+        query = query.where(PUEData.location == location)
+    rows = (await db.execute(query)).all()
+    if not rows:
+        return None
+    return pd.DataFrame([row._asdict() for row in rows])
+
 @router.get("/pue_ai_analysis")
-async def get_pue_ai_analysis(location: str = None, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(PUEData))
-    data = result.scalars().all()
-    if not data:
+async def get_pue_ai_analysis(location: str = None, db: AsyncSession = Depends(get_read_db)):
+    df = await _load_pue_ai_frame(db, location)
+    if df is None:
         return JSONResponse(content={"ai_analysis": "暂无数据"})
-    df_data = []
-    for item in data:
-        if location and item.location != location:
-            continue
-        df_data.append({
-            "month": item.month,
-            "location": item.location,
-            "pue_value": item.pue_value,
-            "year": item.year
-        })
-    import pandas as pd
-    df = pd.DataFrame(df_data)
-    ai_analysis = analyze_and_predict_with_deepseek(df if not location else df[df['location'] == location], location)
+    ai_analysis = await analyze_and_predict_with_deepseek(df, location, **PUE_AI_OPTIONS)
     return JSONResponse(content={"ai_analysis": ai_analysis})
 
+@router.post("/pue_ai_analysis")
+async def submit_pue_ai_analysis(location: str = None, db: AsyncSession = Depends(get_db)):
+    """提交PUE AI分析任务，结果通过 /api/ai_jobs/{job_id} 轮询获取"""
+    df = await _load_pue_ai_frame(db, location)
+    if df is None:
+        return JSONResponse(content={"success": False, "ai_analysis": "暂无数据"})
+    prompt, prompt_stats = build_pue_ai_prompt(df, location)
+    job = await submit_ai_job(db, "pue", prompt, scope=location, options=PUE_AI_OPTIONS, prompt_stats=prompt_stats)
+    return JSONResponse(status_code=202, content={"success": True, "data": job_to_dict(job)})
+
+# ========== 本地PUE预测与异常评分（缓存结果，不依赖外部模型） ==========
+@router.get("/api/pue/outlook")
+async def get_pue_outlook_api(
+    horizon: int = Query(6, ge=1, le=MAX_HORIZON),
+    location: str = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """返回各地点未来N个月PUE预测、异常点和风险排名"""
+    outlook = await get_pue_outlook(db, horizon=horizon, location=location)
+    return JSONResponse(content={"success": True, "data": outlook})
+
 # PUE下钻数据API
+# 下钻数据可返回的全部字段
+DRILL_DOWN_FIELDS = [
+    "id", "location", "month", "year", "work_type", "work_category", "sequence_no",
+    "work_object", "check_item", "operation_method", "benchmark_value",
+    "execution_standard", "execution_status", "detailed_situation",
+    "quantification_standard", "last_month_standard", "quantification_unit", "executor",
+]
+# 弹窗列表、筛选和图表只需要的摘要字段，长文本字段在查看详情时再按ID获取
+DRILL_DOWN_SUMMARY_FIELDS = [
+    "id", "sequence_no", "work_type", "work_category", "work_object",
+    "check_item", "execution_status", "executor",
+]
+DRILL_DOWN_MAX_PAGE_SIZE = 1000
+
+
+def _resolve_drill_down_fields(fields: Optional[str]) -> List[str]:
+    """解析 fields 参数：all / summary / 逗号分隔的字段列表，id 始终返回"""
+    if not fields or fields == "all":
+        return DRILL_DOWN_FIELDS
+    if fields == "summary":
+        return DRILL_DOWN_SUMMARY_FIELDS
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in DRILL_DOWN_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不支持的字段: {', '.join(unknown)}")
+    return ["id"] + [f for f in requested if f != "id"]
+
+
+def _drill_down_location_filter(location: str, match: str):
+    """地点筛选条件；exact 与 prefix 均可命中 (location, year, month) 索引"""
+    location_column = PUEDrillDownData.location
+    if match == "exact":
+        return location_column == location
+    if match == "prefix":
+        # 用范围比较代替 LIKE 'x%'，SQLite 默认大小写不敏感的 LIKE 无法走索引
+        return and_(location_column >= location, location_column < location + "\U0010ffff")
+    return location_column.like(f"%{location}%")
+
+
 @router.get("/pue_drill_down_data")
-async def get_pue_drill_down_data(location: str = None, month: str = None, year: str = None, db: AsyncSession = Depends(get_db)):
-    """获取PUE下钻数据"""
-    from db.models import PUEDrillDownData
-    
-    query = select(PUEDrillDownData)
-    
-    # 添加筛选条件
+async def get_pue_drill_down_data(
+    location: str = None,
+    month: str = None,
+    year: str = None,
+    match: str = Query("contains", pattern="^(exact|prefix|contains)$"),
+    fields: str = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(200, ge=1, le=DRILL_DOWN_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """分页获取PUE下钻数据
+
+    - match: 地点匹配方式，默认 contains 为原来的模糊匹配；exact/prefix 走索引，已知完整地点或前缀时使用
+    - fields: all(默认) / summary / 逗号分隔的字段列表
+    """
+    columns = _resolve_drill_down_fields(fields)
+
+    conditions = []
     if location:
-        query = query.where(PUEDrillDownData.location.like(f"%{location}%"))
+        conditions.append(_drill_down_location_filter(location, match))
     if month:
-        query = query.where(PUEDrillDownData.month == month)
+        conditions.append(PUEDrillDownData.month == month)
     if year:
-        query = query.where(PUEDrillDownData.year == year)
-    
+        conditions.append(PUEDrillDownData.year == year)
+
+    total = (await db.execute(
+        select(func.count(PUEDrillDownData.id)).where(*conditions)
+    )).scalar() or 0
+
+    query = (
+        select(*[getattr(PUEDrillDownData, c) for c in columns])
+        .where(*conditions)
+        .order_by(PUEDrillDownData.sequence_no, PUEDrillDownData.id)
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    )
     result = await db.execute(query)
-    drill_down_data = result.scalars().all()
-    
-    # 转换为字典格式
-    data_list = []
-    for item in drill_down_data:
-        data_list.append({
-            "id": item.id,
-            "location": item.location,
-            "month": item.month,
-            "year": item.year,
-            "work_type": item.work_type,
-            "work_category": item.work_category,
-            "sequence_no": item.sequence_no,
-            "work_object": item.work_object,
-            "check_item": item.check_item,
-            "operation_method": item.operation_method,
-            "benchmark_value": item.benchmark_value,
-            "execution_standard": item.execution_standard,
-            "execution_status": item.execution_status,
-            "detailed_situation": item.detailed_situation,
-            "quantification_standard": item.quantification_standard,
-            "last_month_standard": item.last_month_standard,
-            "quantification_unit": item.quantification_unit,
-            "executor": item.executor
-        })
-
-    # 返回所有数据
+    data_list = [dict(row) for row in result.mappings().all()]
+
     return JSONResponse(content={
         "success": True,
         "data": data_list,
-        "total": len(data_list)
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "has_more": page * page_size < total,
+        "fields": columns
+    })
+
+
+@router.get("/pue_drill_down_data/{id}")
+async def get_pue_drill_down_item(id: int, db: AsyncSession = Depends(get_read_db)):
+    """获取单条下钻数据的全部字段，供弹窗详情使用"""
+    row = await db.get(PUEDrillDownData, id)
+    if not row:
+        raise HTTPException(status_code=404, detail="not found")
+    return JSONResponse(content={
+        "success": True,
+        "data": {c: getattr(row, c) for c in DRILL_DOWN_FIELDS}
     })
 
 # 导出下钻数据为 Excel
+DRILL_DOWN_EXPORT_FIELDS = [
+    ("地点", "location"),
+    ("年份", "year"),
+    ("月份", "month"),
+    ("序号", "sequence_no"),
+    ("作业形式", "work_type"),
+    ("作业分类", "work_category"),
+    ("作业对象", "work_object"),
+    ("检查项", "check_item"),
+    ("操作方法", "operation_method"),
+    ("执行标准", "execution_standard"),
+    ("执行情况", "execution_status"),
+    ("执行人", "executor"),
+]
+
+
 @router.get("/pue_drill_down_excel")
-async def export_pue_drill_down_excel(location: str, year: str, month: str, db: AsyncSession = Depends(get_db)):
-    """生成符合筛选条件的下钻数据 Excel 并返回下载"""
-    query = select(PUEDrillDownData).where(PUEDrillDownData.location == location, PUEDrillDownData.year == year, PUEDrillDownData.month == month)
-    result = await db.execute(query)
-    rows = result.scalars().all()
-    if not rows:
+async def export_pue_drill_down_excel(
+    location: List[str] = Query(None),
+    year: List[str] = Query(None),
+    month: List[str] = Query(None),
+    format: str = Query("xlsx", pattern="^(xlsx|csv|parquet)$"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """流式导出下钻数据
+
+    location / year / month 均可重复传参或逗号分隔，支持多地点、多月份及整年导出。
+    """
+    locations, years, months = split_multi(location), split_multi(year), split_multi(month)
+    conditions = []
+    if locations:
+        conditions.append(PUEDrillDownData.location.in_(locations))
+    if years:
+        conditions.append(PUEDrillDownData.year.in_(years))
+    if months:
+        conditions.append(PUEDrillDownData.month.in_(months))
+
+    total = (await db.execute(select(func.count(PUEDrillDownData.id)).where(*conditions))).scalar()
+    if not total:
         raise HTTPException(status_code=404, detail="no data")
-    import pandas as pd
-    from io import BytesIO
-    df = pd.DataFrame([{
-        "序号": r.sequence_no,
-        "作业形式": r.work_type,
-        "作业分类": r.work_category,
-        "作业对象": r.work_object,
-        "检查项": r.check_item,
-        "操作方法": r.operation_method,
-        "执行标准": r.execution_standard,
-        "执行情况": r.execution_status,
-        "执行人": r.executor,
-    } for r in rows])
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="drill_down")
-    buffer.seek(0)
-    from urllib.parse import quote
-    filename = f"drill_down_{location}_{year}{month}.xlsx"
-    headers = {
-        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"
-    }
-    return StreamingResponse(buffer, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers=headers)
+
+    query = (
+        select(*[getattr(PUEDrillDownData, key) for _, key in DRILL_DOWN_EXPORT_FIELDS])
+        .where(*conditions)
+        .order_by(PUEDrillDownData.location, PUEDrillDownData.year, PUEDrillDownData.month, PUEDrillDownData.sequence_no)
+    )
+    location_label = "-".join(locations) if len(locations) <= 3 else f"{len(locations)}个地点"
+    label = "_".join(filter(None, [location_label, "-".join(years), "-".join(months)])) or "all"
+    return streaming_export_response(
+        iter_query_rows(query),
+        [column(header, key) for header, key in DRILL_DOWN_EXPORT_FIELDS],
+        filename=f"drill_down_{label}",
+        fmt=format,
+        sheet_name="drill_down",
+    )
@@ -0,0 +1,275 @@
+"""
+PUE预测与异常评分引擎
+基于 地点×月份 矩阵一次性拟合所有地点的 趋势+季节 模型，
+输出未来N个月预测、残差z分数异常标记和风险排名。
+结果缓存在内存中，PUE数据变更后在后台重新计算。
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import PUEData
+from db.session import ReadSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 达标口径与PUE分析页一致
+PUE_TARGET = 1.5
+MAX_HORIZON = 12
+# |z| 超过该值视为异常
+ANOMALY_Z = 2.5
+# 风险评分统计的近期月数
+RECENT_MONTHS = 6
+# 某月份至少有几年数据才使用地点自身的季节指数，否则使用全体地点的季节指数
+MIN_SEASON_YEARS = 2
+# 少于该月数时不拟合趋势
+MIN_TREND_POINTS = 6
+# 趋势与季节交替估计的轮数
+BACKFIT_ITERATIONS = 3
+# 风险评分：预测均值从 RISK_LEVEL_FLOOR 到 RISK_LEVEL_CEIL 线性映射到 0~1
+RISK_LEVEL_FLOOR = 1.3
+RISK_LEVEL_CEIL = 2.0
+# 年度上升 RISK_TREND_CEIL 视为趋势满分
+RISK_TREND_CEIL = 0.2
+
+
+def _period_label(period: int) -> str:
+    return f"{period // 12}-{period % 12 + 1:02d}"
+
+
+def build_pue_matrix(records: Iterable[Sequence[Any]]) -> Tuple[List[str], int, np.ndarray]:
+    """将 (location, year, month, pue_value) 记录构造成 地点×月份 矩阵
+
+    同一地点同月多条取平均，缺失为 NaN。返回 (地点列表, 起始期, 矩阵)。
+    """
+    locations: Dict[str, int] = {}
+    loc_idx, periods, values = [], [], []
+    for location, year, month, value in records:
+        if location is None or value is None:
+            continue
+        try:
+            period = int(str(year).strip()) * 12 + int(str(month).strip()) - 1
+        except (TypeError, ValueError):
+            continue
+        loc_idx.append(locations.setdefault(location, len(locations)))
+        periods.append(period)
+        values.append(float(value))
+
+    if not values:
+        return [], 0, np.empty((0, 0))
+
+    loc_idx = np.asarray(loc_idx)
+    periods = np.asarray(periods)
+    start = int(periods.min())
+    cols = periods - start
+    shape = (len(locations), int(cols.max()) + 1)
+    sums = np.zeros(shape)
+    counts = np.zeros(shape)
+    np.add.at(sums, (loc_idx, cols), values)
+    np.add.at(counts, (loc_idx, cols), 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        matrix = np.where(counts > 0, sums / counts, np.nan)
+    return list(locations), start, matrix
+
+
+def _fit_trend(values: np.ndarray, valid: np.ndarray, t: np.ndarray, has_trend: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """按行加权最小二乘拟合 截距+斜率，数据不足的行斜率为0"""
+    n_obs = valid.sum(axis=1)
+    y = np.where(valid, values, 0.0)
+    t_bar = (valid * t).sum(axis=1) / n_obs
+    y_bar = y.sum(axis=1) / n_obs
+    dt = np.where(valid, t - t_bar[:, None], 0.0)
+    sxx = (dt ** 2).sum(axis=1)
+    sxy = (dt * np.where(valid, values - y_bar[:, None], 0.0)).sum(axis=1)
+    slope = np.divide(sxy, sxx, out=np.zeros_like(sxx), where=has_trend & (sxx > 0))
+    return y_bar - slope * t_bar, slope
+
+
+def _fit_season(values: np.ndarray, valid: np.ndarray, month_onehot: np.ndarray) -> np.ndarray:
+    """按自然月平均得到各行的季节指数（和为0），数据不足的月份回退到全体行的季节指数"""
+    season_sum = np.where(valid, values, 0.0) @ month_onehot
+    season_cnt = valid.astype(float) @ month_onehot
+    total_cnt = season_cnt.sum(axis=0)
+    global_season = np.divide(season_sum.sum(axis=0), total_cnt, out=np.zeros(12), where=total_cnt > 0)
+    own_season = np.divide(season_sum, season_cnt, out=np.zeros_like(season_sum), where=season_cnt > 0)
+    season = np.where(season_cnt >= MIN_SEASON_YEARS, own_season, global_season[None, :])
+    return season - season.mean(axis=1, keepdims=True)
+
+
+def fit_pue_outlook(locations: List[str], start: int, matrix: np.ndarray, horizon: int = MAX_HORIZON) -> Dict[str, Any]:
+    """对所有地点同时拟合 截距+线性趋势+月度季节指数，并计算预测、异常与风险"""
+    generated_at = datetime.now().isoformat(timespec="seconds")
+    if matrix.size == 0:
+        return {"generated_at": generated_at, "horizon": horizon, "last_period": None,
+                "forecast_months": [], "locations": [], "risk_ranking": [], "anomaly_count": 0}
+
+    n_loc, n_t = matrix.shape
+    t = np.arange(n_t, dtype=float)
+    month_of_col = (start + np.arange(n_t)) % 12
+    valid = ~np.isnan(matrix)
+    n_obs = valid.sum(axis=1)
+
+    # 1. 交替估计 趋势 与 季节指数（backfitting），避免不完整年份中的趋势被误当作季节性
+    month_onehot = np.eye(12)[month_of_col]
+    has_trend = n_obs >= MIN_TREND_POINTS
+    season = np.zeros((n_loc, 12))
+    for _ in range(BACKFIT_ITERATIONS):
+        intercept, slope = _fit_trend(matrix - season[:, month_of_col], valid, t, has_trend)
+        season = _fit_season(matrix - (intercept[:, None] + slope[:, None] * t), valid, month_onehot)
+
+    # 2. 残差与z分数，样本不足的地点使用合并标准差
+    fitted = intercept[:, None] + slope[:, None] * t + season[:, month_of_col]
+    residual = np.where(valid, matrix - fitted, 0.0)
+    dof = n_obs - np.where(has_trend, 2, 1) - np.minimum(n_obs // 12, 11)
+    ss = (residual ** 2).sum(axis=1)
+    pooled_sigma = max(float(np.sqrt(ss.sum() / max(dof.clip(min=0).sum(), 1))), 1e-3)
+    sigma = np.where(dof >= 3, np.sqrt(ss / np.maximum(dof, 1)), pooled_sigma)
+    sigma = np.maximum(sigma, 1e-3)
+    z = np.where(valid, residual / sigma[:, None], np.nan)
+    anomalies = valid & (np.abs(np.nan_to_num(z)) >= ANOMALY_Z)
+
+    # 3. 预测未来 horizon 个月
+    future_t = n_t - 1 + np.arange(1, horizon + 1, dtype=float)
+    future_month = (start + n_t - 1 + np.arange(1, horizon + 1)) % 12
+    forecast = intercept[:, None] + slope[:, None] * future_t + season[:, future_month]
+    band = 1.96 * sigma[:, None]
+
+    # 4. 风险评分：预测水平、上升趋势、近期向上异常、预测超标月份占比
+    recent = slice(max(n_t - RECENT_MONTHS, 0), n_t)
+    recent_up = (anomalies[:, recent] & (np.nan_to_num(z[:, recent]) > 0)).sum(axis=1)
+    level_score = np.clip((forecast.mean(axis=1) - RISK_LEVEL_FLOOR) / (RISK_LEVEL_CEIL - RISK_LEVEL_FLOOR), 0, 1)
+    trend_score = np.clip(slope * 12 / RISK_TREND_CEIL, 0, 1)
+    anomaly_score = np.clip(recent_up / 2, 0, 1)
+    breach_score = (forecast > PUE_TARGET).mean(axis=1)
+    risk = 100 * (0.4 * level_score + 0.2 * trend_score + 0.2 * anomaly_score + 0.2 * breach_score)
+
+    last_col = np.where(valid, np.arange(n_t), -1).max(axis=1)
+    results = []
+    for i, location in enumerate(locations):
+        anomaly_cols = np.flatnonzero(anomalies[i])
+        risk_score = round(float(risk[i]), 1)
+        results.append({
+            "location": location,
+            "last_period": _period_label(start + int(last_col[i])),
+            "last_value": round(float(matrix[i, last_col[i]]), 3),
+            "slope_per_year": round(float(slope[i] * 12), 4),
+            "sigma": round(float(sigma[i]), 4),
+            "latest_z": round(float(z[i, last_col[i]]), 2),
+            "forecast": np.round(forecast[i], 3).tolist(),
+            "lower": np.round(forecast[i] - band[i], 3).tolist(),
+            "upper": np.round(forecast[i] + band[i], 3).tolist(),
+            "anomalies": [
+                {
+                    "period": _period_label(start + int(c)),
+                    "value": round(float(matrix[i, c]), 3),
+                    "expected": round(float(fitted[i, c]), 3),
+                    "z": round(float(z[i, c]), 2),
+                }
+                for c in anomaly_cols
+            ],
+            "risk_score": risk_score,
+            "risk_level": "high" if risk_score >= 60 else "medium" if risk_score >= 30 else "low",
+        })
+    results.sort(key=lambda r: (-r["risk_score"], r["location"]))
+
+    return {
+        "generated_at": generated_at,
+        "horizon": horizon,
+        "last_period": _period_label(start + n_t - 1),
+        "forecast_months": [_period_label(start + n_t - 1 + h) for h in range(1, horizon + 1)],
+        "locations": results,
+        "risk_ranking": [{k: r[k] for k in ("location", "risk_score", "risk_level")} for r in results],
+        "anomaly_count": int(anomalies.sum()),
+    }
+
+
+def compute_pue_outlook(records: Iterable[Sequence[Any]], horizon: int = MAX_HORIZON) -> Dict[str, Any]:
+    """从原始PUE记录计算完整结果"""
+    locations, start, matrix = build_pue_matrix(records)
+    return fit_pue_outlook(locations, start, matrix, horizon)
+
+
+def slice_outlook(outlook: Dict[str, Any], horizon: int, location: Optional[str] = None) -> Dict[str, Any]:
+    """按预测月数和地点裁剪缓存结果"""
+    horizon = max(1, min(horizon, outlook["horizon"]))
+    items = outlook["locations"]
+    if location:
+        items = [r for r in items if r["location"] == location]
+    return {
+        **outlook,
+        "horizon": horizon,
+        "forecast_months": outlook["forecast_months"][:horizon],
+        "locations": [
+            {**r, "forecast": r["forecast"][:horizon], "lower": r["lower"][:horizon], "upper": r["upper"][:horizon]}
+            for r in items
+        ],
+    }
+
+
+# ------------------ 结果缓存与后台刷新 ------------------
+_outlook_cache: Dict[str, Any] = {"version": 0, "computed_version": -1, "result": None}
+_refresh_lock = asyncio.Lock()
+_background_tasks: set = set()
+
+
+async def refresh_pue_outlook(db: Optional[AsyncSession] = None) -> Dict[str, Any]:
+    """重新计算并缓存结果；未传入会话时使用独立的只读会话（后台任务）
+
+    计算前记下数据版本，读取期间有写入使版本变化时只返回本次结果、不写入缓存，由写入触发的后台刷新重新计算。
+    """
+    async with _refresh_lock:
+        version = _outlook_cache["version"]
+        if _outlook_cache["result"] is not None and _outlook_cache["computed_version"] == version:
+            return _outlook_cache["result"]
+        query = select(PUEData.location, PUEData.year, PUEData.month, PUEData.pue_value)
+        if db is None:
+            async with ReadSessionLocal() as session:
+                rows = (await session.execute(query)).all()
+        else:
+            rows = (await db.execute(query)).all()
+        result = await asyncio.to_thread(compute_pue_outlook, rows)
+        if _outlook_cache["version"] != version:
+            logger.info("PUE数据在预测计算期间有更新，本次结果不缓存")
+            return result
+        _outlook_cache.update(result=result, computed_version=version)
+        logger.info(f"PUE预测结果已刷新: {len(result['locations'])} 个地点, {result['anomaly_count']} 个异常点")
+        return result
+
+
+def schedule_pue_outlook_refresh() -> None:
+    """在后台刷新，不阻塞当前请求"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(refresh_pue_outlook())
+    _background_tasks.add(task)
+    task.add_done_callback(_on_refresh_done)
+
+
+def _on_refresh_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error(f"PUE预测后台刷新失败: {task.exception()}")
+
+
+def mark_pue_data_changed() -> None:
+    """PUE数据增删改后调用：标记缓存过期并触发后台刷新"""
+    _outlook_cache["version"] += 1
+    schedule_pue_outlook_refresh()
+
+
+async def get_pue_outlook(db: AsyncSession, horizon: int = 6, location: Optional[str] = None) -> Dict[str, Any]:
+    """读取缓存结果；缓存为空时同步计算，缓存过期时先返回旧结果并在后台刷新"""
+    result = _outlook_cache["result"]
+    if result is None:
+        result = await refresh_pue_outlook(db)
+    elif _outlook_cache["computed_version"] != _outlook_cache["version"] and not _refresh_lock.locked():
+        schedule_pue_outlook_refresh()
+    return slice_outlook(result, horizon, location)
@@ -0,0 +1,27 @@
+// AI分析任务 - 提交后轮询 /api/ai_jobs/{job_id}，完成时返回分析文本
+function runAIAnalysisJob(submitUrl, options) {
+    const interval = (options && options.interval) || 2000;
+    const timeout = (options && options.timeout) || 10 * 60 * 1000;
+    const deadline = Date.now() + timeout;
+
+    function poll(jobId) {
+        return fetch(`/api/ai_jobs/${jobId}`)
+            .then(resp => resp.json())
+            .then(data => {
+                const job = data.data || {};
+                if (job.status === 'done') return job.result || '';
+                if (job.status === 'failed') throw new Error(job.error || 'AI分析生成失败，请稍后重试。');
+                if (Date.now() > deadline) throw new Error('AI分析耗时较长，请稍后重新查看。');
+                return new Promise(resolve => setTimeout(resolve, interval)).then(() => poll(jobId));
+            });
+    }
+
+    return fetch(submitUrl, { method: 'POST' })
+        .then(resp => resp.json())
+        .then(data => {
+            if (!data.success) return data.ai_analysis || 'AI分析生成失败，请稍后重试。';
+            const job = data.data;
+            if (job.status === 'done') return job.result || '';
+            return poll(job.job_id);
+        });
+}
@@ -0,0 +1,39 @@
+// 服务端事件订阅：EventSource 断线后由浏览器自动重连
+// handlers: { 主题: function(data) }；同一主题短时间内的多次事件合并为一次回调
+function subscribeEvents(topics, handlers, options) {
+    options = options || {};
+    if (!window.EventSource) {
+        return null;
+    }
+    const debounceMs = options.debounceMs === undefined ? 500 : options.debounceMs;
+    const url = (options.baseUrl || '') + '/api/events?topics=' + encodeURIComponent(topics.join(','));
+    const source = new EventSource(url);
+    const timers = {};
+
+    topics.forEach(topic => {
+        source.addEventListener(topic, event => {
+            let data = {};
+            try {
+                data = JSON.parse(event.data);
+            } catch (e) {
+                console.error('事件数据解析失败:', e);
+                return;
+            }
+            const run = () => {
+                try {
+                    handlers[topic](data);
+                } catch (e) {
+                    console.error(`处理${topic}事件失败:`, e);
+                }
+            };
+            if (!debounceMs) {
+                run();
+                return;
+            }
+            clearTimeout(timers[topic]);
+            timers[topic] = setTimeout(run, debounceMs);
+        });
+    });
+    window.addEventListener('beforeunload', () => source.close());
+    return source;
+}
@@ -4,7 +4,8 @@ if (hostname == '') hostname = '127.0.0.1';
 var port = '8000';
 var baseUrl = `http://${hostname}:${port}`;
 
-axios.get(baseUrl + '/api/bi_data').then(res => {
+// 地址栏中的 year/month_from/month_to 参数原样传给接口，不带时为当前年份
+axios.get(baseUrl + '/api/bi_data' + window.location.search).then(res => {
     const {
         centerTopTopData,
         centerTopBottomData,
@@ -499,3 +500,6 @@ function bottomContainer(data) {
     const vchart = new VChart.default(spec, { dom: ele });
     vchart.renderSync();
 }
+
+// 大屏数据在管理端修改后由服务端推送通知，重新加载页面取最新快照，不再定时轮询
+subscribeEvents(['bi'], { bi: () => window.location.reload() }, { baseUrl: baseUrl, debounceMs: 2000 });
@@ -15,7 +15,7 @@ const params = {
 
 // 新增：KPI相关图表的数据接口
 function fetchKPIData(apiField, callback) {
-    axios.get(baseUrl + "/api/bi_data").then((res) => {
+    axios.get(baseUrl + "/api/bi_data" + window.location.search).then((res) => {
         const data = res.data;
         // 容错处理：如果数据不存在，返回空数组
         callback(Array.isArray(data[apiField]) ? data[apiField] : []);
@@ -821,3 +821,6 @@ function rightBottom(data) {
 
 VChart.ThemeManager.registerTheme('theme', theme);
 VChart.ThemeManager.setCurrentTheme('theme');
+
+// 大屏数据在管理端修改后由服务端推送通知，重新加载页面取最新快照，不再定时轮询
+subscribeEvents(['bi'], { bi: () => window.location.reload() }, { baseUrl: baseUrl, debounceMs: 2000 });
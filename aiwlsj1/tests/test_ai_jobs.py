@@ -0,0 +1,167 @@
+"""
+AI分析后台任务测试
+测试入队去重、结果持久化、失败状态和轮询接口
+"""
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+from fastapi.testclient import TestClient
+
+import ai_jobs
+from ai_jobs import JOB_DONE, JOB_FAILED, submit_ai_job, wait_ai_jobs_idle
+from db.models import AIAnalysisJob, FaultRecord, PUEData
+from utils.llm_client import LLMError, StubBackend, set_llm_backend
+from tests.conftest import TestSessionLocal
+
+
+class FailingBackend(StubBackend):
+    """总是调用失败的桩后端"""
+
+    async def chat(self, messages, **kwargs):
+        raise LLMError("AI分析服务连接失败")
+
+
+@pytest.fixture
+async def workers(monkeypatch):
+    """在当前事件循环中启动读写测试库的后台任务协程"""
+    monkeypatch.setattr(ai_jobs, "session_factory", TestSessionLocal)
+    ai_jobs.start_ai_job_workers(resume=False)
+    yield
+    await ai_jobs.stop_ai_job_workers()
+
+
+class TestAIJobs:
+    """后台任务测试"""
+
+    @pytest.mark.asyncio
+    async def test_dedupe_and_persist_result(self, db_session, workers):
+        """测试相同输入只入队一次，完成后结果被复用"""
+        first = await submit_ai_job(db_session, "pue", "去重测试数据", scope="A", options={"max_rounds": 1})
+        second = await submit_ai_job(db_session, "pue", "去重测试数据", scope="A", options={"max_rounds": 1})
+        assert first.id == second.id
+
+        await wait_ai_jobs_idle()
+        job = await db_session.get(AIAnalysisJob, first.id)
+        await db_session.refresh(job)
+        assert job.status == JOB_DONE
+        assert job.result.startswith("【离线分析】")
+        assert len(job.input_hash) == 64
+
+        again = await submit_ai_job(db_session, "pue", "去重测试数据", scope="A", options={"max_rounds": 1})
+        assert again.id == first.id
+
+        other = await submit_ai_job(db_session, "huiju", "去重测试数据", options={"max_rounds": 1})
+        assert other.id != first.id
+        await wait_ai_jobs_idle()
+
+    @pytest.mark.asyncio
+    async def test_one_active_job_per_input(self, db_session):
+        """测试唯一索引只允许一个进行中的相同任务，已完成的任务不受限制"""
+        db_session.add_all([
+            AIAnalysisJob(kind="pue", input_hash="h" * 64, status=JOB_DONE),
+            AIAnalysisJob(kind="pue", input_hash="h" * 64, status=JOB_FAILED),
+            AIAnalysisJob(kind="pue", input_hash="h" * 64, status="pending"),
+        ])
+        await db_session.flush()
+        db_session.add(AIAnalysisJob(kind="pue", input_hash="h" * 64, status="running"))
+        with pytest.raises(IntegrityError):
+            await db_session.flush()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_insert_reuses_active_job(self, db_session, workers, monkeypatch):
+        """测试查重之后被并发请求抢先入库时，返回已入库的任务而不是报错"""
+        async def skip_job(job_id):
+            pass
+        monkeypatch.setattr(ai_jobs, "_run_job", skip_job)
+        first = await submit_ai_job(db_session, "pue", "并发提交测试数据", options={"max_rounds": 1})
+
+        # 模拟两个请求同时查重：本次查重看不到已入库的任务
+        original_execute = db_session.execute
+        statements = []
+
+        async def miss_first_lookup(statement, *args, **kwargs):
+            statements.append(statement)
+            if len(statements) == 1:
+                statement = statement.where(AIAnalysisJob.id < 0)
+            return await original_execute(statement, *args, **kwargs)
+
+        monkeypatch.setattr(db_session, "execute", miss_first_lookup)
+        second = await submit_ai_job(db_session, "pue", "并发提交测试数据", options={"max_rounds": 1})
+        assert second.id == first.id
+        assert len(statements) == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_job_can_be_resubmitted(self, db_session, workers):
+        """测试调用失败记录错误，重新提交会新建任务"""
+        set_llm_backend(FailingBackend())
+        job = await submit_ai_job(db_session, "fault", "失败测试数据")
+        await wait_ai_jobs_idle()
+        await db_session.refresh(job)
+        assert job.status == JOB_FAILED
+        assert "连接失败" in job.error
+
+        set_llm_backend(StubBackend())
+        retry = await submit_ai_job(db_session, "fault", "失败测试数据")
+        assert retry.id != job.id
+        await wait_ai_jobs_idle()
+
+
+class TestAIJobEndpoints:
+    """提交与轮询接口测试"""
+
+    @pytest.mark.asyncio
+    async def test_submit_and_poll(self, client: TestClient, db_session, monkeypatch):
+        """测试POST入队去重，GET返回任务状态和结果"""
+        # 测试客户端运行在独立事件循环中，这里不让后台协程执行任务，状态由测试直接写入
+        async def skip_job(job_id):
+            pass
+        monkeypatch.setattr(ai_jobs, "_run_job", skip_job)
+
+        record = PUEData(location="任务机房", year="2025", month="1", pue_value=1.5)
+        db_session.add(record)
+        await db_session.commit()
+
+        response = client.post("/pue_ai_analysis", params={"location": "任务机房"})
+        assert response.status_code == 202
+        job_id = response.json()["data"]["job_id"]
+        assert response.json()["data"]["status"] == "pending"
+        assert client.post("/pue_ai_analysis", params={"location": "任务机房"}).json()["data"]["job_id"] == job_id
+
+        job = await db_session.get(AIAnalysisJob, job_id)
+        job.status, job.result = JOB_DONE, "分析结果"
+        await db_session.commit()
+        data = client.get(f"/api/ai_jobs/{job_id}").json()["data"]
+        assert data["status"] == JOB_DONE
+        assert data["result"] == "分析结果"
+
+        assert client.get("/api/ai_jobs/999999").status_code == 404
+        await db_session.delete(record)
+        await db_session.commit()
+
+    @pytest.mark.asyncio
+    async def test_fault_routes_on_mounted_router(self, client: TestClient, db_session, monkeypatch):
+        """测试故障分析页面使用的AI接口挂在 main.app 上，可提交任务和同步分析"""
+        async def skip_job(job_id):
+            pass
+        monkeypatch.setattr(ai_jobs, "_run_job", skip_job)
+
+        record = FaultRecord(sequence_no=1, fault_name="任务故障", province_fault_type="AI测试类型")
+        db_session.add(record)
+        await db_session.flush()
+
+        # 入队会提交会话，结束时删除写入的记录
+        try:
+            response = client.post("/fault/ai_analysis/jobs", params={"fault_type": "AI测试类型"})
+            assert response.status_code == 202
+            assert response.json()["record_count"] == 1
+            assert response.json()["data"]["kind"] == "fault"
+
+            assert client.post("/fault/ai_analysis/jobs", params={"start_date": "2025/01/01"}).status_code == 400
+
+            data = client.get("/fault/ai_analysis", params={"fault_type": "AI测试类型"}).json()
+            assert data["success"] is True
+            assert data["record_count"] == 1
+            assert data["ai_analysis"]
+        finally:
+            await db_session.delete(record)
+            await db_session.commit()
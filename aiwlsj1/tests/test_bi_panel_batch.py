@@ -0,0 +1,118 @@
+"""
+面板数据批量写入测试
+测试按模型校验、按 年份+月份/类型 的新增更新、表格上传和大屏版本只变化一次
+"""
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+import bi_snapshot
+from bi_panel_batch import parse_panel_frame
+from db.models import LeftTop, TopKPI
+
+
+class TestPanelBatch:
+    """面板批量写入测试"""
+
+    @pytest.fixture
+    async def clean_tables(self, db_session):
+        yield
+        await db_session.execute(delete(LeftTop))
+        await db_session.execute(delete(TopKPI))
+        await db_session.commit()
+
+    def test_parse_and_validate(self):
+        """测试中文列名、默认年份和各项校验"""
+        df, errors = parse_panel_frame("left_top", pd.DataFrame([
+            {"月份": "1月", "基准值": "95", "挑战值": "98", "指标": "96.5"},
+            {"月份": "2025-02", "基准值": "95", "挑战值": "", "备注": "忽略"},
+        ]), default_year=2025)
+        assert errors == []
+        assert df["year"].tolist() == [2025, 2025]
+        assert df["_key"].tolist() == [1, 2]
+        assert pd.isna(df["challenge"].iloc[1])
+
+        _, errors = parse_panel_frame("left_top", pd.DataFrame([
+            {"month": "13月", "baseline": "x", "year": "2025"},
+            {"month": "3", "baseline": "1", "year": "2025.5"},
+            {"month": "3月", "baseline": "1", "year": "2025"},
+            {"month": "", "baseline": "1", "year": ""},
+        ]), first_line=1)
+        assert "第1行：月份无法识别" in errors
+        assert "第1行：基准值不是有效数字" in errors
+        assert "第2行：年份必须为整数" in errors
+        assert "第4行：年份不能为空" in errors
+        assert "第4行：月份不能为空" in errors
+
+        _, errors = parse_panel_frame("left_top", pd.DataFrame([{"month": "1月"}]))
+        assert errors == ["缺少必要的列: year(年份)"]
+
+    def test_json_batch_upsert(self, client: TestClient, clean_tables, monkeypatch):
+        """测试整年数据一次写入、再次写入时按月份更新，大屏版本每次请求只变化一次"""
+        published = []
+        monkeypatch.setattr(bi_snapshot, "publish_event", lambda topic, data=None: published.append(data))
+        rows = [{"month": f"{m}月", "baseline": 90, "challenge": 95, "indicator": 90 + m * 0.1} for m in range(1, 13)]
+
+        response = client.post("/api/panels/left_top/batch", json={"year": 2026, "rows": rows})
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["inserted"], data["updated"], data["unchanged"]) == (12, 0, 0)
+        assert len(published) == 1
+
+        # 月份写法不同也匹配到同一行；只提供的列参与比较和更新
+        response = client.post("/api/panels/left_top/batch", json={"year": 2026, "rows": [
+            {"month": "2026-01", "indicator": 99},
+            {"month": "2月", "indicator": 90.2},
+            {"month": "13月", "indicator": 1},
+        ]})
+        assert response.status_code == 400
+        assert response.json()["errors"] == ["第3行：月份无法识别"]
+
+        response = client.post("/api/panels/left_top/batch", json={"year": 2026, "rows": [
+            {"month": "2026-01", "indicator": 99},
+            {"month": "2月", "indicator": 90.2},
+        ]})
+        data = response.json()
+        assert (data["inserted"], data["updated"], data["unchanged"]) == (0, 1, 1)
+        assert data["changes"][0]["before"] == {"indicator": 90.1}
+        assert len(published) == 2
+
+        # 预览不写库，也不使快照失效
+        response = client.post("/api/panels/left_top/batch", json={"year": 2026, "dry_run": True, "rows": [
+            {"month": "3月", "indicator": 1},
+        ]})
+        assert response.json()["updated"] == 1
+        assert len(published) == 2
+
+    @pytest.mark.asyncio
+    async def test_upload_spreadsheet(self, client: TestClient, db_session, clean_tables):
+        """测试上传CSV按 年份+类型 写入，其他年份的同名类型不受影响"""
+        db_session.add(TopKPI(type="宽带", status="未达标", year=2025))
+        await db_session.commit()
+
+        csv = pd.DataFrame([
+            {"类型": "宽带", "是否达标": "达标"},
+            {"类型": "专线", "是否达标": "达标"},
+        ]).to_csv(index=False).encode("utf-8")
+        response = client.post(
+            "/api/panels/top_kpi/batch",
+            files={"file": ("top.csv", csv, "text/csv")},
+            data={"year": "2026"},
+        )
+        assert response.status_code == 200
+        assert response.json()["inserted"] == 2
+
+        result = await db_session.execute(select(TopKPI.type, TopKPI.status, TopKPI.year).order_by(TopKPI.id))
+        assert result.all() == [("宽带", "未达标", 2025), ("宽带", "达标", 2026), ("专线", "达标", 2026)]
+
+    def test_unknown_table_and_bad_body(self, client: TestClient):
+        """测试未知面板表和格式错误的请求体"""
+        assert client.post("/api/panels/zbk/batch", json={"rows": []}).status_code == 404
+        assert client.post("/api/panels/left_top/batch", json={"rows": "x"}).status_code == 400
+        assert client.post("/api/panels/left_top/batch", json={"year": "abc", "rows": []}).status_code == 400
+        response = client.get("/api/panels/left_top/template")
+        assert response.status_code == 200
+        assert pd.read_excel(pd.io.common.BytesIO(response.content)).columns.tolist() == ["月份", "基准值", "挑战值", "指标", "年份"]
@@ -0,0 +1,106 @@
+"""
+大屏数据快照测试
+测试快照复用、ETag协商缓存以及数据管理增删改后失效
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+import bi_snapshot
+from db.models import CenterTopTop, LeftTop
+
+
+class TestBISnapshot:
+    """大屏快照测试"""
+
+    @pytest.fixture
+    async def snapshot(self, db_session, monkeypatch):
+        """清空快照并统计读库次数"""
+        loads = []
+        original = bi_snapshot.load_bi_panels
+
+        async def counting_load(*args):
+            loads.append(1)
+            return await original(*args)
+
+        monkeypatch.setattr(bi_snapshot, "load_bi_panels", counting_load)
+        bi_snapshot.clear_bi_snapshot()
+        yield loads
+        bi_snapshot.clear_bi_snapshot()
+        await db_session.execute(delete(CenterTopTop))
+        await db_session.execute(delete(LeftTop))
+        await db_session.commit()
+
+    def test_served_from_snapshot(self, client: TestClient, snapshot):
+        """测试多次请求只读库一次，ETag命中返回304"""
+        first = client.get("/api/bi_data")
+        assert first.status_code == 200
+        assert list(first.json())[:2] == ["centerTopTopData", "centerTopBottomData"]
+        etag = first.headers["etag"]
+
+        for _ in range(5):
+            assert client.get("/api/bi_data").headers["etag"] == etag
+        assert client.get("/api/bi_data", headers={"If-None-Match": etag}).status_code == 304
+        assert len(snapshot) == 1
+
+    def test_invalidated_by_data_manage(self, client: TestClient, snapshot):
+        """测试数据管理新增/删除后快照重建"""
+        etag = client.get("/api/bi_data", params={"year": 2025}).headers["etag"]
+
+        client.post("/center_top_top/add", data={"type": "宽带", "status": "达标", "year": 2025}, follow_redirects=False)
+        response = client.get("/api/bi_data", params={"year": 2025})
+        assert response.json()["centerTopTopData"] == [["宽带", "达标"]]
+        assert response.headers["etag"] != etag
+        assert len(snapshot) == 2
+
+        client.get("/api/bi_data", params={"year": 2025})
+        assert len(snapshot) == 2
+
+    @pytest.mark.asyncio
+    async def test_year_and_month_scope(self, client: TestClient, db_session, snapshot, monkeypatch):
+        """测试按年份、月份范围返回数据，默认年份无数据时回退到最近有数据的年份"""
+        db_session.add_all([
+            LeftTop(month=f"{m}月", baseline=0.9, challenge=0.95, indicator=0.9 + m / 100, year=2024) for m in range(1, 13)
+        ] + [
+            LeftTop(month="1月", baseline=0.9, challenge=0.95, indicator=0.5, year=2025),
+            CenterTopTop(type="历史", status="达标", year=None),
+        ])
+        await db_session.commit()
+
+        data = client.get("/api/bi_data", params={"year": 2024}).json()
+        assert data["year"] == 2024
+        assert len(data["leftTopData"]) == 12
+        assert data["centerTopTopData"] == [["历史", "达标"]]
+
+        data = client.get("/api/bi_data", params={"year": 2024, "month_from": 3, "month_to": 5}).json()
+        assert [row[0] for row in data["leftTopData"]] == ["3月", "4月", "5月"]
+
+        monkeypatch.setattr(bi_snapshot.settings, "BI_DEFAULT_YEAR", 2030)
+        data = client.get("/api/bi_data").json()
+        assert data["year"] == 2025
+        assert data["leftTopData"] == [["1月", 0.9, 0.95, 0.5]]
+
+        assert client.get("/api/bi_data", params={"month_from": 5, "month_to": 3}).status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_not_cached_when_changed_during_build(self, db_session, snapshot, monkeypatch):
+        """测试重建期间有写入使版本变化时，本次快照不缓存，下次请求重新读取"""
+        original = bi_snapshot.load_bi_panels
+
+        async def load_then_write(*args):
+            data = await original(*args)
+            bi_snapshot.mark_bi_data_changed()
+            return data
+
+        monkeypatch.setattr(bi_snapshot, "load_bi_panels", load_then_write)
+        await bi_snapshot.get_bi_snapshot(db_session, 2025)
+        assert bi_snapshot._snapshots == {}
+
+        monkeypatch.setattr(bi_snapshot, "load_bi_panels", original)
+        first = await bi_snapshot.get_bi_snapshot(db_session, 2025)
+        assert await bi_snapshot.get_bi_snapshot(db_session, 2025) is first
+
+    def test_parse_panel_month(self):
+        """测试面板月份解析"""
+        assert [bi_snapshot.parse_panel_month(v) for v in ("1月", "2025-03", "12", "13", None)] == [1, 3, 12, None, None]
@@ -0,0 +1,136 @@
+"""
+批量导入命令行工具测试
+测试多进程解析、按文件名确定下钻范围、按校验和续传、整体校验失败和故障去重
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+import bulk_import
+from bulk_import import BULK_KINDS, expand_paths, file_scope, run_bulk_import, sync_database_url
+from db.models import FaultRecord, ImportedFile, PUEData, PUEDrillDownData
+from utils.exceptions import FileUploadException
+
+DRILL_DOWN_CSV = "作业形式,序号,作业对象,检查项\n" + "".join(f"巡检,{i},空调{i},温度\n" for i in range(1, 6))
+
+
+@pytest.fixture
+def database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'bulk.db'}"
+    yield url
+    create_engine(url).dispose()
+
+
+def count(url, model, *conditions):
+    with Session(create_engine(url)) as session:
+        return session.scalar(select(func.count()).select_from(model).where(*conditions))
+
+
+class TestBulkImportHelpers:
+    """辅助函数测试"""
+
+    def test_file_scope(self):
+        """测试从文件名解析地点和年月，命令行参数优先"""
+        kind = BULK_KINDS["drill_down"]
+        assert file_scope(kind, "d/深圳宝安区宝城_2025-01.xlsx", {}) == {
+            "location": "深圳宝安区宝城", "year": "2025", "month": "1"}
+        assert file_scope(kind, "d/_宝城.xlsx", {"year": "2024", "month": "12"}) == {
+            "location": "宝城", "year": "2024", "month": "12"}
+        with pytest.raises(FileUploadException) as exc:
+            file_scope(kind, "d/_宝城.xlsx", {})
+        assert "--year" in exc.value.message
+        assert file_scope(BULK_KINDS["fault"], "a.xlsx", {}) == {}
+
+    def test_expand_paths_and_url(self, tmp_path):
+        """测试目录和通配符展开，跳过锁文件和其他格式"""
+        for name in ("a.csv", "b.xlsx", "~$b.xlsx", "c.txt"):
+            (tmp_path / name).write_text("x")
+        assert [p.split("/")[-1] for p in expand_paths([str(tmp_path)])] == ["a.csv", "b.xlsx"]
+        assert [p.split("/")[-1] for p in expand_paths([str(tmp_path / "*.csv")])] == ["a.csv"]
+        assert sync_database_url("sqlite+aiosqlite:///db.sqlite3") == "sqlite:///db.sqlite3"
+
+
+class TestRunBulkImport:
+    """导入流程测试"""
+
+    def test_parallel_drill_down_and_resume(self, tmp_path, database):
+        """测试多文件并行导入，重新运行跳过已导入文件，修改后的文件替换同一范围的数据"""
+        for site in ("宝城", "福永", "沙井"):
+            (tmp_path / f"{site}_2025-03.csv").write_text(DRILL_DOWN_CSV, encoding="utf-8")
+
+        summary = run_bulk_import("drill_down", [str(tmp_path)], database_url=database, workers=2, log=lambda m: None)
+        assert (summary["imported"], summary["inserted"], summary["failed"]) == (3, 15, 0)
+        assert count(database, PUEDrillDownData, PUEDrillDownData.location == "福永", PUEDrillDownData.month == "3") == 5
+
+        summary = run_bulk_import("drill_down", [str(tmp_path)], database_url=database, workers=2, log=lambda m: None)
+        assert (summary["imported"], summary["skipped"]) == (0, 3)
+
+        (tmp_path / "福永_2025-03.csv").write_text(DRILL_DOWN_CSV + "巡检,6,水泵,压力\n", encoding="utf-8")
+        summary = run_bulk_import("drill_down", [str(tmp_path)], database_url=database, workers=1, log=lambda m: None)
+        assert (summary["imported"], summary["skipped"]) == (1, 2)
+        assert count(database, PUEDrillDownData) == 16
+        assert count(database, ImportedFile) == 4
+
+    def test_strict_failure_is_retried(self, tmp_path, database):
+        """测试整体校验失败的文件不写入也不记录，修正后重新运行会导入"""
+        path = tmp_path / "pue.csv"
+        path.write_text("地点,月份,PUE值,年份\n宝城,1,1.5,2025\n宝城,2,高,2025\n", encoding="utf-8")
+        logs = []
+        summary = run_bulk_import("pue", [str(path)], database_url=database, log=logs.append)
+        assert summary["failed"] == 1
+        assert "第3行" in summary["files"][0]["error"]
+        assert count(database, PUEData) == 0
+
+        path.write_text("地点,月份,PUE值,年份\n宝城,1,1.5,2025\n宝城,2,1.4,2025\n", encoding="utf-8")
+        summary = run_bulk_import("pue", [str(path)], database_url=database, log=logs.append)
+        assert (summary["imported"], summary["inserted"]) == (1, 2)
+
+    def test_fault_dedup_across_files(self, tmp_path, database):
+        """测试内容不同的文件中重复的故障记录只写入一次"""
+        header = "序号,故障名称,发生时间\n"
+        (tmp_path / "3月.csv").write_text(header + "1,光缆中断,2025-03-01 08:00:00\n", encoding="utf-8")
+        (tmp_path / "3月补报.csv").write_text(
+            header + "1,光缆中断,2025-03-01 08:00:00\n2,停电,2025-03-02 09:00:00\n", encoding="utf-8")
+        summary = run_bulk_import("fault", [str(tmp_path)], database_url=database, workers=1, log=lambda m: None)
+        assert summary["inserted"] == 2
+        assert [f["duplicate_count"] for f in summary["files"]] == [0, 1]
+        assert count(database, FaultRecord) == 2
+
+    def test_in_flight_files_bounded(self, tmp_path, database, monkeypatch):
+        """测试已提交解析但尚未写入的文件数不超过进程数"""
+        state = {"outstanding": 0, "peak": 0}
+
+        class CountingPool(ThreadPoolExecutor):
+            def submit(self, *args, **kwargs):
+                state["outstanding"] += 1
+                state["peak"] = max(state["peak"], state["outstanding"])
+                return super().submit(*args, **kwargs)
+
+        write = bulk_import.BulkWriter.write
+
+        def counting_write(self, *args, **kwargs):
+            state["outstanding"] -= 1
+            return write(self, *args, **kwargs)
+
+        # 线程池代替进程池，便于在主进程中计数
+        monkeypatch.setattr(bulk_import, "ProcessPoolExecutor", CountingPool)
+        monkeypatch.setattr(bulk_import.BulkWriter, "write", counting_write)
+        for month in range(1, 9):
+            (tmp_path / f"宝城_2025-{month:02d}.csv").write_text(DRILL_DOWN_CSV, encoding="utf-8")
+
+        summary = run_bulk_import("drill_down", [str(tmp_path)], database_url=database, workers=2, log=lambda m: None)
+        assert (summary["imported"], summary["inserted"]) == (8, 40)
+        assert state["peak"] <= 3
+
+    def test_main_exit_code(self, tmp_path, database):
+        """测试有失败文件时返回非0"""
+        (tmp_path / "_宝城.csv").write_text(DRILL_DOWN_CSV, encoding="utf-8")
+        assert bulk_import.main(["drill_down", str(tmp_path), "--database-url", database]) == 1
+        assert bulk_import.main([
+            "drill_down", str(tmp_path), "--database-url", database, "--year", "2025", "--month", "01",
+        ]) == 0
+        assert count(database, PUEDrillDownData, PUEDrillDownData.month == "1") == 5
@@ -0,0 +1,122 @@
+"""
+数据库引擎配置测试
+测试引擎参数取自配置、SQLite PRAGMA 钩子、启动报告和读写分离
+"""
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from config import settings
+from db import session as session_module
+from db.session import (
+    create_engine_from_settings, create_read_engine, database_report, engine_options, get_db, get_read_db,
+)
+import pue_forecast
+from bi_api import router as bi_api_router
+from dashboard_api import router as dashboard_router
+from fault_analysis_fastapi import router as fault_router
+from huijugugan import router as huiju_router
+from pue import router as pue_router
+
+
+class TestEngineSettings:
+    """引擎配置测试"""
+
+    def test_engine_options(self, monkeypatch):
+        """测试默认不输出SQL，文件库设置连接池，内存库不设置池大小"""
+        monkeypatch.setattr(settings, "DB_POOL_SIZE", 3)
+        options = engine_options("sqlite+aiosqlite:///db.sqlite3")
+        assert options["echo"] is False
+        assert options["pool_pre_ping"] is True
+        assert options["pool_size"] == 3
+        assert "pool_size" not in engine_options("sqlite+aiosqlite:///:memory:")
+
+    @pytest.mark.asyncio
+    async def test_sqlite_pragmas(self, tmp_path, monkeypatch):
+        """测试新连接启用WAL等PRAGMA，启动报告反映实际生效的值"""
+        monkeypatch.setattr(settings, "SQLITE_BUSY_TIMEOUT", 1234)
+        monkeypatch.setattr(settings, "SQLITE_MMAP_SIZE", None)
+        file_engine = create_engine_from_settings(f"sqlite+aiosqlite:///{tmp_path / 'a.db'}")
+        try:
+            report = await database_report(file_engine)
+        finally:
+            await file_engine.dispose()
+        assert report["journal_mode"] == "wal"
+        assert report["synchronous"] == 1
+        assert report["busy_timeout"] == 1234
+        assert report["mmap_size"] == 0
+        assert (report["pool"], report["pool_size"], report["echo"]) == ("AsyncAdaptedQueuePool", 5, False)
+
+    @pytest.mark.asyncio
+    async def test_memory_database(self):
+        """测试内存库跳过WAL，其余PRAGMA照常生效"""
+        memory_engine = create_engine_from_settings("sqlite+aiosqlite:///:memory:")
+        try:
+            report = await database_report(memory_engine)
+        finally:
+            await memory_engine.dispose()
+        assert report["journal_mode"] == "memory"
+        assert report["temp_store"] == 2
+
+
+def route_dependencies(router, path: str, method: str = "GET") -> set:
+    for route in router.routes:
+        if route.path == path and method in route.methods:
+            return {dep.call for dep in route.dependant.dependencies}
+    raise AssertionError(f"未找到路由 {method} {path}")
+
+
+class TestReadWriteRouting:
+    """读写分离测试"""
+
+    @pytest.mark.asyncio
+    async def test_read_engine_rejects_writes(self, tmp_path, monkeypatch):
+        """测试读库引擎使用独立的连接池大小，SQLite 读连接只能查询"""
+        monkeypatch.setattr(settings, "DB_READ_POOL_SIZE", 7)
+        url = f"sqlite+aiosqlite:///{tmp_path / 'a.db'}"
+        write_engine = create_engine_from_settings(url)
+        read_engine = create_engine_from_settings(url, read_only=True)
+        try:
+            async with write_engine.begin() as conn:
+                await conn.execute(text("CREATE TABLE t (x INTEGER)"))
+                await conn.execute(text("INSERT INTO t VALUES (1)"))
+            async with read_engine.connect() as conn:
+                assert (await conn.execute(text("SELECT x FROM t"))).scalar() == 1
+                with pytest.raises(OperationalError):
+                    await conn.execute(text("INSERT INTO t VALUES (2)"))
+            report = await database_report(read_engine)
+            assert (report["pool_size"], report["journal_mode"]) == (7, "wal")
+        finally:
+            await read_engine.dispose()
+            await write_engine.dispose()
+
+    def test_read_engine_selection(self, monkeypatch):
+        """测试未配置读库时内存库复用写库引擎，配置后创建独立引擎"""
+        write_engine = create_engine_from_settings("sqlite+aiosqlite:///:memory:")
+        monkeypatch.setattr(session_module, "DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+        assert create_read_engine(write_engine) is write_engine
+        monkeypatch.setattr(settings, "DATABASE_READ_URL", "sqlite+aiosqlite:///replica.db")
+        read_engine = create_read_engine(write_engine)
+        assert read_engine is not write_engine
+        assert str(read_engine.url).endswith("replica.db")
+
+    def test_analytics_routes_use_reader(self):
+        """测试分析类GET接口使用读库会话，录入和修改使用写库会话"""
+        assert get_read_db in route_dependencies(fault_router, "/fault/api/analysis/time_series")
+        assert get_read_db in route_dependencies(dashboard_router, "/api/dashboard/summary")
+        assert get_read_db in route_dependencies(pue_router, "/pue_drill_down_excel")
+        assert route_dependencies(pue_router, "/pue_drill_down_data/{id}") == {get_read_db}
+        assert route_dependencies(pue_router, "/pue_ai_analysis") == {get_read_db}
+        assert route_dependencies(huiju_router, "/huiju/ai_analysis") == {get_read_db}
+        assert route_dependencies(huiju_router, "/huiju/ai_analysis", "POST") == {get_db}
+        assert get_db in route_dependencies(fault_router, "/fault/add_fault_data", "POST")
+        assert get_db in route_dependencies(fault_router, "/fault/data")
+
+    def test_versioned_caches_rebuild_on_reader(self):
+        """测试大屏快照、汇聚图表和PUE预测从读库重建（版本变化时不缓存，见各模块测试）"""
+        assert route_dependencies(bi_api_router, "/api/bi_data") == {get_read_db}
+        assert route_dependencies(huiju_router, "/huiju/analyze/charts") == {get_read_db}
+        assert route_dependencies(pue_router, "/api/pue/outlook") == {get_read_db}
+        assert route_dependencies(pue_router, "/pue_analyze") == {get_read_db}
+        assert pue_forecast.ReadSessionLocal is session_module.ReadSessionLocal
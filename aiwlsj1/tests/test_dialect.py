@@ -0,0 +1,141 @@
+"""
+跨数据库查询辅助测试
+测试时间分桶、文本检索和 upsert 在 SQLite 上的结果，以及在 PostgreSQL / MySQL 上生成的 SQL
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, event, func
+from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.future import select
+
+from db.dialect import date_bucket, escape_like, text_search, upsert
+from dashboard_api import get_pue_stats
+from db.models import FaultRecord, ImportedFile, PUEData
+from tests.conftest import test_engine
+
+
+def compiled(stmt, dialect) -> str:
+    return str(stmt.compile(dialect=dialect))
+
+
+@pytest.fixture
+async def faults(db_session):
+    db_session.add_all([
+        FaultRecord(fault_name="光缆中断", fault_date=datetime(2025, 3, 5, 8, 30)),   # 周三
+        FaultRecord(fault_name="电源100%告警", fault_date=datetime(2025, 3, 9, 23, 0)),  # 周日
+        FaultRecord(fault_name="Fiber cut", fault_date=datetime(2025, 3, 10, 0, 15)),  # 周一
+    ])
+    await db_session.commit()
+    yield
+    await db_session.execute(delete(FaultRecord))
+    await db_session.commit()
+
+
+class TestDateBucket:
+    """时间分桶测试"""
+
+    @pytest.mark.asyncio
+    async def test_bucket_labels(self, db_session, faults):
+        """测试各粒度的标签，周以周一的日期为标签"""
+        async def buckets(unit):
+            bucket = date_bucket(FaultRecord.fault_date, unit)
+            result = await db_session.execute(
+                select(bucket.label("period"), func.count()).group_by(bucket).order_by(bucket)
+            )
+            return [tuple(row) for row in result.all()]
+
+        assert await buckets("week") == [("2025-03-03", 2), ("2025-03-10", 1)]
+        assert await buckets("month") == [("2025-03", 3)]
+        assert (await buckets("day"))[0] == ("2025-03-05", 1)
+        assert (await buckets("hour"))[-1] == ("2025-03-10 00:00:00", 1)
+        with pytest.raises(ValueError):
+            date_bucket(FaultRecord.fault_date, "minute")
+
+    def test_other_dialects(self):
+        """测试PostgreSQL用to_char、MySQL用DATE_FORMAT，分组表达式与选出列一致"""
+        bucket = date_bucket(FaultRecord.fault_date, "week")
+        stmt = select(bucket).group_by(bucket)
+        sql = compiled(stmt, postgresql.dialect())
+        assert sql.count("to_char(date_trunc('week', fault_record.fault_date), 'YYYY-MM-DD')") == 2
+        sql = compiled(select(date_bucket(FaultRecord.fault_date, "month")), mysql.dialect())
+        assert "DATE_FORMAT(fault_record.fault_date, '%%Y-%%m')" in sql
+
+
+class TestTextSearch:
+    """文本检索测试"""
+
+    @pytest.mark.asyncio
+    async def test_search(self, db_session, faults):
+        """测试不区分大小写的子串匹配，通配符按字面匹配"""
+        async def search(keyword):
+            result = await db_session.execute(
+                select(FaultRecord.fault_name).where(text_search([FaultRecord.fault_name], keyword))
+            )
+            return result.scalars().all()
+
+        assert await search("fiber") == ["Fiber cut"]
+        assert await search("100%") == ["电源100%告警"]
+        assert await search("%") == ["电源100%告警"]
+        assert escape_like("a_b\\") == "a\\_b\\\\"
+        assert "ILIKE" in compiled(select(FaultRecord.id).where(text_search([FaultRecord.remarks], "x")),
+                                   postgresql.dialect())
+
+
+class TestUpsert:
+    """按唯一键写入测试"""
+
+    @pytest.mark.asyncio
+    async def test_upsert_imported_file(self, db_session):
+        """测试键冲突时更新其余列，不产生重复记录"""
+        row = {"kind": "fault", "checksum": "abc", "path": "a.xlsx", "inserted": 1}
+        dialect_name = db_session.get_bind().dialect.name
+        await db_session.execute(upsert(dialect_name, ImportedFile, [row], keys=["kind", "checksum"]))
+        await db_session.execute(upsert(dialect_name, ImportedFile, [{**row, "inserted": 5}], keys=["kind", "checksum"]))
+        await db_session.commit()
+        result = await db_session.execute(select(ImportedFile.inserted))
+        assert result.scalars().all() == [5]
+        await db_session.execute(delete(ImportedFile))
+        await db_session.commit()
+
+    def test_other_dialects(self):
+        """测试PostgreSQL用ON CONFLICT、MySQL用ON DUPLICATE KEY，不支持的数据库报错"""
+        row = {"kind": "fault", "checksum": "abc", "path": "a.xlsx"}
+        sql = compiled(upsert("postgresql", ImportedFile, [row], keys=["kind", "checksum"]), postgresql.dialect())
+        assert "ON CONFLICT (kind, checksum) DO UPDATE SET path = excluded.path" in sql
+        sql = compiled(upsert("postgresql", ImportedFile, [row], keys=["kind", "checksum"], update=[]),
+                       postgresql.dialect())
+        assert "ON CONFLICT (kind, checksum) DO NOTHING" in sql
+        assert "ON DUPLICATE KEY UPDATE" in compiled(upsert("mysql", ImportedFile, [row], keys=["kind", "checksum"]),
+                                                      mysql.dialect())
+        with pytest.raises(NotImplementedError):
+            upsert("oracle", ImportedFile, [row], keys=["kind", "checksum"])
+
+
+class TestTextColumnParams:
+    """文本列的比较参数测试：PostgreSQL 不会把整数参数隐式转换为文本，SQLite 则按类型亲和性放过"""
+
+    @pytest.mark.asyncio
+    async def test_pue_stats_binds_strings(self, db_session):
+        """测试按年月统计PUE时，年、月按字符串绑定"""
+        db_session.add_all([
+            PUEData(location="宝城", year="2025", month="3", pue_value=1.4),
+            PUEData(location="宝城", year="2025", month="2", pue_value=1.6),
+        ])
+        await db_session.commit()
+        params = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if "pue_data.year =" in statement:
+                params.extend(parameters)
+
+        event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            stats = await get_pue_stats(db_session, datetime(2025, 3, 15), datetime(2025, 2, 15))
+        finally:
+            event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+            await db_session.execute(delete(PUEData))
+            await db_session.commit()
+        assert (stats["current_avg"], stats["last_avg"]) == (1.4, 1.6)
+        assert params and not any(isinstance(value, int) for value in params)
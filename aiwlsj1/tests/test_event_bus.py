@@ -0,0 +1,98 @@
+"""
+事件推送测试
+测试发布订阅、SSE报文、按需采样和推送接口参数校验
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import bi_snapshot
+from utils.event_bus import SUBSCRIBER_QUEUE_SIZE, EventBus, event_bus
+
+
+class TestEventBus:
+    """事件总线测试"""
+
+    @pytest.mark.asyncio
+    async def test_publish_by_topic(self):
+        """测试只推送给订阅了该主题的连接，积压过多时丢弃最旧事件"""
+        bus = EventBus()
+        bi = bus.subscribe(["bi"])
+        other = bus.subscribe(["fault"])
+        assert bus.publish("bi", {"version": 1}) == 1
+        assert other.queue.empty()
+        assert (await bi.queue.get())["data"]["version"] == 1
+
+        for i in range(SUBSCRIBER_QUEUE_SIZE + 5):
+            bus.publish("bi", {"n": i})
+        assert bi.dropped == 5
+        assert bi.queue.get_nowait()["data"]["n"] == 5
+
+    @pytest.mark.asyncio
+    async def test_stream(self):
+        """测试SSE报文格式，连接结束后自动退订"""
+        bus = EventBus()
+        subscription = bus.subscribe(["fault"])
+        stream = bus.stream(subscription, heartbeat=0.05)
+        assert (await stream.__anext__()).startswith("retry: 3000")
+
+        assert (await stream.__anext__()) == ": keepalive\n\n"
+        bus.publish("fault", {"action": "add", "id": 3})
+        message = await stream.__anext__()
+        lines = message.strip().split("\n")
+        assert lines[1] == "event: fault"
+        assert json.loads(lines[2][len("data: "):])["id"] == 3
+
+        await stream.aclose()
+        assert bus.subscriber_count == 0
+
+    @pytest.mark.asyncio
+    async def test_sampler_runs_once_for_all_subscribers(self):
+        """测试多个订阅者共用一次采样，无订阅者时停止采样"""
+        bus = EventBus()
+        samples = []
+
+        async def sample():
+            samples.append(1)
+            return {"cpu_percent": 10.0}
+
+        bus.register_sampler("metrics", 0.01, sample)
+        subscriptions = [bus.subscribe(["metrics"]) for _ in range(5)]
+        await asyncio.sleep(0.035)
+        rounds = len(samples)
+        assert 1 <= rounds <= 5
+        assert all(s.queue.qsize() == rounds for s in subscriptions)
+
+        for s in subscriptions:
+            bus.unsubscribe(s)
+        await asyncio.sleep(0.03)
+        assert len(samples) == rounds
+        await bus.close()
+
+    @pytest.mark.asyncio
+    async def test_close_ends_streams(self):
+        """测试关闭总线时进行中的连接结束"""
+        bus = EventBus()
+        stream = bus.stream(bus.subscribe(["bi"]), heartbeat=10)
+        await stream.__anext__()
+        await bus.close()
+        with pytest.raises(StopAsyncIteration):
+            await stream.__anext__()
+
+    @pytest.mark.asyncio
+    async def test_bi_change_published(self):
+        """测试大屏数据变更时发布bi事件"""
+        subscription = event_bus.subscribe(["bi"])
+        try:
+            bi_snapshot.mark_bi_data_changed()
+            event = subscription.queue.get_nowait()
+            assert event["topic"] == "bi"
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    def test_unknown_topic(self, client: TestClient):
+        """测试未知主题返回400"""
+        assert client.get("/api/events", params={"topics": "bi,unknown"}).status_code == 400
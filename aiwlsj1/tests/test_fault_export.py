@@ -0,0 +1,61 @@
+"""
+故障数据导出测试
+测试筛选条件、导出列选择和参数校验
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from db.models import FaultRecord
+from fault_export import FAULT_EXPORT_FIELDS, fault_export_conditions
+from tests.conftest import TestSessionLocal
+from utils.streaming_export import column, iter_query_rows, select_fields, stream_ndjson
+
+
+@pytest.fixture
+async def faults(db_session):
+    db_session.add_all([
+        FaultRecord(sequence_no=i, fault_name=f"故障{i}", fault_date=datetime(2025, 3, i),
+                    province_fault_type="光缆" if i % 2 else "设备", notification_level="一般",
+                    fault_duration_hours=float(i))
+        for i in range(1, 7)
+    ])
+    await db_session.commit()
+    yield
+    await db_session.execute(delete(FaultRecord))
+    await db_session.commit()
+
+
+class TestFaultExport:
+    """故障数据导出测试"""
+
+    @pytest.mark.asyncio
+    async def test_filters_and_columns(self, faults):
+        """测试类型、时长范围和日期范围组合筛选，只导出选中的列"""
+        conditions = fault_export_conditions(
+            ["光缆"], [], ["一般"], min_duration=2, max_duration=5,
+            start_date="2025-03-01", end_date="2025-03-03",
+        )
+        fields = select_fields(FAULT_EXPORT_FIELDS, ["sequence_no", "故障处理时长（小时）"])
+        query = (
+            select(*[getattr(FaultRecord, key) for _, key in fields])
+            .where(*conditions)
+            .order_by(FaultRecord.fault_date.desc(), FaultRecord.id.desc())
+        )
+        rows = iter_query_rows(query, chunk_size=2, session_factory=TestSessionLocal)
+        content = b"".join([chunk async for chunk in stream_ndjson(rows, [column(h, k) for h, k in fields])])
+        assert [json.loads(line) for line in content.decode("utf-8").splitlines()] == [
+            {"序号": 3, "故障处理时长（小时）": 3.0},
+        ]
+
+    def test_invalid_parameters(self, client: TestClient):
+        """测试未知导出列、颠倒的时长范围、错误日期和不支持的格式"""
+        assert client.get("/fault/export_fault_data?columns=password").status_code == 400
+        assert client.get("/fault/export_fault_data?min_duration=5&max_duration=1").status_code == 400
+        assert client.get("/fault/export_fault_data?start_date=2025/03/01").status_code == 400
+        assert client.get("/fault/export_fault_data?format=pdf").status_code == 422
@@ -0,0 +1,94 @@
+"""
+汇聚骨干分析页图表接口测试
+测试echarts配置JSON、ETag协商缓存和静态库缓存头
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.future import select
+
+import huijugugan
+from db.models import Huijugugan
+from huijugugan import build_huiju_chart_options, _load_huiju_frame
+
+
+class TestHuijuCharts:
+    """图表配置接口测试"""
+
+    @pytest.fixture
+    async def huiju_rows(self, db_session):
+        """创建测试汇聚骨干数据"""
+        rows = [
+            Huijugugan(month=f"2025-0{m}", city=city, huiju_amount=100 + m, over_4h=m,
+                       important_amount=50, over_12h=m % 2)
+            for m in range(1, 4) for city in ("深圳", "广州")
+        ]
+        db_session.add_all(rows)
+        await db_session.commit()
+        yield rows
+        for row in rows:
+            await db_session.delete(row)
+        await db_session.commit()
+
+    @pytest.mark.asyncio
+    async def test_chart_options(self, db_session, huiju_rows):
+        """测试全部城市和单城市的图表配置"""
+        df = await _load_huiju_frame(db_session)
+        charts = build_huiju_chart_options(df)
+        assert charts["bar_chart"]["xAxis"][0]["data"] == ["2025-01", "2025-02", "2025-03"]
+        assert len(charts["bar_chart"]["series"]) == 8
+        assert charts["shenzhen_line_chart"] is not None
+
+        single = build_huiju_chart_options(df, "广州")
+        assert [s["name"] for s in single["bar_chart"]["series"]] == ["汇聚总量", "超4小时", "重要紧急", "超12小时"]
+        assert single["bar_chart"]["series"][0]["data"] == [101.0, 102.0, 103.0]
+
+    @pytest.mark.asyncio
+    async def test_etag_and_version(self, client: TestClient, db_session, huiju_rows):
+        """测试ETag命中返回304，数据变更后ETag改变"""
+        response = client.get("/huiju/analyze/charts", params={"city": "深圳"})
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        assert response.json()["charts"]["bar_chart"]["series"]
+
+        cached = client.get("/huiju/analyze/charts", params={"city": "深圳"}, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+
+        other_city = client.get("/huiju/analyze/charts", params={"city": "广州"})
+        assert other_city.headers["etag"] != etag
+
+        client.post("/huiju/data/add", data={
+            "month": "2025-04", "city": "深圳", "huiju_amount": 1, "over_4h": 0,
+            "important_amount": 1, "over_12h": 0,
+        }, follow_redirects=False)
+        changed = client.get("/huiju/analyze/charts", params={"city": "深圳"}, headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert "2025-04" in changed.json()["charts"]["bar_chart"]["xAxis"][0]["data"]
+
+        added = (await db_session.execute(select(Huijugugan).where(Huijugugan.month == "2025-04"))).scalars().all()
+        for row in added:
+            await db_session.delete(row)
+        await db_session.commit()
+
+    def test_not_cached_when_changed_during_build(self, client: TestClient, huiju_rows, monkeypatch):
+        """测试读取期间版本变化时图表照常返回但不缓存"""
+        versions = iter(["v1", "v2"])
+
+        async def moving_version(db):
+            return next(versions)
+
+        monkeypatch.setattr(huijugugan, "_huiju_data_version", moving_version)
+        huijugugan._chart_cache.clear()
+        response = client.get("/huiju/analyze/charts", params={"city": "深圳"})
+        assert response.status_code == 200
+        assert response.json()["version"] == "v1"
+        assert response.json()["charts"]["bar_chart"]["series"]
+        assert huijugugan._chart_cache == {}
+
+    def test_static_cache_headers(self, client: TestClient):
+        """测试第三方库长期缓存，其他静态文件协商缓存"""
+        lib = client.get("/static/js/echarts.min.js")
+        assert "immutable" in lib.headers["cache-control"]
+        page_js = client.get("/static/js/common.js")
+        assert page_js.headers["cache-control"] == "no-cache"
+        assert client.get("/static/js/common.js", headers={"If-None-Match": page_js.headers["etag"]}).status_code == 304
@@ -0,0 +1,117 @@
+"""
+汇聚骨干数据批量导入测试
+测试模板下载、数据校验和按 城市+月份 的新增/更新汇总
+"""
+
+import io
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from db.models import Huijugugan
+from huijugugan import parse_huiju_frame
+
+
+def _csv(rows):
+    return pd.DataFrame(rows).to_csv(index=False).encode("utf-8")
+
+
+ROW = {"月份": "2025-01", "城市": "深圳", "汇聚全量": "100", "超4小时": "5", "重要环全量": "40", "超12小时": "2"}
+
+
+class TestHuijuImport:
+    """批量导入测试"""
+
+    @pytest.fixture
+    async def clean_table(self, db_session):
+        yield
+        await db_session.execute(delete(Huijugugan))
+        await db_session.commit()
+
+    def test_parse_and_validate(self):
+        """测试月份规范化和各项校验"""
+        df, errors = parse_huiju_frame(pd.DataFrame([
+            {**ROW, "月份": "2025年3月"},
+            {**ROW, "城市": "广州", "超4小时": "200"},
+            {**ROW, "城市": "", "汇聚全量": "-1"},
+            {**ROW, "月份": "3"},
+            {**ROW, "月份": "2025-3", "超4小时占比": "50%"},
+        ]))
+        assert df["month"].iloc[0] == "2025-03"
+        assert errors == [
+            "第3行：超4小时不能大于汇聚全量",
+            "第4行：城市不能为空",
+            "第4行：汇聚全量须为非负整数",
+            "第5行：月份格式应为 YYYY-MM",
+            "第6行：超4小时占比与数量计算结果不一致",
+            "第6行：城市+月份在文件中重复",
+        ]
+
+        _, errors = parse_huiju_frame(pd.DataFrame([{"月份": "2025-01"}]))
+        assert errors[0].startswith("缺少必要的列")
+
+    def test_template(self, client: TestClient):
+        """测试模板可被导入接口直接解析"""
+        response = client.get("/huiju/data/download_template")
+        assert response.status_code == 200
+        df, errors = parse_huiju_frame(pd.read_excel(io.BytesIO(response.content), dtype=str))
+        assert errors == [] and len(df) == 2
+
+    @pytest.mark.asyncio
+    async def test_upsert_summary(self, client: TestClient, db_session, clean_table):
+        """测试新增、更新、未变化的汇总以及预览不写库"""
+        db_session.add(Huijugugan(month="2025-01", city="深圳", huiju_amount=100, over_4h=5, important_amount=40, over_12h=2))
+        db_session.add(Huijugugan(month="2025-01", city="广州", huiju_amount=90, over_4h=5, important_amount=40, over_12h=2))
+        await db_session.commit()
+
+        content = _csv([ROW, {**ROW, "城市": "广州", "汇聚全量": "95"}, {**ROW, "城市": "东莞"}])
+        files = {"file": ("huiju.csv", content, "text/csv")}
+
+        preview = client.post("/huiju/data/upload", files=files, data={"dry_run": "true"}).json()
+        assert (preview["inserted"], preview["updated"], preview["unchanged"]) == (1, 1, 1)
+        assert preview["changes"][0]["before"]["huiju_amount"] == 90
+        count = await db_session.execute(select(Huijugugan.id))
+        assert len(count.all()) == 2
+
+        result = client.post("/huiju/data/upload", files=files).json()
+        assert result["success"] and (result["inserted"], result["updated"]) == (1, 1)
+
+        rows = await db_session.execute(select(Huijugugan.city, Huijugugan.huiju_amount).order_by(Huijugugan.id))
+        assert rows.all() == [("深圳", 100), ("广州", 95), ("东莞", 100)]
+
+        again = client.post("/huiju/data/upload", files=files).json()
+        assert (again["inserted"], again["updated"], again["unchanged"]) == (0, 0, 3)
+
+    @pytest.mark.asyncio
+    async def test_upsert_matches_normalized_month(self, client: TestClient, db_session, clean_table):
+        """测试库中 "2025年1月"、带空白的城市与导入的 2025-01 视为同一条，更新时写回规范化的值"""
+        db_session.add(Huijugugan(month="2025年1月", city=" 深圳", huiju_amount=90, over_4h=5, important_amount=40, over_12h=2))
+        await db_session.commit()
+
+        files = {"file": ("huiju.csv", _csv([ROW]), "text/csv")}
+        result = client.post("/huiju/data/upload", files=files).json()
+        assert (result["inserted"], result["updated"]) == (0, 1)
+        rows = await db_session.execute(select(Huijugugan.city, Huijugugan.month, Huijugugan.huiju_amount))
+        assert rows.all() == [("深圳", "2025-01", 100)]
+
+    @pytest.mark.asyncio
+    async def test_add_duplicate_month(self, client: TestClient, db_session, clean_table):
+        """测试表单新增时月份同样规范化，城市+月份重复返回409"""
+        form = {"month": "2025-1", "city": "深圳 ", "huiju_amount": 1, "over_4h": 0, "important_amount": 1, "over_12h": 0}
+        assert client.post("/huiju/data/add", data=form, follow_redirects=False).status_code == 303
+        response = client.post("/huiju/data/add", data={**form, "month": "2025年01月"}, follow_redirects=False)
+        assert response.status_code == 409
+        rows = await db_session.execute(select(Huijugugan.city, Huijugugan.month))
+        assert rows.all() == [("深圳", "2025-01")]
+
+    def test_invalid_upload(self, client: TestClient):
+        """测试校验失败和不支持的文件类型"""
+        response = client.post("/huiju/data/upload", files={"file": ("huiju.csv", _csv([{**ROW, "超12小时": "x"}]), "text/csv")})
+        assert response.status_code == 400
+        assert response.json()["errors"] == ["第2行：超12小时须为非负整数"]
+
+        response = client.post("/huiju/data/upload", files={"file": ("huiju.txt", b"abc", "text/plain")})
+        assert response.status_code == 400
@@ -0,0 +1,78 @@
+"""
+大屏图片服务测试
+测试内容类型、ETag协商、内存LRU缓存和路径越界防护
+"""
+
+import os
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import bi
+from utils.static_files import ImageFiles
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"0" * 100
+
+
+class TestImageFiles:
+    """图片服务测试"""
+
+    @pytest.fixture
+    def images(self, tmp_path, monkeypatch):
+        (tmp_path / "map").mkdir()
+        (tmp_path / "map" / "a.png").write_bytes(PNG)
+        (tmp_path / "map" / "b.jpg").write_bytes(b"j" * 300)
+        (tmp_path / "map" / "big.png").write_bytes(b"b" * 2000)
+        (tmp_path / "secret.txt").write_text("secret")
+        files = ImageFiles(str(tmp_path / "."), max_bytes=350, max_item_bytes=1000, max_age=60)
+        monkeypatch.setattr(bi, "image_files", files)
+        return files
+
+    def test_headers_and_304(self, client: TestClient, images):
+        """测试内容类型、缓存头和304"""
+        response = client.get("/img/map/a.png")
+        assert response.status_code == 200
+        assert response.content == PNG
+        assert response.headers["content-type"] == "image/png"
+        assert response.headers["cache-control"] == "public, max-age=60"
+        etag = response.headers["etag"]
+
+        cached = client.get("/img/map/a.png", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+    def test_lru_and_large_files(self, client: TestClient, images):
+        """测试缓存总量上限和大文件直接发送"""
+        client.get("/img/map/a.png")
+        assert images.cached_bytes == len(PNG)
+        client.get("/img/map/b.jpg")
+        # 超出总量上限，淘汰最早的 a.png
+        assert images.cached_bytes == 300
+
+        response = client.get("/img/map/big.png")
+        assert response.status_code == 200 and len(response.content) == 2000
+        assert images.cached_bytes == 300
+
+    def test_changed_file_refreshes_cache(self, client: TestClient, images, tmp_path):
+        """测试文件被替换后返回新内容"""
+        etag = client.get("/img/map/b.jpg").headers["etag"]
+        path = tmp_path / "map" / "b.jpg"
+        path.write_bytes(b"k" * 10)
+        os.utime(path, ns=(0, 10**9))
+        response = client.get("/img/map/b.jpg", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.content == b"k" * 10
+
+    def test_path_outside_root(self, images, tmp_path):
+        """测试越界路径和不存在的文件返回404"""
+        with pytest.raises(HTTPException):
+            images.resolve("..", "secret.txt")
+        with pytest.raises(HTTPException):
+            images.resolve("map", "..")
+        assert images.resolve("map", "a.png") == (tmp_path / "map" / "a.png").resolve()
+
+    def test_missing(self, client: TestClient, images):
+        """测试接口对不存在和越界的图片返回404"""
+        assert client.get("/img/map/none.png").status_code == 404
+        assert client.get("/img/map/..").status_code == 404
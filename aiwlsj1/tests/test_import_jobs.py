@@ -0,0 +1,142 @@
+"""
+后台导入任务测试
+测试上传暂存、进度推送、任务表统计、整体校验失败、取消回滚和查询接口
+"""
+
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, func
+from sqlalchemy.future import select
+
+import import_jobs
+from config import settings
+from db.models import FaultRecord, ImportJob, Zbk
+from import_jobs import JOB_CANCELLED, JOB_DONE, JOB_FAILED, JOB_PENDING
+from tests.conftest import TestSessionLocal
+from utils.event_bus import TOPIC_IMPORT, event_bus
+
+FAULT_CSV = "序号,故障名称,发生时间,故障处理时长（小时）\n" + "".join(
+    f"{i},故障{i},2025-04-01 08:{i % 60:02d}:00,{i % 7}\n" for i in range(1, 31)
+) + "31,故障31,2025-04-01 09:00:00,很久\n"
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    """暂存目录和后台会话指向测试环境"""
+    monkeypatch.setattr(settings, "IMPORT_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 10)
+    monkeypatch.setattr(import_jobs, "session_factory", TestSessionLocal)
+    return tmp_path
+
+
+@pytest.fixture
+async def clean_tables(db_session):
+    yield
+    for model in (ImportJob, FaultRecord, Zbk):
+        await db_session.execute(delete(model))
+    await db_session.commit()
+
+
+async def create_job(db_session, spool, kind, content: str, suffix=".csv", **options) -> ImportJob:
+    path = spool / f"upload{suffix}"
+    path.write_text(content, encoding="utf-8")
+    job = ImportJob(kind=kind, filename=f"upload{suffix}", spool_path=str(path), options=options, status=JOB_PENDING)
+    db_session.add(job)
+    await db_session.commit()
+    return job
+
+
+class TestImportJobRunner:
+    """后台执行测试"""
+
+    @pytest.mark.asyncio
+    async def test_fault_import_progress(self, db_session, spool, clean_tables):
+        """测试分批推送进度，结束后任务表记录统计和耗时，暂存文件删除"""
+        job = await create_job(db_session, spool, "fault", FAULT_CSV)
+        subscription = event_bus.subscribe([TOPIC_IMPORT])
+        try:
+            await import_jobs._run_job(job.id)
+        finally:
+            event_bus.unsubscribe(subscription)
+
+        events = []
+        while not subscription.queue.empty():
+            events.append(subscription.queue.get_nowait()["data"])
+        assert [e["status"] for e in events] == ["running"] * 4 + [JOB_DONE]
+        assert [e["inserted"] for e in events[1:4]] == [10, 20, 30]
+
+        await db_session.refresh(job)
+        assert job.status == JOB_DONE
+        assert (job.rows_read, job.inserted, job.rejected, job.duplicates) == (31, 30, 1, 0)
+        assert job.errors == ["第32行：故障处理时长（小时）不是有效数字"]
+        assert job.elapsed_seconds is not None
+        assert not os.path.exists(job.spool_path)
+
+        # 再次导入同一文件，全部计为重复
+        again = await create_job(db_session, spool, "fault", FAULT_CSV)
+        await import_jobs._run_job(again.id)
+        await db_session.refresh(again)
+        assert (again.inserted, again.duplicates) == (0, 30)
+
+    @pytest.mark.asyncio
+    async def test_strict_failure_and_cancel(self, db_session, spool, clean_tables):
+        """测试整体校验失败和取消都回滚，任务记录失败原因"""
+        job = await create_job(db_session, spool, "kpi", "指标项,分值\n指标A,1\n")
+        await import_jobs._run_job(job.id)
+        await db_session.refresh(job)
+        assert job.status == JOB_FAILED
+        assert "缺少必要的列" in job.error
+
+        job = await create_job(db_session, spool, "fault", FAULT_CSV)
+        import_jobs._cancel_requested.add(job.id)
+        await import_jobs._run_job(job.id)
+        await db_session.refresh(job)
+        assert job.status == JOB_CANCELLED
+        assert job.inserted == 0
+        assert await db_session.scalar(select(func.count()).select_from(FaultRecord)) == 0
+        assert not import_jobs._cancel_requested
+
+
+class TestImportJobEndpoints:
+    """提交、查询和取消接口测试"""
+
+    @pytest.mark.asyncio
+    async def test_submit_poll_cancel(self, client: TestClient, db_session, spool, clean_tables, monkeypatch):
+        """测试上传返回202并暂存文件，排队中的任务可取消，已结束的不能再取消"""
+        # 测试客户端运行在独立事件循环中，这里不让后台协程执行任务
+        async def skip_job(job_id):
+            pass
+        monkeypatch.setattr(import_jobs, "_run_job", skip_job)
+
+        response = client.post(
+            "/api/import_jobs/fault",
+            files={"file": ("故障.csv", FAULT_CSV.encode("utf-8"), "text/csv")},
+            data={"skip_rows": "1"},
+        )
+        assert response.status_code == 202
+        data = response.json()["data"]
+        assert (data["status"], data["filename"], data["file_size"]) == (JOB_PENDING, "故障.csv", len(FAULT_CSV.encode()))
+        job = await db_session.get(ImportJob, data["job_id"])
+        assert job.options == {"skip_rows": 1}
+        assert os.path.exists(job.spool_path)
+
+        assert client.get(f"/api/import_jobs/{job.id}").json()["data"]["status"] == JOB_PENDING
+        assert client.get("/api/import_jobs").json()["data"][0]["job_id"] == job.id
+
+        response = client.post(f"/api/import_jobs/{job.id}/cancel")
+        assert response.json()["data"]["status"] == JOB_CANCELLED
+        assert not os.path.exists(job.spool_path)
+        assert client.post(f"/api/import_jobs/{job.id}/cancel").status_code == 409
+        assert client.get("/api/import_jobs/999999").status_code == 404
+
+    def test_rejected_uploads(self, client: TestClient, spool, monkeypatch):
+        """测试未知类型、不支持的格式和超过大小限制"""
+        files = {"file": ("a.csv", b"x" * 100, "text/csv")}
+        assert client.post("/api/import_jobs/unknown", files=files).status_code == 404
+        assert client.post("/api/import_jobs/fault", files={"file": ("a.txt", b"x")}).status_code == 400
+
+        monkeypatch.setattr(settings, "IMPORT_JOB_MAX_FILE_SIZE", 50)
+        assert client.post("/api/import_jobs/fault", files=files).status_code == 400
+        assert list(spool.iterdir()) == []
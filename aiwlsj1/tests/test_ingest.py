@@ -0,0 +1,299 @@
+"""
+流式表格导入测试
+测试类型转换、日期时间整列转换、表头匹配、分批与错误行号、xlsx/csv 逐行读取以及上传接口整体回滚
+"""
+
+import io
+from datetime import datetime
+
+import openpyxl
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from utils import ingest as ingest_module
+
+from db.models import FAULT_NATURAL_KEY, FaultRecord, PUEData, Zbk
+from fault_analysis_fastapi import router as fault_router
+from import_maps import FAULT_RECORD_MAP, ZBK_MAP
+from utils.exceptions import FileUploadException
+from utils.ingest import (
+    DatetimeColumn, FieldSpec, IngestReport, TableMap, as_datetime, as_float, as_int, as_str,
+    dedup_insert_sink, infer_datetime_format, ingest, iter_record_chunks, iter_sheet_rows,
+    normalize_datetime_column, read_upload_frame,
+)
+
+ZBK_HEADER = ["指标项", "分值", "全省排名", "全年累计得分占比", "年度达成评估",
+              "1月指标", "2月指标", "3月指标", "4月指标", "5月指标", "6月指标", "基准值", "挑战值"]
+
+
+def xlsx_bytes(rows) -> bytes:
+    workbook = openpyxl.Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+class TestConverters:
+    """类型转换测试"""
+
+    def test_blank_and_numbers(self):
+        """测试空白值、浮点写法的整数和非法数字"""
+        assert as_str("  ") is None
+        assert as_str(" 光缆 ") == "光缆"
+        assert as_int("12.0") == 12
+        assert as_float(" 1234.5 ") == 1234.5
+        assert as_float(float("nan")) is None
+        with pytest.raises(ValueError):
+            as_float("abc")
+        with pytest.raises(ValueError):
+            as_int("1.5")
+
+    def test_datetime(self):
+        """测试常见日期写法"""
+        assert as_datetime("2025/03/01 08:30:00") == datetime(2025, 3, 1, 8, 30)
+        assert as_datetime("2025-03-01") == datetime(2025, 3, 1)
+        assert as_datetime(datetime(2025, 1, 1)) == datetime(2025, 1, 1)
+        with pytest.raises(ValueError):
+            as_datetime("昨天")
+
+    def test_datetime_column(self):
+        """测试整列转换：按样本推断格式，少数其他写法逐个回退，无法解析的返回位置"""
+        values = ["2025/03/01 08:30:00", None, "2025/03/02 09:00:00", "2025-03-03", datetime(2025, 3, 4), "昨天", " "]
+        result, bad = normalize_datetime_column(values)
+        assert result == [datetime(2025, 3, 1, 8, 30), None, datetime(2025, 3, 2, 9), datetime(2025, 3, 3),
+                          datetime(2025, 3, 4), None, None]
+        assert bad == [5]
+        assert type(result[0]) is datetime
+        assert infer_datetime_format(["2025年03月01日", "x"]) == "%Y年%m月%d日"
+        assert infer_datetime_format(["昨天"]) is None
+
+    def test_datetime_format_reused(self):
+        """测试推断出的格式在后续批次沿用"""
+        column = DatetimeColumn()
+        column.convert(["2025-03-01 08:00", "2025-03-02 08:00"])
+        assert column.fmt == "%Y-%m-%d %H:%M"
+        result, bad = column.convert(["2025-04-01 10:15", "2025/04/02"])
+        assert result == [datetime(2025, 4, 1, 10, 15), datetime(2025, 4, 2)]
+        assert (bad, column.fmt) == ([], "%Y-%m-%d %H:%M")
+
+
+class TestTableMap:
+    """列映射测试"""
+
+    def test_resolve_headers(self):
+        """测试表头去空白、别名和包含匹配"""
+        columns = FAULT_RECORD_MAP.resolve(["序号", " 省-故障原因析", "故障处理时长(小时)", "无关列"])
+        assert [(i, spec.field) for i, spec in columns] == [
+            (0, "sequence_no"), (1, "province_cause_analysis"), (2, "fault_duration_hours"),
+        ]
+        columns = ZBK_MAP.resolve([h + "(%)" for h in ZBK_HEADER])
+        assert len(columns) == len(ZBK_HEADER)
+
+    def test_missing_required(self):
+        """测试缺少必填列时列出列名"""
+        with pytest.raises(FileUploadException) as exc:
+            ZBK_MAP.resolve(["指标项", "分值"])
+        assert "全省排名" in exc.value.message
+
+    def test_chunks_and_errors(self):
+        """测试分批、跳过行、空行和出错行号"""
+        table_map = TableMap(Zbk, [
+            FieldSpec("zbx", "指标项", nullable=False),
+            FieldSpec("fz", "分值", convert=as_float),
+        ], {"type": "kpi"})
+        rows = [("指标项", "分值"), ("说明行",)] + [(f"指标{i}", i) for i in range(5)] + [
+            (None, None), (None, 1), ("指标X", "x"),
+        ]
+        report = IngestReport()
+        chunks = list(iter_record_chunks(rows, table_map, 2, report, skip_rows=1))
+        assert [len(c) for c in chunks] == [2, 2, 1]
+        assert chunks[0][0] == {"type": "kpi", "zbx": "指标0", "fz": 0.0}
+        assert report.rows == 7
+        assert report.errors == ["第9行：指标项不能为空", "第10行：分值不是有效数字"]
+
+    def test_datetime_column_errors(self):
+        """测试日期时间列按批整列转换后仍按行号报告错误，错误顺序与逐行转换一致"""
+        rows = [("序号", "发生时间", "故障名称")] + [
+            (i, f"2025-04-01 08:{i:02d}:00", f"故障{i}") for i in range(1, 4)
+        ] + [(4, "明天", None), (5, "", "故障5"), (6, "2025/04/02", "故障6")]
+        report = IngestReport()
+        table_map = TableMap(FaultRecord, [
+            FieldSpec("sequence_no", "序号", convert=as_int),
+            FieldSpec("start_time", "发生时间", convert=as_datetime),
+            FieldSpec("fault_name", "故障名称", nullable=False),
+        ])
+        chunks = list(iter_record_chunks(rows, table_map, 4, report))
+        assert [[r["start_time"] for r in c] for c in chunks] == [
+            [datetime(2025, 4, 1, 8, i) for i in range(1, 4)], [None, datetime(2025, 4, 2)],
+        ]
+        assert report.errors == ["第5行：发生时间不是有效的日期时间", "第5行：故障名称不能为空"]
+        assert (report.rows, report.rejected) == (6, 1)
+
+
+class TestSheetReader:
+    """表格逐行读取测试"""
+
+    def test_xlsx_and_csv(self, tmp_path):
+        """测试xlsx和带BOM的csv读取结果一致"""
+        rows = [("序号", "故障名称"), (1, "光缆中断")]
+        assert list(iter_sheet_rows(xlsx_bytes(rows), "a.xlsx")) == rows
+
+        path = tmp_path / "a.csv"
+        path.write_text("序号,故障名称\n1,光缆中断\n", encoding="utf-8-sig")
+        assert list(iter_sheet_rows(str(path))) == [("序号", "故障名称"), ("1", "光缆中断")]
+        assert read_upload_frame("a.csv", path.read_bytes()).columns.tolist() == ["序号", "故障名称"]
+
+    def test_parquet_rows(self, tmp_path):
+        """测试parquet按批读取，时间列为datetime"""
+        pa = pytest.importorskip("pyarrow")
+        pq = pytest.importorskip("pyarrow.parquet")
+        path = tmp_path / "a.parquet"
+        pq.write_table(pa.table({"序号": [1, 2], "发生时间": [datetime(2025, 1, 1, 8), None]}), path)
+        assert list(iter_sheet_rows(str(path))) == [("序号", "发生时间"), (1, datetime(2025, 1, 1, 8)), (2, None)]
+
+    def test_parquet_without_pyarrow(self, monkeypatch):
+        """测试未安装pyarrow时提示安装"""
+        monkeypatch.setattr(ingest_module, "pq", None)
+        with pytest.raises(FileUploadException) as exc:
+            list(iter_sheet_rows(b"PAR1", "a.parquet"))
+        assert "pyarrow" in exc.value.message
+
+    def test_bad_files(self):
+        """测试不支持的格式、损坏的文件和不存在的工作表"""
+        with pytest.raises(FileUploadException):
+            list(iter_sheet_rows(b"x", "a.txt"))
+        with pytest.raises(FileUploadException):
+            list(iter_sheet_rows(b"not a zip", "a.xlsx"))
+        with pytest.raises(FileUploadException):
+            list(iter_sheet_rows(xlsx_bytes([("a",)]), "a.xlsx", sheet="leftTop"))
+
+
+class TestUploadIngest:
+    """上传接口导入测试"""
+
+    @pytest.fixture
+    async def clean_tables(self, db_session):
+        yield
+        await db_session.execute(delete(Zbk))
+        await db_session.execute(delete(PUEData))
+        await db_session.commit()
+
+    @pytest.mark.asyncio
+    async def test_zbk_upload(self, client: TestClient, db_session, clean_tables):
+        """测试指标库上传写入指标类型，缺少必要的列时返回400"""
+        good = xlsx_bytes([ZBK_HEADER, ["指标A"] + ["1"] * 12, ["指标B"] + ["2"] * 12])
+        response = client.post("/upload-kpi-excel", files={"file": ("kpi.xlsx", good)}, follow_redirects=False)
+        assert response.status_code == 303
+        result = await db_session.execute(select(Zbk.zbx, Zbk.type).order_by(Zbk.xh))
+        assert result.all() == [("指标A", "kpi"), ("指标B", "kpi")]
+
+        missing = xlsx_bytes([ZBK_HEADER[:3], ["指标C", "1", "1"]])
+        response = client.post("/upload-excel", files={"file": ("c.xlsx", missing)}, follow_redirects=False)
+        assert response.status_code == 400
+        assert "缺少必要的列" in response.json()["message"]
+
+    @pytest.mark.asyncio
+    async def test_csv_upload(self, client: TestClient, db_session, clean_tables):
+        """测试指标库上传CSV与xlsx使用同一列映射"""
+        csv = (",".join(ZBK_HEADER) + "\n" + ",".join(["指标C"] + ["3"] * 12) + "\n").encode("utf-8-sig")
+        response = client.post("/upload-excel", files={"file": ("c.csv", csv)}, follow_redirects=False)
+        assert response.status_code == 303
+        result = await db_session.execute(select(Zbk.zbx, Zbk.type, Zbk.fz))
+        assert result.all() == [("指标C", "contract", "3")]
+
+    @pytest.mark.asyncio
+    async def test_pue_upload_strict(self, client: TestClient, db_session, clean_tables):
+        """测试PUE上传：数值错误时返回行号并回滚，正确时写入"""
+        header = ["地点", "月份", "PUE值", "年份"]
+        bad = xlsx_bytes([header, ["宝城", "1", "1.5", "2025"], ["宝城", "2", "高", "2025"]])
+        response = client.post("/upload-pue-excel", files={"file": ("p.xlsx", bad)}, follow_redirects=False)
+        assert response.status_code == 400
+        assert response.json()["details"]["errors"] == ["第3行：PUE值不是有效数字"]
+        result = await db_session.execute(select(PUEData))
+        assert result.scalars().all() == []
+
+        good = xlsx_bytes([header, ["宝城", "1", "1.5", "2025"]])
+        response = client.post("/upload-pue-excel", files={"file": ("p.xlsx", good)}, follow_redirects=False)
+        assert response.status_code == 303
+        result = await db_session.execute(select(PUEData.location, PUEData.pue_value))
+        assert result.all() == [("宝城", 1.5)]
+
+
+class TestFaultDedup:
+    """故障记录按业务键去重测试"""
+
+    @pytest.fixture
+    async def clean_faults(self, db_session):
+        yield
+        await db_session.execute(delete(FaultRecord))
+        await db_session.commit()
+
+    @pytest.mark.asyncio
+    async def test_reimport_is_idempotent(self, db_session, clean_faults):
+        """测试文件内重复和再次导入同一文件都计为重复，不会重复写入"""
+        rows = [("序号", "故障名称", "发生时间", "故障处理时长（小时）")] + [
+            (i, f"故障{i}", f"2025-03-{i:02d} 08:00:00", i) for i in range(1, 6)
+        ] + [(1, " 故障1 ", "2025/03/01 08:00:00", 9), (None, None, None, 1)]
+
+        async def run():
+            sink = dedup_insert_sink(FaultRecord, FAULT_NATURAL_KEY)
+            return await ingest(db_session, rows, FAULT_RECORD_MAP, chunk_size=2, sink=sink)
+
+        first = await run()
+        assert (first["total"], first["inserted"], first["duplicate_count"]) == (7, 6, 1)
+        second = await run()
+        assert (second["inserted"], second["duplicate_count"]) == (1, 6)
+
+        result = await db_session.execute(select(FaultRecord.fault_name).where(FaultRecord.sequence_no == 1))
+        assert result.scalars().all() == ["故障1"]
+
+    def test_lookup_is_scoped_to_chunk(self):
+        """测试去重查询按本批发生时间和序号的范围限定，不扫描整张表"""
+        keys = [(1, datetime(2025, 3, 1, 8), "故障1"), (5, datetime(2025, 3, 5, 8), "故障5"), (None, None, "故障6")]
+        sql = str(ingest_module.existing_keys_query(FaultRecord, FAULT_NATURAL_KEY, keys))
+        assert "fault_record.sequence_no BETWEEN" in sql
+        assert "fault_record.start_time BETWEEN" in sql
+        assert "fault_record.start_time IS NULL" in sql
+        assert "fault_name IN" not in sql
+
+    @pytest.mark.asyncio
+    async def test_unique_index_ignores_racing_insert(self, db_session, clean_faults, monkeypatch):
+        """测试查重之后才被其他导入写入的记录由唯一索引忽略，计为重复"""
+        record = {"sequence_no": 1, "fault_name": "故障1", "start_time": datetime(2025, 3, 1, 8)}
+        db_session.add(FaultRecord(**record))
+        await db_session.commit()
+        # 模拟查重时另一个导入尚未提交
+        monkeypatch.setattr(ingest_module, "split_new_records", lambda records, key_fields, existing: records)
+        sink = dedup_insert_sink(FaultRecord, FAULT_NATURAL_KEY)
+        assert await sink(db_session, [dict(record), {**record, "sequence_no": 2}]) == 1
+
+    def test_upload_endpoint_reports_duplicates(self, client: TestClient, db_session, clean_faults):
+        """测试挂载在应用上的上传接口，再次上传同一文件全部计为重复"""
+        content = "序号,故障名称,发生时间\n1,故障1,2025-03-01 08:00:00\n2,故障2,2025-03-02 08:00:00\n".encode("utf-8")
+        assert "/fault/import_fault_data" in {route.path for route in fault_router.routes}
+
+        def upload():
+            response = client.post("/fault/upload_fault_data", data={"skip_first_row": "false"},
+                                   files={"file": ("faults.csv", content, "text/csv")})
+            assert response.status_code == 200
+            return response.json()
+
+        assert (upload()["success_count"], upload()["duplicate_count"]) == (2, 2)
+
+    @pytest.mark.asyncio
+    async def test_form_duplicate_returns_409(self, client: TestClient, db_session, clean_faults):
+        """测试新增和编辑表单与已有记录的业务键相同时返回409，而不是500"""
+        form = {"sequence_no": "1", "fault_name": "故障1", "start_time": "2025-03-01T08:00"}
+        assert client.post("/fault/add_fault_data", data=form, follow_redirects=False).status_code == 303
+        response = client.post("/fault/add_fault_data", data=form, follow_redirects=False)
+        assert response.status_code == 409
+        assert "已存在" in response.json()["message"]
+
+        assert client.post("/fault/add_fault_data", data={**form, "sequence_no": "2"}, follow_redirects=False).status_code == 303
+        other = (await db_session.execute(select(FaultRecord.id).where(FaultRecord.sequence_no == 2))).scalar_one()
+        assert client.post(f"/fault/edit_fault_data/{other}", data=form, follow_redirects=False).status_code == 409
+        assert client.post("/fault/edit_fault_data/999999", data=form, follow_redirects=False).status_code == 404
@@ -0,0 +1,116 @@
+"""
+大模型客户端测试
+测试续写、缓存、并发上限、超时预算和AI分析接口
+"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from db.models import PUEData
+from utils.llm_client import (
+    CONTINUE_PROMPT,
+    NOT_CONFIGURED_MESSAGE,
+    TIMEOUT_MESSAGE,
+    DeepSeekBackend,
+    LLMClient,
+    StubBackend,
+    clean_ai_output,
+)
+
+
+class SequenceBackend(StubBackend):
+    """按顺序返回预设内容的桩后端"""
+
+    def __init__(self, replies):
+        super().__init__()
+        self.replies = list(replies)
+
+    async def chat(self, messages, **kwargs):
+        self.calls.append(list(messages))
+        return self.replies.pop(0)
+
+
+class SlowBackend(StubBackend):
+    """记录同时进行的调用数的慢速桩后端"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+
+    async def chat(self, messages, **kwargs):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return "完成"
+
+
+class TestLLMClient:
+    """大模型客户端测试"""
+
+    def test_clean_ai_output(self):
+        """测试去除思考过程和markdown符号"""
+        assert clean_ai_output("<think>推理</think>\n## 结论\n- **上升**") == "结论\n上升"
+
+    @pytest.mark.asyncio
+    async def test_continuation_rounds(self):
+        """测试长输出自动续写"""
+        backend = SequenceBackend(["甲" * 950, "乙已完成", "不应调用"])
+        result = await LLMClient(backend).analyze("提示", max_rounds=3)
+        assert result == "甲" * 950 + "乙已完成"
+        assert len(backend.calls) == 2
+        assert backend.calls[1][-1]["content"] == CONTINUE_PROMPT
+
+    @pytest.mark.asyncio
+    async def test_cache_by_input(self):
+        """测试相同输入命中缓存，不同输入重新调用"""
+        backend = StubBackend()
+        client = LLMClient(backend)
+        first = await client.analyze("数据A")
+        assert await client.analyze("数据A") == first
+        await client.analyze("数据B")
+        assert len(backend.calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_bounded_concurrency(self):
+        """测试并发调用数不超过上限"""
+        backend = SlowBackend(0.02)
+        client = LLMClient(backend, max_concurrency=2)
+        await asyncio.gather(*(client.analyze(f"数据{i}") for i in range(6)))
+        assert backend.peak == 2
+
+    @pytest.mark.asyncio
+    async def test_timeout_budget_not_cached(self):
+        """测试超时返回提示且不缓存失败结果"""
+        backend = SlowBackend(1)
+        client = LLMClient(backend, request_timeout=0.05, total_timeout=0.05)
+        assert await client.analyze("数据") == TIMEOUT_MESSAGE
+        backend.delay = 0
+        assert await client.analyze("数据") == "完成"
+
+    @pytest.mark.asyncio
+    async def test_missing_api_key(self):
+        """测试未配置密钥时不发起请求"""
+        client = LLMClient(DeepSeekBackend("https://example.invalid/chat/completions", ""))
+        assert await client.analyze("数据") == NOT_CONFIGURED_MESSAGE
+
+
+class TestAIAnalysisEndpoint:
+    """AI分析接口测试（使用桩后端）"""
+
+    @pytest.mark.asyncio
+    async def test_pue_ai_analysis(self, client: TestClient, db_session):
+        """测试PUE AI分析接口返回桩后端结果"""
+        record = PUEData(location="AI机房", year="2025", month="1", pue_value=1.5)
+        db_session.add(record)
+        await db_session.commit()
+        data = client.get("/pue_ai_analysis", params={"location": "AI机房"}).json()
+        assert data["ai_analysis"].startswith("【离线分析】")
+        await db_session.delete(record)
+        await db_session.commit()
@@ -0,0 +1,72 @@
+"""
+AI提示词统计摘要测试
+测试月序号解析、趋势与异常点统计，以及摘要大小不随历史增长
+"""
+
+import math
+
+import pandas as pd
+import pytest
+
+from pue import build_pue_ai_prompt
+from utils.prompt_digest import build_digest, estimate_csv_chars, month_index
+
+
+def _pue_frame(locations, years):
+    rows = []
+    for loc_no, location in enumerate(locations):
+        for year in years:
+            for month in range(1, 13):
+                t = (year - years[0]) * 12 + month - 1
+                value = 1.4 + 0.01 * loc_no + 0.05 * math.sin(month / 12 * 2 * math.pi) + 0.002 * t
+                rows.append({"month": str(month), "location": location, "pue_value": value, "year": str(year)})
+    return pd.DataFrame(rows)
+
+
+class TestPromptDigest:
+    """统计摘要测试"""
+
+    def test_month_index(self):
+        """测试年月两列和单列月份的解析"""
+        assert month_index(pd.Series(["2025"]), pd.Series(["3"])).tolist() == [2025 * 12 + 2]
+        parsed = month_index(None, pd.Series(["2025-01", "2025年12月", "7", "abc"]))
+        assert parsed[:3].tolist() == [2025 * 12, 2025 * 12 + 11, 6]
+        assert math.isnan(parsed[3])
+
+    def test_trend_and_outlier(self):
+        """测试趋势斜率和异常点"""
+        df = _pue_frame(["A"], [2023, 2024])
+        df.loc[5, "pue_value"] = 3.0
+        digest, stats = build_digest(
+            df.assign(period=month_index(df["year"], df["month"])), "location", ["pue_value"], entity_label="地点",
+        )
+        assert "A：均值" in digest
+        assert "异常点：A 2023-06 3" in digest
+        assert "季节指数" in digest
+        assert stats["rows"] == 24
+
+    def test_digest_size_flat_as_history_grows(self):
+        """测试历史增长时摘要大小基本不变，压缩比上升"""
+        locations = [f"机房{i}" for i in range(30)]
+        _, small = build_pue_ai_prompt(_pue_frame(locations, [2024]))
+        prompt, large = build_pue_ai_prompt(_pue_frame(locations, list(range(2016, 2026))))
+        assert large["raw_chars"] > 9 * small["raw_chars"]
+        assert large["digest_chars"] < small["digest_chars"] * 1.2
+        assert large["compression_ratio"] > small["compression_ratio"]
+        # 超出上限的地点合并为一行
+        assert "其余10个地点" in prompt
+
+    def test_raw_size_estimate(self):
+        """测试小表按实际CSV计算，大表抽样估算且误差在5%以内"""
+        small = _pue_frame(["A"], [2024])
+        assert estimate_csv_chars(small) == len(small.to_csv(index=False))
+        large = _pue_frame([f"机房{i}" for i in range(30)], list(range(2016, 2026)))
+        exact = len(large.to_csv(index=False))
+        assert abs(estimate_csv_chars(large) - exact) < exact * 0.05
+
+    def test_empty_frame(self):
+        """测试无有效月份时输出提示"""
+        df = pd.DataFrame({"city": ["深圳"], "month": ["abc"], "v": [1.0]})
+        digest, stats = build_digest(df.assign(period=month_index(None, df["month"])), "city", ["v"])
+        assert digest == "暂无可统计的数据。"
+        assert stats["rows"] == 0
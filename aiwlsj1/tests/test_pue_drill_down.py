@@ -0,0 +1,106 @@
+"""
+PUE下钻数据接口测试
+测试分页、字段选择、地点匹配和压缩
+"""
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from db.models import PUEDrillDownData
+from pue import DRILL_DOWN_FIELDS, DRILL_DOWN_SUMMARY_FIELDS, _resolve_drill_down_fields
+
+
+class TestDrillDownFields:
+    """字段选择参数解析测试"""
+
+    def test_default_returns_all_fields(self):
+        """测试默认返回全部字段"""
+        assert _resolve_drill_down_fields(None) == DRILL_DOWN_FIELDS
+        assert _resolve_drill_down_fields("all") == DRILL_DOWN_FIELDS
+
+    def test_summary_preset(self):
+        """测试摘要字段预设"""
+        fields = _resolve_drill_down_fields("summary")
+        assert fields == DRILL_DOWN_SUMMARY_FIELDS
+        assert "detailed_situation" not in fields
+
+    def test_custom_fields_always_include_id(self):
+        """测试自定义字段列表始终包含id"""
+        assert _resolve_drill_down_fields("executor, work_type") == ["id", "executor", "work_type"]
+
+    def test_unknown_field_rejected(self):
+        """测试未知字段返回400"""
+        with pytest.raises(HTTPException) as exc_info:
+            _resolve_drill_down_fields("executor,password")
+        assert exc_info.value.status_code == 400
+
+
+class TestDrillDownEndpoint:
+    """下钻数据接口测试"""
+
+    @pytest.fixture
+    async def drill_down_rows(self, db_session):
+        """创建测试下钻数据"""
+        rows = [
+            PUEDrillDownData(
+                location="测试机房A" if i % 3 else "测试机房A-分区",
+                year="2025", month="1", sequence_no=i,
+                work_type="巡检", check_item=f"检查项{i}",
+                detailed_situation="详细情况" * 50, executor="张三",
+            )
+            for i in range(1, 31)
+        ]
+        db_session.add_all(rows)
+        await db_session.commit()
+        yield rows
+        for row in rows:
+            await db_session.delete(row)
+        await db_session.commit()
+
+    def test_pagination_and_summary(self, client: TestClient, drill_down_rows):
+        """测试分页与摘要字段"""
+        response = client.get("/pue_drill_down_data", params={
+            "location": "测试机房A", "match": "exact", "year": "2025", "month": "1",
+            "fields": "summary", "page": 1, "page_size": 5,
+        })
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 20
+        assert len(data["data"]) == 5
+        assert data["has_more"] is True
+        assert set(data["data"][0]) == set(DRILL_DOWN_SUMMARY_FIELDS)
+
+        last_page = client.get("/pue_drill_down_data", params={
+            "location": "测试机房A", "match": "exact", "page": 4, "page_size": 5,
+        }).json()
+        assert last_page["has_more"] is False
+
+    def test_prefix_match(self, client: TestClient, drill_down_rows):
+        """测试前缀匹配包含分区机房"""
+        data = client.get("/pue_drill_down_data", params={"location": "测试机房", "match": "prefix", "page_size": 100}).json()
+        assert data["total"] == 30
+
+    def test_default_contains_match(self, client: TestClient, drill_down_rows):
+        """测试未指定匹配方式时仍按子串匹配，与原接口一致"""
+        data = client.get("/pue_drill_down_data", params={"location": "机房", "page_size": 100}).json()
+        assert data["total"] == 30
+        prefix = client.get("/pue_drill_down_data", params={"location": "机房", "match": "prefix"}).json()
+        assert prefix["total"] == 0
+
+    def test_item_detail(self, client: TestClient, drill_down_rows):
+        """测试按ID获取完整记录"""
+        response = client.get(f"/pue_drill_down_data/{drill_down_rows[0].id}")
+        assert response.status_code == 200
+        assert response.json()["data"]["detailed_situation"].startswith("详细情况")
+
+        assert client.get("/pue_drill_down_data/999999").status_code == 404
+
+    def test_large_response_gzipped(self, client: TestClient, drill_down_rows):
+        """测试大响应启用gzip压缩"""
+        response = client.get(
+            "/pue_drill_down_data",
+            params={"location": "测试机房", "page_size": 100},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        assert response.headers.get("content-encoding") == "gzip"
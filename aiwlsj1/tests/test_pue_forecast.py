@@ -0,0 +1,107 @@
+"""
+PUE预测引擎测试
+测试矩阵构造、季节趋势拟合、异常检测和风险排名
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+import pue_forecast
+from db.models import PUEData
+from pue_forecast import build_pue_matrix, compute_pue_outlook, refresh_pue_outlook, slice_outlook
+
+
+def _seasonal_records(location, base, slope_per_year=0.0, years=(2023, 2024, 2025), last_month=8):
+    records = []
+    for year in years:
+        for month in range(1, 13):
+            if year == years[-1] and month > last_month:
+                break
+            t = (year - years[0]) * 12 + month - 1
+            value = base + 0.08 * math.sin((month - 1) / 12 * 2 * math.pi) + slope_per_year * t / 12
+            records.append((location, str(year), str(month), value))
+    return records
+
+
+class TestPueForecast:
+    """PUE预测引擎测试"""
+
+    def test_build_matrix_averages_duplicates(self):
+        """测试同月多条取平均、非法年月被忽略"""
+        locations, start, matrix = build_pue_matrix([
+            ("A", "2025", "1", 1.4), ("A", "2025", "1", 1.6),
+            ("B", "2025", "3", 1.5), ("B", "abc", "3", 9.9),
+        ])
+        assert locations == ["A", "B"]
+        assert start == 2025 * 12
+        assert matrix.shape == (2, 3)
+        assert matrix[0, 0] == pytest.approx(1.5)
+        assert np.isnan(matrix[0, 2])
+
+    def test_forecast_follows_season_and_trend(self):
+        """测试预测延续季节性和趋势"""
+        outlook = compute_pue_outlook(_seasonal_records("A", 1.4, slope_per_year=0.05))
+        assert outlook["last_period"] == "2025-08"
+        assert outlook["forecast_months"][:2] == ["2025-09", "2025-10"]
+        item = outlook["locations"][0]
+        assert item["slope_per_year"] == pytest.approx(0.05, abs=0.005)
+        expected_sep = 1.4 + 0.08 * math.sin(8 / 12 * 2 * math.pi) + 0.05 * 32 / 12
+        assert item["forecast"][0] == pytest.approx(expected_sep, abs=0.01)
+        assert item["anomalies"] == []
+
+    def test_anomaly_and_risk_ranking(self):
+        """测试异常点检测和风险排序"""
+        records = _seasonal_records("稳定机房", 1.35) + _seasonal_records("上升机房", 1.55, slope_per_year=0.1)
+        records = [
+            (loc, y, m, v + 0.4 if (loc, y, m) == ("稳定机房", "2025", "6") else v)
+            for loc, y, m, v in records
+        ]
+        outlook = compute_pue_outlook(records)
+        assert [r["location"] for r in outlook["risk_ranking"]] == ["上升机房", "稳定机房"]
+        stable = next(r for r in outlook["locations"] if r["location"] == "稳定机房")
+        assert [a["period"] for a in stable["anomalies"]] == ["2025-06"]
+        assert outlook["anomaly_count"] >= 1
+
+    def test_empty_input(self):
+        """测试无数据"""
+        outlook = compute_pue_outlook([])
+        assert outlook["locations"] == []
+        assert outlook["last_period"] is None
+
+    def test_slice_outlook(self):
+        """测试按预测月数和地点裁剪"""
+        outlook = compute_pue_outlook(_seasonal_records("A", 1.4) + _seasonal_records("B", 1.5))
+        sliced = slice_outlook(outlook, 3, location="B")
+        assert sliced["forecast_months"] == outlook["forecast_months"][:3]
+        assert [r["location"] for r in sliced["locations"]] == ["B"]
+        assert len(sliced["locations"][0]["forecast"]) == 3
+
+    @pytest.mark.asyncio
+    async def test_refresh_from_database(self, db_session):
+        """测试数据变更后重新计算缓存"""
+        db_session.add_all([PUEData(location=loc, year=y, month=m, pue_value=v) for loc, y, m, v in _seasonal_records("缓存机房", 1.45)])
+        await db_session.commit()
+
+        pue_forecast._outlook_cache["version"] += 1
+        result = await refresh_pue_outlook(db_session)
+        assert "缓存机房" in [r["location"] for r in result["locations"]]
+        assert pue_forecast._outlook_cache["computed_version"] == pue_forecast._outlook_cache["version"]
+
+    @pytest.mark.asyncio
+    async def test_not_cached_when_changed_during_refresh(self, db_session, monkeypatch):
+        """测试计算期间有写入使版本变化时，结果照常返回但不写入缓存"""
+        cached = pue_forecast._outlook_cache["result"]
+        pue_forecast._outlook_cache["version"] += 1
+        stale_version = pue_forecast._outlook_cache["version"]
+
+        def compute_then_write(rows):
+            pue_forecast._outlook_cache["version"] += 1
+            return compute_pue_outlook(rows)
+
+        monkeypatch.setattr(pue_forecast, "compute_pue_outlook", compute_then_write)
+        result = await refresh_pue_outlook(db_session)
+        assert "locations" in result
+        assert pue_forecast._outlook_cache["result"] is cached
+        assert pue_forecast._outlook_cache["computed_version"] < stale_version
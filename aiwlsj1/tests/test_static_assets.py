@@ -0,0 +1,151 @@
+"""
+静态资源构建与预压缩服务测试
+测试指纹文件名、CSS引用改写、.gz预压缩、清单驱动的 static_url 以及按Accept-Encoding发送
+"""
+
+import gzip
+import json
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import build_static_assets
+from utils import static_files
+from utils.static_files import CachedStaticFiles, FINGERPRINT_RE, load_asset_manifest, static_url
+
+JS = b"var chart = {};\n" * 200
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / "js").mkdir()
+    (tmp_path / "css").mkdir()
+    (tmp_path / "font").mkdir()
+    (tmp_path / "js" / "echarts.min.js").write_bytes(JS)
+    (tmp_path / "js" / "tiny.js").write_bytes(b"1;")
+    (tmp_path / "font" / "digit.TTF").write_bytes(b"\x00\x01font" * 400)
+    (tmp_path / "css" / "index.css").write_text(
+        "@font-face{src:url(../font/digit.TTF)}\n"
+        ".a{background:url('/static/js/tiny.js?v=1')}\n"
+        ".b{background:url(data:image/png;base64,AAAA)}\n"
+        ".c{background:url(../images/missing.png)}\n",
+        encoding="utf-8",
+    )
+    return tmp_path
+
+
+@pytest.fixture
+def restore_manifest():
+    yield
+    static_files._manifest.clear()
+
+
+class TestBuildStaticAssets:
+    """构建步骤测试"""
+
+    def test_fingerprint_and_compress(self, static_dir):
+        """测试生成指纹文件和.gz，原文件保留"""
+        manifest = build_static_assets.build_static_assets(str(static_dir))
+        built = manifest["files"]["js/echarts.min.js"]
+        assert FINGERPRINT_RE.search(built)
+        assert built.startswith("js/echarts.min.") and built.endswith(".js")
+        assert (static_dir / built).read_bytes() == JS
+        assert gzip.decompress((static_dir / (built + ".gz")).read_bytes()) == JS
+        assert (static_dir / "js" / "echarts.min.js.gz").exists()
+        # 太小的文件不压缩
+        assert not (static_dir / "js" / "tiny.js.gz").exists()
+        assert json.loads((static_dir / "manifest.json").read_text(encoding="utf-8")) == manifest
+
+    def test_css_urls_rewritten(self, static_dir):
+        """测试CSS中引用的字体和绝对路径改写为指纹文件名，其他引用不变"""
+        manifest = build_static_assets.build_static_assets(str(static_dir))
+        css = (static_dir / manifest["files"]["css/index.css"]).read_text(encoding="utf-8")
+        font = manifest["files"]["font/digit.TTF"].split("/")[-1]
+        tiny = manifest["files"]["js/tiny.js"]
+        assert f"url(../font/{font})" in css
+        assert f"url('/static/{tiny}?v=1')" in css
+        assert "url(data:image/png;base64,AAAA)" in css
+        assert "url(../images/missing.png)" in css
+
+    def test_rebuild_and_clean(self, static_dir):
+        """测试重复构建不会把生成文件当作源文件，清理后恢复原状"""
+        original = sorted(p.relative_to(static_dir).as_posix() for p in static_dir.rglob("*") if p.is_file())
+        first = build_static_assets.build_static_assets(str(static_dir))
+        second = build_static_assets.build_static_assets(str(static_dir))
+        assert first == second
+        assert build_static_assets.clean_static_assets(str(static_dir)) == len(first["generated"]) + 1
+        assert sorted(p.relative_to(static_dir).as_posix() for p in static_dir.rglob("*") if p.is_file()) == original
+
+
+class TestStaticUrl:
+    """模板辅助函数测试"""
+
+    def test_manifest_lookup(self, static_dir, restore_manifest):
+        """测试构建后返回指纹URL，未构建的文件原样返回"""
+        manifest = build_static_assets.build_static_assets(str(static_dir))
+        load_asset_manifest(str(static_dir))
+        assert static_url("/js/echarts.min.js") == "/static/" + manifest["files"]["js/echarts.min.js"]
+        assert static_url("images/移动logo.png") == "/static/images/%E7%A7%BB%E5%8A%A8logo.png"
+
+    def test_without_manifest(self, tmp_path, restore_manifest):
+        """测试未构建时使用原始文件名"""
+        assert load_asset_manifest(str(tmp_path)) == {}
+        assert static_url("js/echarts.min.js") == "/static/js/echarts.min.js"
+
+
+class TestCachedStaticFiles:
+    """预压缩文件服务测试"""
+
+    @pytest.fixture
+    def static_client(self, static_dir):
+        manifest = build_static_assets.build_static_assets(str(static_dir))
+        app = FastAPI()
+        app.mount("/static", CachedStaticFiles(directory=str(static_dir)), name="static")
+        return TestClient(app), manifest
+
+    def test_precompressed_variant(self, static_client):
+        """测试客户端接受gzip时发送.gz，指纹文件永久缓存"""
+        client, manifest = static_client
+        url = "/static/" + manifest["files"]["js/echarts.min.js"]
+        response = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["content-type"].startswith(("text/javascript", "application/javascript"))
+        assert "immutable" in response.headers["cache-control"]
+        assert response.content == JS
+
+        etag = response.headers["etag"]
+        response = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert response.status_code == 304
+
+    def test_identity_when_not_accepted(self, static_client):
+        """测试不接受压缩（或q=0）时发送原文件"""
+        client, manifest = static_client
+        url = "/static/" + manifest["files"]["js/echarts.min.js"]
+        for accept in ("identity", "gzip;q=0"):
+            response = client.get(url, headers={"Accept-Encoding": accept})
+            assert response.status_code == 200
+            assert "content-encoding" not in response.headers
+            assert response.headers["content-length"] == str(len(JS))
+
+    def test_stale_variant_skipped(self, static_client, static_dir):
+        """测试源文件在压缩后被修改时不发送过期的.gz"""
+        client, _ = static_client
+        source = static_dir / "js" / "echarts.min.js"
+        variant_mtime = os.stat(str(source) + ".gz").st_mtime
+        source.write_bytes(b"var chart = {updated: true};\n" * 200)
+        os.utime(source, (variant_mtime + 10, variant_mtime + 10))
+
+        response = client.get("/static/js/echarts.min.js", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+        assert response.content == source.read_bytes()
+
+    def test_unfingerprinted_cache_policy(self, static_client):
+        """测试未带指纹的自有文件仍按协商缓存，大写后缀的字体长期缓存"""
+        client, _ = static_client
+        assert client.get("/static/js/tiny.js").headers["cache-control"] == "no-cache"
+        assert "immutable" in client.get("/static/font/digit.TTF").headers["cache-control"]
@@ -0,0 +1,127 @@
+"""
+流式导出模块测试
+测试CSV/XLSX/NDJSON/Parquet分块输出、导出列选择和数据库流式读取
+"""
+
+import io
+from contextlib import nullcontext
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from openpyxl import load_workbook
+from sqlalchemy.future import select
+
+from db.models import PUEDrillDownData
+from utils import streaming_export
+from utils.streaming_export import (
+    column,
+    iter_query_rows,
+    select_fields,
+    split_multi,
+    stream_csv,
+    stream_ndjson,
+    stream_parquet,
+    stream_xlsx,
+    streaming_export_response,
+)
+
+COLUMNS = [column("名称", "name"), column("数值", "value"), column("时间", "ts")]
+
+
+async def _rows(count):
+    for i in range(count):
+        yield SimpleNamespace(name=f"行{i}\x07", value=i, ts=datetime(2025, 1, 1, 8, 30))
+
+
+async def _collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+class TestStreamingExport:
+    """流式导出测试"""
+
+    @pytest.mark.asyncio
+    async def test_stream_csv(self):
+        """测试CSV输出包含BOM、表头和格式化的时间"""
+        chunks = [chunk async for chunk in stream_csv(_rows(5000), COLUMNS)]
+        assert len(chunks) > 1
+        text = b"".join(chunks).decode("utf-8")
+        lines = text.splitlines()
+        assert lines[0] == "\ufeff名称,数值,时间"
+        assert len(lines) == 5001
+        assert lines[1].endswith("2025-01-01 08:30:00")
+
+    @pytest.mark.asyncio
+    async def test_stream_ndjson(self):
+        """测试NDJSON每行一个对象，键为表头，时间格式与CSV一致"""
+        chunks = [chunk async for chunk in stream_ndjson(_rows(3000), COLUMNS)]
+        assert len(chunks) > 1
+        lines = b"".join(chunks).decode("utf-8").splitlines()
+        assert len(lines) == 3000
+        assert json.loads(lines[1]) == {"名称": "行1\x07", "数值": 1, "时间": "2025-01-01 08:30:00"}
+
+    @pytest.mark.asyncio
+    async def test_stream_xlsx(self):
+        """测试XLSX输出可被读取且去除了非法字符"""
+        content = await _collect(stream_xlsx(_rows(100), COLUMNS, sheet_name="数据"))
+        workbook = load_workbook(io.BytesIO(content), read_only=True)
+        sheet = workbook["数据"]
+        rows = list(sheet.iter_rows(values_only=True))
+        assert rows[0] == ("名称", "数值", "时间")
+        assert rows[1][0] == "行0"
+        assert len(rows) == 101
+
+    @pytest.mark.asyncio
+    async def test_stream_parquet(self):
+        """测试Parquet按批写入行组，类型与首批一致"""
+        pq = pytest.importorskip("pyarrow.parquet")
+        content = await _collect(stream_parquet(_rows(2500), COLUMNS, batch_rows=1000))
+        parquet = pq.ParquetFile(io.BytesIO(content))
+        assert parquet.metadata.num_rows == 2500
+        assert parquet.metadata.num_row_groups == 3
+        table = parquet.read()
+        assert table.column_names == ["名称", "数值", "时间"]
+        assert table.column("时间")[0].as_py() == datetime(2025, 1, 1, 8, 30)
+
+    def test_parquet_without_pyarrow(self, monkeypatch):
+        """测试未安装pyarrow时Parquet导出返回400"""
+        monkeypatch.setattr(streaming_export, "pq", None)
+        with pytest.raises(HTTPException) as exc:
+            streaming_export_response(_rows(1), COLUMNS, filename="导出", fmt="parquet")
+        assert exc.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_iter_query_rows(self, db_session):
+        """测试从数据库分块读取；数据只 flush 不提交，测试结束时随 db_session 回滚"""
+        db_session.add_all([PUEDrillDownData(location="导出机房", year="2025", month=str(m)) for m in range(1, 13)])
+        await db_session.flush()
+
+        query = select(PUEDrillDownData.location, PUEDrillDownData.month).where(PUEDrillDownData.location == "导出机房")
+        rows = [row async for row in iter_query_rows(query, chunk_size=5, session_factory=lambda: nullcontext(db_session))]
+        assert len(rows) == 12
+        assert rows[0].location == "导出机房"
+
+    def test_response_headers(self):
+        """测试下载响应头"""
+        response = streaming_export_response(_rows(1), COLUMNS, filename="导出", fmt="csv")
+        assert response.media_type.startswith("text/csv")
+        assert "attachment" in response.headers["content-disposition"]
+        assert response.headers["content-disposition"].endswith(".csv")
+
+    def test_split_multi(self):
+        """测试多值参数解析"""
+        assert split_multi(["a,b", "c", " "]) == ["a", "b", "c"]
+        assert split_multi(None) == []
+
+    def test_select_fields(self):
+        """测试按字段名或表头选择导出列，未知列返回400"""
+        fields = [("名称", "name"), ("数值", "value"), ("时间", "ts")]
+        assert select_fields(fields, []) == fields
+        assert select_fields(fields, ["ts", "名称", "name"]) == [("时间", "ts"), ("名称", "name")]
+        with pytest.raises(HTTPException) as exc:
+            select_fields(fields, ["name", "密码"])
+        assert exc.value.status_code == 400
+        assert "密码" in exc.value.detail
@@ -0,0 +1,107 @@
+"""
+红绿灯预警规则和汇聚骨干SQL汇总测试
+"""
+
+import pandas as pd
+import pytest
+
+from db.models import Huijugugan
+from huijugugan import _load_huiju_frame, build_huiju_wide, huiju_alert_rules
+from utils.traffic_light import GREEN, RED, YELLOW, CompareRule, ThresholdRule, evaluate_rules, split_by_level
+
+
+def _wide():
+    df = pd.DataFrame([
+        {"month": "2025-01", "city": "深圳", "huiju_amount": 10, "over_4h_ratio": 0.01},
+        {"month": "2025-01", "city": "广州", "huiju_amount": 20, "over_4h_ratio": 0.2},
+        {"month": "2025-02", "city": "深圳", "huiju_amount": 30, "over_4h_ratio": 0.06},
+        {"month": "2025-02", "city": "广州", "huiju_amount": 20, "over_4h_ratio": 0.0},
+        {"month": "2025-03", "city": "深圳", "huiju_amount": 5, "over_4h_ratio": 0.07},
+    ])
+    return df.pivot(index="month", columns="city", values=["huiju_amount", "over_4h_ratio"])
+
+
+class TestTrafficLightRules:
+    """预警规则测试"""
+
+    def test_compare_rule(self):
+        """测试对比规则，缺失数据的月份不预警"""
+        levels = evaluate_rules(_wide(), [CompareRule(["huiju_amount"], "深圳", "广州")])
+        assert levels.tolist() == [GREEN, RED, GREEN]
+
+    def test_threshold_rule(self):
+        """测试阈值规则及按实体限定"""
+        rule = ThresholdRule("over_4h_ratio", yellow=0.05, red=0.1)
+        assert evaluate_rules(_wide(), [rule]).tolist() == [RED, YELLOW, YELLOW]
+
+        only_shenzhen = ThresholdRule("over_4h_ratio", yellow=0.05, red=0.1, entities=["深圳"])
+        assert evaluate_rules(_wide(), [only_shenzhen]).tolist() == [GREEN, YELLOW, YELLOW]
+
+        missing = ThresholdRule("unknown", yellow=0)
+        assert evaluate_rules(_wide(), [missing]).tolist() == [GREEN, GREEN, GREEN]
+
+    def test_combined_levels(self):
+        """测试多规则取最高等级并按等级拆分"""
+        rules = [
+            CompareRule(["huiju_amount"], "深圳", "广州"),
+            ThresholdRule("over_4h_ratio", yellow=0.05, entities=["深圳"]),
+        ]
+        by_level = split_by_level(evaluate_rules(_wide(), rules))
+        assert by_level[RED] == ["2025-02"]
+        assert by_level[YELLOW] == ["2025-03"]
+        assert by_level[GREEN] == ["2025-01"]
+
+
+class TestHuijuAggregation:
+    """汇聚骨干SQL汇总测试"""
+
+    @pytest.fixture
+    async def huiju_rows(self, db_session):
+        rows = [
+            # 城市+月份 唯一，每个城市每月一条
+            Huijugugan(month="2025-01", city="深圳", huiju_amount=200, over_4h=40, important_amount=40, over_12h=4),
+            Huijugugan(month="2025-01", city="广州", huiju_amount=50, over_4h=5, important_amount=20, over_12h=1),
+        ]
+        db_session.add_all(rows)
+        await db_session.commit()
+        yield rows
+        for row in rows:
+            await db_session.delete(row)
+        await db_session.commit()
+
+    @pytest.mark.asyncio
+    async def test_sql_ratios(self, db_session, huiju_rows):
+        """测试按城市+月份汇总并在SQL中计算占比"""
+        df = await _load_huiju_frame(db_session)
+        shenzhen = df[df["city"] == "深圳"].iloc[0]
+        assert shenzhen["huiju_amount"] == 200
+        assert shenzhen["over_4h_ratio"] == pytest.approx(0.2)
+        assert shenzhen["over_12h_ratio"] == pytest.approx(0.1)
+
+        only = await _load_huiju_frame(db_session, "广州")
+        assert only["city"].tolist() == ["广州"]
+        assert only["over_12h_ratio"].iloc[0] == pytest.approx(0.05)
+
+    @pytest.mark.asyncio
+    async def test_default_rules(self, db_session, huiju_rows):
+        """测试默认规则：深圳任一指标大于广州为红灯"""
+        wide = build_huiju_wide(await _load_huiju_frame(db_session))
+        assert list(wide.columns.get_level_values(1).unique()) == ["深圳", "广州"]
+        assert split_by_level(evaluate_rules(wide, huiju_alert_rules()))[RED] == ["2025-01"]
+
+    def test_unlisted_city_kept(self):
+        """测试不在固定顺序中的城市保留在宽表和图表中，排在已知城市之后"""
+        from huijugugan import build_huiju_chart_options
+
+        df = pd.DataFrame([
+            {"month": "2025-01", "city": "惠州", "huiju_amount": 7, "over_4h": 1, "over_4h_ratio": 1 / 7,
+             "important_amount": 2, "over_12h": 0, "over_12h_ratio": 0.0},
+            {"month": "2025-01", "city": "深圳", "huiju_amount": 9, "over_4h": 0, "over_4h_ratio": 0.0,
+             "important_amount": 0, "over_12h": 0, "over_12h_ratio": 0.0},
+        ])
+        wide = build_huiju_wide(df)
+        assert list(wide.columns.get_level_values(1).unique()) == ["深圳", "惠州"]
+        assert wide[("huiju_amount", "惠州")].tolist() == [7]
+
+        bar = build_huiju_chart_options(df, "惠州")["bar_chart"]
+        assert bar["series"][0]["data"] == [7.0]
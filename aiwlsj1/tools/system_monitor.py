@@ -17,14 +17,18 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, text, func
 from pydantic import BaseModel
 
-from db.session import get_db
+from db.session import AsyncSessionLocal, get_db
 from db.models import (
     PUEData, FaultRecord, Huijugugan, Zbk, 
     PUEComment, PUEDrillDownData, SystemFaultLog
 )
 
+from config import settings
+from utils.event_bus import TOPIC_METRICS, TOPIC_SYSTEM_FAULT, event_bus, publish_event
+
 # 导入模板支持
 from fastapi import Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import HTMLResponse
 
 # 使用共享模板环境
@@ -131,6 +135,47 @@ async def check_database_health(db: AsyncSession = Depends(get_db)):
         logger.error(f"数据库健康检查失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"数据库健康检查失败: {str(e)}")
 
+def _collect_performance_metrics() -> PerformanceMetrics:
+    """采集CPU、内存、磁盘指标（psutil采样CPU会阻塞约1秒，需在线程中调用）"""
+    if HAS_PSUTIL:
+        # 使用psutil获取详细信息
+        cpu_percent = psutil.cpu_percent(interval=1)
+        memory = psutil.virtual_memory()
+        memory_percent = memory.percent
+        memory_used_mb = memory.used / (1024 * 1024)
+        memory_available_mb = memory.available / (1024 * 1024)
+        disk = psutil.disk_usage('.')
+        disk_usage_percent = (disk.used / disk.total) * 100
+    else:
+        # 基础监控（模拟数据）
+        cpu_percent = 25.0  # 模拟CPU使用率
+        memory_percent = 45.0  # 模拟内存使用率
+        memory_used_mb = 1024.0  # 模拟已用内存
+        memory_available_mb = 2048.0  # 模拟可用内存
+        disk_usage_percent = 60.0  # 模拟磁盘使用率
+
+    return PerformanceMetrics(
+        cpu_percent=cpu_percent,
+        memory_percent=memory_percent,
+        memory_used_mb=round(memory_used_mb, 2),
+        memory_available_mb=round(memory_available_mb, 2),
+        disk_usage_percent=round(disk_usage_percent, 2),
+        timestamp=datetime.utcnow()
+    )
+
+def _uptime_seconds() -> int:
+    if HAS_PSUTIL:
+        return int(time.time() - psutil.boot_time())
+    # 模拟运行时间 (1小时)
+    return 3600
+
+async def _database_health(db: AsyncSession) -> str:
+    try:
+        await db.execute(text("SELECT 1"))
+        return "正常"
+    except Exception:
+        return "异常"
+
 @router.get("/performance/metrics", response_model=PerformanceMetrics)
 async def get_performance_metrics():
     """
@@ -140,32 +185,7 @@ async def get_performance_metrics():
     - 磁盘使用情况
     """
     try:
-        if HAS_PSUTIL:
-            # 使用psutil获取详细信息
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            memory_percent = memory.percent
-            memory_used_mb = memory.used / (1024 * 1024)
-            memory_available_mb = memory.available / (1024 * 1024)
-            disk = psutil.disk_usage('.')
-            disk_usage_percent = (disk.used / disk.total) * 100
-        else:
-            # 基础监控（模拟数据）
-            cpu_percent = 25.0  # 模拟CPU使用率
-            memory_percent = 45.0  # 模拟内存使用率
-            memory_used_mb = 1024.0  # 模拟已用内存
-            memory_available_mb = 2048.0  # 模拟可用内存
-            disk_usage_percent = 60.0  # 模拟磁盘使用率
-        
-        return PerformanceMetrics(
-            cpu_percent=cpu_percent,
-            memory_percent=memory_percent,
-            memory_used_mb=round(memory_used_mb, 2),
-            memory_available_mb=round(memory_available_mb, 2),
-            disk_usage_percent=round(disk_usage_percent, 2),
-            timestamp=datetime.utcnow()
-        )
-        
+        return await asyncio.to_thread(_collect_performance_metrics)
     except Exception as e:
         logger.error(f"获取性能指标失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取性能指标失败: {str(e)}")
@@ -179,28 +199,10 @@ async def get_system_overview(db: AsyncSession = Depends(get_db)):
     - 性能指标摘要
     """
     try:
-        # 系统启动时间
-        if HAS_PSUTIL:
-            boot_time = psutil.boot_time()
-            uptime_seconds = int(time.time() - boot_time)
-        else:
-            # 模拟运行时间 (1小时)
-            uptime_seconds = 3600
-        
-        # 获取数据库健康状态 (简化版)
-        try:
-            await db.execute(text("SELECT 1"))
-            database_health = "正常"
-        except:
-            database_health = "异常"
-        
-        # 获取当前性能指标
-        performance = await get_performance_metrics()
-        
         return SystemStatus(
-            uptime_seconds=uptime_seconds,
-            database_health=database_health,
-            performance=performance,
+            uptime_seconds=_uptime_seconds(),
+            database_health=await _database_health(db),
+            performance=await get_performance_metrics(),
             last_check=datetime.utcnow()
         )
         
@@ -208,6 +210,20 @@ async def get_system_overview(db: AsyncSession = Depends(get_db)):
         logger.error(f"获取系统概览失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取系统概览失败: {str(e)}")
 
+async def sample_system_status() -> Dict[str, Any]:
+    """推送用的系统状态采样，结构与 /status/overview 一致；所有订阅页面共用一次采样"""
+    async with AsyncSessionLocal() as session:
+        database_health = await _database_health(session)
+    status = SystemStatus(
+        uptime_seconds=_uptime_seconds(),
+        database_health=database_health,
+        performance=await asyncio.to_thread(_collect_performance_metrics),
+        last_check=datetime.utcnow()
+    )
+    return jsonable_encoder(status)
+
+event_bus.register_sampler(TOPIC_METRICS, settings.EVENT_METRICS_INTERVAL, sample_system_status)
+
 @router.get("/health/quick")
 async def quick_health_check():
     """
@@ -403,6 +419,7 @@ async def create_system_fault(
         db.add(new_fault)
         await db.commit()
         await db.refresh(new_fault)
+        publish_event(TOPIC_SYSTEM_FAULT, {"action": "create", "id": new_fault.id, "severity": new_fault.severity})
         
         logger.info(f"创建系统故障记录: {fault_data.title}")
         
@@ -502,6 +519,7 @@ async def resolve_system_fault(
         fault.resolution_notes = resolution_notes
         
         await db.commit()
+        publish_event(TOPIC_SYSTEM_FAULT, {"action": "resolve", "id": fault_id})
         
         logger.info(f"故障记录 {fault_id} 已标记为解决")
         
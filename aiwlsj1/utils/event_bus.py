@@ -0,0 +1,143 @@
+"""
+服务端事件推送模块
+进程内发布/订阅：业务代码发布面板级变更事件，SSE连接订阅后推送给浏览器；
+周期性指标由一个服务端采样任务产生，只在有订阅者时运行，开多少屏幕都只采样一次。
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# 每个订阅者最多积压的事件数，消费过慢时丢弃最旧的事件
+SUBSCRIBER_QUEUE_SIZE = 100
+
+TOPIC_BI = "bi"
+TOPIC_FAULT = "fault"
+TOPIC_SYSTEM_FAULT = "system_fault"
+TOPIC_METRICS = "metrics"
+TOPIC_IMPORT = "import"
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """把事件编码为SSE报文"""
+    data = json.dumps(event["data"], ensure_ascii=False, default=str)
+    return f"id: {event['id']}\nevent: {event['topic']}\ndata: {data}\n\n"
+
+
+class Subscription:
+    """一个订阅者：关注的主题和待推送的事件队列"""
+
+    def __init__(self, topics: Set[str]):
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def offer(self, event: Dict[str, Any]):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class EventBus:
+    """进程内事件总线"""
+
+    def __init__(self):
+        self._subscriptions: List[Subscription] = []
+        self._samplers: Dict[str, Dict[str, Any]] = {}
+        self._next_id = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    def publish(self, topic: str, data: Optional[Dict[str, Any]] = None) -> int:
+        """发布事件，返回收到事件的订阅者数；可在同步代码中直接调用"""
+        self._next_id += 1
+        event = {"id": self._next_id, "topic": topic, "data": {"ts": time.time(), **(data or {})}}
+        receivers = 0
+        for subscription in self._subscriptions:
+            if topic in subscription.topics:
+                subscription.offer(event)
+                receivers += 1
+        return receivers
+
+    def register_sampler(self, topic: str, interval: float, sample: Callable[[], Awaitable[Dict[str, Any]]]):
+        """注册周期采样：有订阅者时每 interval 秒调用一次 sample 并发布结果"""
+        self._samplers[topic] = {"interval": interval, "sample": sample, "task": None}
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(set(topics))
+        self._subscriptions.append(subscription)
+        for topic in subscription.topics:
+            self._ensure_sampler(topic)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+        for topic, sampler in self._samplers.items():
+            task = sampler["task"]
+            if task is not None and not self._has_subscribers(topic):
+                task.cancel()
+                sampler["task"] = None
+
+    def _has_subscribers(self, topic: str) -> bool:
+        return any(topic in s.topics for s in self._subscriptions)
+
+    def _ensure_sampler(self, topic: str):
+        sampler = self._samplers.get(topic)
+        if sampler is None or (sampler["task"] is not None and not sampler["task"].done()):
+            return
+        sampler["task"] = asyncio.get_running_loop().create_task(self._run_sampler(topic, sampler))
+
+    async def _run_sampler(self, topic: str, sampler: Dict[str, Any]):
+        while self._has_subscribers(topic):
+            try:
+                self.publish(topic, await sampler["sample"]())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"事件采样失败({topic}): {e}")
+            await asyncio.sleep(sampler["interval"])
+
+    async def stream(self, subscription: Subscription, heartbeat: float) -> AsyncIterator[str]:
+        """逐条产出SSE报文，空闲时发送注释行保持连接；连接断开时自动退订"""
+        try:
+            yield f"retry: 3000\n: subscribed {','.join(sorted(subscription.topics))}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield format_sse(event)
+        finally:
+            self.unsubscribe(subscription)
+
+    async def close(self):
+        """应用关闭时停止采样任务并断开所有订阅"""
+        tasks = [s["task"] for s in self._samplers.values() if s["task"] is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for sampler in self._samplers.values():
+            sampler["task"] = None
+        # 放入结束标记，让进行中的SSE连接结束
+        for subscription in list(self._subscriptions):
+            subscription.offer(None)
+        self._subscriptions.clear()
+
+
+event_bus = EventBus()
+
+
+def publish_event(topic: str, data: Optional[Dict[str, Any]] = None) -> int:
+    """向共享事件总线发布事件"""
+    return event_bus.publish(topic, data)
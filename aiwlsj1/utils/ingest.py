@@ -0,0 +1,575 @@
+"""
+表格数据流式导入模块
+xlsx 用 openpyxl 只读模式逐行读取、csv 逐行读取、parquet 按行组分批读取，按声明式列映射转换类型，
+每 chunk_size 行交给写入端批量插入；内存占用只与批大小有关，与文件行数无关。
+"""
+
+import asyncio
+import csv
+import io
+import logging
+import math
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import openpyxl
+import pandas as pd
+from sqlalchemy import Date, DateTime, Float, Integer, Numeric, String, func, insert, or_, select
+
+from config import settings
+from db.dialect import upsert
+from utils.exceptions import FileUploadException
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # 可选依赖，未安装时不支持 .parquet
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# 结果中保留的错误明细条数上限
+INGEST_MAX_ERRORS = 200
+
+_DATETIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M",
+                     "%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y %H:%M:%S", "%Y年%m月%d日")
+
+Source = Union[str, Path, bytes, io.IOBase]
+Record = Dict[str, Any]
+
+
+def is_blank(value: Any) -> bool:
+    return (
+        value is None
+        or (isinstance(value, float) and math.isnan(value))
+        or (isinstance(value, str) and not value.strip())
+    )
+
+
+# 单元格转换函数：空值返回None，无法转换时抛出ValueError
+def as_str(value: Any) -> Optional[str]:
+    if is_blank(value):
+        return None
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value)
+
+
+def as_float(value: Any) -> Optional[float]:
+    if is_blank(value):
+        return None
+    if isinstance(value, bool):
+        raise ValueError("不是有效数字")
+    try:
+        return float(value.strip() if isinstance(value, str) else value)
+    except (TypeError, ValueError):
+        raise ValueError("不是有效数字")
+
+
+def as_int(value: Any) -> Optional[int]:
+    number = as_float(value)
+    if number is None:
+        return None
+    if not number.is_integer():
+        raise ValueError("必须为整数")
+    return int(number)
+
+
+def as_datetime(value: Any) -> Optional[datetime]:
+    if is_blank(value):
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    text = str(value).strip()
+    for fmt in _DATETIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        raise ValueError("不是有效的日期时间")
+
+
+# 推断整列格式时取样的非空文本个数
+DATETIME_SAMPLE_SIZE = 50
+
+
+def infer_datetime_format(sample: Sequence[str]) -> Optional[str]:
+    """返回能解析样本中最多值的候选格式，一个都解析不了时返回None"""
+    best, best_hits = None, 0
+    for fmt in _DATETIME_FORMATS:
+        hits = 0
+        for text in sample:
+            try:
+                datetime.strptime(text, fmt)
+                hits += 1
+            except ValueError:
+                pass
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+    return best
+
+
+class DatetimeColumn:
+    """按列批量转换日期时间
+
+    首次转换时从样本推断该列的格式，之后每批用 pd.to_datetime 按该格式整列转换；
+    不符合该格式的少数值再逐个用 as_datetime 回退解析。格式在批次间沿用，同一文件只推断一次。
+    """
+
+    def __init__(self, fmt: Optional[str] = None):
+        self.fmt = fmt
+
+    def convert(self, values: Sequence[Any]) -> Tuple[List[Optional[datetime]], List[int]]:
+        """返回转换结果和无法解析的位置；无法解析的位置结果为None"""
+        result: List[Optional[datetime]] = [None] * len(values)
+        positions, texts = [], []
+        for i, value in enumerate(values):
+            if is_blank(value):
+                continue
+            if isinstance(value, (datetime, date)):
+                result[i] = as_datetime(value)
+            else:
+                positions.append(i)
+                texts.append(str(value).strip())
+        if not texts:
+            return result, []
+
+        if self.fmt is None:
+            self.fmt = infer_datetime_format(texts[:DATETIME_SAMPLE_SIZE])
+        stragglers = positions
+        if self.fmt is not None:
+            parsed = pd.to_datetime(pd.Series(texts, dtype=object), format=self.fmt, errors="coerce")
+            missing = parsed.isna().tolist()
+            stragglers = []
+            for i, value, failed in zip(positions, parsed.array.to_pydatetime(), missing):
+                if failed:
+                    stragglers.append(i)
+                else:
+                    result[i] = value
+
+        bad = []
+        for i in stragglers:
+            try:
+                result[i] = as_datetime(values[i])
+            except ValueError:
+                bad.append(i)
+        return result, bad
+
+
+def normalize_datetime_column(values: Sequence[Any]) -> Tuple[List[Optional[datetime]], List[int]]:
+    """一次性转换一整列日期时间，返回转换结果和无法解析的位置"""
+    return DatetimeColumn().convert(values)
+
+
+class FieldSpec:
+    """一列的导入规则：写入字段、可接受的表头和类型转换
+
+    required 表示文件中必须有该列，nullable=False 表示该列的值不能为空。
+    表头去掉首尾空白后比较；contains=True 时表头包含该名称也算匹配（兼容带单位、备注的表头）。
+    """
+
+    def __init__(self, field: str, *headers: str, convert: Callable[[Any], Any] = as_str,
+                 required: bool = False, nullable: bool = True, contains: bool = False):
+        self.field = field
+        self.headers = tuple(h.strip() for h in headers) or (field,)
+        self.convert = convert
+        self.required = required
+        self.nullable = nullable
+        self.contains = contains
+
+    @property
+    def label(self) -> str:
+        return self.headers[0]
+
+    def match(self, header: str) -> bool:
+        return header in self.headers or (self.contains and any(h in header for h in self.headers))
+
+
+class TableMap:
+    """一张表的导入列映射；constants 为每行都写入的固定值"""
+
+    def __init__(self, model, fields: Sequence[FieldSpec], constants: Optional[Record] = None):
+        self.model = model
+        self.fields = list(fields)
+        self.constants = dict(constants or {})
+
+    def with_constants(self, **constants) -> "TableMap":
+        return TableMap(self.model, self.fields, {**self.constants, **constants})
+
+    def resolve(self, header: Sequence[Any]) -> List[Tuple[int, FieldSpec]]:
+        """按表头确定各字段所在列，缺少必填列时抛出 FileUploadException"""
+        names = [str(h).strip() if h is not None else "" for h in header]
+        columns: List[Tuple[int, FieldSpec]] = []
+        missing = []
+        for spec in self.fields:
+            index = next((i for i, name in enumerate(names) if name in spec.headers), None)
+            if index is None and spec.contains:
+                index = next((i for i, name in enumerate(names) if name and spec.match(name)), None)
+            if index is not None:
+                columns.append((index, spec))
+            elif spec.required:
+                missing.append(spec.label)
+        if missing:
+            raise FileUploadException(f"缺少必要的列: {'、'.join(missing)}")
+        return columns
+
+    def convert_rows(self, rows: Sequence[Tuple[int, Sequence[Any]]], columns: List[Tuple[int, FieldSpec]],
+                     errors: List[str], datetime_columns: Optional[Dict[int, DatetimeColumn]] = None
+                     ) -> List[Optional[Record]]:
+        """转换一批 (行号, 行) ，日期时间列整列转换，其余列逐格转换；出错行结果为None
+
+        datetime_columns 保存各日期时间列推断出的格式，跨批次传入同一个字典即可只推断一次。
+        """
+        if datetime_columns is None:
+            datetime_columns = {}
+        converted: Dict[int, Tuple[List[Optional[datetime]], set]] = {}
+        for index, spec in columns:
+            if spec.convert is as_datetime:
+                column = datetime_columns.setdefault(index, DatetimeColumn())
+                raw = [values[index] if index < len(values) else None for _, values in rows]
+                result, bad = column.convert(raw)
+                converted[index] = (result, set(bad))
+
+        records: List[Optional[Record]] = []
+        for position, (line, values) in enumerate(rows):
+            record = dict(self.constants)
+            ok = True
+            for index, spec in columns:
+                if index in converted:
+                    result, bad = converted[index]
+                    if position in bad:
+                        errors.append(f"第{line}行：{spec.label}不是有效的日期时间")
+                        ok = False
+                        continue
+                    value = result[position]
+                else:
+                    raw = values[index] if index < len(values) else None
+                    try:
+                        value = spec.convert(raw)
+                    except ValueError as e:
+                        errors.append(f"第{line}行：{spec.label}{e}")
+                        ok = False
+                        continue
+                if value is None and not spec.nullable:
+                    errors.append(f"第{line}行：{spec.label}不能为空")
+                    ok = False
+                record[spec.field] = value
+            records.append(record if ok else None)
+        return records
+
+
+_TYPE_CONVERTERS = ((Integer, as_int), ((Float, Numeric), as_float), ((DateTime, Date), as_datetime))
+
+
+def model_table_map(model, required: Sequence[str] = (), exclude: Sequence[str] = ()) -> TableMap:
+    """按模型生成列映射：表头为列注释或字段名，类型转换按列类型；required 中的列必须存在且非空"""
+    fields = []
+    for column in model.__table__.columns:
+        if column.primary_key or column.name in exclude:
+            continue
+        convert = next((conv for types, conv in _TYPE_CONVERTERS if isinstance(column.type, types)), as_str)
+        headers = (column.comment, column.name) if column.comment else (column.name,)
+        needed = column.name in required
+        fields.append(FieldSpec(column.name, *headers, convert=convert, required=needed, nullable=not needed))
+    return TableMap(model, fields)
+
+
+def _suffix(filename: str) -> str:
+    return Path(filename).suffix.lower()
+
+
+def check_upload(filename: str, size: int, allowed: Optional[Sequence[str]] = None,
+                 max_size: Optional[int] = None):
+    """检查上传文件的扩展名和大小（默认上限为 settings.MAX_FILE_SIZE）"""
+    allowed = allowed or settings.ALLOWED_FILE_EXTENSIONS
+    max_size = max_size or settings.MAX_FILE_SIZE
+    if _suffix(filename) not in allowed:
+        raise FileUploadException(f"仅支持{'、'.join(allowed)}格式的文件")
+    if size > max_size:
+        raise FileUploadException(f"文件超过{max_size // 1048576}MB限制")
+
+
+def iter_sheet_rows(source: Source, filename: Optional[str] = None, sheet: Optional[str] = None) -> Iterator[tuple]:
+    """逐行产出表格的单元格值（第一行为表头）
+
+    xlsx 使用 openpyxl 只读模式，csv 使用 csv 模块，parquet 按批读取列数据（需要 pyarrow）；
+    旧版 xls 需要 xlrd，经 pandas 读取。
+    """
+    if filename is None:
+        filename = str(source)
+    suffix = _suffix(filename)
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    if suffix == ".csv":
+        if isinstance(source, (str, Path)):
+            with open(source, newline="", encoding="utf-8-sig") as f:
+                yield from (tuple(row) for row in csv.reader(f))
+        else:
+            text = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+            try:
+                yield from (tuple(row) for row in csv.reader(text))
+            finally:
+                text.detach()
+    elif suffix in (".xlsx", ".xlsm"):
+        try:
+            workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        except Exception as e:
+            raise FileUploadException(f"文件解析失败: {str(e)[:100]}")
+        try:
+            if sheet is not None and sheet not in workbook.sheetnames:
+                raise FileUploadException(f"文件中没有工作表: {sheet}")
+            worksheet = workbook[sheet] if sheet is not None else workbook.active
+            yield from worksheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    elif suffix == ".xls":
+        try:
+            frame = pd.read_excel(source, sheet_name=sheet or 0, header=None, dtype=object)
+        except Exception as e:
+            raise FileUploadException(f"文件解析失败: {str(e)[:100]}")
+        yield from frame.itertuples(index=False, name=None)
+    elif suffix == ".parquet":
+        yield from _iter_parquet_rows(source)
+    else:
+        raise FileUploadException(f"不支持的文件格式: {suffix or filename}")
+
+
+def _iter_parquet_rows(source) -> Iterator[tuple]:
+    if pq is None:
+        raise FileUploadException("读取Parquet文件需要安装pyarrow")
+    try:
+        parquet = pq.ParquetFile(source)
+    except Exception as e:
+        raise FileUploadException(f"文件解析失败: {str(e)[:100]}")
+    yield tuple(parquet.schema_arrow.names)
+    # 每批按列取出再转置为行，时间列得到 datetime，与 xlsx 读取结果一致
+    for batch in parquet.iter_batches(batch_size=max(settings.IMPORT_CHUNK_SIZE, 1)):
+        yield from zip(*(col.to_pylist() for col in batch.columns))
+
+
+class IngestReport:
+    """导入统计：读取的数据行数、写入行数和出错行的明细"""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.errors: List[str] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.rows,
+            "inserted": self.inserted,
+            "skipped": self.rows - self.inserted,
+            "error_count": self.rejected,
+            "duplicate_count": self.duplicates,
+            "errors": self.errors[:INGEST_MAX_ERRORS],
+        }
+
+
+def iter_record_chunks(rows: Iterable[Sequence[Any]], table_map: TableMap, chunk_size: int,
+                       report: IngestReport, skip_rows: int = 0) -> Iterator[List[Record]]:
+    """把表格行按 chunk_size 分批转换为记录后产出；空行跳过，出错行记入 report 后跳过
+
+    skip_rows 为表头之后需要跳过的行数（如说明行）。行号与表格一致（表头为第1行）。
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise FileUploadException("文件中没有表头")
+    columns = table_map.resolve(header)
+    datetime_columns: Dict[int, DatetimeColumn] = {}
+
+    def convert(batch):
+        records = table_map.convert_rows(batch, columns, report.errors, datetime_columns)
+        chunk = [record for record in records if record is not None]
+        report.rejected += len(records) - len(chunk)
+        return chunk
+
+    batch: List[Tuple[int, Sequence[Any]]] = []
+    for line, values in enumerate(rows, start=2):
+        if line - 2 < skip_rows or all(is_blank(v) for v in values):
+            continue
+        report.rows += 1
+        batch.append((line, values))
+        if len(batch) >= chunk_size:
+            chunk = convert(batch)
+            batch = []
+            if chunk:
+                yield chunk
+    if batch:
+        chunk = convert(batch)
+        if chunk:
+            yield chunk
+
+
+def read_upload_frame(filename: str, contents: bytes) -> pd.DataFrame:
+    """读取上传的Excel/CSV为全字符串的DataFrame，供需要整表校验的小文件导入使用"""
+    check_upload(filename, len(contents))
+    rows = iter_sheet_rows(contents, filename)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    names = [str(h).strip() if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+    data = [[as_str(v) for v in values[:len(names)]] + [None] * (len(names) - len(values)) for values in rows]
+    return pd.DataFrame(data, columns=names, dtype=object)
+
+
+# 写入端：写入一批记录并返回实际写入条数，未写入的记录计为重复
+Sink = Callable[[Any, List[Record]], Awaitable[int]]
+
+
+def insert_sink(model) -> Sink:
+    """默认写入端：一批记录一条 executemany INSERT"""
+    async def sink(db, records: List[Record]) -> int:
+        await db.execute(insert(model), records)
+        return len(records)
+    return sink
+
+
+def natural_key(values: Iterable[Any]) -> Optional[tuple]:
+    """业务键比较值（字符串去首尾空白）；各字段都为空时无法识别，返回None"""
+    key = tuple(v.strip() if isinstance(v, str) else v for v in values)
+    return key if any(v is not None for v in key) else None
+
+
+def existing_keys_query(model, key_fields: Sequence[str], keys: Sequence[tuple]):
+    """查询库中可能与这批业务键相同的行，只扫描与这批数据相关的范围而不是整张表
+
+    非文本字段限定在这批键的最小、最大值之间（发生时间、序号等有索引）；全部为文本字段时按去空白后的取值匹配。
+    """
+    columns = [getattr(model, field) for field in key_fields]
+    textual = [isinstance(column.type, String) for column in columns]
+    conditions = []
+    for position, (column, is_text) in enumerate(zip(columns, textual)):
+        if is_text and not all(textual):
+            continue
+        values = [key[position] for key in keys]
+        present = [v for v in values if v is not None]
+        if not present:
+            condition = column.is_(None)
+        elif is_text:
+            condition = func.trim(column).in_(set(present))
+        else:
+            condition = column.between(min(present), max(present))
+        if present and len(present) < len(values):
+            condition = or_(condition, column.is_(None))
+        conditions.append(condition)
+    return select(*columns).where(*conditions)
+
+
+def split_new_records(records: List[Record], key_fields: Sequence[str],
+                      existing: Iterable[Any]) -> List[Record]:
+    """去掉业务键已在 existing 中或在本批中重复的记录；业务键各字段都为空的记录保留"""
+    seen = {natural_key(row) for row in existing}
+    fresh = []
+    for record in records:
+        key = natural_key(record.get(field) for field in key_fields)
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        fresh.append(record)
+    return fresh
+
+
+def record_keys(records: List[Record], key_fields: Sequence[str]) -> List[tuple]:
+    keys = (natural_key(record.get(field) for field in key_fields) for record in records)
+    return [key for key in keys if key is not None]
+
+
+def dedup_insert_sink(model, key_fields: Sequence[str]) -> Sink:
+    """按业务键去重的写入端：每批只查询库中与本批键范围相关的行，库中已有或文件中重复的记录跳过
+
+    本次导入已写入的批次在同一事务中，查询时可见。写入时冲突的行忽略（需要业务键上的唯一索引），
+    两个导入同时写入同一记录时只有一条生效。业务键各字段都为空的记录无法识别，照常写入。
+    """
+    async def sink(db, records: List[Record]) -> int:
+        keys = record_keys(records, key_fields)
+        existing = (await db.execute(existing_keys_query(model, key_fields, keys))).all() if keys else []
+        fresh = split_new_records(records, key_fields, existing)
+        if not fresh:
+            return 0
+        stmt = upsert(db.get_bind().dialect.name, model, fresh, key_fields, update=())
+        return (await db.execute(stmt)).rowcount
+
+    return sink
+
+
+def _check_strict(report: IngestReport, strict: bool):
+    if strict and report.rejected:
+        raise FileUploadException(
+            f"数据校验未通过，共{report.rejected}行有错误",
+            details={"errors": report.errors[:INGEST_MAX_ERRORS]},
+        )
+
+
+async def ingest(db, rows: Iterable[Sequence[Any]], table_map: TableMap, *, skip_rows: int = 0,
+                 chunk_size: Optional[int] = None, sink: Optional[Sink] = None,
+                 strict: bool = False, commit: bool = True,
+                 progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """流式导入到异步会话：逐批在线程中解析，由 sink 写入，最后一次提交
+
+    rows 一般为 iter_sheet_rows(...) 的结果（第一行为表头）。出错行默认跳过并在结果中列出；
+    strict=True 时有任一行出错即回滚并抛出 FileUploadException。
+    progress 每批写入后收到当前统计，在其中抛出异常可中止导入（已写入的批次随之回滚）。
+    返回 {total, inserted, skipped, error_count, duplicate_count, errors}。
+    """
+    chunk_size = max(chunk_size or settings.IMPORT_CHUNK_SIZE, 1)
+    sink = sink or insert_sink(table_map.model)
+    report = IngestReport()
+    chunks = iter_record_chunks(rows, table_map, chunk_size, report, skip_rows)
+    try:
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            written = await sink(db, chunk)
+            report.inserted += written
+            report.duplicates += len(chunk) - written
+            if progress is not None:
+                progress(report.to_dict())
+        _check_strict(report, strict)
+        if commit:
+            await db.commit()
+    except Exception:
+        if commit:
+            await db.rollback()
+        raise
+    finally:
+        chunks.close()
+    logger.info(f"{table_map.model.__tablename__} 导入：{report.rows}行，写入{report.inserted}行，重复{report.duplicates}行，出错{report.rejected}行")
+    return report.to_dict()
+
+
+def ingest_sync(session, rows: Iterable[Sequence[Any]], table_map: TableMap, *, skip_rows: int = 0,
+                chunk_size: Optional[int] = None, strict: bool = False, commit: bool = True,
+                progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """流式导入到同步会话（命令行脚本使用），每批一条 executemany INSERT；progress 每批写入后收到累计行数"""
+    chunk_size = max(chunk_size or settings.IMPORT_CHUNK_SIZE, 1)
+    report = IngestReport()
+    try:
+        for chunk in iter_record_chunks(rows, table_map, chunk_size, report, skip_rows):
+            session.execute(insert(table_map.model), chunk)
+            report.inserted += len(chunk)
+            if progress is not None:
+                progress(report.inserted)
+        _check_strict(report, strict)
+        if commit:
+            session.commit()
+    except Exception:
+        if commit:
+            session.rollback()
+        raise
+    return report.to_dict()
@@ -0,0 +1,268 @@
+"""
+大模型调用模块
+基于httpx的共享异步客户端：连接池复用、并发上限、总超时预算和结果缓存
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 单轮输出低于该长度或出现结束标志时不再续写
+CONTINUE_MIN_LENGTH = 900
+CONTINUE_PROMPT = "请继续输出剩余内容"
+FINISH_MARKERS = ("已完成", "END")
+
+NOT_CONFIGURED_MESSAGE = "AI分析功能未配置，请联系管理员配置API密钥。"
+TIMEOUT_MESSAGE = "AI分析请求超时，请稍后重试。如问题持续，请联系管理员。"
+CONNECT_ERROR_MESSAGE = "AI分析服务连接失败，请检查网络连接或稍后重试。"
+EMPTY_MESSAGE = "AI分析服务返回空结果，请稍后重试。"
+
+Messages = List[Dict[str, str]]
+
+
+class LLMError(Exception):
+    """大模型调用失败，message 为可直接展示给用户的提示"""
+
+
+def clean_ai_output(content: str) -> str:
+    """清洗AI输出：去除<think>标签、行首markdown符号和*字符"""
+    cleaned = re.sub(r'<think>[\s\S]*?</think>', '', content)
+    cleaned = re.sub(r'^[#>*\-\s]+', '', cleaned, flags=re.MULTILINE)
+    return cleaned.replace('*', '').strip()
+
+
+class DeepSeekBackend:
+    """OpenAI兼容的chat/completions接口，复用同一个连接池"""
+
+    def __init__(self, api_url: str, api_key: str, max_connections: int = 10):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_url and self.api_key)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"},
+            )
+        return self._client
+
+    async def chat(self, messages: Messages, *, model: str, max_tokens: int, temperature: float, timeout: float) -> str:
+        payload = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        try:
+            resp = await self._get_client().post(self.api_url, json=payload, timeout=timeout)
+        except httpx.TimeoutException as e:
+            raise LLMError(TIMEOUT_MESSAGE) from e
+        except httpx.TransportError as e:
+            raise LLMError(CONNECT_ERROR_MESSAGE) from e
+        if resp.status_code != 200:
+            raise LLMError(f"AI分析服务暂时不可用（状态码: {resp.status_code}），请稍后重试。")
+        try:
+            return resp.json()["choices"][0]["message"]["content"] or ""
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise LLMError("AI分析服务返回格式异常，请稍后重试。") from e
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class StubBackend:
+    """本地桩后端：不访问网络，根据提示词生成确定性的结果，用于测试和离线运行"""
+
+    configured = True
+
+    def __init__(self, reply: Optional[str] = None):
+        self.reply = reply
+        self.calls: List[Messages] = []
+
+    async def chat(self, messages: Messages, *, model: str, max_tokens: int, temperature: float, timeout: float) -> str:
+        self.calls.append(list(messages))
+        if self.reply is not None:
+            return self.reply
+        prompt = messages[0]["content"]
+        first_line = prompt.splitlines()[0] if prompt else ""
+        return f"【离线分析】{first_line[:60]}\n数据共{max(len(prompt.splitlines()) - 1, 0)}行，未调用外部模型。"
+
+    async def aclose(self):
+        pass
+
+
+class LLMClient:
+    """带并发上限、超时预算和结果缓存的大模型客户端"""
+
+    def __init__(
+        self,
+        backend,
+        *,
+        model: str = "deepseek-chat",
+        max_concurrency: int = 4,
+        request_timeout: float = 60.0,
+        total_timeout: float = 150.0,
+        cache_ttl: int = 3600,
+        cache_size: int = 128,
+    ):
+        self.backend = backend
+        self.model = model
+        self.request_timeout = request_timeout
+        self.total_timeout = total_timeout
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    @staticmethod
+    def cache_key(prompt: str, **params) -> str:
+        """按提示词（含数据）和调用参数计算缓存键"""
+        raw = json.dumps({"prompt": prompt, **params}, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        item = self._cache.get(key)
+        if item is None:
+            return None
+        if time.monotonic() - item[0] > self.cache_ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return item[1]
+
+    def _cache_set(self, key: str, value: str):
+        self._cache[key] = (time.monotonic(), value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    async def analyze(
+        self,
+        prompt: str,
+        *,
+        model: Optional[str] = None,
+        max_rounds: int = 3,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        raise_on_error: bool = False,
+    ) -> str:
+        """调用大模型分析，输出过长时自动续写，返回清洗后的文本
+
+        默认失败时返回可展示的提示文本；raise_on_error=True 时首轮即失败则抛出 LLMError。
+        只缓存成功的结果。
+        """
+        if not getattr(self.backend, "configured", True):
+            logger.warning("AI分析后端未配置API密钥")
+            if raise_on_error:
+                raise LLMError(NOT_CONFIGURED_MESSAGE)
+            return NOT_CONFIGURED_MESSAGE
+
+        model = model or self.model
+        key = self.cache_key(prompt, model=model, max_rounds=max_rounds, max_tokens=max_tokens, temperature=temperature)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        messages: Messages = [{"role": "user", "content": prompt}]
+        all_content = ""
+        failed = False
+        async with self._semaphore:
+            # 超时预算从拿到并发名额后开始计算，覆盖全部续写轮次
+            deadline = time.monotonic() + self.total_timeout
+            for _ in range(max_rounds):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    failed = True
+                    if raise_on_error and not all_content:
+                        raise LLMError(TIMEOUT_MESSAGE)
+                    all_content = all_content + "\n[AI分析补全失败：超出时间预算]" if all_content else TIMEOUT_MESSAGE
+                    break
+                timeout = min(self.request_timeout, remaining)
+                try:
+                    content = await asyncio.wait_for(
+                        self.backend.chat(messages, model=model, max_tokens=max_tokens, temperature=temperature, timeout=timeout),
+                        timeout=timeout,
+                    )
+                except (LLMError, asyncio.TimeoutError) as e:
+                    failed = True
+                    message = str(e) if isinstance(e, LLMError) else TIMEOUT_MESSAGE
+                    logger.warning(f"AI分析调用失败: {message}")
+                    if raise_on_error and not all_content:
+                        raise LLMError(message) from e
+                    all_content = all_content + f"\n[AI分析补全失败：{message}]" if all_content else message
+                    break
+                all_content += content
+                if len(content) < CONTINUE_MIN_LENGTH or any(marker in content for marker in FINISH_MARKERS):
+                    break
+                messages.append({"role": "assistant", "content": content})
+                messages.append({"role": "user", "content": CONTINUE_PROMPT})
+
+        if not all_content.strip():
+            if raise_on_error:
+                raise LLMError(EMPTY_MESSAGE)
+            return EMPTY_MESSAGE
+        cleaned = clean_ai_output(all_content)
+        if not failed and cleaned:
+            self._cache_set(key, cleaned)
+        return cleaned or "AI分析完成，但未生成有效内容。"
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+
+def _build_backend():
+    if settings.AI_BACKEND == "stub":
+        return StubBackend()
+    return DeepSeekBackend(settings.DEEPSEEK_API_URL, settings.DEEPSEEK_API_KEY, settings.AI_MAX_CONNECTIONS)
+
+
+_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """获取进程内共享的大模型客户端（按配置懒加载）"""
+    global _client
+    if _client is None:
+        _client = LLMClient(
+            _build_backend(),
+            model=settings.DEEPSEEK_MODEL,
+            max_concurrency=settings.AI_MAX_CONCURRENCY,
+            request_timeout=settings.AI_REQUEST_TIMEOUT,
+            total_timeout=settings.AI_TOTAL_TIMEOUT,
+            cache_ttl=settings.AI_CACHE_TTL,
+            cache_size=settings.AI_CACHE_SIZE,
+        )
+    return _client
+
+
+def set_llm_backend(backend) -> LLMClient:
+    """替换共享客户端的后端（测试或离线运行时注入桩后端），同时清空缓存"""
+    client = get_llm_client()
+    client.backend = backend
+    client.clear_cache()
+    return client
+
+
+async def close_llm_client():
+    """应用关闭时释放连接池"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
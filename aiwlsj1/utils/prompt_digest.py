@@ -0,0 +1,195 @@
+"""
+AI提示词统计摘要模块
+把 实体×月份 的明细表压缩为固定大小的统计摘要（分实体统计、趋势、季节指数、异常点），
+提示词长度不随历史数据增长，并记录压缩比。
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 摘要中逐个列出的实体数上限，其余合并为一行
+DIGEST_MAX_ENTITIES = 20
+# 列出的异常点数上限
+DIGEST_MAX_OUTLIERS = 10
+# |z| 超过该值视为异常点
+OUTLIER_Z = 2.5
+# 估算原始CSV大小时抽样的行数
+RAW_SIZE_SAMPLE_ROWS = 200
+
+_YEAR_MONTH_RE = re.compile(r"(\d{4})\D*(\d{1,2})")
+_MONTH_RE = re.compile(r"(\d{1,2})")
+
+
+def month_index(year: Optional[pd.Series], month: pd.Series) -> pd.Series:
+    """把年、月两列（字符串或数字）转换为月序号 year*12+month-1，无法解析的为NaN
+
+    year 为 None 时从 month 列解析，支持 "2025-01"、"2025年1月" 和只有月份的 "1"（记为第0年）。
+    """
+    if year is not None:
+        y = pd.to_numeric(year.astype(str).str.strip(), errors="coerce")
+        m = pd.to_numeric(month.astype(str).str.strip(), errors="coerce")
+    else:
+        text = month.astype(str)
+        parts = text.str.extract(_YEAR_MONTH_RE)
+        y = pd.to_numeric(parts[0], errors="coerce")
+        m = pd.to_numeric(parts[1], errors="coerce")
+        only_month = y.isna()
+        m = m.where(~only_month, pd.to_numeric(text.str.extract(_MONTH_RE)[0], errors="coerce"))
+        y = y.where(~only_month, 0)
+    m = m.where((m >= 1) & (m <= 12))
+    return y * 12 + m - 1
+
+
+def estimate_csv_chars(df: pd.DataFrame, sample_rows: int = RAW_SIZE_SAMPLE_ROWS) -> int:
+    """估算整表序列化为CSV的字符数：随机抽样 sample_rows 行（固定种子），按平均行宽乘以总行数
+
+    只用于压缩比统计，不必为此把整张表序列化一遍。
+    """
+    if len(df) <= sample_rows:
+        return len(df.to_csv(index=False))
+    # 等间隔抽样会和按月排列的数据周期重合，改用固定种子的随机抽样
+    sample = df.sample(n=sample_rows, random_state=0)
+    header = len(df.head(0).to_csv(index=False))
+    return header + round((len(sample.to_csv(index=False)) - header) / len(sample) * len(df))
+
+
+def _period_label(period: float) -> str:
+    period = int(period)
+    year, month = divmod(period, 12)
+    return f"{year}-{month + 1:02d}" if year else f"{month + 1}月"
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.4g}" if pd.notna(value) else "-"
+
+
+def _entity_stats(df: pd.DataFrame, entity_col: str, value_col: str, season: pd.Series) -> pd.DataFrame:
+    """分实体统计：条数、均值、标准差、极值、最新值和按月最小二乘斜率
+
+    斜率按季节指数调整后的值计算，避免不足整年的数据把季节波动误判为趋势。
+    """
+    data = df[[entity_col, "period", value_col]].dropna()
+    t = data["period"].astype(float)
+    t = t - t.min()
+    v = data[value_col].astype(float)
+    factor = ((data["period"].astype(int) % 12) + 1).map(season).fillna(1.0)
+    adjusted = v / factor.where(factor != 0, 1.0)
+    grouped = data.assign(_t=t, _v=v, _tt=t * t, _tv=t * adjusted, _a=adjusted).groupby(entity_col, sort=False)
+    stats = grouped.agg(
+        count=("_v", "size"), mean=("_v", "mean"), std=("_v", "std"),
+        min=("_v", "min"), max=("_v", "max"),
+        st=("_t", "sum"), sv=("_a", "sum"), stt=("_tt", "sum"), stv=("_tv", "sum"),
+    )
+    n = stats["count"]
+    denominator = n * stats["stt"] - stats["st"] ** 2
+    stats["slope"] = ((n * stats["stv"] - stats["st"] * stats["sv"]) / denominator.where(denominator > 0)).fillna(0.0)
+
+    latest = data.sort_values("period").groupby(entity_col, sort=False).tail(1).set_index(entity_col)
+    stats["last_period"] = latest["period"]
+    stats["last"] = latest[value_col].astype(float)
+    return stats.drop(columns=["st", "sv", "stt", "stv"])
+
+
+def _seasonal_index(df: pd.DataFrame, entity_col: str, value_col: str) -> pd.Series:
+    """季节指数：各月份值相对所属实体均值的平均比值"""
+    data = df[[entity_col, "period", value_col]].dropna()
+    entity_mean = data.groupby(entity_col)[value_col].transform("mean")
+    ratio = data[value_col] / entity_mean.where(entity_mean != 0)
+    calendar_month = (data["period"].astype(int) % 12) + 1
+    return ratio.groupby(calendar_month).mean().reindex(range(1, 13))
+
+
+def _outliers(df: pd.DataFrame, entity_col: str, value_col: str, limit: int) -> pd.DataFrame:
+    """相对实体自身均值的z分数异常点，按|z|降序取前limit个"""
+    data = df[[entity_col, "period", value_col]].dropna()
+    grouped = data.groupby(entity_col)[value_col]
+    std = grouped.transform("std")
+    z = (data[value_col] - grouped.transform("mean")) / std.where(std > 0)
+    data = data.assign(z=z).dropna(subset=["z"])
+    data = data[data["z"].abs() >= OUTLIER_Z]
+    return data.reindex(data["z"].abs().sort_values(ascending=False).index).head(limit)
+
+
+def build_digest(
+    df: pd.DataFrame,
+    entity_col: str,
+    value_cols: Sequence[str],
+    *,
+    entity_label: str = "实体",
+    value_labels: Optional[Dict[str, str]] = None,
+    max_entities: int = DIGEST_MAX_ENTITIES,
+    max_outliers: int = DIGEST_MAX_OUTLIERS,
+) -> Tuple[str, Dict[str, Any]]:
+    """生成统计摘要文本
+
+    df 需包含 entity_col、period（month_index 的结果）和 value_cols 列。
+    返回 (摘要文本, 统计信息)，统计信息含原始CSV字符数（抽样估算）、摘要字符数和压缩比。
+    """
+    value_labels = value_labels or {}
+    raw_chars = estimate_csv_chars(df)
+    df = df.dropna(subset=["period"])
+
+    lines: List[str] = []
+    if df.empty:
+        lines.append("暂无可统计的数据。")
+    else:
+        entities = df[entity_col].nunique()
+        lines.append(
+            f"数据概况：共{len(df)}条记录，{entities}个{entity_label}，"
+            f"时间范围 {_period_label(df['period'].min())} ~ {_period_label(df['period'].max())}。"
+        )
+        for value_col in value_cols:
+            label = value_labels.get(value_col, value_col)
+            season = _seasonal_index(df, entity_col, value_col)
+            stats = _entity_stats(df, entity_col, value_col, season)
+            if stats.empty:
+                continue
+            overall = df[value_col].astype(float)
+            lines.append(
+                f"【{label}】整体均值{_fmt(overall.mean())}，最小{_fmt(overall.min())}，最大{_fmt(overall.max())}。"
+            )
+            # 按最新值从高到低列出，超出上限的实体合并汇总
+            stats = stats.sort_values("last", ascending=False)
+            lines.append(f"各{entity_label}（均值/最小/最大/最新值/月均变化）：")
+            for name, row in stats.head(max_entities).iterrows():
+                lines.append(
+                    f"{name}：均值{_fmt(row['mean'])}，最小{_fmt(row['min'])}，最大{_fmt(row['max'])}，"
+                    f"最新{_fmt(row['last'])}（{_period_label(row['last_period'])}），"
+                    f"趋势{row['slope']:+.4g}/月，{int(row['count'])}个月"
+                )
+            rest = stats.iloc[max_entities:]
+            if not rest.empty:
+                lines.append(
+                    f"其余{len(rest)}个{entity_label}：最新值均值{_fmt(rest['last'].mean())}，"
+                    f"最高{_fmt(rest['last'].max())}，平均趋势{rest['slope'].mean():+.4g}/月"
+                )
+
+            if season.notna().any():
+                lines.append("季节指数（各月相对均值）：" + "，".join(
+                    f"{month}月{value:.3f}" for month, value in season.items() if pd.notna(value)
+                ))
+
+            outliers = _outliers(df, entity_col, value_col, max_outliers)
+            if not outliers.empty:
+                lines.append("异常点：" + "；".join(
+                    f"{row[entity_col]} {_period_label(row['period'])} {_fmt(row[value_col])}（z={row['z']:+.1f}）"
+                    for _, row in outliers.iterrows()
+                ))
+
+    digest = "\n".join(lines)
+    stats_info = {
+        "rows": int(len(df)),
+        "raw_chars": raw_chars,
+        "digest_chars": len(digest),
+        "compression_ratio": round(raw_chars / len(digest), 2) if digest else None,
+    }
+    logger.info(
+        f"AI提示词摘要：{stats_info['rows']}行，原始{raw_chars}字符 -> 摘要{len(digest)}字符，"
+        f"压缩比{stats_info['compression_ratio']}"
+    )
+    return digest, stats_info
@@ -0,0 +1,207 @@
+"""
+静态文件服务模块
+在StaticFiles基础上按文件类型设置浏览器缓存策略，优先发送构建好的 .br/.gz 预压缩文件；
+模板通过 static_url() 引用带内容指纹的文件名（见 build_static_assets.py）；大屏图片目录带内存缓存
+"""
+
+import asyncio
+import json
+import logging
+import mimetypes
+import os
+import re
+import stat
+from collections import OrderedDict
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from starlette.datastructures import Headers
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = "static"
+STATIC_URL_PREFIX = "/static/"
+# 构建步骤生成的 源路径->指纹文件名 清单，位于静态目录下
+ASSET_MANIFEST = "manifest.json"
+
+# 第三方压缩库（echarts.min.js 等）内容不会原地修改，可长期缓存
+LONG_CACHE_SUFFIXES = (".min.js", ".min.css", ".woff", ".woff2", ".ttf")
+# 文件名带12位内容哈希（echarts.min.0123456789ab.js），内容变化即换名，可永久缓存
+FINGERPRINT_RE = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+# 按优先顺序尝试的预压缩文件：(Content-Encoding, 后缀)
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_manifest: Dict[str, Dict[str, str]] = {}
+
+
+def accepted_encodings(headers: Headers) -> List[str]:
+    """解析Accept-Encoding，返回客户端接受的编码（忽略q=0）"""
+    encodings = []
+    for item in headers.get("accept-encoding", "").split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        key, _, value = params.replace(" ", "").partition("=")
+        try:
+            rejected = key == "q" and float(value) == 0
+        except ValueError:
+            rejected = False
+        if name and not rejected:
+            encodings.append(name)
+    return encodings
+
+
+class CachedStaticFiles(StaticFiles):
+    """带Cache-Control和预压缩的静态文件服务
+
+    指纹文件名和第三方库长期缓存（immutable）；其他文件每次用ETag/Last-Modified协商，未修改时返回304。
+    同目录下存在不早于源文件的 .br/.gz 且客户端接受时直接发送压缩文件，不再在线压缩。
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        path = os.fspath(full_path)
+        media_type = mimetypes.guess_type(path)[0] or "text/plain"
+        headers = {}
+        accepted = accepted_encodings(request_headers)
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            try:
+                variant_stat = os.stat(path + suffix)
+            except OSError:
+                continue
+            # 源文件在压缩之后被修改过（未重新构建），压缩文件已过期，不再发送
+            if variant_stat.st_mtime < stat_result.st_mtime:
+                continue
+            headers["Vary"] = "Accept-Encoding"
+            if encoding in accepted and stat.S_ISREG(variant_stat.st_mode):
+                headers["Content-Encoding"] = encoding
+                full_path, stat_result = path + suffix, variant_stat
+                break
+
+        response = FileResponse(
+            full_path, status_code=status_code, media_type=media_type, headers=headers, stat_result=stat_result
+        )
+        if FINGERPRINT_RE.search(path) or path.lower().endswith(LONG_CACHE_SUFFIXES):
+            response.headers["Cache-Control"] = f"public, max-age={settings.STATIC_LONG_CACHE_SECONDS}, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def load_asset_manifest(directory: str = STATIC_DIR) -> Dict[str, str]:
+    """读取构建清单；未构建时为空，static_url 原样返回源文件路径"""
+    manifest_path = Path(directory) / ASSET_MANIFEST
+    try:
+        files = json.loads(manifest_path.read_text(encoding="utf-8")).get("files", {})
+    except FileNotFoundError:
+        files = {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"静态资源清单读取失败，使用原始文件名: {e}")
+        files = {}
+    _manifest["files"] = files
+    return files
+
+
+def static_url(path: str) -> str:
+    """模板中引用静态文件：{{ static_url('js/echarts.min.js') }}，构建后返回指纹文件的URL"""
+    if "files" not in _manifest:
+        load_asset_manifest()
+    path = path.lstrip("/")
+    return STATIC_URL_PREFIX + quote(_manifest["files"].get(path, path))
+
+
+def install_static_url(templates) -> None:
+    """把 static_url 注册为 Jinja2Templates 的全局函数"""
+    templates.env.globals["static_url"] = static_url
+
+
+class ImageFiles:
+    """图片目录服务：路径限定在根目录内，小图片按LRU缓存在内存中
+
+    响应带 Content-Type、ETag（mtime+大小）和 Cache-Control，If-None-Match 命中时返回304；
+    超过单张缓存上限的大图片由 FileResponse 分块发送，不进内存。
+    """
+
+    def __init__(self, root: str, max_bytes: int, max_item_bytes: int, max_age: int):
+        self.root = Path(root).resolve()
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.max_age = max_age
+        self._cache: "OrderedDict[Path, Tuple[str, bytes]]" = OrderedDict()
+        self._cached_bytes = 0
+
+    def resolve(self, *parts: str) -> Path:
+        """解析为根目录内的文件路径，越界或不存在时抛出404"""
+        if any(not part or "\x00" in part for part in parts):
+            raise HTTPException(status_code=404, detail="图片不存在")
+        path = self.root.joinpath(*parts).resolve()
+        if path == self.root or self.root not in path.parents:
+            raise HTTPException(status_code=404, detail="图片不存在")
+        return path
+
+    @property
+    def cached_bytes(self) -> int:
+        return self._cached_bytes
+
+    def _cache_get(self, path: Path, etag: str) -> Optional[bytes]:
+        item = self._cache.get(path)
+        if item is None:
+            return None
+        if item[0] != etag:
+            # 文件已被替换
+            self._cache_pop(path)
+            return None
+        self._cache.move_to_end(path)
+        return item[1]
+
+    def _cache_pop(self, path: Path):
+        item = self._cache.pop(path, None)
+        if item is not None:
+            self._cached_bytes -= len(item[1])
+
+    def _cache_set(self, path: Path, etag: str, body: bytes):
+        self._cache_pop(path)
+        self._cache[path] = (etag, body)
+        self._cached_bytes += len(body)
+        while self._cached_bytes > self.max_bytes and self._cache:
+            _, (_, evicted) = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+
+    def clear(self):
+        self._cache.clear()
+        self._cached_bytes = 0
+
+    async def response(self, request: Request, *parts: str) -> Response:
+        path = self.resolve(*parts)
+        try:
+            stat_result = await asyncio.to_thread(os.stat, path)
+        except OSError:
+            raise HTTPException(status_code=404, detail="图片不存在")
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise HTTPException(status_code=404, detail="图片不存在")
+
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "Cache-Control": f"public, max-age={self.max_age}",
+        }
+        if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        if stat_result.st_size > self.max_item_bytes:
+            return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
+        body = self._cache_get(path, etag)
+        if body is None:
+            body = await asyncio.to_thread(path.read_bytes)
+            self._cache_set(path, etag, body)
+        return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,241 @@
+"""
+流式导出模块
+以有界内存将数据库查询结果导出为 CSV / XLSX / NDJSON / Parquet 并分块返回
+"""
+
+import asyncio
+import csv
+import io
+import json
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Callable, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from sqlalchemy.sql import Select
+
+from db.session import ReadSessionLocal
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 可选依赖，未安装时不提供 Parquet 导出
+    pa = pq = None
+
+# 每次从数据库取出的行数
+FETCH_CHUNK_ROWS = 1000
+# 每次向客户端发送的字节数
+SEND_CHUNK_BYTES = 64 * 1024
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# 导出列：(表头, 取值函数)，取值函数接收查询结果的一行
+ExportColumn = Tuple[str, Callable[[Any], Any]]
+
+
+def column(header: str, key: str) -> ExportColumn:
+    """按结果行的属性名取值的导出列"""
+    return header, lambda row: getattr(row, key)
+
+
+async def iter_query_rows(
+    query: Select,
+    chunk_size: int = FETCH_CHUNK_ROWS,
+    session_factory=ReadSessionLocal,
+) -> AsyncIterator[Any]:
+    """逐块流式读取查询结果
+
+    使用独立的读库会话，响应流式发送期间不依赖请求作用域的数据库会话。
+    """
+    async with session_factory() as session:
+        result = await session.stream(query.execution_options(yield_per=chunk_size))
+        async for partition in result.partitions(chunk_size):
+            for row in partition:
+                yield row
+
+
+def select_fields(fields: Sequence[Tuple[str, str]], names: Sequence[str]) -> List[Tuple[str, str]]:
+    """按字段名或表头从 (表头, 字段名) 列表中挑选导出列，保持请求的顺序；names 为空时返回全部"""
+    if not names:
+        return list(fields)
+    lookup = {}
+    for header, key in fields:
+        lookup[key] = lookup[header] = (header, key)
+    unknown = [name for name in names if name not in lookup]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不支持的导出列: {'、'.join(unknown)}")
+    return list(dict.fromkeys(lookup[name] for name in names))
+
+
+def _format_cell(value: Any) -> Any:
+    """统一单元格取值：去除Excel不允许的控制字符"""
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    return value
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+
+async def stream_csv(rows: AsyncIterator[Any], columns: Sequence[ExportColumn]) -> AsyncIterator[bytes]:
+    """将行流编码为CSV字节流（带BOM，Excel可直接打开中文）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow([header for header, _ in columns])
+    async for row in rows:
+        writer.writerow([_csv_value(getter(row)) for _, getter in columns])
+        if buffer.tell() >= SEND_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return _csv_value(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+async def stream_ndjson(rows: AsyncIterator[Any], columns: Sequence[ExportColumn]) -> AsyncIterator[bytes]:
+    """将行流编码为NDJSON字节流，每行一个以表头为键的JSON对象"""
+    buffer = io.StringIO()
+    async for row in rows:
+        record = {header: _json_value(getter(row)) for header, getter in columns}
+        buffer.write(json.dumps(record, ensure_ascii=False, default=str))
+        buffer.write("\n")
+        if buffer.tell() >= SEND_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def stream_xlsx(
+    rows: AsyncIterator[Any],
+    columns: Sequence[ExportColumn],
+    sheet_name: str = "Sheet1",
+) -> AsyncIterator[bytes]:
+    """将行流写入openpyxl只写模式工作簿，再分块发送
+
+    只写模式下工作表行会落盘到临时文件，内存占用与行数无关。
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_name[:31])
+    sheet.append([header for header, _ in columns])
+    async for row in rows:
+        sheet.append([_format_cell(getter(row)) for _, getter in columns])
+
+    with tempfile.TemporaryFile() as tmp:
+        await asyncio.to_thread(workbook.save, tmp)
+        tmp.seek(0)
+        while True:
+            chunk = await asyncio.to_thread(tmp.read, SEND_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _parquet_batch(columns: Sequence[ExportColumn], rows: List[Any], schema=None):
+    """一批行按列转换为 RecordBatch；首批确定各列类型，全为空的列按字符串处理"""
+    values = [[getter(row) for row in rows] for _, getter in columns]
+    if schema is None:
+        arrays = [pa.array(v) for v in values]
+        schema = pa.schema([
+            pa.field(header, pa.string() if arr.type == pa.null() else arr.type)
+            for (header, _), arr in zip(columns, arrays)
+        ])
+    arrays = []
+    for field, column_values in zip(schema, values):
+        if field.type == pa.string():
+            column_values = [v if v is None or isinstance(v, str) else str(v) for v in column_values]
+        arrays.append(pa.array(column_values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema), schema
+
+
+async def stream_parquet(
+    rows: AsyncIterator[Any],
+    columns: Sequence[ExportColumn],
+    batch_rows: int = FETCH_CHUNK_ROWS,
+) -> AsyncIterator[bytes]:
+    """将行流按批写成Parquet行组（临时文件），再分块发送"""
+    with tempfile.TemporaryFile() as tmp:
+        writer, schema, pending = None, None, []
+
+        def flush():
+            nonlocal writer, schema
+            batch, schema = _parquet_batch(columns, pending, schema)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, schema)
+            writer.write_batch(batch)
+            pending.clear()
+
+        async for row in rows:
+            pending.append(row)
+            if len(pending) >= batch_rows:
+                await asyncio.to_thread(flush)
+        if pending or writer is None:
+            await asyncio.to_thread(flush)
+        writer.close()
+
+        tmp.seek(0)
+        while True:
+            chunk = await asyncio.to_thread(tmp.read, SEND_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+
+def streaming_export_response(
+    rows: AsyncIterator[Any],
+    columns: Sequence[ExportColumn],
+    filename: str,
+    fmt: str = "xlsx",
+    sheet_name: Optional[str] = None,
+) -> StreamingResponse:
+    """构造流式下载响应，filename 不含扩展名"""
+    if fmt == "csv":
+        body = stream_csv(rows, columns)
+    elif fmt == "ndjson":
+        body = stream_ndjson(rows, columns)
+    elif fmt == "parquet":
+        if pq is None:
+            raise HTTPException(status_code=400, detail="导出Parquet需要安装pyarrow")
+        body = stream_parquet(rows, columns)
+    else:
+        fmt = "xlsx"
+        body = stream_xlsx(rows, columns, sheet_name or "Sheet1")
+    headers = {
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(f'{filename}.{fmt}')}"
+    }
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[fmt], headers=headers)
+
+
+def split_multi(values: Optional[List[str]]) -> List[str]:
+    """多值查询参数：支持重复参数和逗号分隔两种写法"""
+    items: List[str] = []
+    for value in values or []:
+        items.extend(v.strip() for v in value.split(",") if v.strip())
+    return items
@@ -0,0 +1,69 @@
+"""
+红绿灯预警规则模块
+规则作用于 月份×(指标, 实体) 宽表，按列整体比较，一次得到每个月的预警等级
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+GREEN = 0
+YELLOW = 1
+RED = 2
+
+
+class ThresholdRule:
+    """阈值规则：指标 >= red 为红灯，>= yellow 为黄灯；entities 为空时作用于宽表中全部实体"""
+
+    def __init__(self, field: str, yellow: Optional[float] = None, red: Optional[float] = None,
+                 entities: Optional[Sequence[str]] = None):
+        self.field = field
+        self.yellow = yellow
+        self.red = red
+        self.entities = list(entities) if entities else None
+
+    def evaluate(self, wide: pd.DataFrame) -> np.ndarray:
+        if self.field not in wide.columns.get_level_values(0):
+            return np.zeros(len(wide), dtype=int)
+        values = wide[self.field]
+        if self.entities is not None:
+            values = values.reindex(columns=self.entities)
+        values = values.to_numpy(dtype=float)
+        levels = np.zeros(values.shape, dtype=int)
+        if self.yellow is not None:
+            levels[values >= self.yellow] = YELLOW
+        if self.red is not None:
+            levels[values >= self.red] = RED
+        return levels.max(axis=1, initial=GREEN)
+
+
+class CompareRule:
+    """对比规则：实体 left 的任一指标大于实体 right 时，该月记为 level"""
+
+    def __init__(self, fields: Sequence[str], left: str, right: str, level: int = RED):
+        self.fields = list(fields)
+        self.left = left
+        self.right = right
+        self.level = level
+
+    def evaluate(self, wide: pd.DataFrame) -> np.ndarray:
+        hit = np.zeros(len(wide), dtype=bool)
+        for field in self.fields:
+            if (field, self.left) in wide.columns and (field, self.right) in wide.columns:
+                # 任一方缺失数据时比较结果为False，不预警
+                hit |= (wide[(field, self.left)] > wide[(field, self.right)]).to_numpy()
+        return np.where(hit, self.level, GREEN)
+
+
+def evaluate_rules(wide: pd.DataFrame, rules: Iterable) -> pd.Series:
+    """按规则集计算每行（月份）的预警等级，取各规则的最高等级"""
+    levels = np.zeros(len(wide), dtype=int)
+    for rule in rules:
+        levels = np.maximum(levels, rule.evaluate(wide))
+    return pd.Series(levels, index=wide.index)
+
+
+def split_by_level(levels: pd.Series) -> Dict[int, List]:
+    """把等级序列拆分为 {等级: [索引...]}"""
+    return {level: levels.index[levels == level].tolist() for level in (RED, YELLOW, GREEN)}